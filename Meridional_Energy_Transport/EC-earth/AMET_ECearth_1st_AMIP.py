@@ -11,7 +11,7 @@ Description     : The code aims to calculate the atmospheric meridional energy
                   correction and the computation of vertical integral of zonally
                   integrated meridional energy transport.
 Return Value    : GRIB1 data file
-Dependencies    : os, time, numpy, netCDF4, sys, matplotlib, pygrib
+Dependencies    : os, time, numpy, netCDF4, sys, matplotlib, pygrib, wizard
 variables       : Absolute Temperature              T         [K]
                   Specific Humidity                 q         [kg/kg]
                   Surface pressure                  sp        [Pa]
@@ -55,6 +55,12 @@ matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 #import iris
 import pygrib
+# shared kernels of Energy-Wizard at the root of the repository
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir))
+from wizard import grib
+from wizard import output
+from wizard import store
+from wizard import stream
 
 ##########################################################################
 ###########################   Units vacabulory   #########################
@@ -134,6 +140,15 @@ line_in = sys.stdin.readline()
 file_name = int(line_in)
 # specify output path for the netCDF4 file
 output_path = '/home/lwc16308/ecearth_postproc/output'
+# directory of the message index of each GRIB file (wizard.grib), built by the first run
+index_path = '/home/lwc16308/ecearth_postproc/grib_index'
+# number of processes which decode the GRIB files (one per variable)
+decode_workers = 6
+# directory of the NetCDF4 store (ingest_grib2netcdf_ecearth.py), output files which
+# are in the store are read from it instead of the GRIB files
+store_path = '/home/lwc16308/ecearth_postproc/store_1st_AMIP'
+# packing of the output fields (wizard.output), None (float64), 'float32' or 'int16'
+output_packing = None
 ####################################################################################
 ###############################   stdout and log  ##################################
 # Redirect all the console output to a file
@@ -281,23 +296,23 @@ def create_netcdf_point (meridional_E_point_pool,meridional_E_internal_point_poo
     print '*******************************************************************'
     logging.info("Start creating netcdf file for total meridional energy transport and each component at each grid point.")
     # wrap the datasets into netcdf file
-    # 'NETCDF3_CLASSIC', 'NETCDF3_64BIT', 'NETCDF4_CLASSIC', and 'NETCDF4'
-    data_wrap = Dataset(output_path + os.sep + 'point' + os.sep + 'AMET_EC-earth_model_daily_%d_E_point.nc' % (filename),'w',format = 'NETCDF3_64BIT')
+    # NETCDF4, compressed and chunked by time step (wizard.output)
+    data_wrap = output.create_dataset(output_path + os.sep + 'point' + os.sep + 'AMET_EC-earth_model_daily_%d_E_point.nc' % (filename))
     # create dimensions for netcdf data
     lat_wrap_dim = data_wrap.createDimension('latitude',Dim_latitude)
     lon_wrap_dim = data_wrap.createDimension('longitude',Dim_longitude)
     # create coordinate variables for 3-dimensions
-    lat_wrap_var = data_wrap.createVariable('latitude',np.float32,('latitude',))
-    lon_wrap_var = data_wrap.createVariable('longitude',np.float32,('longitude',))
+    lat_wrap_var = output.create_variable(data_wrap,'latitude',np.float32,('latitude',))
+    lon_wrap_var = output.create_variable(data_wrap,'longitude',np.float32,('longitude',))
     # create the actual 3-d variable
-    uc_wrap_var = data_wrap.createVariable('uc',np.float32,('latitude','longitude'))
-    vc_wrap_var = data_wrap.createVariable('vc',np.float32,('latitude','longitude'))
+    uc_wrap_var = output.create_variable(data_wrap,'uc',np.float32,('latitude','longitude'))
+    vc_wrap_var = output.create_variable(data_wrap,'vc',np.float32,('latitude','longitude'))
 
-    E_total_wrap_var = data_wrap.createVariable('E',np.float64,('latitude','longitude'))
-    E_internal_wrap_var = data_wrap.createVariable('E_cpT',np.float64,('latitude','longitude'))
-    E_latent_wrap_var = data_wrap.createVariable('E_Lvq',np.float64,('latitude','longitude'))
-    E_geopotential_wrap_var = data_wrap.createVariable('E_gz',np.float64,('latitude','longitude'))
-    E_kinetic_wrap_var = data_wrap.createVariable('E_uv2',np.float64,('latitude','longitude'))
+    E_total_wrap_var = output.create_variable(data_wrap,'E',np.float64,('latitude','longitude'),packing=output_packing)
+    E_internal_wrap_var = output.create_variable(data_wrap,'E_cpT',np.float64,('latitude','longitude'),packing=output_packing)
+    E_latent_wrap_var = output.create_variable(data_wrap,'E_Lvq',np.float64,('latitude','longitude'),packing=output_packing)
+    E_geopotential_wrap_var = output.create_variable(data_wrap,'E_gz',np.float64,('latitude','longitude'),packing=output_packing)
+    E_kinetic_wrap_var = output.create_variable(data_wrap,'E_uv2',np.float64,('latitude','longitude'),packing=output_packing)
     # global attributes
     data_wrap.description = 'Monthly mean meridional energy transport and each component at each grid point'
     # variable attributes
@@ -341,18 +356,18 @@ def create_netcdf_zonal_int (meridional_E_pool, meridional_E_internal_pool, meri
     print '*******************************************************************'
     logging.info("Start creating netcdf files for the zonal integral of total meridional energy transport and each component.")
     # wrap the datasets into netcdf file
-    # 'NETCDF3_CLASSIC', 'NETCDF3_64BIT', 'NETCDF4_CLASSIC', and 'NETCDF4'
-    data_wrap = Dataset(output_path + os.sep + 'zonal_int' + os.sep + 'AMET_EC-earth_model_daily_%d_E_zonal_int.nc' % (filename),'w',format = 'NETCDF3_64BIT')
+    # NETCDF4, compressed and chunked by time step (wizard.output)
+    data_wrap = output.create_dataset(output_path + os.sep + 'zonal_int' + os.sep + 'AMET_EC-earth_model_daily_%d_E_zonal_int.nc' % (filename))
     # create dimensions for netcdf data
     lat_wrap_dim = data_wrap.createDimension('latitude',Dim_latitude)
     # create coordinate variables for 3-dimensions
-    lat_wrap_var = data_wrap.createVariable('latitude',np.float32,('latitude',))
+    lat_wrap_var = output.create_variable(data_wrap,'latitude',np.float32,('latitude',))
     # create the actual 3-d variable
-    E_total_wrap_var = data_wrap.createVariable('E',np.float64,('latitude',))
-    E_internal_wrap_var = data_wrap.createVariable('E_cpT',np.float64,('latitude',))
-    E_latent_wrap_var = data_wrap.createVariable('E_Lvq',np.float64,('latitude',))
-    E_geopotential_wrap_var = data_wrap.createVariable('E_gz',np.float64,('latitude',))
-    E_kinetic_wrap_var = data_wrap.createVariable('E_uv2',np.float64,('latitude',))
+    E_total_wrap_var = output.create_variable(data_wrap,'E',np.float64,('latitude',),packing=output_packing)
+    E_internal_wrap_var = output.create_variable(data_wrap,'E_cpT',np.float64,('latitude',),packing=output_packing)
+    E_latent_wrap_var = output.create_variable(data_wrap,'E_Lvq',np.float64,('latitude',),packing=output_packing)
+    E_geopotential_wrap_var = output.create_variable(data_wrap,'E_gz',np.float64,('latitude',),packing=output_packing)
+    E_kinetic_wrap_var = output.create_variable(data_wrap,'E_uv2',np.float64,('latitude',),packing=output_packing)
     # global attributes
     data_wrap.description = 'Monthly mean zonal integral of meridional energy transport and each component'
     # variable attributes
@@ -401,22 +416,6 @@ if __name__=="__main__":
     ####################################################################
     ###  Create space for stroing intermediate variables and outputs ###
     ####################################################################
-    # for climatological variables
-    u = np.zeros((Dim_level,len(latitude),len(longitude)),dtype=float)
-    v = np.zeros((Dim_level,len(latitude),len(longitude)),dtype=float)
-    T = np.zeros((Dim_level,len(latitude),len(longitude)),dtype=float)
-    gz = np.zeros((Dim_level,len(latitude),len(longitude)),dtype=float)
-    sp = np.zeros((len(latitude),len(longitude)),dtype=float)
-    q = np.zeros((Dim_level,len(latitude),len(longitude)),dtype=float)
-    # for vertical integral
-    dp = np.zeros((Dim_level,len(latitude),len(longitude)),dtype=float)
-    # for tendency terms
-    q_start = np.zeros((Dim_level,len(latitude),len(longitude)),dtype=float)
-    q_end = np.zeros((Dim_level,len(latitude),len(longitude)),dtype=float)
-    sp_start = np.zeros((len(latitude),len(longitude)),dtype=float)
-    sp_end = np.zeros((len(latitude),len(longitude)),dtype=float)
-    dp_start = np.zeros((Dim_level,len(latitude),len(longitude)),dtype=float)
-    dp_end = np.zeros((Dim_level,len(latitude),len(longitude)),dtype=float)
     # data pool for grid point values
     uc_point_pool = np.zeros((Dim_latitude,Dim_longitude),dtype = float)
     vc_point_pool = np.zeros((Dim_latitude,Dim_longitude),dtype = float)
@@ -431,208 +430,54 @@ if __name__=="__main__":
     meridional_E_latent_pool = np.zeros((Dim_latitude),dtype = float)
     meridional_E_geopotential_pool = np.zeros((Dim_latitude),dtype = float)
     meridional_E_kinetic_pool = np.zeros((Dim_latitude),dtype = float)
-    ####################################################################
-    ####  Create space for stroing temporary variables and outputs  ####
-    ####################################################################
-    # data pool for mass budget correction module
-    pool_div_moisture_flux_u = np.zeros((num_record,Dim_latitude,Dim_longitude),dtype=float)
-    pool_div_moisture_flux_v = np.zeros((num_record,Dim_latitude,Dim_longitude),dtype=float)
-    pool_div_mass_flux_u = np.zeros((num_record,Dim_latitude,Dim_longitude),dtype=float)
-    pool_div_mass_flux_v = np.zeros((num_record,Dim_latitude,Dim_longitude),dtype=float)
-    pool_precipitable_water = np.zeros((num_record,Dim_latitude,Dim_longitude),dtype=float)
-    pool_sp = np.zeros((num_record,Dim_latitude,Dim_longitude),dtype=float)
-    # data pool for meridional energy tansport module
-    pool_internal_flux_int = np.zeros((num_record,Dim_latitude,Dim_longitude),dtype=float)
-    pool_latent_flux_int = np.zeros((num_record,Dim_latitude,Dim_longitude),dtype=float)
-    pool_geopotential_flux_int = np.zeros((num_record,Dim_latitude,Dim_longitude),dtype=float)
-    pool_kinetic_flux_int = np.zeros((num_record,Dim_latitude,Dim_longitude),dtype=float)
-    # data pool for the correction of meridional energy tansport
-    pool_heat_flux_int = np.zeros((num_record,Dim_latitude,Dim_longitude),dtype=float)
-    pool_vapor_flux_int = np.zeros((num_record,Dim_latitude,Dim_longitude),dtype=float)
-    pool_geo_flux_int = np.zeros((num_record,Dim_latitude,Dim_longitude),dtype=float)
-    pool_velocity_flux_int = np.zeros((num_record,Dim_latitude,Dim_longitude),dtype=float)
     ###############################################################################
     ###  extract variables and calculate the vertical integrated zonal integral ###
     ###############################################################################
-    # create a message iterator
-    index_SH = 2
-    index_GG = 35 # the first message is already read
+    # the 2D column integrals are summed record by record over the month (wizard.stream),
+    # each record (u, v, T, gz and q on 91 levels) is a chunk of one time step
+    month_stream = stream.MonthStream(A, B, constant)
+    # the messages are found through the index of each file (wizard.grib)
+    path_SH = datapath + os.sep + 'ICMSHECE3+%d_sp2gpl' % (file_name)
+    path_GG = datapath + os.sep + 'ICMGGECE3+%d_gp' % (file_name)
+    # the output file is converted to the store and its GRIB files are unchanged
+    month_store = store.MonthStore(store_path, 'EC-Earth')
+    file_stored = month_store.available('%d' % (file_name))
     for i in np.arange(num_record):
         ################################################################
-        ######       Get all the variables - spectral field      #######
+        ######       Get all the variables - GRIB messages       #######
         ################################################################
-        # for the variables on the spectral fields
-        while (index_SH <= (92+i*num_SH_per)):
-            key_u = ICMSHECE.message(index_SH)
-            u[index_SH-2-i*num_SH_per,:,:] = key_u.values
-            index_SH = index_SH + 1
-        while (index_SH <= (183+i*num_SH_per)):
-            key_v = ICMSHECE.message(index_SH)
-            v[index_SH-93-i*num_SH_per,:,:] = key_v.values
-            index_SH = index_SH + 1
-        while (index_SH <= (274+i*num_SH_per)):
-            key_T = ICMSHECE.message(index_SH)
-            T[index_SH-184-i*num_SH_per,:,:] = key_T.values
-            index_SH = index_SH + 1
-        while (index_SH <= (365+i*num_SH_per)):
-            key_gz = ICMSHECE.message(index_SH)
-            gz[index_SH-275-i*num_SH_per,:,:] = key_gz.values
-            index_SH = index_SH + 1
-        # jump the vertical velocity, now index_SH is 366 + i x 475
-        index_SH = index_SH + 91
-        # jump the lograithm of surface pressure (2 records)
-        index_SH = index_SH + 2
-        print "Retrieving datasets on the spectral fields successfully for the %d record!" % (i+1)
-        logging.info("Retrieving variables on the spectral fields for the %d record successfully!" % (i+1))
-        ############################################################
-        ######       Get all the fields - Gaussian grid      #######
-        ############################################################
-        while (index_GG <= (125+i*num_GG_per)):
-            key_q = ICMGGECE.message(index_GG)
-            q[index_GG-35-i*num_GG_per,:,:] = key_q.values
-            index_GG = index_GG + 1
-        key_sp = ICMGGECE.message(index_GG)
-        sp = key_sp.values
-        # jump the other variables that are not relevant
-        index_GG = index_GG + 45
-        print "Retrieving datasets on the Gaussian grid successfully for the %d record!" % (i+1)
-        logging.info("Retrieving variables on the Gaussian grid for the %d record successfully!" % (i+1))
-        ############################################################
-        ######    for the computation of tendency terms      #######
-        ############################################################
-        if i==0:
-            q_start = q
-            sp_start = sp
-        elif i==(num_record-1):
-            q_end = q
-            sp_end = sp
+        # position of the messages (0 for the first message) of the current record
+        record_SH = i * num_SH_per
+        record_GG = i * num_GG_per
+        # the variables are decoded at the same time, one worker per variable, and
+        # each worker reads its messages forward
+        # message numbers of the spectral field: u (2-92), v (93-183), T (184-274) and
+        # gz (275-365), the vertical velocity and the lograithm of surface pressure are jumped
+        # message numbers of the Gaussian grid: q (35-125) and sp (126)
+        if file_stored:
+            u, v, T, gz, q, sp = [field[0] for field in month_store.read('%d' % (file_name), ['u','v','T','gz','q','sp'],
+                                                                         steps=slice(i,i+1))]
+        else:
+            u, v, T, gz, q, sp = grib.read_blocks([(path_SH, record_SH + np.arange(1,92)),
+                                                   (path_SH, record_SH + np.arange(92,183)),
+                                                   (path_SH, record_SH + np.arange(183,274)),
+                                                   (path_SH, record_SH + np.arange(274,365)),
+                                                   (path_GG, record_GG + np.arange(34,125)),
+                                                   (path_GG, record_GG + np.array([125]))],
+                                                  decode_workers, index_path)
+            sp = sp[0]
+        print "Retrieving datasets on the spectral fields and the Gaussian grid successfully for the %d record!" % (i+1)
+        logging.info("Retrieving variables on the spectral fields and the Gaussian grid for the %d record successfully!" % (i+1))
         ############################################################
         ######       calculate flux (vertical integral)      #######
-        ######           meridional energy transport         #######
-        ############################################################
-        # use matrix A and B to calculate dp based on half pressure level
-        index_level = np.arange(Dim_level)
-        for j in index_level:
-            dp[j,:,:] = (A[j+1] + B[j+1] * sp) - (A[j] + B[j] * sp)
-        # calculate each component of total energy
-        # take the vertical integral
-        # variables for correction
-        # Internal Energy cpT
-        internal_flux = constant['cp'] * v * T * dp / constant['g']
-        internal_flux_int = np.sum(internal_flux,0)
-        # Latent heat Lq
-        latent_flux = constant['Lv'] * v * q * dp / constant['g']
-        latent_flux_int = np.sum(latent_flux,0)
-        # geopotential gz
-        geopotential_flux = v * gz * dp / constant['g']
-        geopotential_flux_int = np.sum(geopotential_flux,0)
-        # kinetic energy
-        kinetic_flux = v * 1/2 *(u**2 + v**2) * dp / constant['g']
-        kinetic_flux_int = np.sum(kinetic_flux,0)
-        # variables for correction
-        # for the correction of Internal Energy cpT
-        heat_flux = constant['cp'] * T * dp / constant['g']
-        heat_flux_int = np.sum(heat_flux,0)
-        # for the correction of Latent Heat flux Lq
-        vapor_flux = constant['Lv'] * q* dp / constant['g']
-        vapor_flux_int = np.sum(vapor_flux,0)
-        # for the correction of Geopotential flux gz
-        geo_flux = gz * dp / constant['g']
-        geo_flux_int = np.sum(geo_flux,0)
-        # for the correction of Kinetic Energy flux u2
-        velocity_flux = 1/2 *(u**2 + v**2) * dp / constant['g']
-        velocity_flux_int = np.sum(velocity_flux,0)
-        print 'Complete calculating meridional energy transport on model level'
-        # save the divergence terms to the warehouse
-        pool_internal_flux_int[i,:,:] = internal_flux_int
-        pool_latent_flux_int[i,:,:] = latent_flux_int
-        pool_geopotential_flux_int[i,:,:] = geopotential_flux_int
-        pool_kinetic_flux_int[i,:,:] = kinetic_flux_int
-        # variables for the correction of each energy component
-        pool_heat_flux_int[i,:,:] = heat_flux_int
-        pool_vapor_flux_int[i,:,:] = vapor_flux_int
-        pool_geo_flux_int[i,:,:] = geo_flux_int
-        pool_velocity_flux_int[i,:,:] = velocity_flux_int
+        ###### meridional energy transport & mass correction #######
         ############################################################
-        ######       calculate flux (vertical integral)      #######
-        ######             mass budget correction            #######
-        ############################################################
-        print 'Begin the calculation of divergent verically integrated moisture flux.'
-        # calculte the mean moisture flux for a certain month
-        moisture_flux_u = u * q * dp / constant['g']
-        moisture_flux_v = v * q * dp / constant['g']
-        # take the vertical integral
-        moisture_flux_u_int = np.sum(moisture_flux_u,0)
-        moisture_flux_v_int = np.sum(moisture_flux_v,0)
+        # the first and the last record are kept for the tendency terms
+        month_stream.add(T[np.newaxis], q[np.newaxis], u[np.newaxis], v[np.newaxis], sp[np.newaxis],
+                         gz=gz[np.newaxis])
+        print 'Complete calculating the vertical integrals of the %d record' % (i+1)
         # save memory
-        #del moisture_flux_u, moisture_flux_v
-        # calculate the divergence of moisture flux
-        div_moisture_flux_u = np.zeros((Dim_latitude,Dim_longitude),dtype = float)
-        div_moisture_flux_v = np.zeros((Dim_latitude,Dim_longitude),dtype = float)
-        ######################## Attnention to the coordinate and symbol #######################
-        # zonal moisture flux divergence
-        for j in np.arange(Dim_latitude):
-            for k in np.arange(Dim_longitude):
-                # the longitude could be from 0 to 360 or -180 to 180, but the index remains the same
-                if k == 0:
-                    div_moisture_flux_u[j,k] = (moisture_flux_u_int[j,k+1] - moisture_flux_u_int[j,-1]) / (2 * dx[j])
-                elif k == (Dim_longitude-1) :
-                    div_moisture_flux_u[j,k] = (moisture_flux_u_int[j,0] - moisture_flux_u_int[j,k-1]) / (2 * dx[j])
-                else:
-                    div_moisture_flux_u[j,k] = (moisture_flux_u_int[j,k+1] - moisture_flux_u_int[j,k-1]) / (2 * dx[j])
-        # meridional moisture flux divergence
-        # the latitude is from 90N to -90S
-        for j in np.arange(Dim_latitude):
-            if j == 0:
-                div_moisture_flux_v[j,:] = -(moisture_flux_v_int[j+1,:] - moisture_flux_v_int[j,:]) / (2 * dy)
-            elif j == (Dim_latitude-1):
-                div_moisture_flux_v[j,:] = -(moisture_flux_v_int[j,:] - moisture_flux_v_int[j-1,:]) / (2 * dy)
-            else:
-                div_moisture_flux_v[j,:] = -(moisture_flux_v_int[j+1,:] - moisture_flux_v_int[j-1,:]) / (2 * dy)
-        print 'The calculation of divergent verically integrated moisture flux is finished !!'
-        # save the divergence terms to the warehouse
-        pool_div_moisture_flux_u[i,:,:] = div_moisture_flux_u
-        pool_div_moisture_flux_v[i,:,:] = div_moisture_flux_v
-        ########################################################################
-        print 'Begin the calculation of divergent verically integrated mass flux.'
-        # calculate the mass flux
-        mass_flux_u = u * dp / constant['g']
-        mass_flux_v = v * dp / constant['g']
-        # take the vertical integral
-        mass_flux_u_int = np.sum(mass_flux_u,0)
-        mass_flux_v_int = np.sum(mass_flux_v,0)
-        # calculate the divergence of moisture flux
-        div_mass_flux_u = np.zeros((Dim_latitude,Dim_longitude),dtype = float)
-        div_mass_flux_v = np.zeros((Dim_latitude,Dim_longitude),dtype = float)
-        # zonal mass flux divergence
-        for j in np.arange(Dim_latitude):
-            for k in np.arange(Dim_longitude):
-                # the longitude could be from 0 to 360 or -180 to 180, but the index remains the same
-                if k == 0:
-                    div_mass_flux_u[j,k] = (mass_flux_u_int[j,k+1] - mass_flux_u_int[j,-1]) / (2 * dx[j])
-                elif k == (Dim_longitude-1) :
-                    div_mass_flux_u[j,k] = (mass_flux_u_int[j,0] - mass_flux_u_int[j,k-1]) / (2 * dx[j])
-                else:
-                    div_mass_flux_u[j,k] = (mass_flux_u_int[j,k+1] - mass_flux_u_int[j,k-1]) / (2 * dx[j])
-        # meridional mass flux divergence
-        for j in np.arange(Dim_latitude):
-            if j == 0:
-                div_mass_flux_v[j,:] = -(mass_flux_v_int[j+1,:] - mass_flux_v_int[j,:]) / (2 * dy)
-            elif j == (Dim_latitude-1):
-                div_mass_flux_v[j,:] = -(mass_flux_v_int[j,:] - mass_flux_v_int[j-1,:]) / (2 * dy)
-            else:
-                div_mass_flux_v[j,:] = -(mass_flux_v_int[j+1,:] - mass_flux_v_int[j-1,:]) / (2 * dy)
-        print 'The calculation of divergent verically integrated mass flux is finished !!'
-        # save the divergence terms to the warehouse
-        pool_div_mass_flux_u[i,:,:] = div_mass_flux_u
-        pool_div_mass_flux_v[i,:,:] = div_mass_flux_v
-        ########################################################################
-        # calculate precipitable water
-        precipitable_water = q * dp / constant['g']
-        precipitable_water_int = np.sum(precipitable_water,0)
-        pool_precipitable_water[i,:,:] = precipitable_water_int
-        # surface pressure for further mean comp
-        pool_sp[i,:,:] = sp
+        del u, v, T, gz, q, sp
     print "====================================================================="
     print " The extraction of variables and the computation of terms are done!! "
     print "====================================================================="
@@ -642,45 +487,8 @@ if __name__=="__main__":
     ############################################################
     ###########            mass correction           ###########
     ############################################################
-    # calculate tendency terms
-    # use matrix A and B to calculate dp based on half pressure level
-    for j in index_level:
-        dp_start[j,:,:] = (A[j+1] + B[j+1] * sp_start) - (A[j] + B[j] * sp_start)
-        dp_end[j,:,:] = (A[j+1] + B[j+1] * sp_end) - (A[j] + B[j] * sp_end)
-    print 'Begin the calculation of precipitable water tendency'
-    moisture_start = np.sum((q_start * dp_start), 0) # start of the current month
-    moisture_end = np.sum((q_end * dp_end), 0) # end of the current month
-    # compute the moisture tendency (one day has 86400s)
-    moisture_tendency = (moisture_end - moisture_start) / (days*86400) / constant['g']
-    print 'The calculation of precipitable water tendency is finished !!'
-    print 'Begin the calculation of surface pressure tendency'
-    sp_tendency = (sp_end - sp_start) / (days*86400) / constant['g']
-    print 'The calculation of surface pressure tendency is finished !!'
-    logging.info("Finish calculating the moisture tendency and surface pressure tendency")
-    print "Finish calculating the moisture tendency and surface pressure tendency"
-    # calculate the bartropic correction wind velocity
-    E_P = moisture_tendency + np.mean(pool_div_moisture_flux_u,0) +np.mean(pool_div_moisture_flux_v,0)
-    print '*******************************************************************'
-    print "******  Computation of E-P on each grid point is finished   *******"
-    print '*******************************************************************'
-    logging.info("Computation of E-P on each grid point is finished!")
-    # calculate the mass residual
-    mass_residual = sp_tendency + constant['g'] * (np.mean(pool_div_mass_flux_u,0) +\
-                    np.mean(pool_div_mass_flux_v,0)) - constant['g'] * E_P
-    print '*******************************************************************'
-    print "*** Computation of mass residual on each grid point is finished ***"
-    print '*******************************************************************'
-    logging.info("Computation of mass residual on each grid point is finished!")
-    # calculate barotropic correction wind
-    print 'Begin the calculation of barotropic correction wind.'
-    uc = np.zeros((Dim_latitude,Dim_longitude),dtype = float)
-    vc = np.zeros((Dim_latitude,Dim_longitude),dtype = float)
-    vc = mass_residual * dy / (np.mean(pool_sp,0) - constant['g'] * np.mean(pool_precipitable_water,0))
-    # extra modification for points at polor mesh
-    vc[0,:] = 0
-    vc[-1,:] = 0
-    for c in np.arange(Dim_latitude):
-        uc[c,:] = mass_residual[c,:] * dx[c] / (np.mean(pool_sp[:,c,:],0) - constant['g'] * np.mean(pool_precipitable_water[:,c,:],0))
+    # tendency terms from the first and the last record of the month (one day has 86400s)
+    uc, vc = month_stream.correction(dx, dy, days*86400, north_to_south=True, polar_rows=[0,-1])
     print '********************************************************************************'
     print "*** Computation of barotropic correction wind on each grid point is finished ***"
     print '********************************************************************************'
@@ -688,32 +496,10 @@ if __name__=="__main__":
     ####################################################################
     ##########           Meridional Energy Transport          ##########
     ####################################################################
-    # calculate the correction terms
-    correction_internal_flux_int = vc * np.mean(pool_heat_flux_int,0)
-    correction_latent_flux_int = vc * np.mean(pool_vapor_flux_int,0)
-    correction_geopotential_flux_int = vc * np.mean(pool_geo_flux_int,0)
-    correction_kinetic_flux_int = vc * np.mean(pool_velocity_flux_int,0)
-    # calculate the total meridional energy transport and each component respectively
-    # energy on grid point
-    meridional_E_internal_point = np.zeros((len(latitude),len(longitude)),dtype=float)
-    meridional_E_latent_point = np.zeros((len(latitude),len(longitude)),dtype=float)
-    meridional_E_geopotential_point = np.zeros((len(latitude),len(longitude)),dtype=float)
-    meridional_E_kinetic_point = np.zeros((len(latitude),len(longitude)),dtype=float)
-    meridional_E_point = np.zeros((len(latitude),len(longitude)),dtype=float)
-    for c in np.arange(Dim_latitude):
-        meridional_E_internal_point[c,:] = (np.mean(pool_internal_flux_int[:,c,:],0) - correction_internal_flux_int[c,:]) * dx[c]/1e+12
-        meridional_E_latent_point[c,:] = (np.mean(pool_latent_flux_int[:,c,:],0) - correction_latent_flux_int[c,:]) * dx[c]/1e+12
-        meridional_E_geopotential_point[c,:] = (np.mean(pool_geopotential_flux_int[:,c,:],0) - correction_geopotential_flux_int[c,:]) * dx[c]/1e+12
-        meridional_E_kinetic_point[c,:] = (np.mean(pool_kinetic_flux_int[:,c,:],0) - correction_kinetic_flux_int[c,:]) * dx[c]/1e+12
-    # total energy transport
-    meridional_E_point = meridional_E_internal_point + meridional_E_latent_point + meridional_E_geopotential_point + meridional_E_kinetic_point
-    # zonal integral of energy
-    meridional_E_internal = np.sum(meridional_E_internal_point,1)
-    meridional_E_latent = np.sum(meridional_E_latent_point,1)
-    meridional_E_geopotential = np.sum(meridional_E_geopotential_point,1)
-    meridional_E_kinetic = np.sum(meridional_E_kinetic_point,1)
-    # total energy transport
-    meridional_E = meridional_E_internal + meridional_E_latent + meridional_E_geopotential + meridional_E_kinetic
+    #!!!!!!!!!!!!!!! The unit is tera-watt (TW) !!!!!!!!!!!!!!!!!!!!!!#
+    meridional_E, meridional_E_internal, meridional_E_latent, meridional_E_geopotential, meridional_E_kinetic,\
+    meridional_E_point, meridional_E_internal_point, meridional_E_latent_point, meridional_E_geopotential_point,\
+    meridional_E_kinetic_point = month_stream.energy_transport(vc, dx)
     print '*****************************************************************************'
     print "***Computation of meridional energy transport in the atmosphere is finished**"
     print "************         The result is in tera-watt (1E+12)          ************"
@@ -51,6 +51,11 @@ from cartopy.mpl.gridliner import LONGITUDE_FORMATTER, LATITUDE_FORMATTER
 import iris
 import iris.plot as iplt
 import iris.quickplot as qplt
+# shared kernels of Energy-Wizard at the root of the repository
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir))
+from wizard import barotropic
+from wizard import mesh
+from wizard import overturning
 
 ##########################################################################
 ###########################   Units vacabulory   #########################
@@ -99,6 +104,8 @@ end_year = 1993
 # specify output path for the netCDF4 file
 output_path = 'C:\Yang\PhD\Computation and Modeling\Blue Action\OMET\GLORYS2V3'
 #output_path = '/project/Reanalysis/ERA_Interim/Subdaily/Model'
+# directory of the cache of the fields derived from the mesh (wizard.mesh), None for the directory of the mesh
+mesh_cache_path = None
 ####################################################################################
 
 def var_key(datapath, year, month):
@@ -118,58 +125,6 @@ def var_key(datapath, year, month):
     #logging.info("Retrieving variables for the year %d successfully!" % (year))
     return theta_key, uv_key
 
-def var_coordinate(datapath):
-    print "Start retrieving the datasets of ORCA025 coordinate and mask info"
-    #logging.info('Start retrieving the datasets of ORCA025 coordinate and mask info')
-    # get the variable keys
-    mesh_mask_key = Dataset(datapath+ os.sep + 'G2V3_mesh_mask_myocean.nc')
-    #grid_T_key = Dataset(datapath+ os.sep + 'coordinates_grid_T.nc')
-    #grid_U_key = Dataset(datapath+ os.sep + 'coordinates_grid_U.nc')
-    #grid_V_key = Dataset(datapath+ os.sep + 'coordinates_grid_V.nc')
-    #extract variables
-    # lat-lon-depth coordinate info
-    nav_lat = mesh_mask_key.variables['nav_lat'][:]
-    nav_lon = mesh_mask_key.variables['nav_lon'][:]
-    deptht = mesh_mask_key.variables['deptht'][:]
-    # lat-lon coordinate of V grid
-    gphiv = mesh_mask_key.variables['gphiv'][0,:,:] # lat from -78 to -89
-    glamv = mesh_mask_key.variables['glamv'][0,:,:] # lon from -179 to 179
-    # land-sea mask
-    tmask = mesh_mask_key.variables['tmask'][0,:,:,:]
-    umask = mesh_mask_key.variables['umask'][0,:,:,:]
-    vmask = mesh_mask_key.variables['vmask'][0,:,:,:]
-    # grid spacing scale factors (zonal)
-    e1t = mesh_mask_key.variables['e1t'][0,:,:]
-    e2t = mesh_mask_key.variables['e2t'][0,:,:]
-    #e1u = mesh_mask_key.variables['e1u'][0,:,:]
-    #e2u = mesh_mask_key.variables['e2u'][0,:,:]
-    e1v = mesh_mask_key.variables['e1v'][0,:,:]
-    e2v = mesh_mask_key.variables['e2v'][0,:,:]
-    # take the bathymetry
-    mbathy = mesh_mask_key.variables['mbathy'][0,:,:]
-    # depth of each layer
-    e3t_0 = mesh_mask_key.variables['e3t_0'][0,:]
-    # depth of partial cells
-    e3t_ps = mesh_mask_key.variables['e3t_ps'][0,:,:]
-    # Here the coordinate and mask from coordinates_grid_T/U/V are the same with
-    # those from mesh_mask
-    #lat_grid_T = grid_T_key.variables['lat'][:]
-    #lon_grid_T = grid_T_key.variables['lon'][:]
-    #tmask_grid_T = grid_T_key.variables['tmask'][:]
-
-    #lat_grid_U = grid_U_key.variables['lat'][:]
-    #lon_grid_U = grid_U_key.variables['lon'][:]
-    #umask_grid_U = grid_U_key.variables['umask'][:]
-
-    #lat_grid_V = grid_V_key.variables['lat'][:]
-    #lon_grid_V = grid_V_key.variables['lon'][:]
-    #vmask_grid_V = grid_V_key.variables['vmask'][:]
-
-    #Comparison
-    #print 'The tmask file from mesh_mask.nc and the grid T are the same %s' % np.array_equal(tmask,tmask_grid_T)
-
-    return nav_lat, nav_lon, deptht, tmask, umask, vmask, e1t, e2t, e1v, e2v, gphiv, glamv, mbathy, e3t_0, e3t_ps
-
 def mass_correction(uv_key):
     '''
     This function is used to correct the mass budget.
@@ -179,70 +134,16 @@ def mass_correction(uv_key):
     # extract variables
     u = uv_key.variables['vozocrtx'][0,:,:,:]
     v = uv_key.variables['vomecrty'][0,:,:,:]
-    # set the filled value to be 0
-    np.ma.set_fill_value(u,0)
-    np.ma.set_fill_value(v,0)
-    # interpolate u on v grid
-    u_vgrid = np.zeros((level,jj,ji),dtype=float)
-    # calculate the exception
-    # at north pole
-    u_vgrid[:,-1,0] = (u[:,-1,-1].filled() + u[:,-1,0].filled())/2
-    u_vgrid[:,-1,1:] = (u[:,-1,0:-1].filled() + u[:,-1,1:].filled())/2
-    # for the rest
-    for i in np.arange(jj-1):
-        for j in np.arange(ji):
-            if j == 0:
-                u_vgrid[:,i,j] = ((u[:,i,-1].filled() + u[:,i,0].filled())/2 + (u[:,i+1,-1].filled() + u[:,i+1,0].filled())/2)/2
-            else:
-                u_vgrid[:,i,j] = ((u[:,i,j-1].filled() + u[:,i,j].filled())/2 + (u[:,i+1,j-1].filled() + u[:,i+1,j].filled())/2)/2
-    # mask the u field after interpolation
-    u_vgrid = u_vgrid * vmask
     # calculate the mass residual based on continuity equation (divergence free for incompressible fluid)
-    # calculate the mass flux
-    mass_flux_u = np.zeros((level,jj,ji),dtype=float)
-    mass_flux_v = np.zeros((level,jj,ji),dtype=float)
-    for i in np.arange(level):
-            mass_flux_u[i,:,:] = u_vgrid[i,:,:] * e3t_0[i]
-            mass_flux_v[i,:,:] = v[i,:,:].filled() * e3t_0[i]
-    # take the vertical integral
-    mass_flux_u_int = np.sum(mass_flux_u,0)
-    mass_flux_v_int = np.sum(mass_flux_v,0)
-    # calculate the divergence of flux
-    div_mass_flux_u = np.zeros((jj,ji),dtype=float)
-    div_mass_flux_v = np.zeros((jj,ji),dtype=float)
-
-    for i in np.arange(ji):
-        if i == 0:
-            div_mass_flux_u[:,i] = (mass_flux_u_int[:,i+1] - mass_flux_u_int[:,-1]) / (e1v[:,i+1]/2+e1v[:,i]+e1v[:,-1]/2)
-        elif i == ji-1:
-            div_mass_flux_u[:,j] = (mass_flux_u_int[:,0] - mass_flux_u_int[:,i-1]) / (e1v[:,0]/2+e1v[:,i]+e1v[:,i-1]/2)
-        else:
-            div_mass_flux_u[:,j] = (mass_flux_u_int[:,i+1] - mass_flux_u_int[:,i-1]) / (e1v[:,i+1]/2+e1v[:,i]+e1v[:,i-1]/2)
-
-    for i in np.arange(jj):
-        if i == 0:
-            div_mass_flux_v[i,:] = mass_flux_v_int[i,:] / (e2v[i,:]/2)
-        elif i == jj-1:
-            div_mass_flux_v[i,:] = mass_flux_v_int[i,:] / (e2v[i,:]/2)
-        else:
-            div_mass_flux_v[i,:] = (mass_flux_v_int[i+1,:] - mass_flux_v_int[i-1,:]) / (e2v[i+1,:]/2+e2v[i,:]+e2v[i-1,:]/2)
-    # define the mass transport matrix at each grid point
-    mass_residual = np.zeros((jj,ji),dtype=float)
-    # calculate the mass residual based on continuity equation
-    mass_residual = div_mass_flux_u + div_mass_flux_v
+    # take the vertical integral of the mass flux on the U and V points
+    mass_flux_u_int = barotropic.transport(u, cell_thickness, umask)
+    mass_flux_v_int = barotropic.transport(v, cell_thickness, vmask)
+    # divergence of the flux through the faces of the T cells (NEMO style, e1/e2 metrics)
+    mass_residual = barotropic.flux_divergence(mass_flux_u_int, mass_flux_v_int, e2u, e1v, e1t, e2t)
     print "Complete the calculation of mass residual."
-    # take the bathymetry
-    # attention! We should not mask the depth array for the sake of following computation
-    max_bathy = np.zeros((jj,ji),dtype = float)
-    for i in np.arange(jj):
-        for j in np.arange(ji):
-            counter = mbathy[i,j]
-            max_bathy[i,j] = deptht[counter]
     # create the velocity correction matrix
-    uc = np.zeros((jj,ji),dtype=float)
-    vc = np.zeros((jj,ji),dtype=float)
-    uc = mass_residual[:,:] * e1v / max_bathy * vmask[0,:,:]
-    vc = mass_residual[:,:] * e2v / max_bathy * vmask[0,:,:]
+    # the depth of the sea bottom (max_bathy) is taken once from the mesh
+    uc, vc = barotropic.correction_velocity(mass_residual, max_bathy, e1u, e2v, umask[0,:,:], vmask[0,:,:])
 
     print "Barotropic current velocity is obtained from mass residual."
 
@@ -479,15 +380,20 @@ if __name__=="__main__":
     jj = 1021
     level = 75
     # extract the mesh_mask and coordinate information
-    nav_lat, nav_lon, deptht, tmask, umask, vmask, e1t, e2t, e1v, e2v, gphiv, glamv, mbathy, e3t_0, e3t_ps = var_coordinate(datapath)
+    # mesh of ORCA025, the fields are read from the mesh files when they are used (wizard.mesh)
+    ocean_mesh = mesh.ORCAMesh('ORCA025', datapath, mesh_cache_path)
+    deptht, vmask, e1v, e2v, gphiv, glamv, mbathy, e3t_0 = ocean_mesh.fields('deptht', 'vmask', 'e1v', 'e2v', 'gphiv', 'glamv',
+                                                                             'mbathy', 'e3t_0')
+    umask, e1u, e2u, e1t, e2t = ocean_mesh.fields('umask', 'e1u', 'e2u', 'e1t', 'e2t')
     # construct partialer depth matrix
     # include the partial cell to the layers above, due to the presence of variabels (t,u,v)
-    e3t_adjust = np.zeros((level,jj,ji),dtype = float)
-    for i in np.arange(1,level,1):
-        for j in np.arange(jj):
-            for k in np.arange(ji):
-                if i == mbathy[j,k]:
-                    e3t_adjust[i-1,j,k] = e3t_ps[j,k]
+    # the levels 1 to level-1 of mbathy have a partial cell, cached for each mesh (wizard.mesh)
+    e3t_adjust = ocean_mesh.e3t_partial
+    # thickness of the cells with the partial cells at the bottom and depth of the sea bottom
+    # for the mass correction, the mass budget is closed on the cells that carry the transport
+    # attention! We should not mask the depth array for the sake of following computation
+    cell_thickness = overturning.cell_thickness(e3t_0, ocean_mesh.e3t_adjust)
+    max_bathy = barotropic.bottom_depth(deptht, mbathy)
     #create a data pool to save the OMET for each year and month
     E_pool_point = np.zeros((len(period),12,jj,ji),dtype = float)
     E_pool_zonal_int = np.zeros((len(period),12,jj),dtype = float)
@@ -496,31 +402,31 @@ if __name__=="__main__":
     uc_pool_point = np.zeros((len(period),12,jj,ji),dtype = float)
     vc_pool_point = np.zeros((len(period),12,jj,ji),dtype = float)
     # loop for calculation
-    for i in period:
+    for n, i in enumerate(period):
         for j in index_month:
             # get the key of each variable
             theta_key, uv_key = var_key(datapath, i, namelist_month[j])
             # mass budget correction
             uc, vc = mass_correction(uv_key)
-            uc_pool_point[i-1993,j,:,:] = uc
-            vc_pool_point[i-1993,j,:,:] = vc
+            uc_pool_point[n,j,:,:] = uc
+            vc_pool_point[n,j,:,:] = vc
             # calculate the stokes stream function and plot
             psi = stream_function(uv_key,e1v)
             E_pool_zonal_psi[j,:,:] = psi
             # calculate the meridional energy transport in the ocean
             E_point = meridional_energy_transport(theta_key, uv_key)
-            E_pool_point[i-1993,j,:,:] = E_point
+            E_pool_point[n,j,:,:] = E_point
         # plot the stream function
         psi_mean = visualization_stream_function(E_pool_zonal_psi)
         # take the mean value over the entire year for visualization
-        E_point_mean = np.mean(E_pool_point[i-1993,:,:,:],0)
+        E_point_mean = np.mean(E_pool_point[n,:,:,:],0)
         # regridding for visualization
         cube_regrid, E_regrid, y_coord = regridding(E_point_mean, vmask[0,:,:])
-        E_pool_point_regrid[i-1993,:,:] = E_regrid
+        E_pool_point_regrid[n,:,:] = E_regrid
         #visualization
         visualization(cube_regrid)
         # plot the meridional energy transport in the ocean
-        E_zonal_int = zonal_int_plot(E_pool_point[i-1993,:,:,:])
-        E_pool_zonal_int[i-1993,:,:] = E_zonal_int
+        E_zonal_int = zonal_int_plot(E_pool_point[n,:,:,:])
+        E_pool_zonal_int[n,:,:] = E_zonal_int
 
 print ("--- %s minutes ---" % ((tttt.time() - start_time)/60))
@@ -45,6 +45,12 @@ import matplotlib
 matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 from mpl_toolkits.basemap import Basemap, cm
+# shared kernels of Energy-Wizard at the root of the repository
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir))
+from wizard import mesh
+from wizard import omet
+from wizard import output
+from wizard import overturning
 #import cartopy.crs as ccrs
 #from cartopy.mpl.gridliner import LONGITUDE_FORMATTER, LATITUDE_FORMATTER
 #import iris
@@ -95,6 +101,22 @@ start_year = 1993
 end_year = 2014
 # specify output path for the netCDF4 file
 output_path = '/project/Reanalysis/GLORYS2V3/monthly/output'
+# packing of the output fields (wizard.output), None (float64), 'float32' or 'int16'
+output_packing = None
+# range (minimum, maximum) of the output fields for the int16 packing (wizard.output), required
+# since the fields are appended one by one and the first append does not cover the range
+# OMET at each grid point [TW]
+point_value_range = None
+# zonal integral of OMET of the globe and of the basins [TW]
+zonal_value_range = None
+# stream function of the globe and of the basins [Sv]
+psi_value_range = None
+# directory of the cache of the fields derived from the mesh (wizard.mesh), None for the directory of the mesh
+mesh_cache_path = None
+# basins of the zonal integral of OMET and of the stream function besides the globe (wizard.mesh)
+# 'atl' (Atlantic), 'inp' (Indo-Pacific), 'arc' (Arctic) or a polygon (name, [(lon, lat), ...])
+# e.g. ('nordic', [(-30,60),(20,60),(20,80),(-30,80)])
+basins = ['atl', 'inp', 'arc']
 ####################################################################################
 
 def var_key(datapath, year, month):
@@ -133,111 +155,26 @@ def var_key(datapath, year, month):
     logging.info("Retrieving variables for the year %d month %s successfully!" % (year,namelist_month[month]))
     return theta_key, uv_key
 
-def var_coordinate(datapath):
-    print "Start retrieving the ORCA025 coordinate and mask info"
-    logging.info('Start retrieving the ORCA025 coordinate and mask info')
-    # get the variable keys
-    mesh_mask_key = Dataset(datapath+ os.sep + 'G2V3_mesh_mask_myocean.nc')
-    subbasin_mesh_key = Dataset(datapath+ os.sep + 'new_maskglo.nc') #sub-basin from Andreas
-    #extract variables
-    # lat-lon-depth coordinate info
-    nav_lat = mesh_mask_key.variables['nav_lat'][:]
-    nav_lon = mesh_mask_key.variables['nav_lon'][:]
-    deptht = mesh_mask_key.variables['deptht'][:]
-    # lat-lon coordinate of V grid
-    gphiv = mesh_mask_key.variables['gphiv'][0,:,:] # lat from -78 to -89
-    glamv = mesh_mask_key.variables['glamv'][0,:,:] # lon from -179 to 179
-    # land-sea mask
-    tmask = mesh_mask_key.variables['tmask'][0,:,:,:]
-    #umask = mesh_mask_key.variables['umask'][0,:,:,:]
-    vmask = mesh_mask_key.variables['vmask'][0,:,:,:]
-    # land-sea mask for sub-basin
-    tmaskatl = subbasin_mesh_key.variables['tmaskatl'][:,1:-1] # attention that the size is different!
-    # grid spacing scale factors (zonal)
-    e1t = mesh_mask_key.variables['e1t'][0,:,:]
-    e2t = mesh_mask_key.variables['e2t'][0,:,:]
-    #e1u = mesh_mask_key.variables['e1u'][0,:,:]
-    #e2u = mesh_mask_key.variables['e2u'][0,:,:]
-    e1v = mesh_mask_key.variables['e1v'][0,:,:]
-    e2v = mesh_mask_key.variables['e2v'][0,:,:]
-    # take the bathymetry
-    mbathy = mesh_mask_key.variables['mbathy'][0,:,:]
-    # depth of each layer
-    e3t_0 = mesh_mask_key.variables['e3t_0'][0,:]
-    # depth of partial cells
-    e3t_ps = mesh_mask_key.variables['e3t_ps'][0,:,:]
-
-    print "Retrieve the ORCA025 coordinate and mask info successfully!"
-    logging.info('Finish retrieving the ORCA025 coordinate and mask info')
-
-    return nav_lat, nav_lon, deptht, tmask, vmask, tmaskatl, e1t, e2t, e1v, e2v, gphiv, glamv, mbathy, e3t_0, e3t_ps
-
-
 def stream_function(uv_key,e1v):
     '''
     This function is used to calculate the mass transport.
     The unit is Sv (1E+6 m3/s)
     '''
-    print "Compute the meridional overturning stream function for globle and Atlantic!"
-    logging.info('Compute the meridional overturning stream function for globle and Atlantic!')
+    print "Compute the meridional overturning stream function for globle and each basin!"
+    logging.info('Compute the meridional overturning stream function for globle and each basin!')
     #dominant equation for stream function
     # psi = e1v(m) * rho(kg/m3) * v(m/s) * dz(m) = (kg/s)
     # extract variables
     #u = uv_key.variables['vozocrtx'][0,:,:,:]
     v = uv_key.variables['vomecrty'][0,:,:,:]
-    # set the filled value to be 0
-    #np.ma.set_fill_value(u,0)
-    np.ma.set_fill_value(v,0)
-    # define the stream function psi
-    psi_globe = np.zeros((level,jj,ji),dtype=float)
-    psi_atlantic = np.zeros((level,jj,ji),dtype=float)
-    # expand the grid size matrix e1v to avoid more loops
-    e1v_3D = np.repeat(e1v[np.newaxis,:,:],level,0)
-    # choose the integration order
-    int_order = 1  # 1 - from sea bottom to sea surface 2 from sea surfaca to sea bottom
-    if int_order == 1:
-        # take the integral from sea botton to the surface
-        # global meridional overturning stream function
-        for i in (level - np.arange(level) -1 ):
-            if i == level -1:
-                psi_globe[i,:,:] = e1v_3D[i,:,:] * v[i,:,:].filled() * vmask[i,:,:] * e3t_0[i] -\
-                                   e1v_3D[i,:,:] * v[i,:,:].filled() * vmask[i,:,:] * e3t_adjust[i,:,:]
-                # for old version of python to avoid the filling value during summation
-                psi_globe[i,:,:] = psi_globe[i,:,:] * vmask[i,:,:]
-            else:
-                psi_globe[i,:,:] = e1v_3D[i,:,:] * v[i,:,:].filled() * vmask[i,:,:] * e3t_0[i] + psi_globe[i+1,:,:] -\
-                                   e1v_3D[i,:,:] * v[i,:,:].filled() * vmask[i,:,:] * e3t_adjust[i,:,:]
-                # for old version of python to avoid the filling value during summation
-                psi_globe[i,:,:] = psi_globe[i,:,:] * vmask[i,:,:]
-        # Atlantic meridional overturning stream function
-        for i in (level - np.arange(level) -1 ):
-            if i == level -1:
-                psi_atlantic[i,:,:] = e1v_3D[i,:,:] * v[i,:,:].filled() * vmask[i,:,:] * tmaskatl * e3t_0[i] -\
-                                      e1v_3D[i,:,:] * v[i,:,:].filled() * vmask[i,:,:] * tmaskatl * e3t_adjust[i,:,:]
-                # for old version of python to avoid the filling value during summation
-                psi_atlantic[i,:,:] = psi_atlantic[i,:,:] * tmaskatl * vmask[i,:,:]
-            else:
-                psi_atlantic[i,:,:] = e1v_3D[i,:,:] * v[i,:,:].filled() * vmask[i,:,:] * tmaskatl * e3t_0[i] + psi_atlantic[i+1,:,:] -\
-                                      e1v_3D[i,:,:] * v[i,:,:].filled() * vmask[i,:,:] * tmaskatl * e3t_adjust[i,:,:]
-                # for old version of python to avoid the filling value during summation
-                psi_atlantic[i,:,:] = psi_atlantic[i,:,:] * tmaskatl * vmask[i,:,:]
-    elif int_order == 2:
-        # take the integral from sea surface to the bottom
-        for i in np.arange(level):
-            if i == 0:
-                psi_globe[i,:,:] = e1v_3D[i,:,:] * v[i,:,:].filled() * vmask[i,:,:] * e3t_0[i] -\
-                                   e1v_3D[i,:,:] * v[i,:,:].filled() * vmask[i,:,:] * e3t_adjust[i,:,:]
-            else:
-                psi_globe[i,:,:] = e1v_3D[i,:,:] * v[i,:,:].filled() * vmask[i,:,:] * e3t_0[i] + psi_globe[i+1,:,:] -\
-                                   e1v_3D[i,:,:] * v[i,:,:].filled() * vmask[i,:,:] * e3t_adjust[i,:,:]
-    # take the zonal integral
-    psi_stream_globe = np.sum(psi_globe,2)/1e+6 # the unit is changed to Sv
-    psi_stream_atlantic = np.sum(psi_atlantic,2)/1e+6 # the unit is changed to Sv
+    # integral from the sea bottom to the surface and zonal integral, for the globe and
+    # each basin in one pass (wizard.overturning)
+    psi_stream = overturning.stream_function(v, e1v, e3t_cell, vmask, [None] + basin_masks)
 
-    print "Compute the meridional overturning stream function for globle and Atlantic successfully!"
-    logging.info('Compute the meridional overturning stream function for globle and Atlantic successfully!')
+    print "Compute the meridional overturning stream function for globle and each basin successfully!"
+    logging.info('Compute the meridional overturning stream function for globle and each basin successfully!')
 
-    return psi_stream_globe, psi_stream_atlantic
+    return psi_stream[0], psi_stream[1:]
 
 def visualization_stream_function(psi_glo,psi_atl):
     print "Visualize meridional overturning stream function for globle and Atlantic."
@@ -295,29 +232,11 @@ def meridional_energy_transport(theta_key, uv_key):
     np.ma.set_fill_value(v,0)
     print 'Extracting variables successfully!'
     #logging.info("Extracting variables successfully!")
-    # calculate the meridional velocity at T grid
-    T_vgrid = np.zeros((level,jj,ji),dtype=float)
-    # Interpolation of T on V grid through Nearest-Neighbor method
-    for i in np.arange(jj):
-        if i == jj-1:
-            T_vgrid[:,i,:] = theta[:,i,:]
-        else:
-            T_vgrid[:,i,:] = (theta[:,i,:] + theta[:,i+1,:])/2
-    # calculate heat flux at each grid point
-    Internal_E_flux = np.zeros((level,jj,ji),dtype=float)
-    partial = 1 # switch for the partial cells 1 = include & 0 = exclude
-    for i in np.arange(level):
-        if partial == 1: # include partial cells
-            Internal_E_flux[i,:,:] = constant['rho'] * constant['cp'] * v[i,:,:].filled() *\
-                                     T_vgrid[i,:,:] * e1v * e3t_0[i] * vmask[i,:,:] -\
-                                     constant['rho'] * constant['cp'] * v[i,:,:].filled() *\
-                                     T_vgrid[i,:,:] * e1v * e3t_adjust[i,:,:] * vmask[i,:,:]
-        else: # exclude partial cells
-            Internal_E_flux[i,:,:] = constant['rho'] * constant['cp'] * v[i,:,:].filled() *\
-                                     T_vgrid[i,:,:] * e1v * e3t_0[i] * vmask[i,:,:]
-    # take the vertical integral
-    Internal_E_int = np.zeros((jj,ji))
-    Internal_E_int = np.sum(Internal_E_flux * vmask,0)/1e+12
+    # temperature on the V grid, the mean of the neighbouring T points (wizard.omet)
+    T_vgrid = omet.t_on_v(theta)
+    # vertical integral of the heat flux at each grid point, the partial cells are in the
+    # area of the V faces (wizard.omet)
+    Internal_E_int = omet.energy_transport(v, T_vgrid, vface_area, constant)
     print '*****************************************************************************'
     print "**** Computation of meridional energy transport in the ocean is finished ****"
     print "************         The result is in tera-watt (1E+12)          ************"
@@ -334,29 +253,31 @@ def zonal_int_plot(E_annual):
     plt.show()
     fig3.savefig(output_path + os.sep + 'OMET_GLORYS2V3_1993_2014.png',dpi = 500)
 
-def create_netcdf_point (meridional_E_point_pool,output_path):
+def create_netcdf_point (output_path):
     print '*******************************************************************'
     print '*********************** create netcdf file ************************'
     print '***********************    OMET on ORCA   *************************'
     print '*******************************************************************'
     logging.info("Start creating netcdf file for total meridional energy transport at each grid point.")
     # wrap the datasets into netcdf file
-    # 'NETCDF3_CLASSIC', 'NETCDF3_64BIT', 'NETCDF4_CLASSIC', and 'NETCDF4'
-    data_wrap = Dataset(output_path + os.sep + 'GLORYS2V3_model_monthly_orca025_E_point.nc' ,'w',format = 'NETCDF3_64BIT')
+    # NETCDF4, compressed and chunked by time step (wizard.output)
+    data_wrap = output.create_dataset(output_path + os.sep + 'GLORYS2V3_model_monthly_orca025_E_point.nc')
     # create dimensions for netcdf data
-    year_wrap_dim = data_wrap.createDimension('year',len(period))
+    # the months are appended as soon as they are computed (unlimited years)
+    year_wrap_dim = data_wrap.createDimension('year',None)
     month_wrap_dim = data_wrap.createDimension('month',12)
     lat_wrap_dim = data_wrap.createDimension('j',jj)
     lon_wrap_dim = data_wrap.createDimension('i',ji)
+    data_append = output.Appender(data_wrap, flush_interval=12)
     # create coordinate variables for 3-dimensions
     # 1D
-    year_wrap_var = data_wrap.createVariable('year',np.int32,('year',))
-    month_wrap_var = data_wrap.createVariable('month',np.int32,('month',))
+    year_wrap_var = data_append.create_variable('year',np.int32,('year',))
+    month_wrap_var = data_append.create_variable('month',np.int32,('month',))
     # 2D
-    lat_wrap_var = data_wrap.createVariable('latitude',np.float32,('j','i'))
-    lon_wrap_var = data_wrap.createVariable('longitude',np.float32,('j','i'))
+    lat_wrap_var = data_append.create_variable('latitude',np.float32,('j','i'))
+    lon_wrap_var = data_append.create_variable('longitude',np.float32,('j','i'))
     # 4D
-    E_total_wrap_var = data_wrap.createVariable('E',np.float64,('year','month','j','i'))
+    E_total_wrap_var = data_append.create_variable('E',np.float64,('year','month','j','i'),packing=output_packing,value_range=point_value_range)
     # global attributes
     data_wrap.description = 'Monthly mean meridional energy transport on ORCA grid'
     # variable attributes
@@ -367,42 +288,49 @@ def create_netcdf_point (meridional_E_point_pool,output_path):
     lat_wrap_var.long_name = 'ORCA025 grid latitude'
     lon_wrap_var.long_name = 'ORCA025 grid longitude'
     E_total_wrap_var.long_name = 'oceanic meridional energy transport'
-    # writing data
-    year_wrap_var[:] = period
+    # writing data, the months are appended by the main loop
     lat_wrap_var[:] = gphiv
     lon_wrap_var[:] = glamv
     month_wrap_var[:] = np.arange(1,13,1)
-    E_total_wrap_var[:] = meridional_E_point_pool
-    # close the file
-    data_wrap.close()
     print "Create netcdf file successfully"
-    logging.info("The generation of netcdf files for the total meridional energy transport on each grid point is complete!!")
+    logging.info("The netcdf file for the total meridional energy transport on each grid point is created!!")
 
-def create_netcdf_zonal_int (meridional_E_zonal_int_pool, meridional_psi_zonal_glo, meridional_psi_zonal_atl,output_path):
+    return data_append
+
+def create_netcdf_zonal_int (output_path):
     print '*******************************************************************'
     print '*********************** create netcdf file ************************'
     print '***********************    OMET on ORCA   *************************'
     print '*******************************************************************'
     logging.info("Start creating netcdf file for total meridional energy transport at each grid point.")
     # wrap the datasets into netcdf file
-    # 'NETCDF3_CLASSIC', 'NETCDF3_64BIT', 'NETCDF4_CLASSIC', and 'NETCDF4'
-    data_wrap = Dataset(output_path + os.sep + 'GLORYS2V3_model_monthly_orca025_E_zonal_int.nc' ,'w',format = 'NETCDF3_64BIT')
+    # NETCDF4, compressed and chunked by time step (wizard.output)
+    data_wrap = output.create_dataset(output_path + os.sep + 'GLORYS2V3_model_monthly_orca025_E_zonal_int.nc')
     # create dimensions for netcdf data
-    year_wrap_dim = data_wrap.createDimension('year',len(period))
+    # the months are appended as soon as they are computed (unlimited years)
+    year_wrap_dim = data_wrap.createDimension('year',None)
     month_wrap_dim = data_wrap.createDimension('month',12)
     lat_wrap_dim = data_wrap.createDimension('latitude_aux',jj)
     lev_wrap_dim = data_wrap.createDimension('lev',level)
+    data_append = output.Appender(data_wrap, flush_interval=12)
     # create coordinate variables for 3-dimensions
     # 1D
-    year_wrap_var = data_wrap.createVariable('year',np.int32,('year',))
-    month_wrap_var = data_wrap.createVariable('month',np.int32,('month',))
-    lat_wrap_var = data_wrap.createVariable('latitude_aux',np.float32,('latitude_aux',))
-    lev_wrap_var = data_wrap.createVariable('lev',np.float32,('lev',))
+    year_wrap_var = data_append.create_variable('year',np.int32,('year',))
+    month_wrap_var = data_append.create_variable('month',np.int32,('month',))
+    lat_wrap_var = data_append.create_variable('latitude_aux',np.float32,('latitude_aux',))
+    lev_wrap_var = data_append.create_variable('lev',np.float32,('lev',))
     # 3D
-    E_total_wrap_var = data_wrap.createVariable('E',np.float64,('year','month','latitude_aux'))
+    E_total_wrap_var = data_append.create_variable('E',np.float64,('year','month','latitude_aux'),packing=output_packing,value_range=zonal_value_range)
     # 4D
-    psi_glo_wrap_var = data_wrap.createVariable('Psi_glo',np.float64,('year','month','lev','latitude_aux'))
-    psi_atl_wrap_var = data_wrap.createVariable('Psi_atl',np.float64,('year','month','lev','latitude_aux'))
+    psi_glo_wrap_var = data_append.create_variable('Psi_glo',np.float64,('year','month','lev','latitude_aux'),packing=output_packing,value_range=psi_value_range)
+    # zonal integrals and stream functions of the basins, e.g. E_atl and Psi_atl
+    for name, long_name in zip(basin_names, basin_long_names):
+        E_basin_wrap_var = data_append.create_variable('E_%s' % (name),np.float64,('year','month','latitude_aux'),packing=output_packing,value_range=zonal_value_range)
+        psi_basin_wrap_var = data_append.create_variable('Psi_%s' % (name),np.float64,('year','month','lev','latitude_aux'),packing=output_packing,value_range=psi_value_range)
+        E_basin_wrap_var.units = 'tera watt'
+        psi_basin_wrap_var.units = 'Sv'
+        E_basin_wrap_var.long_name = 'Oceanic meridional energy transport of %s ocean' % (long_name)
+        psi_basin_wrap_var.long_name = 'Meridional overturning stream function of %s ocean' % (long_name)
     # global attributes
     data_wrap.description = 'Monthly mean zonal integral of meridional energy transport on ORCA grid'
     # variable attributes
@@ -410,25 +338,19 @@ def create_netcdf_zonal_int (meridional_E_zonal_int_pool, meridional_psi_zonal_g
     E_total_wrap_var.units = 'tera watt'
     lev_wrap_var.units = 'm'
     psi_glo_wrap_var.units = 'Sv'
-    psi_atl_wrap_var.units = 'Sv'
 
     lev_wrap_var.long_name = 'depth'
     lat_wrap_var.long_name = 'auxillary latitude'
     E_total_wrap_var.long_name = 'Oceanic meridional energy transport'
     psi_glo_wrap_var.long_name = 'Meridional overturning stream function of global ocean'
-    psi_atl_wrap_var.long_name = 'Meridional overturning stream function of Atlantic ocean'
-    # writing data
-    year_wrap_var[:] = period
+    # writing data, the months are appended by the main loop
     lat_wrap_var[:] = gphiv[:,1060]
     month_wrap_var[:] = np.arange(1,13,1)
     lev_wrap_var[:] = deptht
-    E_total_wrap_var[:] = meridional_E_zonal_int_pool
-    psi_glo_wrap_var[:] = meridional_psi_zonal_glo
-    psi_atl_wrap_var[:] = meridional_psi_zonal_atl
-    # close the file
-    data_wrap.close()
     print "Create netcdf file successfully"
-    logging.info("The generation of netcdf files for the total meridional energy transport is complete!!")
+    logging.info("The netcdf file for the zonal integral of the meridional energy transport is created!!")
+
+    return data_append
 
 if __name__=="__main__":
     print '*******************************************************************'
@@ -443,8 +365,11 @@ if __name__=="__main__":
     jj = 1021
     level = 75
     # extract the mesh_mask and coordinate information
-    nav_lat, nav_lon, deptht, tmask, vmask, tmaskatl, e1t, e2t, e1v, e2v, gphiv,\
-    glamv, mbathy, e3t_0, e3t_ps = var_coordinate(datapath)
+    # mesh of ORCA025, the fields are read from the mesh files when they are used (wizard.mesh)
+    ocean_mesh = mesh.ORCAMesh('ORCA025', datapath, mesh_cache_path)
+    deptht, vmask, e1v, gphiv, glamv, e3t_0 = ocean_mesh.fields('deptht', 'vmask', 'e1v', 'gphiv', 'glamv', 'e3t_0')
+    # land-sea masks of the basins
+    basin_names, basin_long_names, basin_masks = ocean_mesh.basin_masks(basins)
     print '*******************************************************************'
     print '*******************  Partial cells correction   *******************'
     print '*******************************************************************'
@@ -453,24 +378,24 @@ if __name__=="__main__":
     # for the sake of simplicity of the code, just calculate the difference between e3t_0 and e3t_ps
     # then minus this adjustment when calculate the OMET at each layer with mask
     # Attention! Since python start with 0, the partial cell info given in mbathy should incoporate with this
-    e3t_adjust = np.zeros((level,jj,ji),dtype = float)
-    for i in np.arange(1,level,1): # start from 1
-        for j in np.arange(jj):
-            for k in np.arange(ji):
-                if i == mbathy[j,k]:
-                    e3t_adjust[i-1,j,k] = e3t_0[i-1] - e3t_ps[j,k] # python start with 0, so i-1
+    # the levels 1 to level-1 of mbathy have a partial cell, cached for each mesh (wizard.mesh)
+    e3t_adjust = ocean_mesh.e3t_adjust
+    # thickness of the cells with the partial cells
+    e3t_cell = overturning.cell_thickness(e3t_0, e3t_adjust)
+    # area of the V faces of the cells, with the partial cells and the land-sea mask
+    vface_area = omet.face_area(e1v, e3t_cell, vmask)
     ####################################################################
     ###  Create space for stroing intermediate variables and outputs ###
     ####################################################################
-    #create a data pool to save the OMET for each year and month
-    E_pool_point = np.zeros((len(period),12,jj,ji),dtype = float)
+    # create NetCDF files, the OMET and the meridional overturning of each month are
+    # appended as soon as they are computed
+    point_append = create_netcdf_point(output_path)
+    zonal_int_append = create_netcdf_zonal_int(output_path)
+    # the zonal integral is kept for the plot of all time
     E_pool_zonal_int = np.zeros((len(period),12,jj),dtype = float)
     #E_pool_point_regrid = np.zeros((len(period),900,1440),dtype = float)
-    # Meridional overturning stream function
-    psi_pool_zonal_glo = np.zeros((len(period),12,level,jj),dtype = float) # for Globe
-    psi_pool_zonal_atl = np.zeros((len(period),12,level,jj),dtype = float) # for Atlantic
     # loop for calculation
-    for i in period:
+    for n, i in enumerate(period):
         for j in index_month:
             ####################################################################
             #########################  Extract variables #######################
@@ -481,23 +406,29 @@ if __name__=="__main__":
             ########  Calculate meridional overturning stream function #########
             ####################################################################
             # calculate the stokes stream function and plot
-            psi_glo, psi_atl = stream_function(uv_key,e1v)
-            psi_pool_zonal_glo[i-1993,j,:,:] = psi_glo
-            psi_pool_zonal_atl[i-1993,j,:,:] = psi_atl
+            psi_glo, psi_basins = stream_function(uv_key,e1v)
             ####################################################################
             ##############  Calculate meridional energy transport ##############
             ####################################################################
             # calculate the meridional energy transport in the ocean
             E_point = meridional_energy_transport(theta_key, uv_key)
-            E_pool_point[i-1993,j,:,:] = E_point
-            E_pool_zonal_int[i-1993,j,:] = np.sum(E_point,1)
+            E_pool_zonal_int[n,j,:] = np.sum(E_point,1)
+            point_append.append((n,j), {'year' : i, 'E' : E_point})
+            # zonal integral of each basin, from the same OMET at each grid point
+            E_basins = overturning.zonal_integrals(E_point, basin_masks)
+            zonal_int_fields = {'year' : i, 'E' : E_pool_zonal_int[n,j,:], 'Psi_glo' : psi_glo}
+            for name, E_basin, psi_basin in zip(basin_names, E_basins, psi_basins):
+                zonal_int_fields['E_%s' % (name)] = E_basin
+                zonal_int_fields['Psi_%s' % (name)] = psi_basin
+            zonal_int_append.append((n,j), zonal_int_fields)
+            del E_point, psi_glo, psi_basins, E_basins
     # plot the zonal int of all time
     zonal_int_plot(E_pool_zonal_int)
     # plot the stream function
     #visualization_stream_function(psi_pool_zonal_glo,psi_pool_zonal_atl)
-    # create NetCDF file and save the output
-    create_netcdf_point(E_pool_point,output_path)
-    create_netcdf_zonal_int(E_pool_zonal_int,psi_pool_zonal_glo,psi_pool_zonal_atl,output_path)
+    # close the NetCDF files
+    point_append.close()
+    zonal_int_append.close()
 
     print 'Computation of meridional energy transport on ORCA grid for GLORYS2V3 is complete!!!'
     print 'The output is in sleep, safe and sound!!!'
@@ -12,7 +12,7 @@ Description     : The code aims to calculate the atmospheric meridional energy
                   The procedure is generic and is able to adapt any atmospheric
                   reanalysis datasets, with some changes.
 Return Value    : GRIB1 data file
-Dependencies    : os, time, numpy, netCDF4, sys, matplotlib
+Dependencies    : os, time, numpy, netCDF4, sys, matplotlib, wizard
 variables       : Absolute Temperature              T         [K]
                   Specific Humidity                 q         [kg/kg]
                   Surface pressure                  ps        [Pa]
@@ -50,6 +50,10 @@ matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 import iris
 import pygrib
+# shared kernels of Energy-Wizard at the root of the repository
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir))
+from wizard import divergence
+from wizard import output
 
 ##########################################################################
 ###########################   Units vacabulory   #########################
@@ -126,6 +130,8 @@ start_year = 1979
 end_year = 2013
 # specify output path for the netCDF4 file
 output_path = '/home/lwc16308/reanalysis/JRA55/output'
+# packing of the output fields (wizard.output), None (float64), 'float32' or 'int16'
+output_packing = None
 ####################################################################################
 # ==============================  Initial test   ==================================
 # benchmark datasets for basic dimensions
@@ -301,27 +307,11 @@ def mass_correction(u,v,q,sp,dp,days):
     moisture_flux_u_int = np.sum(moisture_flux_u,1)
     moisture_flux_v_int = np.sum(moisture_flux_v,1)
     # calculate the divergence of moisture flux
-    div_moisture_flux_u = np.zeros((days,len(latitude),len(longitude)),dtype = float)
-    div_moisture_flux_v = np.zeros((days,len(latitude),len(longitude)),dtype = float)
     ######################## Attnention to the coordinate and symbol #######################
     # zonal moisture flux divergence
-    for i in np.arange(len(latitude)):
-        for j in np.arange(len(longitude)):
-            # the longitude could be from 0 to 360 or -180 to 180, but the index remains the same
-            if j == 0:
-                div_moisture_flux_u[:,i,j] = (moisture_flux_u_int[:,i,j+1] - moisture_flux_u_int[:,i,-1]) / (2 * dx[i])
-            elif j == (len(longitude)-1) :
-                div_moisture_flux_u[:,i,j] = (moisture_flux_u_int[:,i,0] - moisture_flux_u_int[:,i,j-1]) / (2 * dx[i])
-            else:
-                div_moisture_flux_u[:,i,j] = (moisture_flux_u_int[:,i,j+1] - moisture_flux_u_int[:,i,j-1]) / (2 * dx[i])
+    div_moisture_flux_u = divergence.zonal_divergence(moisture_flux_u_int, dx)
     # meridional moisture flux divergence
-    for i in np.arange(len(latitude)):
-        if i == 0:
-            div_moisture_flux_v[:,i,:] = -(moisture_flux_v_int[:,i+1,:] - moisture_flux_v_int[:,i,:]) / (2 * dy)
-        elif i == (len(latitude)-1):
-            div_moisture_flux_v[:,i,:] = -(moisture_flux_v_int[:,i,:] - moisture_flux_v_int[:,i-1,:]) / (2 * dy)
-        else:
-            div_moisture_flux_v[:,i,:] = -(moisture_flux_v_int[:,i+1,:] - moisture_flux_v_int[:,i-1,:]) / (2 * dy)
+    div_moisture_flux_v = divergence.meridional_divergence(moisture_flux_v_int, dy, north_to_south=True)
     print 'The calculation of divergent verically integrated moisture flux is finished !!'
 
     # calculate evaporation minus precipitation
@@ -346,27 +336,11 @@ def mass_correction(u,v,q,sp,dp,days):
     mass_flux_u_int = np.sum(mass_flux_u,1)
     mass_flux_v_int = np.sum(mass_flux_v,1)
     # calculate the divergence of moisture flux
-    div_mass_flux_u = np.zeros((days,len(latitude),len(longitude)),dtype = float)
-    div_mass_flux_v = np.zeros((days,len(latitude),len(longitude)),dtype = float)
     # zonal mass flux divergence
     # zonal moisture flux divergence
-    for i in np.arange(len(latitude)):
-        for j in np.arange(len(longitude)):
-            # the longitude could be from 0 to 360 or -180 to 180, but the index remains the same
-            if j == 0:
-                div_mass_flux_u[:,i,j] = (mass_flux_u_int[:,i,j+1] - mass_flux_u_int[:,i,-1]) / (2 * dx[i])
-            elif j == (len(longitude)-1) :
-                div_mass_flux_u[:,i,j] = (mass_flux_u_int[:,i,0] - mass_flux_u_int[:,i,j-1]) / (2 * dx[i])
-            else:
-                div_mass_flux_u[:,i,j] = (mass_flux_u_int[:,i,j+1] - mass_flux_u_int[:,i,j-1]) / (2 * dx[i])
+    div_mass_flux_u = divergence.zonal_divergence(mass_flux_u_int, dx)
     # meridional mass flux divergence
-    for i in np.arange(len(latitude)):
-        if i == 0:
-            div_mass_flux_v[:,i,:] = -(mass_flux_v_int[:,i+1,:] - mass_flux_v_int[:,i,:]) / (2 * dy)
-        elif i == (len(latitude)-1):
-            div_mass_flux_v[:,i,:] = -(mass_flux_v_int[:,i,:] - mass_flux_v_int[:,i-1,:]) / (2 * dy)
-        else:
-            div_mass_flux_v[:,i,:] = -(mass_flux_v_int[:,i+1,:] - mass_flux_v_int[:,i-1,:]) / (2 * dy)
+    div_mass_flux_v = divergence.meridional_divergence(mass_flux_v_int, dy, north_to_south=True)
     print 'The calculation of divergent verically integrated mass flux is finished !!'
     mass_residual = np.zeros((len(latitude),len(longitude)),dtype = float)
     mass_residual = sp_tendency + constant['g'] * (np.mean(div_mass_flux_u,0) + np.mean(div_mass_flux_v,0)) - constant['g'] * E_P
@@ -547,25 +521,25 @@ def create_netcdf_point (meridional_E_point_pool,meridional_E_internal_point_poo
     print '*******************************************************************'
     logging.info("Start creating netcdf file for total meridional energy transport and each component at each grid point.")
     # wrap the datasets into netcdf file
-    # 'NETCDF3_CLASSIC', 'NETCDF3_64BIT', 'NETCDF4_CLASSIC', and 'NETCDF4'
-    data_wrap = Dataset(output_path + os.sep + 'point' + os.sep + 'AMET_JRA55_model_daily_%d_E_point.nc' % (year),'w',format = 'NETCDF3_64BIT')
+    # NETCDF4, compressed and chunked by time step (wizard.output)
+    data_wrap = output.create_dataset(output_path + os.sep + 'point' + os.sep + 'AMET_JRA55_model_daily_%d_E_point.nc' % (year))
     # create dimensions for netcdf data
     month_wrap_dim = data_wrap.createDimension('month',Dim_month)
     lat_wrap_dim = data_wrap.createDimension('latitude',Dim_latitude)
     lon_wrap_dim = data_wrap.createDimension('longitude',Dim_longitude)
     # create coordinate variables for 3-dimensions
-    month_wrap_var = data_wrap.createVariable('month',np.int32,('month',))
-    lat_warp_var = data_wrap.createVariable('latitude',np.float32,('latitude',))
-    lon_warp_var = data_wrap.createVariable('longitude',np.float32,('longitude',))
+    month_wrap_var = output.create_variable(data_wrap,'month',np.int32,('month',))
+    lat_warp_var = output.create_variable(data_wrap,'latitude',np.float32,('latitude',))
+    lon_warp_var = output.create_variable(data_wrap,'longitude',np.float32,('longitude',))
     # create the actual 3-d variable
-    uc_warp_var = data_wrap.createVariable('uc',np.float32,('month','latitude','longitude'))
-    vc_warp_var = data_wrap.createVariable('vc',np.float32,('month','latitude','longitude'))
+    uc_warp_var = output.create_variable(data_wrap,'uc',np.float32,('month','latitude','longitude'))
+    vc_warp_var = output.create_variable(data_wrap,'vc',np.float32,('month','latitude','longitude'))
 
-    E_total_wrap_var = data_wrap.createVariable('E',np.float64,('month','latitude','longitude'))
-    E_internal_wrap_var = data_wrap.createVariable('E_cpT',np.float64,('month','latitude','longitude'))
-    E_latent_wrap_var = data_wrap.createVariable('E_Lvq',np.float64,('month','latitude','longitude'))
-    E_geopotential_wrap_var = data_wrap.createVariable('E_gz',np.float64,('month','latitude','longitude'))
-    E_kinetic_wrap_var = data_wrap.createVariable('E_uv2',np.float64,('month','latitude','longitude'))
+    E_total_wrap_var = output.create_variable(data_wrap,'E',np.float64,('month','latitude','longitude'),packing=output_packing)
+    E_internal_wrap_var = output.create_variable(data_wrap,'E_cpT',np.float64,('month','latitude','longitude'),packing=output_packing)
+    E_latent_wrap_var = output.create_variable(data_wrap,'E_Lvq',np.float64,('month','latitude','longitude'),packing=output_packing)
+    E_geopotential_wrap_var = output.create_variable(data_wrap,'E_gz',np.float64,('month','latitude','longitude'),packing=output_packing)
+    E_kinetic_wrap_var = output.create_variable(data_wrap,'E_uv2',np.float64,('month','latitude','longitude'),packing=output_packing)
     # global attributes
     data_wrap.description = 'Monthly mean meridional energy transport and each component at each grid point'
     # variable attributes
@@ -610,20 +584,20 @@ def create_netcdf_zonal_int (meridional_E_pool, meridional_E_internal_pool, meri
     print '*******************************************************************'
     logging.info("Start creating netcdf files for the zonal integral of total meridional energy transport and each component.")
     # wrap the datasets into netcdf file
-    # 'NETCDF3_CLASSIC', 'NETCDF3_64BIT', 'NETCDF4_CLASSIC', and 'NETCDF4'
-    data_wrap = Dataset(output_path + os.sep + 'zonal_int' + os.sep + 'AMET_JRA55_model_daily_%d_E_zonal_int.nc' % (year),'w',format = 'NETCDF3_64BIT')
+    # NETCDF4, compressed and chunked by time step (wizard.output)
+    data_wrap = output.create_dataset(output_path + os.sep + 'zonal_int' + os.sep + 'AMET_JRA55_model_daily_%d_E_zonal_int.nc' % (year))
     # create dimensions for netcdf data
     month_wrap_dim = data_wrap.createDimension('month',Dim_month)
     lat_wrap_dim = data_wrap.createDimension('latitude',Dim_latitude)
     # create coordinate variables for 3-dimensions
-    month_wrap_var = data_wrap.createVariable('month',np.int32,('month',))
-    lat_warp_var = data_wrap.createVariable('latitude',np.float32,('latitude',))
+    month_wrap_var = output.create_variable(data_wrap,'month',np.int32,('month',))
+    lat_warp_var = output.create_variable(data_wrap,'latitude',np.float32,('latitude',))
     # create the actual 3-d variable
-    E_total_wrap_var = data_wrap.createVariable('E',np.float64,('month','latitude',))
-    E_internal_wrap_var = data_wrap.createVariable('E_cpT',np.float64,('month','latitude',))
-    E_latent_wrap_var = data_wrap.createVariable('E_Lvq',np.float64,('month','latitude',))
-    E_geopotential_wrap_var = data_wrap.createVariable('E_gz',np.float64,('month','latitude',))
-    E_kinetic_wrap_var = data_wrap.createVariable('E_uv2',np.float64,('month','latitude',))
+    E_total_wrap_var = output.create_variable(data_wrap,'E',np.float64,('month','latitude',),packing=output_packing)
+    E_internal_wrap_var = output.create_variable(data_wrap,'E_cpT',np.float64,('month','latitude',),packing=output_packing)
+    E_latent_wrap_var = output.create_variable(data_wrap,'E_Lvq',np.float64,('month','latitude',),packing=output_packing)
+    E_geopotential_wrap_var = output.create_variable(data_wrap,'E_gz',np.float64,('month','latitude',),packing=output_packing)
+    E_kinetic_wrap_var = output.create_variable(data_wrap,'E_uv2',np.float64,('month','latitude',),packing=output_packing)
     # global attributes
     data_wrap.description = 'Monthly mean zonal integral of meridional energy transport and each component'
     # variable attributes
@@ -13,7 +13,7 @@ Description     : The code aims to calculate the atmospheric meridional energy
                   reanalysis datasets, with some changes.
                   The script is specifically optimised for small memory.
 Return Value    : GRIB1 data file
-Dependencies    : os, time, numpy, netCDF4, sys, matplotlib
+Dependencies    : os, time, numpy, netCDF4, sys, matplotlib, wizard
 variables       : Absolute Temperature              T         [K]
                   Specific Humidity                 q         [kg/kg]
                   Surface pressure                  ps        [Pa]
@@ -36,7 +36,8 @@ Caveat!!	: The dataset is the complete dataset of JRA55 from -90N - 90N.
                   E-P = evaporation - precipitation = moisture tendency - divergence of moisture flux(u,v)
                   Due to the structure of the dataset, the mass budget correction are split into
                   two parts: 1. Quantify tendency terms in month loop
-                             2. Quantify divergence terms in day loop
+                             2. Quantify divergence terms in chunks of time steps
+                  The size of the chunks follows from memory_budget (see wizard.stream).
 """
 import numpy as np
 import time as tttt
@@ -51,6 +52,12 @@ matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 import iris
 import pygrib
+# shared kernels of Energy-Wizard at the root of the repository
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir))
+from wizard import grib
+from wizard import output
+from wizard import store
+from wizard import stream
 
 ##########################################################################
 ###########################   Units vacabulory   #########################
@@ -120,6 +127,13 @@ start_time = tttt.time()
 ####################################################################################
 ################################   Input zone  #####################################
 datapath = '/projects/0/blueactn/reanalysis/JRA55/subdaily'
+# directory of the message index of each GRIB file (wizard.grib), built by the first run
+index_path = '/home/lwc16308/reanalysis/JRA55/grib_index'
+# number of processes which decode the GRIB files (one per variable file)
+decode_workers = 5
+# directory of the NetCDF4 store (ingest_grib2netcdf_model_level_JRA55.py), months
+# which are in the store are read from it instead of the GRIB files
+store_path = '/home/lwc16308/reanalysis/JRA55/store'
 # time of the data, which concerns with the name of input
 line_in = sys.stdin.readline()
 input_year = int(line_in)
@@ -129,6 +143,10 @@ start_year = input_year
 end_year = input_year
 # specify output path for the netCDF4 file
 output_path = '/home/lwc16308/reanalysis/JRA55/output'
+# memory for the 3D fields of one chunk of time steps [bytes], the month is computed in chunks
+memory_budget = 32e+9
+# packing of the output fields (wizard.output), None (float64), 'float32' or 'int16'
+output_packing = None
 ####################################################################################
 # ==============================  Initial test   ==================================
 # benchmark datasets for basic dimensions
@@ -148,312 +166,55 @@ logging.basicConfig(filename = output_path + os.sep + 'history_E.log',
                     filemode = 'w', level = logging.DEBUG,
                     format = '%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 ####################################################################################
+month_store = store.MonthStore(store_path, 'JRA55')
 
-def var_3D_key_retrieve(datapath, year, month, days, counter_surface, rounds):
+def var_3D_key_retrieve(datapath, year, month, days, start, stop):
     '''
     This module extracts the variables for mass correction and the computation of AMET.
+    Only the time steps from start to stop (excluded) of the month are taken.
+    The 3D fields are stored in files of 10 days (1-10, 11-20, 21-end) and the
+    surface pressure in one file per year. The messages are found by their time
+    and level through the index of each file (wizard.grib).
     '''
     print '*******************************************************************'
     print '****************** open pygrib files - 3D fields ******************'
     print '*******************************************************************'
-    print "Start retrieving datasets %d (y) - %s (m) for 3D variables" % (year,namelist_month[month-1])
-    logging.info("Start retrieving 3D variables T,q,u,v,z for from %d (y) - %s (m)" % (year,namelist_month[month-1]))
-    # get the base message counter for surface pressure
-    counter_accumulate = counter_surface - 1
-    if rounds == 0:
-        # for the first 10 days
-        key_10d_hgt = pygrib.open(datapath + os.sep + 'jra%d' % (year) + os.sep + 'anl_mdl.007_hgt.reg_tl319.%d%s0100_%d%s1018' %(year,namelist_month[month-1],year,namelist_month[month-1]))
-        key_10d_tmp = pygrib.open(datapath + os.sep + 'jra%d' % (year) + os.sep + 'anl_mdl.011_tmp.reg_tl319.%d%s0100_%d%s1018' %(year,namelist_month[month-1],year,namelist_month[month-1]))
-        key_10d_ugrd = pygrib.open(datapath + os.sep + 'jra%d' % (year) + os.sep + 'anl_mdl.033_ugrd.reg_tl319.%d%s0100_%d%s1018' %(year,namelist_month[month-1],year,namelist_month[month-1]))
-        key_10d_vgrd = pygrib.open(datapath + os.sep + 'jra%d' % (year) + os.sep + 'anl_mdl.034_vgrd.reg_tl319.%d%s0100_%d%s1018' %(year,namelist_month[month-1],year,namelist_month[month-1]))
-        key_10d_spfh = pygrib.open(datapath + os.sep + 'jra%d' % (year) + os.sep + 'anl_mdl.051_spfh.reg_tl319.%d%s0100_%d%s1018' %(year,namelist_month[month-1],year,namelist_month[month-1]))
-        key_sp_year = pygrib.open(datapath + os.sep + 'jra_surf' + os.sep + 'anl_surf.001_pres.reg_tl319.%d010100_%d123118' %(year,year))
-        print "Retrieving datasets successfully and return the variable key (1-10)!"
-        logging.info("Retrieving 3D variables from %d (y) - %s (m) successfully (1-10)!" % (year,namelist_month[month-1]))
-        print '*******************************************************************'
-        print '********************** extract target fields **********************'
-        print '*******************************************************************'
-        print "Extract target fields!"
-        logging.info("Extract target fields")
-        z = np.zeros((40,60,Dim_latitude,Dim_longitude),dtype = float)
-        T = np.zeros((40,60,Dim_latitude,Dim_longitude),dtype = float)
-        u = np.zeros((40,60,Dim_latitude,Dim_longitude),dtype = float)
-        v = np.zeros((40,60,Dim_latitude,Dim_longitude),dtype = float)
-        q = np.zeros((40,60,Dim_latitude,Dim_longitude),dtype = float)
-        sp = np.zeros((40,Dim_latitude,Dim_longitude),dtype = float)
-        # get the target fields
-        # the first ten days
-        # reset counters
-        counter_time = 0
-        counter_lev = 0
-        counter_message = 1
-        while (counter_message <= 60*4*10):
-            # take the key
-            key_z = key_10d_hgt.message(counter_message)
-            key_T = key_10d_tmp.message(counter_message)
-            key_u = key_10d_ugrd.message(counter_message)
-            key_v = key_10d_vgrd.message(counter_message)
-            key_q = key_10d_spfh.message(counter_message)
-            # 60 levels (0-59)
-            if counter_lev == 60:
-                counter_lev = 0
-                counter_time = counter_time + 1
-            # take the values
-            z[counter_time,counter_lev,:,:] = key_z.values
-            T[counter_time,counter_lev,:,:] = key_T.values
-            u[counter_time,counter_lev,:,:] = key_u.values
-            v[counter_time,counter_lev,:,:] = key_v.values
-            q[counter_time,counter_lev,:,:] = key_q.values
-            # push the counter
-            counter_lev = counter_lev + 1
-            counter_message = counter_message + 1
-        # for surface pressure
-        counter_time = 0
-        while (counter_surface <= counter_accumulate + 10*4):
-            key_sp = key_sp_year.message(counter_surface)
-            sp[counter_time,:,:] = key_sp.values
-            counter_time = counter_time + 1
-            counter_surface = counter_surface + 1
-        # close all the grib files
-        key_10d_hgt.close()
-        key_10d_tmp.close()
-        key_10d_ugrd.close()
-        key_10d_vgrd.close()
-        key_10d_spfh.close()
-        key_sp_year.close()
-
-    # for the second 10 days
-    elif rounds == 1:
-        key_20d_hgt = pygrib.open(datapath + os.sep + 'jra%d' % (year) + os.sep + 'anl_mdl.007_hgt.reg_tl319.%d%s1100_%d%s2018' %(year,namelist_month[month-1],year,namelist_month[month-1]))
-        key_20d_tmp = pygrib.open(datapath + os.sep + 'jra%d' % (year) + os.sep + 'anl_mdl.011_tmp.reg_tl319.%d%s1100_%d%s2018' %(year,namelist_month[month-1],year,namelist_month[month-1]))
-        key_20d_ugrd = pygrib.open(datapath + os.sep + 'jra%d' % (year) + os.sep + 'anl_mdl.033_ugrd.reg_tl319.%d%s1100_%d%s2018' %(year,namelist_month[month-1],year,namelist_month[month-1]))
-        key_20d_vgrd = pygrib.open(datapath + os.sep + 'jra%d' % (year) + os.sep + 'anl_mdl.034_vgrd.reg_tl319.%d%s1100_%d%s2018' %(year,namelist_month[month-1],year,namelist_month[month-1]))
-        key_20d_spfh = pygrib.open(datapath + os.sep + 'jra%d' % (year) + os.sep + 'anl_mdl.051_spfh.reg_tl319.%d%s1100_%d%s2018' %(year,namelist_month[month-1],year,namelist_month[month-1]))
-        key_sp_year = pygrib.open(datapath + os.sep + 'jra_surf' + os.sep + 'anl_surf.001_pres.reg_tl319.%d010100_%d123118' %(year,year))
-        print "Retrieving datasets successfully and return the variable key (10-20)!"
-        logging.info("Retrieving 3D variables from %d (y) - %s (m) successfully (10-20)!" % (year,namelist_month[month-1]))
-        print '*******************************************************************'
-        print '********************** extract target fields **********************'
-        print '*******************************************************************'
-        print "Extract target fields!"
-        logging.info("Extract target fields")
-        z = np.zeros((40,60,Dim_latitude,Dim_longitude),dtype = float)
-        T = np.zeros((40,60,Dim_latitude,Dim_longitude),dtype = float)
-        u = np.zeros((40,60,Dim_latitude,Dim_longitude),dtype = float)
-        v = np.zeros((40,60,Dim_latitude,Dim_longitude),dtype = float)
-        q = np.zeros((40,60,Dim_latitude,Dim_longitude),dtype = float)
-        sp = np.zeros((40,Dim_latitude,Dim_longitude),dtype = float)
-        # the second ten days
-        # reset counters
-        counter_time = 0
-        counter_lev = 0
-        counter_message = 1
-        while (counter_message <= 60*4*10):
-            # take the key
-            key_z = key_20d_hgt.message(counter_message)
-            key_T = key_20d_tmp.message(counter_message)
-            key_u = key_20d_ugrd.message(counter_message)
-            key_v = key_20d_vgrd.message(counter_message)
-            key_q = key_20d_spfh.message(counter_message)
-            # 60 levels (0-59)
-            if counter_lev == 60:
-                counter_lev = 0
-                counter_time = counter_time + 1
-            # take the values
-            z[counter_time,counter_lev,:,:] = key_z.values
-            T[counter_time,counter_lev,:,:] = key_T.values
-            u[counter_time,counter_lev,:,:] = key_u.values
-            v[counter_time,counter_lev,:,:] = key_v.values
-            q[counter_time,counter_lev,:,:] = key_q.values
-            # push the counter
-            counter_lev = counter_lev + 1
-            counter_message = counter_message + 1
-        # for surface pressure
-        counter_time = 0
-        while (counter_surface <= counter_accumulate + 10*4):
-            key_sp = key_sp_year.message(counter_surface)
-            sp[counter_time,:,:] = key_sp.values
-            counter_time = counter_time + 1
-            counter_surface = counter_surface + 1
-        # close all the grib files
-        key_20d_hgt.close()
-        key_20d_tmp.close()
-        key_20d_ugrd.close()
-        key_20d_vgrd.close()
-        key_20d_spfh.close()
-        key_sp_year.close()
-
-    # for the rest of days
-    else:
-        # deal with the changing last day of each month
-        key_30d_hgt = pygrib.open(datapath + os.sep + 'jra%d' % (year) + os.sep + 'anl_mdl.007_hgt.reg_tl319.%d%s2100_%d%s%d18' %(year,namelist_month[month-1],year,namelist_month[month-1],days))
-        key_30d_tmp = pygrib.open(datapath + os.sep + 'jra%d' % (year) + os.sep + 'anl_mdl.011_tmp.reg_tl319.%d%s2100_%d%s%d18' %(year,namelist_month[month-1],year,namelist_month[month-1],days))
-        key_30d_ugrd = pygrib.open(datapath + os.sep + 'jra%d' % (year) + os.sep + 'anl_mdl.033_ugrd.reg_tl319.%d%s2100_%d%s%d18' %(year,namelist_month[month-1],year,namelist_month[month-1],days))
-        key_30d_vgrd = pygrib.open(datapath + os.sep + 'jra%d' % (year) + os.sep + 'anl_mdl.034_vgrd.reg_tl319.%d%s2100_%d%s%d18' %(year,namelist_month[month-1],year,namelist_month[month-1],days))
-        key_30d_spfh = pygrib.open(datapath + os.sep + 'jra%d' % (year) + os.sep + 'anl_mdl.051_spfh.reg_tl319.%d%s2100_%d%s%d18' %(year,namelist_month[month-1],year,namelist_month[month-1],days))
-        key_sp_year = pygrib.open(datapath + os.sep + 'jra_surf' + os.sep + 'anl_surf.001_pres.reg_tl319.%d010100_%d123118' %(year,year))
-        print "Retrieving datasets successfully and return the variable key (20-end)!"
-        logging.info("Retrieving 3D variables from %d (y) - %s (m) successfully (20-end)!" % (year,namelist_month[month-1]))
-        print '*******************************************************************'
-        print '********************** extract target fields **********************'
-        print '*******************************************************************'
-        print "Extract target fields!"
-        logging.info("Extract target fields")
-        # reserve space for target fields
-        z = np.zeros(((days-20)*4,60,Dim_latitude,Dim_longitude),dtype = float)
-        T = np.zeros(((days-20)*4,60,Dim_latitude,Dim_longitude),dtype = float)
-        u = np.zeros(((days-20)*4,60,Dim_latitude,Dim_longitude),dtype = float)
-        v = np.zeros(((days-20)*4,60,Dim_latitude,Dim_longitude),dtype = float)
-        q = np.zeros(((days-20)*4,60,Dim_latitude,Dim_longitude),dtype = float)
-        sp = np.zeros(((days-20)*4,Dim_latitude,Dim_longitude),dtype = float)
-        # the rest of days
-        # reset counters
-        counter_time = 0
-        counter_lev = 0
-        counter_message = 1
-        while (counter_message <= 60*4*(days-20)):
-            # take the key
-            key_z = key_30d_hgt.message(counter_message)
-            key_T = key_30d_tmp.message(counter_message)
-            key_u = key_30d_ugrd.message(counter_message)
-            key_v = key_30d_vgrd.message(counter_message)
-            key_q = key_30d_spfh.message(counter_message)
-            # 60 levels (0-59)
-            if counter_lev == 60:
-                counter_lev = 0
-                counter_time = counter_time + 1
-                # take the values
-            z[counter_time,counter_lev,:,:] = key_z.values
-            T[counter_time,counter_lev,:,:] = key_T.values
-            u[counter_time,counter_lev,:,:] = key_u.values
-            v[counter_time,counter_lev,:,:] = key_v.values
-            q[counter_time,counter_lev,:,:] = key_q.values
-            # push the counter
-            counter_lev = counter_lev + 1
-            counter_message = counter_message + 1
-        # for surface pressure
-        counter_time = 0
-        while (counter_surface <= counter_accumulate + (days-20)*4):
-            key_sp = key_sp_year.message(counter_surface)
-            sp[counter_time,:,:] = key_sp.values
-            counter_time = counter_time + 1
-            counter_surface = counter_surface + 1
-        # close all the grib files
-        key_30d_hgt.close()
-        key_30d_tmp.close()
-        key_30d_ugrd.close()
-        key_30d_vgrd.close()
-        key_30d_spfh.close()
-        key_sp_year.close()
+    print "Start retrieving datasets %d (y) - %s (m) for 3D variables (time step %d-%d)" % (year,namelist_month[month-1],start,stop)
+    logging.info("Start retrieving 3D variables T,q,u,v,z for from %d (y) - %s (m) (time step %d-%d)" % (year,namelist_month[month-1],start,stop))
+    # analysis times of the chunk (YYYYMMDDHH)
+    times = grib.analysis_times(year, month, 1, days)[start:stop]
+    # reserve space for target fields, which the workers of each variable file fill
+    z = grib.shared_array((stop-start,60,Dim_latitude,Dim_longitude))
+    T = grib.shared_array((stop-start,60,Dim_latitude,Dim_longitude))
+    u = grib.shared_array((stop-start,60,Dim_latitude,Dim_longitude))
+    v = grib.shared_array((stop-start,60,Dim_latitude,Dim_longitude))
+    q = grib.shared_array((stop-start,60,Dim_latitude,Dim_longitude))
+    requests = []
+    # first and last day of each file
+    file_days = [(1,10),(11,20),(21,days)]
+    for rounds in np.arange(3):
+        # time steps of the chunk in the current file
+        file_start = max(start, (file_days[rounds][0] - 1) * 4)
+        file_stop = min(stop, file_days[rounds][1] * 4)
+        if file_start >= file_stop:
+            continue
+        file_name = 'reg_tl319.%d%s%02d00_%d%s%02d18' % (year,namelist_month[month-1],file_days[rounds][0],
+                                                          year,namelist_month[month-1],file_days[rounds][1])
+        # 60 levels (1-60) for each time step, from the surface to the TOA
+        for name, field in [('007_hgt', z), ('011_tmp', T), ('033_ugrd', u), ('034_vgrd', v), ('051_spfh', q)]:
+            path = datapath + os.sep + 'jra%d' % (year) + os.sep + 'anl_mdl.%s.' % (name) + file_name
+            messages = grib.open_index(path, index_path).locate(times[file_start-start:file_stop-start], range(1,61))
+            requests.append((path, messages, field, file_start-start))
+    # decode the variable files at the same time
+    grib.read_parallel(requests, decode_workers, index_path)
+    print "Retrieving datasets successfully and return the variable key!"
+    logging.info("Retrieving 3D variables from %d (y) - %s (m) successfully (time step %d-%d)!" % (year,namelist_month[month-1],start,stop))
+    # for surface pressure, the file of the whole year is only scanned once
+    key_sp_year = grib.open_index(datapath + os.sep + 'jra_surf' + os.sep + 'anl_surf.001_pres.reg_tl319.%d010100_%d123118' %(year,year), index_path)
+    sp = key_sp_year.read(times)
 
     # return all the fields
-    return z, T, u, v, q, sp, counter_surface
-
-def mass_correction_divergence(u,v,q,dp):
-    print 'Begin the calculation of divergent verically integrated moisture flux.'
-    logging.info("Begin the calculation of divergent verically integrated moisture flux.")
-    # calculte the mean moisture flux for a certain month
-    moisture_flux_u = u * q * dp / constant['g']
-    moisture_flux_v = v * q * dp / constant['g']
-    # take the vertical integral
-    moisture_flux_u_int = np.sum(moisture_flux_u,1)
-    moisture_flux_v_int = np.sum(moisture_flux_v,1)
-    del moisture_flux_u, moisture_flux_v
-    # calculate the divergence of moisture flux
-    div_moisture_flux_u = np.zeros(moisture_flux_u_int.shape,dtype = float)
-    div_moisture_flux_v = np.zeros(moisture_flux_v_int.shape,dtype = float)
-    ######################## Attnention to the coordinate and symbol #######################
-    # zonal moisture flux divergence
-    for i in np.arange(len(latitude)):
-        for j in np.arange(len(longitude)):
-            # the longitude could be from 0 to 360 or -180 to 180, but the index remains the same
-            if j == 0:
-                div_moisture_flux_u[:,i,j] = (moisture_flux_u_int[:,i,j+1] - moisture_flux_u_int[:,i,-1]) / (2 * dx[i])
-            elif j == (len(longitude)-1) :
-                div_moisture_flux_u[:,i,j] = (moisture_flux_u_int[:,i,0] - moisture_flux_u_int[:,i,j-1]) / (2 * dx[i])
-            else:
-                div_moisture_flux_u[:,i,j] = (moisture_flux_u_int[:,i,j+1] - moisture_flux_u_int[:,i,j-1]) / (2 * dx[i])
-    # meridional moisture flux divergence
-    for i in np.arange(len(latitude)):
-        if i == 0:
-            div_moisture_flux_v[:,i,:] = -(moisture_flux_v_int[:,i+1,:] - moisture_flux_v_int[:,i,:]) / (2 * dy)
-        elif i == (len(latitude)-1):
-            div_moisture_flux_v[:,i,:] = -(moisture_flux_v_int[:,i,:] - moisture_flux_v_int[:,i-1,:]) / (2 * dy)
-        else:
-            div_moisture_flux_v[:,i,:] = -(moisture_flux_v_int[:,i+1,:] - moisture_flux_v_int[:,i-1,:]) / (2 * dy)
-    print 'The calculation of divergent verically integrated moisture flux is finished !!'
-
-    print 'Begin the calculation of divergent verically integrated mass flux.'
-    logging.info("Begin the calculation of divergent verically integrated mass flux.")
-    # calculte the mean mass flux for a certain month
-    mass_flux_u = u * dp / constant['g']
-    # take the vertical integral
-    mass_flux_v = v * dp / constant['g']
-    # take the vertical integral
-    mass_flux_u_int = np.sum(mass_flux_u,1)
-    mass_flux_v_int = np.sum(mass_flux_v,1)
-    # save memory
-    del mass_flux_u, mass_flux_v
-    # calculate the divergence of moisture flux
-    div_mass_flux_u = np.zeros(mass_flux_u_int.shape,dtype = float)
-    div_mass_flux_v = np.zeros(mass_flux_v_int.shape,dtype = float)
-    # zonal mass flux divergence
-    # zonal moisture flux divergence
-    for i in np.arange(len(latitude)):
-        for j in np.arange(len(longitude)):
-            # the longitude could be from 0 to 360 or -180 to 180, but the index remains the same
-            if j == 0:
-                div_mass_flux_u[:,i,j] = (mass_flux_u_int[:,i,j+1] - mass_flux_u_int[:,i,-1]) / (2 * dx[i])
-            elif j == (len(longitude)-1) :
-                div_mass_flux_u[:,i,j] = (mass_flux_u_int[:,i,0] - mass_flux_u_int[:,i,j-1]) / (2 * dx[i])
-            else:
-                div_mass_flux_u[:,i,j] = (mass_flux_u_int[:,i,j+1] - mass_flux_u_int[:,i,j-1]) / (2 * dx[i])
-    # meridional mass flux divergence
-    for i in np.arange(len(latitude)):
-        if i == 0:
-            div_mass_flux_v[:,i,:] = -(mass_flux_v_int[:,i+1,:] - mass_flux_v_int[:,i,:]) / (2 * dy)
-        elif i == (len(latitude)-1):
-            div_mass_flux_v[:,i,:] = -(mass_flux_v_int[:,i,:] - mass_flux_v_int[:,i-1,:]) / (2 * dy)
-        else:
-            div_mass_flux_v[:,i,:] = -(mass_flux_v_int[:,i+1,:] - mass_flux_v_int[:,i-1,:]) / (2 * dy)
-    print 'The calculation of divergent verically integrated mass flux is finished !!'
-
-    print 'Calculate precipitable water!!'
-    logging.info("Calculate precipitable water.")
-    # calculate precipitable water
-    precipitable_water = q * dp / constant['g']
-    # take the vertical integral
-    precipitable_water_int = np.sum(precipitable_water,1)
-
-    return div_moisture_flux_u, div_moisture_flux_v, div_mass_flux_u, div_mass_flux_v, precipitable_water_int
-
-def meridional_energy_transport_divergence(z,T,u,v,q,dp):
-    print 'Start calculating meridional energy transport on model level'
-    logging.info("Start calculating meridional energy transport on model level.")
-    # calculate each component of total energy
-    # Internal Energy cpT
-    internal_flux = constant['cp'] * v * T * dp / constant['g']
-    # Latent heat Lq
-    latent_flux = constant['Lv'] * v * q * dp / constant['g']
-    # geopotential
-    geopotential_flux = v * z * dp # * constant['g'] / constant['g']
-    # kinetic energy
-    kinetic_flux = v * 1/2 *(u**2 + v**2) * dp / constant['g']
-    # take the vertical integral and monthly mean
-    internal_flux_int = np.sum(internal_flux, 1)
-    latent_flux_int = np.sum(latent_flux, 1)
-    geopotential_flux_int = np.sum(geopotential_flux, 1)
-    kinetic_flux_int = np.sum(kinetic_flux, 1)
-    # save memory
-    del internal_flux, latent_flux, geopotential_flux, kinetic_flux
-    # mass correction component
-    heat_flux_int = np.sum(constant['cp'] * T * dp / constant['g'],1)
-    vapor_flux_int = np.sum(constant['Lv'] * q * dp / constant['g'],1)
-    geo_flux_int = np.sum(z * dp,1) # * constant['g'] / constant['g']
-    velocity_flux_int = np.sum(1/2 *(u**2 + v**2) * dp / constant['g'],1)
-
-    return internal_flux_int, latent_flux_int, geopotential_flux_int, kinetic_flux_int, \
-           heat_flux_int, vapor_flux_int, geo_flux_int, velocity_flux_int
+    return z, T, u, v, q, sp
 
 # make plots
 def visualization(E_total,E_internal,E_latent,E_geopotential,E_kinetic,output_path,year,month):
@@ -551,23 +312,23 @@ def create_netcdf_point (meridional_E_point_pool,meridional_E_internal_point_poo
     print '*******************************************************************'
     logging.info("Start creating netcdf file for total meridional energy transport and each component at each grid point.")
     # wrap the datasets into netcdf file
-    # 'NETCDF3_CLASSIC', 'NETCDF3_64BIT', 'NETCDF4_CLASSIC', and 'NETCDF4'
-    data_wrap = Dataset(output_path + os.sep + 'point' + os.sep + 'AMET_JRA55_model_daily_%d%s_E_point.nc' % (year,namelist_month[month-1]),'w',format = 'NETCDF3_64BIT')
+    # NETCDF4, compressed and chunked by time step (wizard.output)
+    data_wrap = output.create_dataset(output_path + os.sep + 'point' + os.sep + 'AMET_JRA55_model_daily_%d%s_E_point.nc' % (year,namelist_month[month-1]))
     # create dimensions for netcdf data
     lat_wrap_dim = data_wrap.createDimension('latitude',Dim_latitude)
     lon_wrap_dim = data_wrap.createDimension('longitude',Dim_longitude)
     # create coordinate variables for 3-dimensions
-    lat_warp_var = data_wrap.createVariable('latitude',np.float32,('latitude',))
-    lon_warp_var = data_wrap.createVariable('longitude',np.float32,('longitude',))
+    lat_warp_var = output.create_variable(data_wrap,'latitude',np.float32,('latitude',))
+    lon_warp_var = output.create_variable(data_wrap,'longitude',np.float32,('longitude',))
     # create the actual 3-d variable
-    uc_warp_var = data_wrap.createVariable('uc',np.float32,('latitude','longitude'))
-    vc_warp_var = data_wrap.createVariable('vc',np.float32,('latitude','longitude'))
-
-    E_total_wrap_var = data_wrap.createVariable('E',np.float64,('latitude','longitude'))
-    E_internal_wrap_var = data_wrap.createVariable('E_cpT',np.float64,('latitude','longitude'))
-    E_latent_wrap_var = data_wrap.createVariable('E_Lvq',np.float64,('latitude','longitude'))
-    E_geopotential_wrap_var = data_wrap.createVariable('E_gz',np.float64,('latitude','longitude'))
-    E_kinetic_wrap_var = data_wrap.createVariable('E_uv2',np.float64,('latitude','longitude'))
+    uc_warp_var = output.create_variable(data_wrap,'uc',np.float32,('latitude','longitude'))
+    vc_warp_var = output.create_variable(data_wrap,'vc',np.float32,('latitude','longitude'))
+
+    E_total_wrap_var = output.create_variable(data_wrap,'E',np.float64,('latitude','longitude'),packing=output_packing)
+    E_internal_wrap_var = output.create_variable(data_wrap,'E_cpT',np.float64,('latitude','longitude'),packing=output_packing)
+    E_latent_wrap_var = output.create_variable(data_wrap,'E_Lvq',np.float64,('latitude','longitude'),packing=output_packing)
+    E_geopotential_wrap_var = output.create_variable(data_wrap,'E_gz',np.float64,('latitude','longitude'),packing=output_packing)
+    E_kinetic_wrap_var = output.create_variable(data_wrap,'E_uv2',np.float64,('latitude','longitude'),packing=output_packing)
     # global attributes
     data_wrap.description = 'Monthly mean meridional energy transport and each component at each grid point'
     # variable attributes
@@ -611,18 +372,18 @@ def create_netcdf_zonal_int (meridional_E_pool, meridional_E_internal_pool, meri
     print '*******************************************************************'
     logging.info("Start creating netcdf files for the zonal integral of total meridional energy transport and each component.")
     # wrap the datasets into netcdf file
-    # 'NETCDF3_CLASSIC', 'NETCDF3_64BIT', 'NETCDF4_CLASSIC', and 'NETCDF4'
-    data_wrap = Dataset(output_path + os.sep + 'zonal_int' + os.sep + 'AMET_JRA55_model_daily_%d%s_E_zonal_int.nc' % (year,namelist_month[month-1]),'w',format = 'NETCDF3_64BIT')
+    # NETCDF4, compressed and chunked by time step (wizard.output)
+    data_wrap = output.create_dataset(output_path + os.sep + 'zonal_int' + os.sep + 'AMET_JRA55_model_daily_%d%s_E_zonal_int.nc' % (year,namelist_month[month-1]))
     # create dimensions for netcdf data
     lat_wrap_dim = data_wrap.createDimension('latitude',Dim_latitude)
     # create coordinate variables for 3-dimensions
-    lat_warp_var = data_wrap.createVariable('latitude',np.float32,('latitude',))
+    lat_warp_var = output.create_variable(data_wrap,'latitude',np.float32,('latitude',))
     # create the actual 3-d variable
-    E_total_wrap_var = data_wrap.createVariable('E',np.float64,('latitude',))
-    E_internal_wrap_var = data_wrap.createVariable('E_cpT',np.float64,('latitude',))
-    E_latent_wrap_var = data_wrap.createVariable('E_Lvq',np.float64,('latitude',))
-    E_geopotential_wrap_var = data_wrap.createVariable('E_gz',np.float64,('latitude',))
-    E_kinetic_wrap_var = data_wrap.createVariable('E_uv2',np.float64,('latitude',))
+    E_total_wrap_var = output.create_variable(data_wrap,'E',np.float64,('latitude',),packing=output_packing)
+    E_internal_wrap_var = output.create_variable(data_wrap,'E_cpT',np.float64,('latitude',),packing=output_packing)
+    E_latent_wrap_var = output.create_variable(data_wrap,'E_Lvq',np.float64,('latitude',),packing=output_packing)
+    E_geopotential_wrap_var = output.create_variable(data_wrap,'E_gz',np.float64,('latitude',),packing=output_packing)
+    E_kinetic_wrap_var = output.create_variable(data_wrap,'E_uv2',np.float64,('latitude',),packing=output_packing)
     # global attributes
     data_wrap.description = 'Monthly mean zonal integral of meridional energy transport and each component'
     # variable attributes
@@ -693,10 +454,7 @@ if __name__=="__main__":
     meridional_E_kinetic_point_pool = np.zeros((Dim_latitude,Dim_longitude),dtype = float)
     # loop for calculation
     for i in period:
-        # set the message counter for the extraction of surface field
-        counter_surface = 1
         for j in index_month:
-            rounds = 0 # for the optimization of memory
             #dx = dx_benchmark
 	    #dy = dy_benchmark
             # determine how many days are there in a month
@@ -710,181 +468,36 @@ if __name__=="__main__":
             else:
                 days = 30
             ####################################################################
-            ###  Create space for stroing intermediate variables and outputs ###
+            ######      Mass Correction & Meridional Energy Transport    #######
             ####################################################################
-            # data pool for mass budget correction module
-            pool_div_moisture_flux_u = np.zeros((days*4,len(latitude),len(longitude)),dtype=float)
-            pool_div_moisture_flux_v = np.zeros((days*4,len(latitude),len(longitude)),dtype=float)
-            pool_div_mass_flux_u = np.zeros((days*4,len(latitude),len(longitude)),dtype=float)
-            pool_div_mass_flux_v = np.zeros((days*4,len(latitude),len(longitude)),dtype=float)
-            pool_precipitable_water = np.zeros((days*4,len(latitude),len(longitude)),dtype=float)
-            pool_ps_mean = np.zeros((days*4,len(latitude),len(longitude)),dtype=float)
-            # data pool for meridional energy tansport module
-            pool_internal_flux_int = np.zeros((days*4,len(latitude),len(longitude)),dtype=float)
-            pool_latent_flux_int = np.zeros((days*4,len(latitude),len(longitude)),dtype=float)
-            pool_geopotential_flux_int = np.zeros((days*4,len(latitude),len(longitude)),dtype=float)
-            pool_kinetic_flux_int = np.zeros((days*4,len(latitude),len(longitude)),dtype=float)
-            # data pool for the correction of meridional energy tansport
-            pool_heat_flux_int = np.zeros((days*4,len(latitude),len(longitude)),dtype=float)
-            pool_vapor_flux_int = np.zeros((days*4,len(latitude),len(longitude)),dtype=float)
-            pool_geo_flux_int = np.zeros((days*4,len(latitude),len(longitude)),dtype=float)
-            pool_velocity_flux_int = np.zeros((days*4,len(latitude),len(longitude)),dtype=float)
-            for k in np.arange(3): # devide into 3 rounds
+            # the 2D column integrals are summed chunk by chunk over the month
+            month_stream = stream.MonthStream(A, B, constant, surface_first=True)
+            # number of time steps per chunk from the memory budget (z,T,u,v,q)
+            steps = stream.steps_per_chunk(memory_budget, Dim_level, Dim_latitude, Dim_longitude, n_steps=days*4)
+            # the month is converted to the store and its GRIB files are unchanged
+            month_stored = month_store.available('%d_%s' % (i,namelist_month[j-1]))
+            for start, stop in stream.time_chunks(days*4, steps):
                 # extract 3D variables
-                z, T, u, v, q, sp, counter_surface = var_3D_key_retrieve(datapath, i, j, days, counter_surface,k)
-                # calculate delta pressure of each level
-                dp = np.zeros(T.shape,dtype = float)
-                for c in np.arange(60):
-                    dp[:,c,:,:] = (A[c] + B[c] * sp) - (A[c+1] + B[c+1] * sp) # from surface to the TOA
-                ####################################################################
-                ######                Mass Correction Divergence             #######
-                ####################################################################
-                # for the computation of divergence terms
-                div_moisture_flux_u, div_moisture_flux_v, div_mass_flux_u, div_mass_flux_v, \
-                precipitable_water_int = mass_correction_divergence(u,v,q,dp)
-                # save output to temporary storage
-                if k == 0:
-                    q_start = q[0,:,:,:]
-                    sp_start = sp[0,:,:]
-                    dp_start = dp[0,:,:,:]
-                    pool_div_moisture_flux_u[:40,:,:] = div_moisture_flux_u
-                    pool_div_moisture_flux_v[:40,:,:] = div_moisture_flux_v
-                    pool_div_mass_flux_u[:40,:,:] = div_mass_flux_u
-                    pool_div_mass_flux_v[:40,:,:] = div_mass_flux_v
-                    pool_precipitable_water[:40,:,:] = precipitable_water_int
-                    pool_ps_mean[:40,:,:] = sp
-                elif k == 1:
-                    pool_div_moisture_flux_u[40:80,:,:] = div_moisture_flux_u
-                    pool_div_moisture_flux_v[40:80,:,:] = div_moisture_flux_v
-                    pool_div_mass_flux_u[40:80,:,:] = div_mass_flux_u
-                    pool_div_mass_flux_v[40:80,:,:] = div_mass_flux_v
-                    pool_precipitable_water[40:80,:,:] = precipitable_water_int
-                    pool_ps_mean[40:80,:,:] = sp
+                if month_stored:
+                    z, T, u, v, q, sp = month_store.read('%d_%s' % (i,namelist_month[j-1]), ['z','T','u','v','q','sp'],
+                                                         steps=slice(start,stop))
                 else:
-                    q_end = q[-1,:,:,:]
-                    sp_end = sp[-1,:,:]
-                    dp_end = dp[-1,:,:,:]
-                    pool_div_moisture_flux_u[80:,:,:] = div_moisture_flux_u
-                    pool_div_moisture_flux_v[80:,:,:] = div_moisture_flux_v
-                    pool_div_mass_flux_u[80:,:,:] = div_mass_flux_u
-                    pool_div_mass_flux_v[80:,:,:] = div_mass_flux_v
-                    pool_precipitable_water[80:,:,:] = precipitable_water_int
-                    pool_ps_mean[80:,:,:] = sp
-                ####################################################################
-                ######               Meridional Energy Transport             #######
-                ####################################################################
-                internal_flux_int, latent_flux_int, geopotential_flux_int, kinetic_flux_int,\
-                heat_flux_int, vapor_flux_int, geo_flux_int, velocity_flux_int,\
-                = meridional_energy_transport_divergence(z,T,u,v,q,dp)
-                if k == 0:
-                    pool_internal_flux_int[:40,:,:] = internal_flux_int
-                    pool_latent_flux_int[:40,:,:] = latent_flux_int
-                    pool_geopotential_flux_int[:40,:,:] = geopotential_flux_int
-                    pool_kinetic_flux_int[:40,:,:] = kinetic_flux_int
-                    pool_heat_flux_int[:40,:,:] = heat_flux_int
-                    pool_vapor_flux_int[:40,:,:] = vapor_flux_int
-                    pool_geo_flux_int[:40,:,:] = geo_flux_int
-                    pool_velocity_flux_int[:40,:,:] = velocity_flux_int
-                elif k == 1:
-                    pool_internal_flux_int[40:80,:,:] = internal_flux_int
-                    pool_latent_flux_int[40:80,:,:] = latent_flux_int
-                    pool_geopotential_flux_int[40:80,:,:] = geopotential_flux_int
-                    pool_kinetic_flux_int[40:80,:,:] = kinetic_flux_int
-                    pool_heat_flux_int[40:80,:,:] = heat_flux_int
-                    pool_vapor_flux_int[40:80,:,:] = vapor_flux_int
-                    pool_geo_flux_int[40:80,:,:] = geo_flux_int
-                    pool_velocity_flux_int[40:80,:,:] = velocity_flux_int
-                else:
-                    pool_internal_flux_int[80:,:,:] = internal_flux_int
-                    pool_latent_flux_int[80:,:,:] = latent_flux_int
-                    pool_geopotential_flux_int[80:,:,:] = geopotential_flux_int
-                    pool_kinetic_flux_int[80:,:,:] = kinetic_flux_int
-                    pool_heat_flux_int[80:,:,:] = heat_flux_int
-                    pool_vapor_flux_int[80:,:,:] = vapor_flux_int
-                    pool_geo_flux_int[80:,:,:] = geo_flux_int
-                    pool_velocity_flux_int[80:,:,:] = velocity_flux_int
-            ####################################################################
-            ######                     Mass Correction                   #######
-            ####################################################################
-            # save memory
-	    del z, T, u, v, q
-            print 'Begin the calulation of precipitable water tendency'
-            moisture_start = np.sum((q_start * dp_start), 0) # start of the current month
-            moisture_end = np.sum((q_end * dp_end), 0) # end of the current month
-            # compute the moisture tendency (one day has 86400s)
-            moisture_tendency = (moisture_end - moisture_start) / (days*86400) / constant['g']
-            print 'The calculation of precipitable water tendency is finished !!'
-            # calculate evaporation minus precipitation
-            E_P =  np.zeros((len(latitude),len(longitude)),dtype = float)
-            E_P = moisture_tendency + np.mean(pool_div_moisture_flux_u,0) + np.mean(pool_div_moisture_flux_v,0)
-            print '*******************************************************************'
-            print "******  Computation of E-P on each grid point is finished   *******"
-            print '*******************************************************************'
-            logging.info("Computation of E-P on each grid point is finished!")
-            print 'Begin the calculation of surface pressure tendency'
-            sp_tendency = (sp_end - sp_start) / (days*86400) / constant['g']
-            print 'The calculation of surface pressure tendency is finished !!'
-            logging.info("Finish calculating the moisture tendency and surface pressure tendency")
-            print "Finish calculating the moisture tendency and surface pressure tendency"
-            mass_residual = np.zeros((len(latitude),len(longitude)),dtype = float)
-            mass_residual = sp_tendency + constant['g'] * (np.mean(pool_div_mass_flux_u,0) + np.mean(pool_div_mass_flux_v,0)) - constant['g'] * E_P
-            print '*******************************************************************'
-            print "*** Computation of mass residual on each grid point is finished ***"
-            print '*******************************************************************'
-            logging.info("Computation of mass residual on each grid point is finished!")
-
-            print 'Begin the calculation of barotropic correction wind.'
-            # calculate barotropic correction wind
-            uc = np.zeros((len(latitude),len(longitude)),dtype = float)
-            vc = np.zeros((len(latitude),len(longitude)),dtype = float)
-            vc = mass_residual * dy / (np.mean(pool_ps_mean,0) - constant['g'] * np.mean(pool_precipitable_water,0))
-            vc[0,:] = 0 # Modification at polar points
-            vc[-1,:] = 0
-            for c in np.arange(len(latitude)):
-                uc[c,:] = mass_residual[c,:] * dx[c] / (np.mean(pool_ps_mean[:,c,:],0) - constant['g'] * np.mean(pool_precipitable_water[:,c,:],0))
+                    z, T, u, v, q, sp = var_3D_key_retrieve(datapath, i, j, days, start, stop)
+                # the geopotential height [gpm] is changed to geopotential [m2/s2]
+                z *= constant['g']
+                month_stream.add(T, q, u, v, sp, gz=z)
+                # save memory
+                del z, T, u, v, q, sp
+            # tendency terms from the first and the last time step of the month (one day has 86400s)
+            uc, vc = month_stream.correction(dx, dy, days*86400, north_to_south=True, polar_rows=[0,-1])
             print '********************************************************************************'
             print "*** Computation of barotropic correction wind on each grid point is finished ***"
             print '********************************************************************************'
             logging.info("Computation of barotropic correction wind on each grid point is finished!")
-            ####################################################################
-            ######               Meridional Energy Transport             #######
-            ####################################################################
-            # calculate zonal & meridional grid size on earth
-            # the earth is taken as a perfect sphere, instead of a ellopsoid
-            # strickly make dx at polar to be 0
-            #dx[0] = 0
-            #dx[-1] = 0
-            # mass correction component
-            correction_internal_flux_int = vc * np.mean(pool_heat_flux_int,0)
-            correction_latent_flux_int = vc * np.mean(pool_vapor_flux_int,0)
-            correction_geopotential_flux_int = vc * np.mean(pool_geo_flux_int,0)
-            correction_kinetic_flux_int = vc * np.mean(pool_velocity_flux_int,0)
-            # take the corrected energy flux at each grid point!
-            meridional_E_internal_point = np.zeros((len(latitude),len(longitude)),dtype=float)
-            meridional_E_latent_point = np.zeros((len(latitude),len(longitude)),dtype=float)
-            meridional_E_geopotential_point = np.zeros((len(latitude),len(longitude)),dtype=float)
-            meridional_E_kinetic_point = np.zeros((len(latitude),len(longitude)),dtype=float)
-            meridional_E_point = np.zeros((len(latitude),len(longitude)),dtype=float)
             #!!!!!!!!!!!!!!! The unit is tera-watt (TW) !!!!!!!!!!!!!!!!!!!!!!#
-            for c in np.arange(len(latitude)):
-                meridional_E_internal_point[c,:] = (np.mean(pool_internal_flux_int[:,c,:],0) - correction_internal_flux_int[c,:]) * dx[c]/1e+12
-                meridional_E_latent_point[c,:] = (np.mean(pool_latent_flux_int[:,c,:],0) - correction_latent_flux_int[c,:]) * dx[c]/1e+12
-                meridional_E_geopotential_point[c,:] = (np.mean(pool_geopotential_flux_int[:,c,:],0) - correction_geopotential_flux_int[c,:]) * dx[c]/1e+12
-                meridional_E_kinetic_point[c,:] = (np.mean(pool_kinetic_flux_int[:,c,:],0) - correction_kinetic_flux_int[c,:]) * dx[c]/1e+12
-            meridional_E_point = meridional_E_internal_point + meridional_E_latent_point + meridional_E_geopotential_point + meridional_E_kinetic_point
-            # take the zonal integral
-            meridional_E_internal = np.zeros(len(latitude),dtype=float)
-            meridional_E_latent = np.zeros(len(latitude),dtype=float)
-            meridional_E_geopotential = np.zeros(len(latitude),dtype=float)
-            meridional_E_kinetic = np.zeros(len(latitude),dtype=float)
-            meridional_E = np.zeros(len(latitude),dtype=float)
-           
-	    meridional_E_internal = np.sum(meridional_E_internal_point,1)
-            meridional_E_latent = np.sum(meridional_E_latent_point,1)
-            meridional_E_geopotential = np.sum(meridional_E_geopotential_point,1)
-            meridional_E_kinetic = np.sum(meridional_E_kinetic_point,1)
-            # meridional total energy transport
-            meridional_E = meridional_E_internal + meridional_E_latent + meridional_E_geopotential + meridional_E_kinetic
+            meridional_E, meridional_E_internal, meridional_E_latent, meridional_E_geopotential, meridional_E_kinetic,\
+            meridional_E_point, meridional_E_internal_point, meridional_E_latent_point, meridional_E_geopotential_point,\
+            meridional_E_kinetic_point = month_stream.energy_transport(vc, dx)
             print '*****************************************************************************'
             print "***Computation of meridional energy transport in the atmosphere is finished**"
             print "************         The result is in tera-watt (1E+12)          ************"
@@ -13,7 +13,7 @@ Description     : The code aims to calculate the atmospheric meridional energy
                   reanalysis datasets, with some changes.
                   The script is specifically optimised for small memory.
 Return Value    : GRIB1 data file
-Dependencies    : os, time, numpy, netCDF4, sys, matplotlib
+Dependencies    : os, time, numpy, netCDF4, sys, matplotlib, wizard
 variables       : Absolute Temperature              T         [K]
                   Specific Humidity                 q         [kg/kg]
                   Surface pressure                  ps        [Pa]
@@ -51,6 +51,13 @@ matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 import iris
 import pygrib
+# shared kernels of Energy-Wizard at the root of the repository
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir))
+from wizard import accumulate
+from wizard import divergence
+from wizard import grib
+from wizard import output
+from wizard import store
 
 ##########################################################################
 ###########################   Units vacabulory   #########################
@@ -120,6 +127,13 @@ start_time = tttt.time()
 ####################################################################################
 ################################   Input zone  #####################################
 datapath = '/projects/0/blueactn/reanalysis/JRA55/subdaily'
+# directory of the message index of each GRIB file (wizard.grib), built by the first run
+index_path = '/home/lwc16308/reanalysis/JRA55/grib_index'
+# number of processes which decode the GRIB files (one per variable file)
+decode_workers = 5
+# directory of the NetCDF4 store (ingest_grib2netcdf_model_level_JRA55.py), months
+# which are in the store are read from it instead of the GRIB files
+store_path = '/home/lwc16308/reanalysis/JRA55/store'
 # time of the data, which concerns with the name of input
 #line_in = sys.stdin.readline()
 input_year = 2014
@@ -129,6 +143,8 @@ start_year = input_year
 end_year = input_year
 # specify output path for the netCDF4 file
 output_path = '/home/lwc16308/reanalysis/JRA55/output'
+# packing of the output fields (wizard.output), None (float64), 'float32' or 'int16'
+output_packing = None
 ####################################################################################
 # ==============================  Initial test   ==================================
 # benchmark datasets for basic dimensions
@@ -148,204 +164,36 @@ logging.basicConfig(filename = output_path + os.sep + 'history_E.log',
                     filemode = 'w', level = logging.DEBUG,
                     format = '%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 ####################################################################################
+month_store = store.MonthStore(store_path, 'JRA55')
 
 def var_3D_key_retrieve(datapath, year, month, days, rounds):
     '''
     This module extracts the variables for mass correction and the computation of AMET.
+    The 3D fields are stored in files of 10 days (1-10, 11-20, 21-end), one file for
+    each round, and the surface pressure in one file per month. The messages are found by their
+    time and level through the index of each file (wizard.grib).
     '''
     print '*******************************************************************'
     print '****************** open pygrib files - 3D fields ******************'
     print '*******************************************************************'
     print "Start retrieving datasets %d (y) - %s (m) for 3D variables" % (year,namelist_month[month-1])
     logging.info("Start retrieving 3D variables T,q,u,v,z for from %d (y) - %s (m)" % (year,namelist_month[month-1]))
-    if rounds == 0:
-        # for the first 10 days
-        key_10d_hgt = pygrib.open(datapath + os.sep + 'jra%d' % (year) + os.sep + 'anl_mdl.007_hgt.reg_tl319.%d%s0100_%d%s1018' %(year,namelist_month[month-1],year,namelist_month[month-1]))
-        key_10d_tmp = pygrib.open(datapath + os.sep + 'jra%d' % (year) + os.sep + 'anl_mdl.011_tmp.reg_tl319.%d%s0100_%d%s1018' %(year,namelist_month[month-1],year,namelist_month[month-1]))
-        key_10d_ugrd = pygrib.open(datapath + os.sep + 'jra%d' % (year) + os.sep + 'anl_mdl.033_ugrd.reg_tl319.%d%s0100_%d%s1018' %(year,namelist_month[month-1],year,namelist_month[month-1]))
-        key_10d_vgrd = pygrib.open(datapath + os.sep + 'jra%d' % (year) + os.sep + 'anl_mdl.034_vgrd.reg_tl319.%d%s0100_%d%s1018' %(year,namelist_month[month-1],year,namelist_month[month-1]))
-        key_10d_spfh = pygrib.open(datapath + os.sep + 'jra%d' % (year) + os.sep + 'anl_mdl.051_spfh.reg_tl319.%d%s0100_%d%s1018' %(year,namelist_month[month-1],year,namelist_month[month-1]))
-        key_sp_year = pygrib.open(datapath + os.sep + 'jra_surf' + os.sep + 'anl_surf.001_pres.reg_tl319.%d%s0100_%d%s%d18' %(year,namelist_month[month-1],year,namelist_month[month-1],days))
-        print "Retrieving datasets successfully and return the variable key (1-10)!"
-        logging.info("Retrieving 3D variables from %d (y) - %s (m) successfully (1-10)!" % (year,namelist_month[month-1]))
-        print '*******************************************************************'
-        print '********************** extract target fields **********************'
-        print '*******************************************************************'
-        print "Extract target fields!"
-        logging.info("Extract target fields")
-        z = np.zeros((40,60,Dim_latitude,Dim_longitude),dtype = float)
-        T = np.zeros((40,60,Dim_latitude,Dim_longitude),dtype = float)
-        u = np.zeros((40,60,Dim_latitude,Dim_longitude),dtype = float)
-        v = np.zeros((40,60,Dim_latitude,Dim_longitude),dtype = float)
-        q = np.zeros((40,60,Dim_latitude,Dim_longitude),dtype = float)
-        sp = np.zeros((40,Dim_latitude,Dim_longitude),dtype = float)
-        # get the target fields
-        # the first ten days
-        # reset counters
-        counter_time = 0
-        counter_lev = 0
-        counter_message = 1
-        while (counter_message <= 60*4*10):
-            # take the key
-            key_z = key_10d_hgt.message(counter_message)
-            key_T = key_10d_tmp.message(counter_message)
-            key_u = key_10d_ugrd.message(counter_message)
-            key_v = key_10d_vgrd.message(counter_message)
-            key_q = key_10d_spfh.message(counter_message)
-            # 60 levels (0-59)
-            if counter_lev == 60:
-                counter_lev = 0
-                counter_time = counter_time + 1
-            # take the values
-            z[counter_time,counter_lev,:,:] = key_z.values
-            T[counter_time,counter_lev,:,:] = key_T.values
-            u[counter_time,counter_lev,:,:] = key_u.values
-            v[counter_time,counter_lev,:,:] = key_v.values
-            q[counter_time,counter_lev,:,:] = key_q.values
-            # push the counter
-            counter_lev = counter_lev + 1
-            counter_message = counter_message + 1
-        # for surface pressure
-        counter_time = 0
-        counter_surface = 1
-        while (counter_surface <= 10*4):
-            key_sp = key_sp_year.message(counter_surface)
-            sp[counter_time,:,:] = key_sp.values
-            counter_time = counter_time + 1
-            counter_surface = counter_surface + 1
-        # close all the grib files
-        key_10d_hgt.close()
-        key_10d_tmp.close()
-        key_10d_ugrd.close()
-        key_10d_vgrd.close()
-        key_10d_spfh.close()
-        key_sp_year.close()
-
-    # for the second 10 days
-    elif rounds == 1:
-        key_20d_hgt = pygrib.open(datapath + os.sep + 'jra%d' % (year) + os.sep + 'anl_mdl.007_hgt.reg_tl319.%d%s1100_%d%s2018' %(year,namelist_month[month-1],year,namelist_month[month-1]))
-        key_20d_tmp = pygrib.open(datapath + os.sep + 'jra%d' % (year) + os.sep + 'anl_mdl.011_tmp.reg_tl319.%d%s1100_%d%s2018' %(year,namelist_month[month-1],year,namelist_month[month-1]))
-        key_20d_ugrd = pygrib.open(datapath + os.sep + 'jra%d' % (year) + os.sep + 'anl_mdl.033_ugrd.reg_tl319.%d%s1100_%d%s2018' %(year,namelist_month[month-1],year,namelist_month[month-1]))
-        key_20d_vgrd = pygrib.open(datapath + os.sep + 'jra%d' % (year) + os.sep + 'anl_mdl.034_vgrd.reg_tl319.%d%s1100_%d%s2018' %(year,namelist_month[month-1],year,namelist_month[month-1]))
-        key_20d_spfh = pygrib.open(datapath + os.sep + 'jra%d' % (year) + os.sep + 'anl_mdl.051_spfh.reg_tl319.%d%s1100_%d%s2018' %(year,namelist_month[month-1],year,namelist_month[month-1]))
-        key_sp_year = pygrib.open(datapath + os.sep + 'jra_surf' + os.sep + 'anl_surf.001_pres.reg_tl319.%d%s0100_%d%s%d18' % (year,namelist_month[month-1],year,namelist_month[month-1],days))
-        print "Retrieving datasets successfully and return the variable key (10-20)!"
-        logging.info("Retrieving 3D variables from %d (y) - %s (m) successfully (10-20)!" % (year,namelist_month[month-1]))
-        print '*******************************************************************'
-        print '********************** extract target fields **********************'
-        print '*******************************************************************'
-        print "Extract target fields!"
-        logging.info("Extract target fields")
-        z = np.zeros((40,60,Dim_latitude,Dim_longitude),dtype = float)
-        T = np.zeros((40,60,Dim_latitude,Dim_longitude),dtype = float)
-        u = np.zeros((40,60,Dim_latitude,Dim_longitude),dtype = float)
-        v = np.zeros((40,60,Dim_latitude,Dim_longitude),dtype = float)
-        q = np.zeros((40,60,Dim_latitude,Dim_longitude),dtype = float)
-        sp = np.zeros((40,Dim_latitude,Dim_longitude),dtype = float)
-        # the second ten days
-        # reset counters
-        counter_time = 0
-        counter_lev = 0
-        counter_message = 1
-        while (counter_message <= 60*4*10):
-            # take the key
-            key_z = key_20d_hgt.message(counter_message)
-            key_T = key_20d_tmp.message(counter_message)
-            key_u = key_20d_ugrd.message(counter_message)
-            key_v = key_20d_vgrd.message(counter_message)
-            key_q = key_20d_spfh.message(counter_message)
-            # 60 levels (0-59)
-            if counter_lev == 60:
-                counter_lev = 0
-                counter_time = counter_time + 1
-            # take the values
-            z[counter_time,counter_lev,:,:] = key_z.values
-            T[counter_time,counter_lev,:,:] = key_T.values
-            u[counter_time,counter_lev,:,:] = key_u.values
-            v[counter_time,counter_lev,:,:] = key_v.values
-            q[counter_time,counter_lev,:,:] = key_q.values
-            # push the counter
-            counter_lev = counter_lev + 1
-            counter_message = counter_message + 1
-        # for surface pressure
-        counter_time = 0
-        counter_surface = 41
-        while (counter_surface <= 10*4*2):
-            key_sp = key_sp_year.message(counter_surface)
-            sp[counter_time,:,:] = key_sp.values
-            counter_time = counter_time + 1
-            counter_surface = counter_surface + 1
-        # close all the grib files
-        key_20d_hgt.close()
-        key_20d_tmp.close()
-        key_20d_ugrd.close()
-        key_20d_vgrd.close()
-        key_20d_spfh.close()
-        key_sp_year.close()
-
-    # for the rest of days
-    else:
-        # deal with the changing last day of each month
-        key_30d_hgt = pygrib.open(datapath + os.sep + 'jra%d' % (year) + os.sep + 'anl_mdl.007_hgt.reg_tl319.%d%s2100_%d%s%d18' %(year,namelist_month[month-1],year,namelist_month[month-1],days))
-        key_30d_tmp = pygrib.open(datapath + os.sep + 'jra%d' % (year) + os.sep + 'anl_mdl.011_tmp.reg_tl319.%d%s2100_%d%s%d18' %(year,namelist_month[month-1],year,namelist_month[month-1],days))
-        key_30d_ugrd = pygrib.open(datapath + os.sep + 'jra%d' % (year) + os.sep + 'anl_mdl.033_ugrd.reg_tl319.%d%s2100_%d%s%d18' %(year,namelist_month[month-1],year,namelist_month[month-1],days))
-        key_30d_vgrd = pygrib.open(datapath + os.sep + 'jra%d' % (year) + os.sep + 'anl_mdl.034_vgrd.reg_tl319.%d%s2100_%d%s%d18' %(year,namelist_month[month-1],year,namelist_month[month-1],days))
-        key_30d_spfh = pygrib.open(datapath + os.sep + 'jra%d' % (year) + os.sep + 'anl_mdl.051_spfh.reg_tl319.%d%s2100_%d%s%d18' %(year,namelist_month[month-1],year,namelist_month[month-1],days))
-        key_sp_year = pygrib.open(datapath + os.sep + 'jra_surf' + os.sep + 'anl_surf.001_pres.reg_tl319.%d%s0100_%d%s%d18' % (year,namelist_month[month-1],year,namelist_month[month-1],days))
-        print "Retrieving datasets successfully and return the variable key (20-end)!"
-        logging.info("Retrieving 3D variables from %d (y) - %s (m) successfully (20-end)!" % (year,namelist_month[month-1]))
-        print '*******************************************************************'
-        print '********************** extract target fields **********************'
-        print '*******************************************************************'
-        print "Extract target fields!"
-        logging.info("Extract target fields")
-        # reserve space for target fields
-        z = np.zeros(((days-20)*4,60,Dim_latitude,Dim_longitude),dtype = float)
-        T = np.zeros(((days-20)*4,60,Dim_latitude,Dim_longitude),dtype = float)
-        u = np.zeros(((days-20)*4,60,Dim_latitude,Dim_longitude),dtype = float)
-        v = np.zeros(((days-20)*4,60,Dim_latitude,Dim_longitude),dtype = float)
-        q = np.zeros(((days-20)*4,60,Dim_latitude,Dim_longitude),dtype = float)
-        sp = np.zeros(((days-20)*4,Dim_latitude,Dim_longitude),dtype = float)
-        # the rest of days
-        # reset counters
-        counter_time = 0
-        counter_lev = 0
-        counter_message = 1
-        while (counter_message <= 60*4*(days-20)):
-            # take the key
-            key_z = key_30d_hgt.message(counter_message)
-            key_T = key_30d_tmp.message(counter_message)
-            key_u = key_30d_ugrd.message(counter_message)
-            key_v = key_30d_vgrd.message(counter_message)
-            key_q = key_30d_spfh.message(counter_message)
-            # 60 levels (0-59)
-            if counter_lev == 60:
-                counter_lev = 0
-                counter_time = counter_time + 1
-                # take the values
-            z[counter_time,counter_lev,:,:] = key_z.values
-            T[counter_time,counter_lev,:,:] = key_T.values
-            u[counter_time,counter_lev,:,:] = key_u.values
-            v[counter_time,counter_lev,:,:] = key_v.values
-            q[counter_time,counter_lev,:,:] = key_q.values
-            # push the counter
-            counter_lev = counter_lev + 1
-            counter_message = counter_message + 1
-        # for surface pressure
-        counter_time = 0
-        counter_surface = 40*2 + 1
-        while (counter_surface <= 10*4*2 + (days-20)*4):
-            key_sp = key_sp_year.message(counter_surface)
-            sp[counter_time,:,:] = key_sp.values
-            counter_time = counter_time + 1
-            counter_surface = counter_surface + 1
-        # close all the grib files
-        key_30d_hgt.close()
-        key_30d_tmp.close()
-        key_30d_ugrd.close()
-        key_30d_vgrd.close()
-        key_30d_spfh.close()
-        key_sp_year.close()
+    # first and last day of the file
+    first_day, last_day = [(1,10),(11,20),(21,days)][rounds]
+    file_name = 'reg_tl319.%d%s%02d00_%d%s%02d18' % (year,namelist_month[month-1],first_day,
+                                                      year,namelist_month[month-1],last_day)
+    # analysis times of the file (YYYYMMDDHH)
+    times = grib.analysis_times(year, month, first_day, last_day)
+    # 60 levels (1-60) for each time step, from the surface to the TOA
+    paths = [datapath + os.sep + 'jra%d' % (year) + os.sep + 'anl_mdl.%s.' % (name) + file_name
+             for name in ['007_hgt', '011_tmp', '033_ugrd', '034_vgrd', '051_spfh']]
+    # decode the variable files at the same time, one worker per file
+    z, T, u, v, q = grib.read_blocks([(path, grib.open_index(path, index_path).locate(times, range(1,61))) for path in paths],
+                                     decode_workers, index_path)
+    # for surface pressure, the file is only scanned once
+    sp = grib.open_index(datapath + os.sep + 'jra_surf' + os.sep + 'anl_surf.001_pres.reg_tl319.%d%s0100_%d%s%d18' % (year,namelist_month[month-1],year,namelist_month[month-1],days), index_path).read(times)
+    print "Retrieving datasets successfully and return the variable key (%d-%d)!" % (first_day,last_day)
+    logging.info("Retrieving 3D variables from %d (y) - %s (m) successfully (%d-%d)!" % (year,namelist_month[month-1],first_day,last_day))
 
     # return all the fields
     return z, T, u, v, q, sp
@@ -361,27 +209,11 @@ def mass_correction_divergence(u,v,q,dp):
     moisture_flux_v_int = np.sum(moisture_flux_v,1)
     del moisture_flux_u, moisture_flux_v
     # calculate the divergence of moisture flux
-    div_moisture_flux_u = np.zeros(moisture_flux_u_int.shape,dtype = float)
-    div_moisture_flux_v = np.zeros(moisture_flux_v_int.shape,dtype = float)
     ######################## Attnention to the coordinate and symbol #######################
     # zonal moisture flux divergence
-    for i in np.arange(len(latitude)):
-        for j in np.arange(len(longitude)):
-            # the longitude could be from 0 to 360 or -180 to 180, but the index remains the same
-            if j == 0:
-                div_moisture_flux_u[:,i,j] = (moisture_flux_u_int[:,i,j+1] - moisture_flux_u_int[:,i,-1]) / (2 * dx[i])
-            elif j == (len(longitude)-1) :
-                div_moisture_flux_u[:,i,j] = (moisture_flux_u_int[:,i,0] - moisture_flux_u_int[:,i,j-1]) / (2 * dx[i])
-            else:
-                div_moisture_flux_u[:,i,j] = (moisture_flux_u_int[:,i,j+1] - moisture_flux_u_int[:,i,j-1]) / (2 * dx[i])
+    div_moisture_flux_u = divergence.zonal_divergence(moisture_flux_u_int, dx)
     # meridional moisture flux divergence
-    for i in np.arange(len(latitude)):
-        if i == 0:
-            div_moisture_flux_v[:,i,:] = -(moisture_flux_v_int[:,i+1,:] - moisture_flux_v_int[:,i,:]) / (2 * dy)
-        elif i == (len(latitude)-1):
-            div_moisture_flux_v[:,i,:] = -(moisture_flux_v_int[:,i,:] - moisture_flux_v_int[:,i-1,:]) / (2 * dy)
-        else:
-            div_moisture_flux_v[:,i,:] = -(moisture_flux_v_int[:,i+1,:] - moisture_flux_v_int[:,i-1,:]) / (2 * dy)
+    div_moisture_flux_v = divergence.meridional_divergence(moisture_flux_v_int, dy, north_to_south=True)
     print 'The calculation of divergent verically integrated moisture flux is finished !!'
 
     print 'Begin the calculation of divergent verically integrated mass flux.'
@@ -396,27 +228,11 @@ def mass_correction_divergence(u,v,q,dp):
     # save memory
     del mass_flux_u, mass_flux_v
     # calculate the divergence of moisture flux
-    div_mass_flux_u = np.zeros(mass_flux_u_int.shape,dtype = float)
-    div_mass_flux_v = np.zeros(mass_flux_v_int.shape,dtype = float)
     # zonal mass flux divergence
     # zonal moisture flux divergence
-    for i in np.arange(len(latitude)):
-        for j in np.arange(len(longitude)):
-            # the longitude could be from 0 to 360 or -180 to 180, but the index remains the same
-            if j == 0:
-                div_mass_flux_u[:,i,j] = (mass_flux_u_int[:,i,j+1] - mass_flux_u_int[:,i,-1]) / (2 * dx[i])
-            elif j == (len(longitude)-1) :
-                div_mass_flux_u[:,i,j] = (mass_flux_u_int[:,i,0] - mass_flux_u_int[:,i,j-1]) / (2 * dx[i])
-            else:
-                div_mass_flux_u[:,i,j] = (mass_flux_u_int[:,i,j+1] - mass_flux_u_int[:,i,j-1]) / (2 * dx[i])
+    div_mass_flux_u = divergence.zonal_divergence(mass_flux_u_int, dx)
     # meridional mass flux divergence
-    for i in np.arange(len(latitude)):
-        if i == 0:
-            div_mass_flux_v[:,i,:] = -(mass_flux_v_int[:,i+1,:] - mass_flux_v_int[:,i,:]) / (2 * dy)
-        elif i == (len(latitude)-1):
-            div_mass_flux_v[:,i,:] = -(mass_flux_v_int[:,i,:] - mass_flux_v_int[:,i-1,:]) / (2 * dy)
-        else:
-            div_mass_flux_v[:,i,:] = -(mass_flux_v_int[:,i+1,:] - mass_flux_v_int[:,i-1,:]) / (2 * dy)
+    div_mass_flux_v = divergence.meridional_divergence(mass_flux_v_int, dy, north_to_south=True)
     print 'The calculation of divergent verically integrated mass flux is finished !!'
 
     print 'Calculate precipitable water!!'
@@ -552,23 +368,23 @@ def create_netcdf_point (meridional_E_point_pool,meridional_E_internal_point_poo
     print '*******************************************************************'
     logging.info("Start creating netcdf file for total meridional energy transport and each component at each grid point.")
     # wrap the datasets into netcdf file
-    # 'NETCDF3_CLASSIC', 'NETCDF3_64BIT', 'NETCDF4_CLASSIC', and 'NETCDF4'
-    data_wrap = Dataset(output_path + os.sep + 'point' + os.sep + 'AMET_JRA55_model_daily_%d%s_E_point.nc' % (year,namelist_month[month-1]),'w',format = 'NETCDF3_64BIT')
+    # NETCDF4, compressed and chunked by time step (wizard.output)
+    data_wrap = output.create_dataset(output_path + os.sep + 'point' + os.sep + 'AMET_JRA55_model_daily_%d%s_E_point.nc' % (year,namelist_month[month-1]))
     # create dimensions for netcdf data
     lat_wrap_dim = data_wrap.createDimension('latitude',Dim_latitude)
     lon_wrap_dim = data_wrap.createDimension('longitude',Dim_longitude)
     # create coordinate variables for 3-dimensions
-    lat_warp_var = data_wrap.createVariable('latitude',np.float32,('latitude',))
-    lon_warp_var = data_wrap.createVariable('longitude',np.float32,('longitude',))
+    lat_warp_var = output.create_variable(data_wrap,'latitude',np.float32,('latitude',))
+    lon_warp_var = output.create_variable(data_wrap,'longitude',np.float32,('longitude',))
     # create the actual 3-d variable
-    uc_warp_var = data_wrap.createVariable('uc',np.float32,('latitude','longitude'))
-    vc_warp_var = data_wrap.createVariable('vc',np.float32,('latitude','longitude'))
-
-    E_total_wrap_var = data_wrap.createVariable('E',np.float64,('latitude','longitude'))
-    E_internal_wrap_var = data_wrap.createVariable('E_cpT',np.float64,('latitude','longitude'))
-    E_latent_wrap_var = data_wrap.createVariable('E_Lvq',np.float64,('latitude','longitude'))
-    E_geopotential_wrap_var = data_wrap.createVariable('E_gz',np.float64,('latitude','longitude'))
-    E_kinetic_wrap_var = data_wrap.createVariable('E_uv2',np.float64,('latitude','longitude'))
+    uc_warp_var = output.create_variable(data_wrap,'uc',np.float32,('latitude','longitude'))
+    vc_warp_var = output.create_variable(data_wrap,'vc',np.float32,('latitude','longitude'))
+
+    E_total_wrap_var = output.create_variable(data_wrap,'E',np.float64,('latitude','longitude'),packing=output_packing)
+    E_internal_wrap_var = output.create_variable(data_wrap,'E_cpT',np.float64,('latitude','longitude'),packing=output_packing)
+    E_latent_wrap_var = output.create_variable(data_wrap,'E_Lvq',np.float64,('latitude','longitude'),packing=output_packing)
+    E_geopotential_wrap_var = output.create_variable(data_wrap,'E_gz',np.float64,('latitude','longitude'),packing=output_packing)
+    E_kinetic_wrap_var = output.create_variable(data_wrap,'E_uv2',np.float64,('latitude','longitude'),packing=output_packing)
     # global attributes
     data_wrap.description = 'Monthly mean meridional energy transport and each component at each grid point'
     # variable attributes
@@ -612,18 +428,18 @@ def create_netcdf_zonal_int (meridional_E_pool, meridional_E_internal_pool, meri
     print '*******************************************************************'
     logging.info("Start creating netcdf files for the zonal integral of total meridional energy transport and each component.")
     # wrap the datasets into netcdf file
-    # 'NETCDF3_CLASSIC', 'NETCDF3_64BIT', 'NETCDF4_CLASSIC', and 'NETCDF4'
-    data_wrap = Dataset(output_path + os.sep + 'zonal_int' + os.sep + 'AMET_JRA55_model_daily_%d%s_E_zonal_int.nc' % (year,namelist_month[month-1]),'w',format = 'NETCDF3_64BIT')
+    # NETCDF4, compressed and chunked by time step (wizard.output)
+    data_wrap = output.create_dataset(output_path + os.sep + 'zonal_int' + os.sep + 'AMET_JRA55_model_daily_%d%s_E_zonal_int.nc' % (year,namelist_month[month-1]))
     # create dimensions for netcdf data
     lat_wrap_dim = data_wrap.createDimension('latitude',Dim_latitude)
     # create coordinate variables for 3-dimensions
-    lat_warp_var = data_wrap.createVariable('latitude',np.float32,('latitude',))
+    lat_warp_var = output.create_variable(data_wrap,'latitude',np.float32,('latitude',))
     # create the actual 3-d variable
-    E_total_wrap_var = data_wrap.createVariable('E',np.float64,('latitude',))
-    E_internal_wrap_var = data_wrap.createVariable('E_cpT',np.float64,('latitude',))
-    E_latent_wrap_var = data_wrap.createVariable('E_Lvq',np.float64,('latitude',))
-    E_geopotential_wrap_var = data_wrap.createVariable('E_gz',np.float64,('latitude',))
-    E_kinetic_wrap_var = data_wrap.createVariable('E_uv2',np.float64,('latitude',))
+    E_total_wrap_var = output.create_variable(data_wrap,'E',np.float64,('latitude',),packing=output_packing)
+    E_internal_wrap_var = output.create_variable(data_wrap,'E_cpT',np.float64,('latitude',),packing=output_packing)
+    E_latent_wrap_var = output.create_variable(data_wrap,'E_Lvq',np.float64,('latitude',),packing=output_packing)
+    E_geopotential_wrap_var = output.create_variable(data_wrap,'E_gz',np.float64,('latitude',),packing=output_packing)
+    E_kinetic_wrap_var = output.create_variable(data_wrap,'E_uv2',np.float64,('latitude',),packing=output_packing)
     # global attributes
     data_wrap.description = 'Monthly mean zonal integral of meridional energy transport and each component'
     # variable attributes
@@ -694,8 +510,6 @@ if __name__=="__main__":
     meridional_E_kinetic_point_pool = np.zeros((Dim_latitude,Dim_longitude),dtype = float)
     # loop for calculation
     for i in period:
-        # set the message counter for the extraction of surface field
-        counter_surface = 1
         for j in index_month:
             rounds = 0 # for the optimization of memory
             #dx = dx_benchmark
@@ -714,25 +528,33 @@ if __name__=="__main__":
             ###  Create space for stroing intermediate variables and outputs ###
             ####################################################################
             # data pool for mass budget correction module
-            pool_div_moisture_flux_u = np.zeros((days*4,len(latitude),len(longitude)),dtype=float)
-            pool_div_moisture_flux_v = np.zeros((days*4,len(latitude),len(longitude)),dtype=float)
-            pool_div_mass_flux_u = np.zeros((days*4,len(latitude),len(longitude)),dtype=float)
-            pool_div_mass_flux_v = np.zeros((days*4,len(latitude),len(longitude)),dtype=float)
-            pool_precipitable_water = np.zeros((days*4,len(latitude),len(longitude)),dtype=float)
-            pool_ps_mean = np.zeros((days*4,len(latitude),len(longitude)),dtype=float)
+            pool_div_moisture_flux_u = accumulate.RunningMean()
+            pool_div_moisture_flux_v = accumulate.RunningMean()
+            pool_div_mass_flux_u = accumulate.RunningMean()
+            pool_div_mass_flux_v = accumulate.RunningMean()
+            pool_precipitable_water = accumulate.RunningMean()
+            pool_ps_mean = accumulate.RunningMean()
             # data pool for meridional energy tansport module
-            pool_internal_flux_int = np.zeros((days*4,len(latitude),len(longitude)),dtype=float)
-            pool_latent_flux_int = np.zeros((days*4,len(latitude),len(longitude)),dtype=float)
-            pool_geopotential_flux_int = np.zeros((days*4,len(latitude),len(longitude)),dtype=float)
-            pool_kinetic_flux_int = np.zeros((days*4,len(latitude),len(longitude)),dtype=float)
+            pool_internal_flux_int = accumulate.RunningMean()
+            pool_latent_flux_int = accumulate.RunningMean()
+            pool_geopotential_flux_int = accumulate.RunningMean()
+            pool_kinetic_flux_int = accumulate.RunningMean()
             # data pool for the correction of meridional energy tansport
-            pool_heat_flux_int = np.zeros((days*4,len(latitude),len(longitude)),dtype=float)
-            pool_vapor_flux_int = np.zeros((days*4,len(latitude),len(longitude)),dtype=float)
-            pool_geo_flux_int = np.zeros((days*4,len(latitude),len(longitude)),dtype=float)
-            pool_velocity_flux_int = np.zeros((days*4,len(latitude),len(longitude)),dtype=float)
+            pool_heat_flux_int = accumulate.RunningMean()
+            pool_vapor_flux_int = accumulate.RunningMean()
+            pool_geo_flux_int = accumulate.RunningMean()
+            pool_velocity_flux_int = accumulate.RunningMean()
+            # the month is converted to the store and its GRIB files are unchanged
+            month_stored = month_store.available('%d_%s' % (i,namelist_month[j-1]))
             for k in np.arange(3): # devide into 3 rounds
                 # extract 3D variables
-                z, T, u, v, q, sp = var_3D_key_retrieve(datapath, i, j, days, k)
+                if month_stored:
+                    # time steps of the 10-day round (1-10, 11-20, 21-end)
+                    first_day, last_day = [(1,10),(11,20),(21,days)][k]
+                    z, T, u, v, q, sp = month_store.read('%d_%s' % (i,namelist_month[j-1]), ['z','T','u','v','q','sp'],
+                                                         steps=slice((first_day-1)*4,last_day*4))
+                else:
+                    z, T, u, v, q, sp = var_3D_key_retrieve(datapath, i, j, days, k)
                 # calculate delta pressure of each level
                 dp = np.zeros(T.shape,dtype = float)
                 for c in np.arange(60):
@@ -748,62 +570,30 @@ if __name__=="__main__":
                     q_start = q[0,:,:,:]
                     sp_start = sp[0,:,:]
                     dp_start = dp[0,:,:,:]
-                    pool_div_moisture_flux_u[:40,:,:] = div_moisture_flux_u
-                    pool_div_moisture_flux_v[:40,:,:] = div_moisture_flux_v
-                    pool_div_mass_flux_u[:40,:,:] = div_mass_flux_u
-                    pool_div_mass_flux_v[:40,:,:] = div_mass_flux_v
-                    pool_precipitable_water[:40,:,:] = precipitable_water_int
-                    pool_ps_mean[:40,:,:] = sp
-                elif k == 1:
-                    pool_div_moisture_flux_u[40:80,:,:] = div_moisture_flux_u
-                    pool_div_moisture_flux_v[40:80,:,:] = div_moisture_flux_v
-                    pool_div_mass_flux_u[40:80,:,:] = div_mass_flux_u
-                    pool_div_mass_flux_v[40:80,:,:] = div_mass_flux_v
-                    pool_precipitable_water[40:80,:,:] = precipitable_water_int
-                    pool_ps_mean[40:80,:,:] = sp
-                else:
+                elif k == 2:
                     q_end = q[-1,:,:,:]
                     sp_end = sp[-1,:,:]
                     dp_end = dp[-1,:,:,:]
-                    pool_div_moisture_flux_u[80:,:,:] = div_moisture_flux_u
-                    pool_div_moisture_flux_v[80:,:,:] = div_moisture_flux_v
-                    pool_div_mass_flux_u[80:,:,:] = div_mass_flux_u
-                    pool_div_mass_flux_v[80:,:,:] = div_mass_flux_v
-                    pool_precipitable_water[80:,:,:] = precipitable_water_int
-                    pool_ps_mean[80:,:,:] = sp
+                pool_div_moisture_flux_u.add_chunk(div_moisture_flux_u)
+                pool_div_moisture_flux_v.add_chunk(div_moisture_flux_v)
+                pool_div_mass_flux_u.add_chunk(div_mass_flux_u)
+                pool_div_mass_flux_v.add_chunk(div_mass_flux_v)
+                pool_precipitable_water.add_chunk(precipitable_water_int)
+                pool_ps_mean.add_chunk(sp)
                 ####################################################################
                 ######               Meridional Energy Transport             #######
                 ####################################################################
                 internal_flux_int, latent_flux_int, geopotential_flux_int, kinetic_flux_int,\
                 heat_flux_int, vapor_flux_int, geo_flux_int, velocity_flux_int,\
                 = meridional_energy_transport_divergence(z,T,u,v,q,dp)
-                if k == 0:
-                    pool_internal_flux_int[:40,:,:] = internal_flux_int
-                    pool_latent_flux_int[:40,:,:] = latent_flux_int
-                    pool_geopotential_flux_int[:40,:,:] = geopotential_flux_int
-                    pool_kinetic_flux_int[:40,:,:] = kinetic_flux_int
-                    pool_heat_flux_int[:40,:,:] = heat_flux_int
-                    pool_vapor_flux_int[:40,:,:] = vapor_flux_int
-                    pool_geo_flux_int[:40,:,:] = geo_flux_int
-                    pool_velocity_flux_int[:40,:,:] = velocity_flux_int
-                elif k == 1:
-                    pool_internal_flux_int[40:80,:,:] = internal_flux_int
-                    pool_latent_flux_int[40:80,:,:] = latent_flux_int
-                    pool_geopotential_flux_int[40:80,:,:] = geopotential_flux_int
-                    pool_kinetic_flux_int[40:80,:,:] = kinetic_flux_int
-                    pool_heat_flux_int[40:80,:,:] = heat_flux_int
-                    pool_vapor_flux_int[40:80,:,:] = vapor_flux_int
-                    pool_geo_flux_int[40:80,:,:] = geo_flux_int
-                    pool_velocity_flux_int[40:80,:,:] = velocity_flux_int
-                else:
-                    pool_internal_flux_int[80:,:,:] = internal_flux_int
-                    pool_latent_flux_int[80:,:,:] = latent_flux_int
-                    pool_geopotential_flux_int[80:,:,:] = geopotential_flux_int
-                    pool_kinetic_flux_int[80:,:,:] = kinetic_flux_int
-                    pool_heat_flux_int[80:,:,:] = heat_flux_int
-                    pool_vapor_flux_int[80:,:,:] = vapor_flux_int
-                    pool_geo_flux_int[80:,:,:] = geo_flux_int
-                    pool_velocity_flux_int[80:,:,:] = velocity_flux_int
+                pool_internal_flux_int.add_chunk(internal_flux_int)
+                pool_latent_flux_int.add_chunk(latent_flux_int)
+                pool_geopotential_flux_int.add_chunk(geopotential_flux_int)
+                pool_kinetic_flux_int.add_chunk(kinetic_flux_int)
+                pool_heat_flux_int.add_chunk(heat_flux_int)
+                pool_vapor_flux_int.add_chunk(vapor_flux_int)
+                pool_geo_flux_int.add_chunk(geo_flux_int)
+                pool_velocity_flux_int.add_chunk(velocity_flux_int)
             ####################################################################
             ######                     Mass Correction                   #######
             ####################################################################
@@ -817,7 +607,7 @@ if __name__=="__main__":
             print 'The calculation of precipitable water tendency is finished !!'
             # calculate evaporation minus precipitation
             E_P =  np.zeros((len(latitude),len(longitude)),dtype = float)
-            E_P = moisture_tendency + np.mean(pool_div_moisture_flux_u,0) + np.mean(pool_div_moisture_flux_v,0)
+            E_P = moisture_tendency + pool_div_moisture_flux_u.mean() + pool_div_moisture_flux_v.mean()
             print '*******************************************************************'
             print "******  Computation of E-P on each grid point is finished   *******"
             print '*******************************************************************'
@@ -828,7 +618,7 @@ if __name__=="__main__":
             logging.info("Finish calculating the moisture tendency and surface pressure tendency")
             print "Finish calculating the moisture tendency and surface pressure tendency"
             mass_residual = np.zeros((len(latitude),len(longitude)),dtype = float)
-            mass_residual = sp_tendency + constant['g'] * (np.mean(pool_div_mass_flux_u,0) + np.mean(pool_div_mass_flux_v,0)) - constant['g'] * E_P
+            mass_residual = sp_tendency + constant['g'] * (pool_div_mass_flux_u.mean() + pool_div_mass_flux_v.mean()) - constant['g'] * E_P
             print '*******************************************************************'
             print "*** Computation of mass residual on each grid point is finished ***"
             print '*******************************************************************'
@@ -838,11 +628,10 @@ if __name__=="__main__":
             # calculate barotropic correction wind
             uc = np.zeros((len(latitude),len(longitude)),dtype = float)
             vc = np.zeros((len(latitude),len(longitude)),dtype = float)
-            vc = mass_residual * dy / (np.mean(pool_ps_mean,0) - constant['g'] * np.mean(pool_precipitable_water,0))
+            vc = mass_residual * dy / (pool_ps_mean.mean() - constant['g'] * pool_precipitable_water.mean())
             vc[0,:] = 0 # Modification at polar points
             vc[-1,:] = 0
-            for c in np.arange(len(latitude)):
-                uc[c,:] = mass_residual[c,:] * dx[c] / (np.mean(pool_ps_mean[:,c,:],0) - constant['g'] * np.mean(pool_precipitable_water[:,c,:],0))
+            uc = mass_residual * dx[:,np.newaxis] / (pool_ps_mean.mean() - constant['g'] * pool_precipitable_water.mean())
             print '********************************************************************************'
             print "*** Computation of barotropic correction wind on each grid point is finished ***"
             print '********************************************************************************'
@@ -856,10 +645,10 @@ if __name__=="__main__":
             #dx[0] = 0
             #dx[-1] = 0
             # mass correction component
-            correction_internal_flux_int = vc * np.mean(pool_heat_flux_int,0)
-            correction_latent_flux_int = vc * np.mean(pool_vapor_flux_int,0)
-            correction_geopotential_flux_int = vc * np.mean(pool_geo_flux_int,0)
-            correction_kinetic_flux_int = vc * np.mean(pool_velocity_flux_int,0)
+            correction_internal_flux_int = vc * pool_heat_flux_int.mean()
+            correction_latent_flux_int = vc * pool_vapor_flux_int.mean()
+            correction_geopotential_flux_int = vc * pool_geo_flux_int.mean()
+            correction_kinetic_flux_int = vc * pool_velocity_flux_int.mean()
             # take the corrected energy flux at each grid point!
             meridional_E_internal_point = np.zeros((len(latitude),len(longitude)),dtype=float)
             meridional_E_latent_point = np.zeros((len(latitude),len(longitude)),dtype=float)
@@ -867,11 +656,10 @@ if __name__=="__main__":
             meridional_E_kinetic_point = np.zeros((len(latitude),len(longitude)),dtype=float)
             meridional_E_point = np.zeros((len(latitude),len(longitude)),dtype=float)
             #!!!!!!!!!!!!!!! The unit is tera-watt (TW) !!!!!!!!!!!!!!!!!!!!!!#
-            for c in np.arange(len(latitude)):
-                meridional_E_internal_point[c,:] = (np.mean(pool_internal_flux_int[:,c,:],0) - correction_internal_flux_int[c,:]) * dx[c]/1e+12
-                meridional_E_latent_point[c,:] = (np.mean(pool_latent_flux_int[:,c,:],0) - correction_latent_flux_int[c,:]) * dx[c]/1e+12
-                meridional_E_geopotential_point[c,:] = (np.mean(pool_geopotential_flux_int[:,c,:],0) - correction_geopotential_flux_int[c,:]) * dx[c]/1e+12
-                meridional_E_kinetic_point[c,:] = (np.mean(pool_kinetic_flux_int[:,c,:],0) - correction_kinetic_flux_int[c,:]) * dx[c]/1e+12
+            meridional_E_internal_point = (pool_internal_flux_int.mean() - correction_internal_flux_int) * dx[:,np.newaxis]/1e+12
+            meridional_E_latent_point = (pool_latent_flux_int.mean() - correction_latent_flux_int) * dx[:,np.newaxis]/1e+12
+            meridional_E_geopotential_point = (pool_geopotential_flux_int.mean() - correction_geopotential_flux_int) * dx[:,np.newaxis]/1e+12
+            meridional_E_kinetic_point = (pool_kinetic_flux_int.mean() - correction_kinetic_flux_int) * dx[:,np.newaxis]/1e+12
             meridional_E_point = meridional_E_internal_point + meridional_E_latent_point + meridional_E_geopotential_point + meridional_E_kinetic_point
             # take the zonal integral
             meridional_E_internal = np.zeros(len(latitude),dtype=float)
@@ -12,7 +12,7 @@ Description     : The code aims to calculate the atmospheric meridional energy
                   The procedure is generic and is able to adapt any atmospheric
                   reanalysis datasets, with some changes.
 Return Value    : NetCFD4 data file
-Dependencies    : os, time, numpy, netCDF4, sys, matplotlib
+Dependencies    : os, time, numpy, netCDF4, sys, matplotlib, wizard
 variables       : Absolute Temperature              T         [K]
                   Specific Humidity                 q         [kg/kg]
                   Surface Pressure                  ps        [Pa]
@@ -45,6 +45,14 @@ import matplotlib
 # generate images without having a window appear
 matplotlib.use('Agg')
 import matplotlib.pyplot as plt
+# shared kernels of Energy-Wizard at the root of the repository
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir))
+from wizard import accumulate
+from wizard import divergence
+from wizard import column
+from wizard import hybrid
+from wizard import loader
+from wizard import output
 
 ##########################################################################
 ###########################   Units vacabulory   #########################
@@ -141,6 +149,10 @@ output_path = '/project/Reanalysis/MERRA2/Subdaily/Model'
 # benchmark datasets for basic dimensions
 benchmark_path = '/project/Reanalysis/MERRA2/Subdaily/Model/merra1980/MERRA2_100.inst3_3d_asm_Nv.19801221.SUB.nc4'
 benchmark = Dataset(benchmark_path)
+# number of model levels per read of the 3D fields, None to read each field at once
+chunk_levels = None
+# packing of the output fields (wizard.output), None (float64), 'float32' or 'int16'
+output_packing = None
 ####################################################################################
 
 def var_key_retrieve(datapath, year, month, day):
@@ -187,24 +199,16 @@ def mass_correction_tendency(datapath,year,month,var_start,var_end,var_last,days
     q_start = var_start.variables['QV'][0,:,:,:]
     q_end = var_end.variables['QV'][-1,:,:,:]
     q_next = var_next.variables['QV'][0,:,:,:]
-    # calculate the index of pressure levels
-    index_level = np.arange(len(level))
-    # calculate pressure depth
-    dp_level_last = np.zeros((len(level),len(latitude),len(longitude)),dtype = float) # last day of the last month
-    dp_level_start = np.zeros((len(level),len(latitude),len(longitude)),dtype = float) # start of the current month
-    dp_level_end = np.zeros((len(level),len(latitude),len(longitude)),dtype = float) # end of the current month
-    dp_level_next = np.zeros((len(level),len(latitude),len(longitude)),dtype = float) # first day of the next month
     # use matrix A and B to calculate dp based on half pressure level
-    for i in index_level:
-        dp_level_last[i,:,:] = (A[i+1]*100 + B[i+1] * ps_last) - (A[i]*100 + B[i] * ps_last)
-        dp_level_start[i,:,:] = (A[i+1]*100 + B[i+1] * ps_start) - (A[i]*100 + B[i] * ps_start)
-        dp_level_end[i,:,:] = (A[i+1]*100 + B[i+1] * ps_end) - (A[i]*100 + B[i] * ps_end)
-        dp_level_next[i,:,:] = (A[i+1]*100 + B[i+1] * ps_next) - (A[i]*100 + B[i] * ps_next)
+    levels_last = hybrid.HybridLevels(A*100, B, ps_last) # last day of the last month
+    levels_start = hybrid.HybridLevels(A*100, B, ps_start) # start of the current month
+    levels_end = hybrid.HybridLevels(A*100, B, ps_end) # end of the current month
+    levels_next = hybrid.HybridLevels(A*100, B, ps_next) # first day of the next month
     # calculte the precipitable water tendency and take the vertical integral
-    moisture_last = np.sum((q_last * dp_level_last), 0) # last day of the last month
-    moisture_start = np.sum((q_start * dp_level_start), 0) # start of the current month
-    moisture_end = np.sum((q_end * dp_level_end), 0) # end of the current month
-    moisture_next = np.sum((q_next * dp_level_next), 0) # first day of the next month
+    moisture_last = levels_last.vertical_integral(q_last) # last day of the last month
+    moisture_start = levels_start.vertical_integral(q_start) # start of the current month
+    moisture_end = levels_end.vertical_integral(q_end) # end of the current month
+    moisture_next = levels_next.vertical_integral(q_next) # first day of the next month
     # compute the moisture tendency (one day has 86400s)
     moisture_tendency = ((moisture_end + moisture_next) / 2 - (moisture_last + moisture_start) / 2) / (len(days)*86400) / constant['g']
     # calculate the surface pressure tendency
@@ -215,7 +219,7 @@ def mass_correction_tendency(datapath,year,month,var_start,var_end,var_last,days
     return moisture_tendency, ps_tendency
 
 
-def mass_correction_divergence(var_key):
+def mass_correction_divergence(fields, levels):
     '''
     This module deals with all the divergence terms in mass correction.
     These divergence terms include:
@@ -224,82 +228,37 @@ def mass_correction_divergence(var_key):
     '''
     # extract variables
     print "Start extracting variables for mass correction."
-    q = var_key.variables['QV'][:]
-    ps = var_key.variables['PS'][:]
-    u = var_key.variables['U'][:]
-    v = var_key.variables['V'][:]
+    q = fields['QV']
+    u = fields['U']
+    v = fields['V']
     print 'Extracting variables successfully!'
     logging.info("Extracting variables successfully!")
 
     print 'Begin the calculation of divergent verically integrated moisture flux.'
-    # calculate the index of pressure levels
-    index_level = np.arange(len(level))
-    # calculate the delta pressure
-    dp_level = np.zeros((len(time),len(level),len(latitude),len(longitude)),dtype = float)
-    for i in index_level:
-        dp_level[:,i,:,:] =  (A[i+1]*100 + B[i+1] * ps) - (A[i]*100 + B[i] * ps)
-    # calculte the mean moisture flux for a certain month
-    moisture_flux_u = u * q * dp_level / constant['g']
-    moisture_flux_v = v * q * dp_level / constant['g']
-    # take the vertical integral
-    moisture_flux_u_int = np.sum(moisture_flux_u,1)
-    moisture_flux_v_int = np.sum(moisture_flux_v,1)
+    # calculte the mean moisture flux for a certain month and take the vertical integral
+    moisture_flux_u_int = levels.vertical_integral(u * q) / constant['g']
+    moisture_flux_v_int = levels.vertical_integral(v * q) / constant['g']
     # calculate the divergence of moisture flux
-    div_moisture_flux_u = np.zeros((len(time),len(latitude),len(longitude)),dtype = float)
-    div_moisture_flux_v = np.zeros((len(time),len(latitude),len(longitude)),dtype = float)
     ######################## Attnention to the coordinate and symbol #######################
     # zonal moisture flux divergence
-    for i in np.arange(len(latitude)):
-        for j in np.arange(len(longitude)):
-            # the longitude could be from 0 to 360 or -180 to 180, but the index remains the same
-            if j == 0:
-                div_moisture_flux_u[:,i,j] = (moisture_flux_u_int[:,i,j+1] - moisture_flux_u_int[:,i,-1]) / (2 * dx[i])
-            elif j == (len(longitude)-1) :
-                div_moisture_flux_u[:,i,j] = (moisture_flux_u_int[:,i,0] - moisture_flux_u_int[:,i,j-1]) / (2 * dx[i])
-            else:
-                div_moisture_flux_u[:,i,j] = (moisture_flux_u_int[:,i,j+1] - moisture_flux_u_int[:,i,j-1]) / (2 * dx[i])
+    div_moisture_flux_u = divergence.zonal_divergence(moisture_flux_u_int, dx)
     # meridional moisture flux divergence
     # the latitude is from -90S to 90N
-    for i in np.arange(len(latitude)):
-        if i == 0:
-            div_moisture_flux_v[:,i,:] = (moisture_flux_v_int[:,i+1,:] - moisture_flux_v_int[:,i,:]) / (2 * dy)
-        elif i == (len(latitude)-1):
-            div_moisture_flux_v[:,i,:] = (moisture_flux_v_int[:,i,:] - moisture_flux_v_int[:,i-1,:]) / (2 * dy)
-        else:
-            div_moisture_flux_v[:,i,:] = (moisture_flux_v_int[:,i+1,:] - moisture_flux_v_int[:,i-1,:]) / (2 * dy)
+    div_moisture_flux_v = divergence.meridional_divergence(moisture_flux_v_int, dy)
     # take the daily mean
     div_moisture_flux_u_mean = np.mean(div_moisture_flux_u,0)
     div_moisture_flux_v_mean = np.mean(div_moisture_flux_v,0)
     print 'The calculation of divergent verically integrated moisture flux is finished !!'
 
     print 'Begin the calculation of divergent verically integrated mass flux.'
-    # calculate the mass flux
-    mass_flux_u = u * dp_level / constant['g']
-    mass_flux_v = v * dp_level / constant['g']
-    # take the vertical integral
-    mass_flux_u_int = np.sum(mass_flux_u,1)
-    mass_flux_v_int = np.sum(mass_flux_v,1)
+    # calculate the mass flux and take the vertical integral
+    mass_flux_u_int = levels.vertical_integral(u) / constant['g']
+    mass_flux_v_int = levels.vertical_integral(v) / constant['g']
     # calculate the divergence of moisture flux
-    div_mass_flux_u = np.zeros((len(time),len(latitude),len(longitude)),dtype = float)
-    div_mass_flux_v = np.zeros((len(time),len(latitude),len(longitude)),dtype = float)
     # zonal mass flux divergence
-    for i in np.arange(len(latitude)):
-        for j in np.arange(len(longitude)):
-            # the longitude could be from 0 to 360 or -180 to 180, but the index remains the same
-            if j == 0:
-                div_mass_flux_u[:,i,j] = (mass_flux_u_int[:,i,j+1] - mass_flux_u_int[:,i,-1]) / (2 * dx[i])
-            elif j == (len(longitude)-1) :
-                div_mass_flux_u[:,i,j] = (mass_flux_u_int[:,i,0] - mass_flux_u_int[:,i,j-1]) / (2 * dx[i])
-            else:
-                div_mass_flux_u[:,i,j] = (mass_flux_u_int[:,i,j+1] - mass_flux_u_int[:,i,j-1]) / (2 * dx[i])
+    div_mass_flux_u = divergence.zonal_divergence(mass_flux_u_int, dx)
     # meridional mass flux divergence
-    for i in np.arange(len(latitude)):
-        if i == 0:
-            div_mass_flux_v[:,i,:] = (mass_flux_v_int[:,i+1,:] - mass_flux_v_int[:,i,:]) / (2 * dy)
-        elif i == (len(latitude)-1):
-            div_mass_flux_v[:,i,:] = (mass_flux_v_int[:,i,:] - mass_flux_v_int[:,i-1,:]) / (2 * dy)
-        else:
-            div_mass_flux_v[:,i,:] = (mass_flux_v_int[:,i+1,:] - mass_flux_v_int[:,i-1,:]) / (2 * dy)
+    div_mass_flux_v = divergence.meridional_divergence(mass_flux_v_int, dy)
     # take the daily mean
     div_mass_flux_u_mean = np.mean(div_mass_flux_u,0)
     div_mass_flux_v_mean = np.mean(div_mass_flux_v,0)
@@ -307,80 +266,14 @@ def mass_correction_divergence(var_key):
 
     # now calculate other variables
     # take the mean surface pressure value
-    ps_mean = np.mean(ps,0)
+    ps_mean = np.mean(levels.sp,0)
     # calculate precipitable water
-    precipitable_water = q * dp_level / constant['g']
-    precipitable_water_mean = np.mean(np.sum(precipitable_water,1),0)
+    precipitable_water_mean = np.mean(levels.vertical_integral(q),0) / constant['g']
 
     return div_moisture_flux_u_mean, div_moisture_flux_v_mean, div_mass_flux_u_mean,\
            div_mass_flux_v_mean, precipitable_water_mean, ps_mean
 
-def calc_geopotential(var_key):
-    '''
-    This module aims to calculate the geopotential based on surface geopotential.
-    The procedure and relevant equations can be found in ECMWF IFS 9220.
-    See equation 2.20 - 2.23 .
-    '''
-    # extract variables
-    print "Start extracting variables for the calculation of geopotential on model level."
-    T = var_key.variables['T'][:]
-    q = var_key.variables['QV'][:]
-    ps = var_key.variables['PS'][:]
-    z = var_key.variables['PHIS'][:]
-    print 'Extracting variables successfully!'
-    logging.info("Extracting variables successfully!")
-    print 'Start calculating geopotential on model level'
-    # calculate the surface pressure
-    # the unit of pressure here is Pa!!!
-    # define the half level pressure matrix
-    p_half_plus = np.zeros((len(time),len(level),len(latitude),len(longitude)),dtype = float)
-    p_half_minus = np.zeros((len(time),len(level),len(latitude),len(longitude)),dtype = float)
-    # calculate the index of pressure levels
-    index_level = np.arange(len(level))
-    # calculate the pressure at each half level
-    for i in index_level:
-        p_half_plus[:,i,:,:] = A[i+1]*100 + B[i+1] * ps
-        p_half_minus[:,i,:,:] = A[i]*100 + B[i] * ps
-    # calculate full pressure level
-    #level_full = (p_half_plus + p_half_minus) / 2
-    # compute the moist temperature (virtual temperature)
-    Tv = T * (1 + (constant['R_vap'] / constant['R_dry'] - 1) * q)
-    # initialize the first half level geopotential
-    gz_half = np.zeros((len(time),len(latitude),len(longitude)),dtype =float)
-    # initialize the full level geopotential
-    gz = np.zeros((len(time),len(level),len(latitude),len(longitude)),dtype = float)
-    # Calculate the geopotential at each level
-    # The integral should be taken from surface level to the TOA
-    for i in index_level:
-        # reverse the index to make it from surface to the TOA
-        i_inverse = len(level) -1 - i
-        # the ln(p_plus/p_minus) is calculated, alpha is defined
-        # an exception lies in the TOA
-        # see equation 2.23 in ECMWF IFS 9220
-        if i_inverse == 0:
-            ln_p = np.log(p_half_plus[:,i_inverse,:,:]/10)
-            alpha = np.log(2)
-        else:
-            ln_p = np.log(p_half_plus[:,i_inverse,:,:]/p_half_minus[:,i_inverse,:,:])
-            delta_p = p_half_plus[:,i_inverse,:,:] - p_half_minus[:,i_inverse,:,:]
-            alpha = 1 - p_half_minus[:,i_inverse,:,:] / delta_p * ln_p
-        # calculate the geopotential of the full level (exclude surface geopotential)
-        # see equation 2.22 in ECMWF IFS 9220
-        gz_full = gz_half + alpha * constant['R_dry'] * Tv[:,i_inverse,:,:]
-        # add surface geopotential to the full level
-        # see equation 2.21 in ECMWF IFS 9220
-        gz[:,i_inverse,:,:] = z + gz_full
-        # renew the half level geopotential for next loop step (from p_half_minus level to p_half_plus level)
-        # see equation 2.20 in ECMWF IFS 9220
-        gz_half = gz_half + ln_p * constant['R_dry'] * Tv[:,i_inverse,:,:]
-    print '*******************************************************************'
-    print "***Computation of geopotential on each pressure level is finished**"
-    print '*******************************************************************'
-    logging.info("Computation of geopotential on model level is finished!")
-
-    return gz
-
-def meridional_energy_transport(var_key, gz):
+def meridional_energy_transport(fields, levels):
     '''
     This module calculate the energy flux which are the componets of meridional
     energy transport in the atmosphere.
@@ -391,50 +284,28 @@ def meridional_energy_transport(var_key, gz):
     kinetic energy flux
     '''
     # extract variables
+    # the 3D fields T, QV, U and V have been read by the mass correction and the geopotential
     print "Start extracting variables for the quantification of meridional energy transport."
-    T = var_key.variables['T'][:]
-    q = var_key.variables['QV'][:]
-    ps = var_key.variables['PS'][:]
-    u = var_key.variables['U'][:]
-    v = var_key.variables['V'][:]
     print 'Extracting variables successfully!'
     logging.info("Extracting variables successfully!")
 
     print 'Start calculating meridional energy transport on model level'
-    # calculate dp based on mean value of surface pressure
-    dp_level = np.zeros((len(time),len(level),len(latitude),len(longitude)),dtype = float)
-    # calculate the index of pressure levels
-    index_level = np.arange(len(level))
-    for i in index_level:
-        dp_level[:,i,:,:] = (A[i+1]*100 + B[i+1] * ps) - (A[i]*100 + B[i] * ps)
-    # calculate each component of total energy
-    # take the vertical integral
-    # mass correction component
-    # Internal Energy cpT
-    internal_flux = constant['cp'] * v * T * dp_level / constant['g']
-    internal_flux_int = np.mean(np.sum(internal_flux,1),0)
-    # Latent heat Lq
-    latent_flux = constant['Lv'] * v * q * dp_level / constant['g']
-    latent_flux_int = np.mean(np.sum(latent_flux,1),0)
-    # geopotential gz
-    geopotential_flux = v * gz * dp_level / constant['g']
-    geopotential_flux_int = np.mean(np.sum(geopotential_flux,1),0)
-    # kinetic energy
-    kinetic_flux = v * 1/2 *(u**2 + v**2) * dp_level / constant['g']
-    kinetic_flux_int = np.mean(np.sum(kinetic_flux,1),0)
-    # variables for correction
-    # for the correction of Internal Energy cpT
-    heat_flux = constant['cp'] * T * dp_level / constant['g']
-    heat_flux_int = np.mean(np.sum(heat_flux,1),0)
-    # for the correction of Latent Heat flux Lq
-    vapor_flux = constant['Lv'] * q* dp_level / constant['g']
-    vapor_flux_int = np.mean(np.sum(vapor_flux,1),0)
-    # for the correction of Geopotential flux gz
-    geo_flux = gz * dp_level / constant['g']
-    geo_flux_int = np.mean(np.sum(geo_flux,1),0)
-    # for the correction of Kinetic Energy flux u2
-    velocity_flux = 1/2 *(u**2 + v**2) * dp_level / constant['g']
-    velocity_flux_int = np.mean(np.sum(velocity_flux,1),0)
+    # calculate each component of total energy and the variables for correction
+    # take the vertical integral in one pass over the model levels
+    # the geopotential is computed level by level from the surface geopotential
+    internal_flux_int, latent_flux_int, geopotential_flux_int, kinetic_flux_int,\
+    heat_flux_int, vapor_flux_int, geo_flux_int, velocity_flux_int = \
+    column.energy_column_integrals(fields['T'], fields['QV'], fields['U'], fields['V'],
+                                   None, levels, constant, z=fields['PHIS'])
+    # take the daily mean
+    internal_flux_int = np.mean(internal_flux_int,0)
+    latent_flux_int = np.mean(latent_flux_int,0)
+    geopotential_flux_int = np.mean(geopotential_flux_int,0)
+    kinetic_flux_int = np.mean(kinetic_flux_int,0)
+    heat_flux_int = np.mean(heat_flux_int,0)
+    vapor_flux_int = np.mean(vapor_flux_int,0)
+    geo_flux_int = np.mean(geo_flux_int,0)
+    velocity_flux_int = np.mean(velocity_flux_int,0)
 
     print 'Complete calculating meridional energy transport on model level'
 
@@ -532,25 +403,25 @@ def create_netcdf_point (meridional_E_point_pool,meridional_E_internal_point_poo
     print '*******************************************************************'
     logging.info("Start creating netcdf file for total meridional energy transport and each component at each grid point.")
     # wrap the datasets into netcdf file
-    # 'NETCDF3_CLASSIC', 'NETCDF3_64BIT', 'NETCDF4_CLASSIC', and 'NETCDF4'
-    data_wrap = Dataset(output_path+os.sep+'merra%d' % (year) + os.sep + 'output' + os.sep + 'AMET_MERRA2_model_daily_%d_E_point.nc' % (year),'w',format = 'NETCDF3_64BIT')
+    # NETCDF4, compressed and chunked by time step (wizard.output)
+    data_wrap = output.create_dataset(output_path+os.sep+'merra%d' % (year) + os.sep + 'output' + os.sep + 'AMET_MERRA2_model_daily_%d_E_point.nc' % (year))
     # create dimensions for netcdf data
     month_wrap_dim = data_wrap.createDimension('month',Dim_month)
     lat_wrap_dim = data_wrap.createDimension('latitude',Dim_latitude)
     lon_wrap_dim = data_wrap.createDimension('longitude',Dim_longitude)
     # create coordinate variables for 3-dimensions
-    month_warp_var = data_wrap.createVariable('month',np.int32,('month',))
-    lat_warp_var = data_wrap.createVariable('latitude',np.float32,('latitude',))
-    lon_warp_var = data_wrap.createVariable('longitude',np.float32,('longitude',))
+    month_warp_var = output.create_variable(data_wrap,'month',np.int32,('month',))
+    lat_warp_var = output.create_variable(data_wrap,'latitude',np.float32,('latitude',))
+    lon_warp_var = output.create_variable(data_wrap,'longitude',np.float32,('longitude',))
     # create the actual 3-d variable
-    uc_warp_var = data_wrap.createVariable('uc',np.float32,('month','latitude','longitude'))
-    vc_warp_var = data_wrap.createVariable('vc',np.float32,('month','latitude','longitude'))
-
-    E_total_wrap_var = data_wrap.createVariable('E',np.float64,('month','latitude','longitude'))
-    E_internal_wrap_var = data_wrap.createVariable('E_cpT',np.float64,('month','latitude','longitude'))
-    E_latent_wrap_var = data_wrap.createVariable('E_Lvq',np.float64,('month','latitude','longitude'))
-    E_geopotential_wrap_var = data_wrap.createVariable('E_gz',np.float64,('month','latitude','longitude'))
-    E_kinetic_wrap_var = data_wrap.createVariable('E_uv2',np.float64,('month','latitude','longitude'))
+    uc_warp_var = output.create_variable(data_wrap,'uc',np.float32,('month','latitude','longitude'))
+    vc_warp_var = output.create_variable(data_wrap,'vc',np.float32,('month','latitude','longitude'))
+
+    E_total_wrap_var = output.create_variable(data_wrap,'E',np.float64,('month','latitude','longitude'),packing=output_packing)
+    E_internal_wrap_var = output.create_variable(data_wrap,'E_cpT',np.float64,('month','latitude','longitude'),packing=output_packing)
+    E_latent_wrap_var = output.create_variable(data_wrap,'E_Lvq',np.float64,('month','latitude','longitude'),packing=output_packing)
+    E_geopotential_wrap_var = output.create_variable(data_wrap,'E_gz',np.float64,('month','latitude','longitude'),packing=output_packing)
+    E_kinetic_wrap_var = output.create_variable(data_wrap,'E_uv2',np.float64,('month','latitude','longitude'),packing=output_packing)
     # global attributes
     data_wrap.description = 'Monthly mean meridional energy transport and each component at each grid point'
     # variable attributes
@@ -595,20 +466,20 @@ def create_netcdf_zonal_int (meridional_E_pool, meridional_E_internal_pool, meri
     print '*******************************************************************'
     logging.info("Start creating netcdf files for the zonal integral of total meridional energy transport and each component.")
     # wrap the datasets into netcdf file
-    # 'NETCDF3_CLASSIC', 'NETCDF3_64BIT', 'NETCDF4_CLASSIC', and 'NETCDF4'
-    data_wrap = Dataset(output_path+os.sep+'merra%d' % (year) + os.sep + 'output' + os.sep + 'AMET_MERRA2_model_daily_%d_E_zonal_int.nc' % (year),'w',format = 'NETCDF3_64BIT')
+    # NETCDF4, compressed and chunked by time step (wizard.output)
+    data_wrap = output.create_dataset(output_path+os.sep+'merra%d' % (year) + os.sep + 'output' + os.sep + 'AMET_MERRA2_model_daily_%d_E_zonal_int.nc' % (year))
     # create dimensions for netcdf data
     month_wrap_dim = data_wrap.createDimension('month',Dim_month)
     lat_wrap_dim = data_wrap.createDimension('latitude',Dim_latitude)
     # create coordinate variables for 3-dimensions
-    month_warp_var = data_wrap.createVariable('month',np.int32,('month',))
-    lat_warp_var = data_wrap.createVariable('latitude',np.float32,('latitude',))
+    month_warp_var = output.create_variable(data_wrap,'month',np.int32,('month',))
+    lat_warp_var = output.create_variable(data_wrap,'latitude',np.float32,('latitude',))
     # create the actual 3-d variable
-    E_total_wrap_var = data_wrap.createVariable('E',np.float64,('month','latitude'))
-    E_internal_wrap_var = data_wrap.createVariable('E_cpT',np.float64,('month','latitude'))
-    E_latent_wrap_var = data_wrap.createVariable('E_Lvq',np.float64,('month','latitude'))
-    E_geopotential_wrap_var = data_wrap.createVariable('E_gz',np.float64,('month','latitude'))
-    E_kinetic_wrap_var = data_wrap.createVariable('E_uv2',np.float64,('month','latitude'))
+    E_total_wrap_var = output.create_variable(data_wrap,'E',np.float64,('month','latitude'),packing=output_packing)
+    E_internal_wrap_var = output.create_variable(data_wrap,'E_cpT',np.float64,('month','latitude'),packing=output_packing)
+    E_latent_wrap_var = output.create_variable(data_wrap,'E_Lvq',np.float64,('month','latitude'),packing=output_packing)
+    E_geopotential_wrap_var = output.create_variable(data_wrap,'E_gz',np.float64,('month','latitude'),packing=output_packing)
+    E_kinetic_wrap_var = output.create_variable(data_wrap,'E_uv2',np.float64,('month','latitude'),packing=output_packing)
     # global attributes
     data_wrap.description = 'Monthly mean zonal integral of meridional energy transport and each component'
     # variable attributes
@@ -711,22 +582,22 @@ if __name__=="__main__":
             ###  Create space for stroing intermediate variables and outputs ###
             ####################################################################
             # data pool for mass budget correction module
-            pool_div_moisture_flux_u = np.zeros((len(days),len(latitude),len(longitude)),dtype=float)
-            pool_div_moisture_flux_v = np.zeros((len(days),len(latitude),len(longitude)),dtype=float)
-            pool_div_mass_flux_u = np.zeros((len(days),len(latitude),len(longitude)),dtype=float)
-            pool_div_mass_flux_v = np.zeros((len(days),len(latitude),len(longitude)),dtype=float)
-            pool_precipitable_water = np.zeros((len(days),len(latitude),len(longitude)),dtype=float)
-            pool_ps_mean = np.zeros((len(days),len(latitude),len(longitude)),dtype=float)
+            pool_div_moisture_flux_u = accumulate.RunningMean()
+            pool_div_moisture_flux_v = accumulate.RunningMean()
+            pool_div_mass_flux_u = accumulate.RunningMean()
+            pool_div_mass_flux_v = accumulate.RunningMean()
+            pool_precipitable_water = accumulate.RunningMean()
+            pool_ps_mean = accumulate.RunningMean()
             # data pool for meridional energy tansport module
-            pool_internal_flux_int = np.zeros((len(days),len(latitude),len(longitude)),dtype=float)
-            pool_latent_flux_int = np.zeros((len(days),len(latitude),len(longitude)),dtype=float)
-            pool_geopotential_flux_int = np.zeros((len(days),len(latitude),len(longitude)),dtype=float)
-            pool_kinetic_flux_int = np.zeros((len(days),len(latitude),len(longitude)),dtype=float)
+            pool_internal_flux_int = accumulate.RunningMean()
+            pool_latent_flux_int = accumulate.RunningMean()
+            pool_geopotential_flux_int = accumulate.RunningMean()
+            pool_kinetic_flux_int = accumulate.RunningMean()
             # data pool for the correction of meridional energy tansport
-            pool_heat_flux_int = np.zeros((len(days),len(latitude),len(longitude)),dtype=float)
-            pool_vapor_flux_int = np.zeros((len(days),len(latitude),len(longitude)),dtype=float)
-            pool_geo_flux_int = np.zeros((len(days),len(latitude),len(longitude)),dtype=float)
-            pool_velocity_flux_int = np.zeros((len(days),len(latitude),len(longitude)),dtype=float)
+            pool_heat_flux_int = accumulate.RunningMean()
+            pool_vapor_flux_int = accumulate.RunningMean()
+            pool_geo_flux_int = accumulate.RunningMean()
+            pool_velocity_flux_int = accumulate.RunningMean()
             # days loop
             for k in days:
                 # get the key of each variable
@@ -734,6 +605,13 @@ if __name__=="__main__":
                 ####################################################################
                 ######                   Mass Correction                     #######
                 ####################################################################
+                # each variable of the current day is read from disk only once
+                fields = loader.MonthFields(chunk_levels)
+                for name in ['T', 'QV', 'U', 'V', 'PS', 'PHIS']:
+                    fields.add(name, var_key)
+                # half level pressure and layer thickness of the current day
+                # A is given in hPa
+                levels = hybrid.HybridLevels(A*100, B, fields['PS'])
                 # for the computation of tendency terms in the following function
                 if k == days[0]:
                     var_start = var_key
@@ -741,35 +619,37 @@ if __name__=="__main__":
                     var_end = var_key
                 # calculate divergence terms and other terms in mass correction
                 div_moisture_flux_u, div_moisture_flux_v, div_mass_flux_u, div_mass_flux_v, \
-                precipitable_water, ps_mean = mass_correction_divergence(var_key)
+                precipitable_water, ps_mean = mass_correction_divergence(fields, levels)
                 # save the divergence terms to the warehouse
-                pool_div_moisture_flux_u[k,:,:] = div_moisture_flux_u
-                pool_div_moisture_flux_v[k,:,:] = div_moisture_flux_v
-                pool_div_mass_flux_u[k,:,:] = div_mass_flux_u
-                pool_div_mass_flux_v[k,:,:] = div_mass_flux_v
-                pool_precipitable_water[k,:,:] = precipitable_water
-                pool_ps_mean[k,:,:] = ps_mean
+                pool_div_moisture_flux_u.add(div_moisture_flux_u)
+                pool_div_moisture_flux_v.add(div_moisture_flux_v)
+                pool_div_mass_flux_u.add(div_mass_flux_u)
+                pool_div_mass_flux_v.add(div_mass_flux_v)
+                pool_precipitable_water.add(precipitable_water)
+                pool_ps_mean.add(ps_mean)
                 ####################################################################
                 ######                       Geopotential                    #######
                 ####################################################################
                 # calculate the geopotential
-                gz = calc_geopotential(var_key)
                 ####################################################################
                 ######               Meridional Energy Transport             #######
                 ####################################################################
                 # calculate the energy flux terms in meridional energy Transport
                 internal_flux_int, latent_flux_int, geopotential_flux_int, kinetic_flux_int,\
-                heat_flux_int, vapor_flux_int, geo_flux_int, velocity_flux_int = meridional_energy_transport(var_key,gz)
+                heat_flux_int, vapor_flux_int, geo_flux_int, velocity_flux_int = meridional_energy_transport(fields,levels)
                 # save the divergence terms to the warehouse
-                pool_internal_flux_int[k,:,:] = internal_flux_int
-                pool_latent_flux_int[k,:,:] = latent_flux_int
-                pool_geopotential_flux_int[k,:,:] = geopotential_flux_int
-                pool_kinetic_flux_int[k,:,:] = kinetic_flux_int
+                pool_internal_flux_int.add(internal_flux_int)
+                pool_latent_flux_int.add(latent_flux_int)
+                pool_geopotential_flux_int.add(geopotential_flux_int)
+                pool_kinetic_flux_int.add(kinetic_flux_int)
                 # variables for the correction of each energy component
-                pool_heat_flux_int[k,:,:] = heat_flux_int
-                pool_vapor_flux_int[k,:,:] = vapor_flux_int
-                pool_geo_flux_int[k,:,:] = geo_flux_int
-                pool_velocity_flux_int[k,:,:] = velocity_flux_int
+                pool_heat_flux_int.add(heat_flux_int)
+                pool_vapor_flux_int.add(vapor_flux_int)
+                pool_geo_flux_int.add(geo_flux_int)
+                pool_velocity_flux_int.add(velocity_flux_int)
+                # report the reading of the input and remove variables to save memory
+                fields.report()
+                del levels, fields
             ####################################################################
             ######                   Mass Correction                     #######
             ####################################################################
@@ -779,14 +659,14 @@ if __name__=="__main__":
             # update the variable key of the last day of the last month
             var_last = var_end
             # calculate evaporation minus precipitation
-            E_P = moisture_tendency + np.mean(pool_div_moisture_flux_u,0) +np.mean(pool_div_moisture_flux_v,0)
+            E_P = moisture_tendency + pool_div_moisture_flux_u.mean() +pool_div_moisture_flux_v.mean()
             print '*******************************************************************'
             print "******  Computation of E-P on each grid point is finished   *******"
             print '*******************************************************************'
             logging.info("Computation of E-P on each grid point is finished!")
             # calculate the mass residual
-            mass_residual = ps_tendency + constant['g'] * (np.mean(pool_div_mass_flux_u,0) +\
-                            np.mean(pool_div_mass_flux_v,0)) - constant['g'] * E_P
+            mass_residual = ps_tendency + constant['g'] * (pool_div_mass_flux_u.mean() +\
+                            pool_div_mass_flux_v.mean()) - constant['g'] * E_P
             print '*******************************************************************'
             print "*** Computation of mass residual on each grid point is finished ***"
             print '*******************************************************************'
@@ -795,13 +675,12 @@ if __name__=="__main__":
             print 'Begin the calculation of barotropic correction wind.'
             uc = np.zeros((len(latitude),len(longitude)),dtype = float)
             vc = np.zeros((len(latitude),len(longitude)),dtype = float)
-            vc = mass_residual * dy / (np.mean(pool_ps_mean,0) - constant['g'] * np.mean(pool_precipitable_water,0))
+            vc = mass_residual * dy / (pool_ps_mean.mean() - constant['g'] * pool_precipitable_water.mean())
             # extra modification for points at polor mesh
             vc[0,:] = 0
             vc[-1,:] = 0
             # Here we should avoid i,j,k as counter since they are used and will still function
-            for c in np.arange(len(latitude)):
-                uc[c,:] = mass_residual[c,:] * dx[c] / (np.mean(pool_ps_mean[:,c,:],0) - constant['g'] * np.mean(pool_precipitable_water[:,c,:],0))
+            uc = mass_residual * dx[:,np.newaxis] / (pool_ps_mean.mean() - constant['g'] * pool_precipitable_water.mean())
             print '********************************************************************************'
             print "*** Computation of barotropic correction wind on each grid point is finished ***"
             print '********************************************************************************'
@@ -810,10 +689,10 @@ if __name__=="__main__":
             ######               Meridional Energy Transport             #######
             ####################################################################
             # calculate the correction terms
-            correction_internal_flux_int = vc * np.mean(pool_heat_flux_int,0)
-            correction_latent_flux_int = vc * np.mean(pool_vapor_flux_int,0)
-            correction_geopotential_flux_int = vc * np.mean(pool_geo_flux_int,0)
-            correction_kinetic_flux_int = vc * np.mean(pool_velocity_flux_int,0)
+            correction_internal_flux_int = vc * pool_heat_flux_int.mean()
+            correction_latent_flux_int = vc * pool_vapor_flux_int.mean()
+            correction_geopotential_flux_int = vc * pool_geo_flux_int.mean()
+            correction_kinetic_flux_int = vc * pool_velocity_flux_int.mean()
             # calculate the total meridional energy transport and each component respectively
             # energy on grid point
             meridional_E_internal_point = np.zeros((len(latitude),len(longitude)),dtype=float)
@@ -821,11 +700,10 @@ if __name__=="__main__":
             meridional_E_geopotential_point = np.zeros((len(latitude),len(longitude)),dtype=float)
             meridional_E_kinetic_point = np.zeros((len(latitude),len(longitude)),dtype=float)
             meridional_E_point = np.zeros((len(latitude),len(longitude)),dtype=float)
-            for c in np.arange(len(latitude)):
-                meridional_E_internal_point[c,:] = (np.mean(pool_internal_flux_int[:,c,:],0) - correction_internal_flux_int[c,:]) * dx[c]/1e+12
-                meridional_E_latent_point[c,:] = (np.mean(pool_latent_flux_int[:,c,:],0) - correction_latent_flux_int[c,:]) * dx[c]/1e+12
-                meridional_E_geopotential_point[c,:] = (np.mean(pool_geopotential_flux_int[:,c,:],0) - correction_geopotential_flux_int[c,:]) * dx[c]/1e+12
-                meridional_E_kinetic_point[c,:] = (np.mean(pool_kinetic_flux_int[:,c,:],0) - correction_kinetic_flux_int[c,:]) * dx[c]/1e+12
+            meridional_E_internal_point = (pool_internal_flux_int.mean() - correction_internal_flux_int) * dx[:,np.newaxis]/1e+12
+            meridional_E_latent_point = (pool_latent_flux_int.mean() - correction_latent_flux_int) * dx[:,np.newaxis]/1e+12
+            meridional_E_geopotential_point = (pool_geopotential_flux_int.mean() - correction_geopotential_flux_int) * dx[:,np.newaxis]/1e+12
+            meridional_E_kinetic_point = (pool_kinetic_flux_int.mean() - correction_kinetic_flux_int) * dx[:,np.newaxis]/1e+12
             # total energy transport
             meridional_E_point = meridional_E_internal_point + meridional_E_latent_point + meridional_E_geopotential_point + meridional_E_kinetic_point
             # zonal integral of energy
@@ -38,6 +38,12 @@ import matplotlib
 # generate images without having a window appear
 matplotlib.use('Agg')
 import matplotlib.pyplot as plt
+# shared kernels of Energy-Wizard at the root of the repository
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir))
+from wizard import accumulate
+from wizard import geopotential
+from wizard import hybrid
+from wizard import output
 
 ##########################################################################
 ###########################   Units vacabulory   #########################
@@ -134,6 +140,8 @@ output_path = '/project/Reanalysis/MERRA2/Subdaily/Model'
 # benchmark datasets for basic dimensions
 benchmark_path = '/project/Reanalysis/MERRA2/Subdaily/Model/merra1980/MERRA2_100.inst3_3d_asm_Nv.19801221.SUB.nc4'
 benchmark = Dataset(benchmark_path)
+# packing of the output fields (wizard.output), None (float64), 'float32' or 'int16'
+output_packing = None
 ####################################################################################
 
 def var_key_retrieve(datapath, year, month, day):
@@ -170,47 +178,9 @@ def calc_geopotential(var_key):
     print 'Start calculating geopotential on model level'
     # calculate the surface pressure
     # the unit of pressure here is Pa!!!
-    # define the half level pressure matrix
-    p_half_plus = np.zeros((len(time),len(level),len(latitude),len(longitude)),dtype = float)
-    p_half_minus = np.zeros((len(time),len(level),len(latitude),len(longitude)),dtype = float)
-    # calculate the index of pressure levels
-    index_level = np.arange(len(level))
-    # calculate the pressure at each half level
-    for i in index_level:
-        p_half_plus[:,i,:,:] = A[i+1]*100 + B[i+1] * ps
-        p_half_minus[:,i,:,:] = A[i]*100 + B[i] * ps
-    # calculate full pressure level
-    #level_full = (p_half_plus + p_half_minus) / 2
-    # compute the moist temperature (virtual temperature)
-    Tv = T * (1 + (constant['R_vap'] / constant['R_dry'] - 1) * q)
-    # initialize the first half level geopotential
-    gz_half = np.zeros((len(time),len(latitude),len(longitude)),dtype =float)
-    # initialize the full level geopotential
-    gz = np.zeros((len(time),len(level),len(latitude),len(longitude)),dtype = float)
-    # Calculate the geopotential at each level
-    # The integral should be taken from surface level to the TOA
-    for i in index_level:
-        # reverse the index to make it from surface to the TOA
-        i_inverse = len(level) -1 - i
-        # the ln(p_plus/p_minus) is calculated, alpha is defined
-        # an exception lies in the TOA
-        # see equation 2.23 in ECMWF IFS 9220
-        if i_inverse == 0:
-            ln_p = np.log(p_half_plus[:,i_inverse,:,:]/10)
-            alpha = np.log(2)
-        else:
-            ln_p = np.log(p_half_plus[:,i_inverse,:,:]/p_half_minus[:,i_inverse,:,:])
-            delta_p = p_half_plus[:,i_inverse,:,:] - p_half_minus[:,i_inverse,:,:]
-            alpha = 1 - p_half_minus[:,i_inverse,:,:] / delta_p * ln_p
-        # calculate the geopotential of the full level (exclude surface geopotential)
-        # see equation 2.22 in ECMWF IFS 9220
-        gz_full = gz_half + alpha * constant['R_dry'] * Tv[:,i_inverse,:,:]
-        # add surface geopotential to the full level
-        # see equation 2.21 in ECMWF IFS 9220
-        gz[:,i_inverse,:,:] = z + gz_full
-        # renew the half level geopotential for next loop step (from p_half_minus level to p_half_plus level)
-        # see equation 2.20 in ECMWF IFS 9220
-        gz_half = gz_half + ln_p * constant['R_dry'] * Tv[:,i_inverse,:,:]
+    # calculate the geopotential on each model level from the surface to the TOA
+    # see equation 2.20 - 2.23 in ECMWF IFS 9220
+    gz = geopotential.geopotential(T, q, z, hybrid.HybridLevels(A*100, B, ps), constant)
     print '*******************************************************************'
     print "***Computation of geopotential on each pressure level is finished**"
     print '*******************************************************************'
@@ -357,22 +327,22 @@ def create_netcdf_point (meridional_E_point_pool,meridional_E_internal_point_poo
     print '*******************************************************************'
     logging.info("Start creating netcdf file for total meridional energy transport and each component at each grid point.")
     # wrap the datasets into netcdf file
-    # 'NETCDF3_CLASSIC', 'NETCDF3_64BIT', 'NETCDF4_CLASSIC', and 'NETCDF4'
-    data_wrap = Dataset(output_path+os.sep+'merra%d' % (year) + os.sep + 'output' + os.sep + 'AMET_MERRA2_model_daily_%d_E_point.nc' % (year),'w',format = 'NETCDF3_64BIT')
+    # NETCDF4, compressed and chunked by time step (wizard.output)
+    data_wrap = output.create_dataset(output_path+os.sep+'merra%d' % (year) + os.sep + 'output' + os.sep + 'AMET_MERRA2_model_daily_%d_E_point.nc' % (year))
     # create dimensions for netcdf data
     month_wrap_dim = data_wrap.createDimension('month',Dim_month)
     lat_wrap_dim = data_wrap.createDimension('latitude',Dim_latitude)
     lon_wrap_dim = data_wrap.createDimension('longitude',Dim_longitude)
     # create coordinate variables for 3-dimensions
-    month_warp_var = data_wrap.createVariable('month',np.int32,('month',))
-    lat_warp_var = data_wrap.createVariable('latitude',np.float32,('latitude',))
-    lon_warp_var = data_wrap.createVariable('longitude',np.float32,('longitude',))
+    month_warp_var = output.create_variable(data_wrap,'month',np.int32,('month',))
+    lat_warp_var = output.create_variable(data_wrap,'latitude',np.float32,('latitude',))
+    lon_warp_var = output.create_variable(data_wrap,'longitude',np.float32,('longitude',))
 
-    E_total_wrap_var = data_wrap.createVariable('E',np.float64,('month','latitude','longitude'))
-    E_internal_wrap_var = data_wrap.createVariable('E_cpT',np.float64,('month','latitude','longitude'))
-    E_latent_wrap_var = data_wrap.createVariable('E_Lvq',np.float64,('month','latitude','longitude'))
-    E_geopotential_wrap_var = data_wrap.createVariable('E_gz',np.float64,('month','latitude','longitude'))
-    E_kinetic_wrap_var = data_wrap.createVariable('E_uv2',np.float64,('month','latitude','longitude'))
+    E_total_wrap_var = output.create_variable(data_wrap,'E',np.float64,('month','latitude','longitude'),packing=output_packing)
+    E_internal_wrap_var = output.create_variable(data_wrap,'E_cpT',np.float64,('month','latitude','longitude'),packing=output_packing)
+    E_latent_wrap_var = output.create_variable(data_wrap,'E_Lvq',np.float64,('month','latitude','longitude'),packing=output_packing)
+    E_geopotential_wrap_var = output.create_variable(data_wrap,'E_gz',np.float64,('month','latitude','longitude'),packing=output_packing)
+    E_kinetic_wrap_var = output.create_variable(data_wrap,'E_uv2',np.float64,('month','latitude','longitude'),packing=output_packing)
     # global attributes
     data_wrap.description = 'Monthly mean meridional energy transport and each component at each grid point'
     # variable attributes
@@ -411,20 +381,20 @@ def create_netcdf_zonal_int (meridional_E_pool, meridional_E_internal_pool, meri
     print '*******************************************************************'
     logging.info("Start creating netcdf files for the zonal integral of total meridional energy transport and each component.")
     # wrap the datasets into netcdf file
-    # 'NETCDF3_CLASSIC', 'NETCDF3_64BIT', 'NETCDF4_CLASSIC', and 'NETCDF4'
-    data_wrap = Dataset(output_path+os.sep+'merra%d' % (year) + os.sep + 'output' + os.sep + 'AMET_MERRA2_model_daily_%d_E_zonal_int.nc' % (year),'w',format = 'NETCDF3_64BIT')
+    # NETCDF4, compressed and chunked by time step (wizard.output)
+    data_wrap = output.create_dataset(output_path+os.sep+'merra%d' % (year) + os.sep + 'output' + os.sep + 'AMET_MERRA2_model_daily_%d_E_zonal_int.nc' % (year))
     # create dimensions for netcdf data
     month_wrap_dim = data_wrap.createDimension('month',Dim_month)
     lat_wrap_dim = data_wrap.createDimension('latitude',Dim_latitude)
     # create coordinate variables for 3-dimensions
-    month_warp_var = data_wrap.createVariable('month',np.int32,('month',))
-    lat_warp_var = data_wrap.createVariable('latitude',np.float32,('latitude',))
+    month_warp_var = output.create_variable(data_wrap,'month',np.int32,('month',))
+    lat_warp_var = output.create_variable(data_wrap,'latitude',np.float32,('latitude',))
     # create the actual 3-d variable
-    E_total_wrap_var = data_wrap.createVariable('E',np.float64,('month','latitude'))
-    E_internal_wrap_var = data_wrap.createVariable('E_cpT',np.float64,('month','latitude'))
-    E_latent_wrap_var = data_wrap.createVariable('E_Lvq',np.float64,('month','latitude'))
-    E_geopotential_wrap_var = data_wrap.createVariable('E_gz',np.float64,('month','latitude'))
-    E_kinetic_wrap_var = data_wrap.createVariable('E_uv2',np.float64,('month','latitude'))
+    E_total_wrap_var = output.create_variable(data_wrap,'E',np.float64,('month','latitude'),packing=output_packing)
+    E_internal_wrap_var = output.create_variable(data_wrap,'E_cpT',np.float64,('month','latitude'),packing=output_packing)
+    E_latent_wrap_var = output.create_variable(data_wrap,'E_Lvq',np.float64,('month','latitude'),packing=output_packing)
+    E_geopotential_wrap_var = output.create_variable(data_wrap,'E_gz',np.float64,('month','latitude'),packing=output_packing)
+    E_kinetic_wrap_var = output.create_variable(data_wrap,'E_uv2',np.float64,('month','latitude'),packing=output_packing)
     # global attributes
     data_wrap.description = 'Monthly mean zonal integral of meridional energy transport and each component'
     # variable attributes
@@ -522,10 +492,10 @@ if __name__=="__main__":
             ###  Create space for stroing intermediate variables and outputs ###
             ####################################################################
             # data pool for meridional energy tansport module
-            pool_internal_flux_int = np.zeros((len(days),len(latitude),len(longitude)),dtype=float)
-            pool_latent_flux_int = np.zeros((len(days),len(latitude),len(longitude)),dtype=float)
-            pool_geopotential_flux_int = np.zeros((len(days),len(latitude),len(longitude)),dtype=float)
-            pool_kinetic_flux_int = np.zeros((len(days),len(latitude),len(longitude)),dtype=float)
+            pool_internal_flux_int = accumulate.RunningMean()
+            pool_latent_flux_int = accumulate.RunningMean()
+            pool_geopotential_flux_int = accumulate.RunningMean()
+            pool_kinetic_flux_int = accumulate.RunningMean()
             # days loop
             for k in days:
                 # get the key of each variable
@@ -541,10 +511,10 @@ if __name__=="__main__":
                 # calculate the energy flux terms in meridional energy Transport
                 internal_flux_int, latent_flux_int, geopotential_flux_int, kinetic_flux_int = meridional_energy_transport(var_key,gz)
                 # save the divergence terms to the warehouse
-                pool_internal_flux_int[k,:,:] = internal_flux_int
-                pool_latent_flux_int[k,:,:] = latent_flux_int
-                pool_geopotential_flux_int[k,:,:] = geopotential_flux_int
-                pool_kinetic_flux_int[k,:,:] = kinetic_flux_int
+                pool_internal_flux_int.add(internal_flux_int)
+                pool_latent_flux_int.add(latent_flux_int)
+                pool_geopotential_flux_int.add(geopotential_flux_int)
+                pool_kinetic_flux_int.add(kinetic_flux_int)
             ####################################################################
             # calculate the total meridional energy transport and each component respectively
             # energy on grid point
@@ -553,11 +523,10 @@ if __name__=="__main__":
             meridional_E_geopotential_point = np.zeros((len(latitude),len(longitude)),dtype=float)
             meridional_E_kinetic_point = np.zeros((len(latitude),len(longitude)),dtype=float)
             meridional_E_point = np.zeros((len(latitude),len(longitude)),dtype=float)
-            for c in np.arange(len(latitude)):
-                meridional_E_internal_point[c,:] = np.mean(pool_internal_flux_int[:,c,:],0) * dx[c]/1e+12
-                meridional_E_latent_point[c,:] = np.mean(pool_latent_flux_int[:,c,:],0) * dx[c]/1e+12
-                meridional_E_geopotential_point[c,:] = np.mean(pool_geopotential_flux_int[:,c,:],0) * dx[c]/1e+12
-                meridional_E_kinetic_point[c,:] = np.mean(pool_kinetic_flux_int[:,c,:],0) * dx[c]/1e+12
+            meridional_E_internal_point = pool_internal_flux_int.mean() * dx[:,np.newaxis]/1e+12
+            meridional_E_latent_point = pool_latent_flux_int.mean() * dx[:,np.newaxis]/1e+12
+            meridional_E_geopotential_point = pool_geopotential_flux_int.mean() * dx[:,np.newaxis]/1e+12
+            meridional_E_kinetic_point = pool_kinetic_flux_int.mean() * dx[:,np.newaxis]/1e+12
             # total energy transport
             meridional_E_point = meridional_E_internal_point + meridional_E_latent_point + meridional_E_geopotential_point + meridional_E_kinetic_point
             # zonal integral of energy
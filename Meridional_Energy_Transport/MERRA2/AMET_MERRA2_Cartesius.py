@@ -12,7 +12,7 @@ Description     : The code aims to calculate the atmospheric meridional energy
                   The procedure is generic and is able to adapt any atmospheric
                   reanalysis datasets, with some changes.
 Return Value    : NetCFD4 data file
-Dependencies    : os, time, numpy, netCDF4, sys, matplotlib
+Dependencies    : os, time, numpy, netCDF4, sys, matplotlib, wizard
 variables       : Absolute Temperature              T         [K]
                   Specific Humidity                 q         [kg/kg]
                   Surface Pressure                  ps        [Pa]
@@ -45,6 +45,14 @@ import matplotlib
 # generate images without having a window appear
 matplotlib.use('Agg')
 import matplotlib.pyplot as plt
+# shared kernels of Energy-Wizard at the root of the repository
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir))
+from wizard import loader
+from wizard import driver
+from wizard import checkpoint
+from wizard import output
+from wizard import precision
+from wizard import stream
 
 ##########################################################################
 ###########################   Units vacabulory   #########################
@@ -115,8 +123,10 @@ B = B[::-1]
 
 ################################   Input zone  ######################################
 #get input from shell
-# this aims for running serial program with one node on Cartesius
+# first line is the starting year, the optional second line is the ending year
+# the months of all years are distributed over the cores of one node on Cartesius
 line_in = sys.stdin.readline()
+line_end = sys.stdin.readline().strip() or line_in
 # specify data path
 #datapath = 'F:\DataBase\ERA_Interim\Subdaily'
 datapath = '/projects/0/blueactn/reanalysis/MERRA2/subdaily'
@@ -124,13 +134,28 @@ datapath = '/projects/0/blueactn/reanalysis/MERRA2/subdaily'
 # starting time (year)
 start_year = int(line_in)
 # Ending time, if only for 1 year, then it should be the same as starting year
-end_year = int(line_in)
+end_year = int(line_end)
 # specify output path for the netCDF4 file
 #output_path = 'F:\DataBase\ERA_Interim\Subdaily'
 output_path = '/projects/0/blueactn/reanalysis/MERRA2/output'
 # benchmark datasets for basic dimensions
 benchmark_path = '/projects/0/blueactn/reanalysis/MERRA2/subdaily/merra1980/MERRA2_100.inst3_3d_asm_Nv.19801221.SUB.nc4'
 benchmark = Dataset(benchmark_path)
+# number of model levels per read of the 3D fields, None to read each field at once
+chunk_levels = None
+# number of worker processes for the months, None for the number of cores
+workers = None
+# memory needed for one month [bytes], which limits the number of workers on a node
+# the month is read in chunks of time steps which fit in this memory
+memory_per_month = 4e+9
+# the result of each month is saved here, finished months are skipped when the job is restarted
+checkpoint_path = output_path + os.sep + 'checkpoint'
+# precision of the 3D fields in memory, np.float32 halves their memory (all sums are taken in float64)
+field_dtype = np.float64
+# compute the first month in float64 and in field_dtype, and report the difference of AMET in PW
+validate_precision = False
+# packing of the output fields (wizard.output), None (float64), 'float32' or 'int16'
+output_packing = None
 ####################################################################################
 
 ###############################   stdout and log  ##################################
@@ -145,14 +170,10 @@ logging.basicConfig(filename = '/projects/0/blueactn/reanalysis/MERRA2/log/histo
                     format = '%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 ####################################################################################
 
-def var_key_retrieve(datapath, year, month, day):
+def var_path(datapath, year, month, day):
     '''
-    This module extracts the variables for mass correction and the computation of AMET.
-    Due to the strcture of the dataset (MEERA2), the processing unit is daily data.
+    Path to the dataset of one day.
     '''
-    # get the path to each datasets
-    print "Start retrieving datasets %d (y) - %s (m) - %s (d)" % (year,namelist_month[month-1],namelist_day[day])
-    logging.info("Start retrieving variables T,q,u,v,sp,z for from %d (y) - %s (m) - %s (d) " % (year,namelist_month[month-1],namelist_day[day]))
     if year < 1992:
         datapath_var = datapath + os.sep + 'merra%d' % (year) + os.sep + 'MERRA2_100.inst3_3d_asm_Nv.%d%s%s.SUB.nc4' % (year,namelist_month[month-1],namelist_day[day])
     elif year < 2001:
@@ -161,6 +182,35 @@ def var_key_retrieve(datapath, year, month, day):
         datapath_var = datapath + os.sep + 'merra%d' % (year) + os.sep + 'MERRA2_300.inst3_3d_asm_Nv.%d%s%s.SUB.nc4' % (year,namelist_month[month-1],namelist_day[day])
     else:
         datapath_var = datapath + os.sep + 'merra%d' % (year) + os.sep + 'MERRA2_400.inst3_3d_asm_Nv.%d%s%s.SUB.nc4' % (year,namelist_month[month-1],namelist_day[day])
+
+    return datapath_var
+
+def input_files(year, month):
+    '''
+    All the files used for one month, for the checkpoint manifest.
+    These include the last day of the last month and the first day of the next month.
+    '''
+    if month == 1:
+        files = [var_path(datapath,year-1,12,days_of_month(year-1,12)[-1])]
+    else:
+        files = [var_path(datapath,year,month-1,days_of_month(year,month-1)[-1])]
+    files += [var_path(datapath,year,month,k) for k in days_of_month(year,month)]
+    if month == 12:
+        files.append(var_path(datapath,year+1,1,0))
+    else:
+        files.append(var_path(datapath,year,month+1,0))
+
+    return files
+
+def var_key_retrieve(datapath, year, month, day):
+    '''
+    This module extracts the variables for mass correction and the computation of AMET.
+    Due to the strcture of the dataset (MEERA2), the processing unit is daily data.
+    '''
+    # get the path to each datasets
+    print "Start retrieving datasets %d (y) - %s (m) - %s (d)" % (year,namelist_month[month-1],namelist_day[day])
+    logging.info("Start retrieving variables T,q,u,v,sp,z for from %d (y) - %s (m) - %s (d) " % (year,namelist_month[month-1],namelist_day[day]))
+    datapath_var = var_path(datapath, year, month, day)
     # get the variable keys
     var_key = Dataset(datapath_var)
     # The shape of each variable is (8,72,361,576)
@@ -168,12 +218,15 @@ def var_key_retrieve(datapath, year, month, day):
     logging.info("Retrieving variables for from %d (y) - %s (m) - %s (d) successfully!" % (year,namelist_month[month-1],namelist_day[day]))
     return var_key
 
-def mass_correction_tendency(datapath,year,month,var_start,var_end,var_last,days):
+def mass_correction_tendency(datapath,year,month,var_last,month_stream):
     '''
     This module deals with all the tendency terms in mass correction.
     These tendency terms include:
     moisture tendency in E-P
     surface pressure tendency in mass residual
+    The tendency is centred, the state of the column at the start (end) of the month
+    is the mean of the first (last) time step of the month and the last (first) time
+    step of the last (next) month. It returns the column states for month_stream.
     '''
     logging.info("Start calculating the tendency terms for mass budget correction in %d (y) - %s (m) " % (year,namelist_month[month-1]))
     print "Start calculating the tendency terms for mass budget correction in %d (y) - %s (m)" % (year,namelist_month[month-1])
@@ -203,267 +256,44 @@ def mass_correction_tendency(datapath,year,month,var_start,var_end,var_last,days
     # extract data
     # surface pressure (8,361,576)
     ps_last = var_last.variables['PS'][-1,:,:] # the last day of last month at 21:00
-    ps_start = var_start.variables['PS'][0,:,:] # the first day of current month at 00:00
-    ps_end = var_end.variables['PS'][-1,:,:] # the last day of current month at 21:00
     ps_next = var_next.variables['PS'][0,:,:] # the first day of next month at 00:00
     # specific Humidity (8,72,361,576)
     q_last = var_last.variables['QV'][-1,:,:,:] # the naming rule is the same as above
-    q_start = var_start.variables['QV'][0,:,:,:]
-    q_end = var_end.variables['QV'][-1,:,:,:]
     q_next = var_next.variables['QV'][0,:,:,:]
-    # calculate the index of pressure levels
-    index_level = np.arange(len(level))
-    # calculate pressure depth
-    dp_level_last = np.zeros((len(level),len(latitude),len(longitude)),dtype = float) # last day of the last month
-    dp_level_start = np.zeros((len(level),len(latitude),len(longitude)),dtype = float) # start of the current month
-    dp_level_end = np.zeros((len(level),len(latitude),len(longitude)),dtype = float) # end of the current month
-    dp_level_next = np.zeros((len(level),len(latitude),len(longitude)),dtype = float) # first day of the next month
-    # use matrix A and B to calculate dp based on half pressure level
-    for i in index_level:
-        dp_level_last[i,:,:] = (A[i+1]*100 + B[i+1] * ps_last) - (A[i]*100 + B[i] * ps_last)
-        dp_level_start[i,:,:] = (A[i+1]*100 + B[i+1] * ps_start) - (A[i]*100 + B[i] * ps_start)
-        dp_level_end[i,:,:] = (A[i+1]*100 + B[i+1] * ps_end) - (A[i]*100 + B[i] * ps_end)
-        dp_level_next[i,:,:] = (A[i+1]*100 + B[i+1] * ps_next) - (A[i]*100 + B[i] * ps_next)
-    # calculte the precipitable water tendency and take the vertical integral
-    moisture_last = np.sum((q_last * dp_level_last), 0) # last day of the last month
-    moisture_start = np.sum((q_start * dp_level_start), 0) # start of the current month
-    moisture_end = np.sum((q_end * dp_level_end), 0) # end of the current month
-    moisture_next = np.sum((q_next * dp_level_next), 0) # first day of the next month
-    # compute the moisture tendency (one day has 86400s)
-    moisture_tendency = ((moisture_end + moisture_next) / 2 - (moisture_last + moisture_start) / 2) / (len(days)*86400) / constant['g']
-    # calculate the surface pressure tendency
-    ps_tendency = ((ps_end + ps_next) / 2 - (ps_last + ps_start) / 2 ) / (len(days)*86400)
-    logging.info("Finish calculating the moisture tendency and surface pressure tendency")
-    print "Finish calculating the moisture tendency and surface pressure tendency"
-
-    return moisture_tendency, ps_tendency
-
-
-def mass_correction_divergence(var_key):
-    '''
-    This module deals with all the divergence terms in mass correction.
-    These divergence terms include:
-    divergence of moisture flux
-    divergence of mass flux
-    '''
-    # extract variables
-    print "Start extracting variables for mass correction."
-    q = var_key.variables['QV'][:]
-    ps = var_key.variables['PS'][:]
-    u = var_key.variables['U'][:]
-    v = var_key.variables['V'][:]
-    print 'Extracting variables successfully!'
-    logging.info("Extracting variables successfully!")
-
-    print 'Begin the calculation of divergent verically integrated moisture flux.'
-    # calculate the index of pressure levels
-    index_level = np.arange(len(level))
-    # calculate the delta pressure
-    dp_level = np.zeros((len(time),len(level),len(latitude),len(longitude)),dtype = float)
-    for i in index_level:
-        dp_level[:,i,:,:] =  (A[i+1]*100 + B[i+1] * ps) - (A[i]*100 + B[i] * ps)
-    # calculte the mean moisture flux for a certain month
-    moisture_flux_u = u * q * dp_level / constant['g']
-    moisture_flux_v = v * q * dp_level / constant['g']
-    # take the vertical integral
-    moisture_flux_u_int = np.sum(moisture_flux_u,1)
-    moisture_flux_v_int = np.sum(moisture_flux_v,1)
-    # calculate the divergence of moisture flux
-    div_moisture_flux_u = np.zeros((len(time),len(latitude),len(longitude)),dtype = float)
-    div_moisture_flux_v = np.zeros((len(time),len(latitude),len(longitude)),dtype = float)
-    ######################## Attnention to the coordinate and symbol #######################
-    # zonal moisture flux divergence
-    for i in np.arange(len(latitude)):
-        for j in np.arange(len(longitude)):
-            # the longitude could be from 0 to 360 or -180 to 180, but the index remains the same
-            if j == 0:
-                div_moisture_flux_u[:,i,j] = (moisture_flux_u_int[:,i,j+1] - moisture_flux_u_int[:,i,-1]) / (2 * dx[i])
-            elif j == (len(longitude)-1) :
-                div_moisture_flux_u[:,i,j] = (moisture_flux_u_int[:,i,0] - moisture_flux_u_int[:,i,j-1]) / (2 * dx[i])
-            else:
-                div_moisture_flux_u[:,i,j] = (moisture_flux_u_int[:,i,j+1] - moisture_flux_u_int[:,i,j-1]) / (2 * dx[i])
-    # meridional moisture flux divergence
-    # the latitude is from -90S to 90N
-    for i in np.arange(len(latitude)):
-        if i == 0:
-            div_moisture_flux_v[:,i,:] = (moisture_flux_v_int[:,i+1,:] - moisture_flux_v_int[:,i,:]) / (2 * dy)
-        elif i == (len(latitude)-1):
-            div_moisture_flux_v[:,i,:] = (moisture_flux_v_int[:,i,:] - moisture_flux_v_int[:,i-1,:]) / (2 * dy)
-        else:
-            div_moisture_flux_v[:,i,:] = (moisture_flux_v_int[:,i+1,:] - moisture_flux_v_int[:,i-1,:]) / (2 * dy)
-    # take the daily mean
-    div_moisture_flux_u_mean = np.mean(div_moisture_flux_u,0)
-    div_moisture_flux_v_mean = np.mean(div_moisture_flux_v,0)
-    print 'The calculation of divergent verically integrated moisture flux is finished !!'
-
-    print 'Begin the calculation of divergent verically integrated mass flux.'
-    # calculate the mass flux
-    mass_flux_u = u * dp_level / constant['g']
-    mass_flux_v = v * dp_level / constant['g']
-    # take the vertical integral
-    mass_flux_u_int = np.sum(mass_flux_u,1)
-    mass_flux_v_int = np.sum(mass_flux_v,1)
-    # calculate the divergence of moisture flux
-    div_mass_flux_u = np.zeros((len(time),len(latitude),len(longitude)),dtype = float)
-    div_mass_flux_v = np.zeros((len(time),len(latitude),len(longitude)),dtype = float)
-    # zonal mass flux divergence
-    for i in np.arange(len(latitude)):
-        for j in np.arange(len(longitude)):
-            # the longitude could be from 0 to 360 or -180 to 180, but the index remains the same
-            if j == 0:
-                div_mass_flux_u[:,i,j] = (mass_flux_u_int[:,i,j+1] - mass_flux_u_int[:,i,-1]) / (2 * dx[i])
-            elif j == (len(longitude)-1) :
-                div_mass_flux_u[:,i,j] = (mass_flux_u_int[:,i,0] - mass_flux_u_int[:,i,j-1]) / (2 * dx[i])
-            else:
-                div_mass_flux_u[:,i,j] = (mass_flux_u_int[:,i,j+1] - mass_flux_u_int[:,i,j-1]) / (2 * dx[i])
-    # meridional mass flux divergence
-    for i in np.arange(len(latitude)):
-        if i == 0:
-            div_mass_flux_v[:,i,:] = (mass_flux_v_int[:,i+1,:] - mass_flux_v_int[:,i,:]) / (2 * dy)
-        elif i == (len(latitude)-1):
-            div_mass_flux_v[:,i,:] = (mass_flux_v_int[:,i,:] - mass_flux_v_int[:,i-1,:]) / (2 * dy)
-        else:
-            div_mass_flux_v[:,i,:] = (mass_flux_v_int[:,i+1,:] - mass_flux_v_int[:,i-1,:]) / (2 * dy)
-    # take the daily mean
-    div_mass_flux_u_mean = np.mean(div_mass_flux_u,0)
-    div_mass_flux_v_mean = np.mean(div_mass_flux_v,0)
-    print 'The calculation of divergent verically integrated mass flux is finished !!'
-
-    # now calculate other variables
-    # take the mean surface pressure value
-    ps_mean = np.mean(ps,0)
-    # calculate precipitable water
-    precipitable_water = q * dp_level / constant['g']
-    precipitable_water_mean = np.mean(np.sum(precipitable_water,1),0)
-
-    return div_moisture_flux_u_mean, div_moisture_flux_v_mean, div_mass_flux_u_mean,\
-           div_mass_flux_v_mean, precipitable_water_mean, ps_mean
-
-def calc_geopotential(var_key):
-    '''
-    This module aims to calculate the geopotential based on surface geopotential.
-    The procedure and relevant equations can be found in ECMWF IFS 9220.
-    See equation 2.20 - 2.23 .
-    '''
-    # extract variables
-    print "Start extracting variables for the calculation of geopotential on model level."
-    T = var_key.variables['T'][:]
-    q = var_key.variables['QV'][:]
-    ps = var_key.variables['PS'][:]
-    z = var_key.variables['PHIS'][:]
-    print 'Extracting variables successfully!'
-    logging.info("Extracting variables successfully!")
-    print 'Start calculating geopotential on model level'
-    # calculate the surface pressure
-    # the unit of pressure here is Pa!!!
-    # define the half level pressure matrix
-    p_half_plus = np.zeros((len(time),len(level),len(latitude),len(longitude)),dtype = float)
-    p_half_minus = np.zeros((len(time),len(level),len(latitude),len(longitude)),dtype = float)
-    # calculate the index of pressure levels
-    index_level = np.arange(len(level))
-    # calculate the pressure at each half level
-    for i in index_level:
-        p_half_plus[:,i,:,:] = A[i+1]*100 + B[i+1] * ps
-        p_half_minus[:,i,:,:] = A[i]*100 + B[i] * ps
-    # calculate full pressure level
-    #level_full = (p_half_plus + p_half_minus) / 2
-    # compute the moist temperature (virtual temperature)
-    Tv = T * (1 + (constant['R_vap'] / constant['R_dry'] - 1) * q)
-    # initialize the first half level geopotential
-    gz_half = np.zeros((len(time),len(latitude),len(longitude)),dtype =float)
-    # initialize the full level geopotential
-    gz = np.zeros((len(time),len(level),len(latitude),len(longitude)),dtype = float)
-    # Calculate the geopotential at each level
-    # The integral should be taken from surface level to the TOA
-    for i in index_level:
-        # reverse the index to make it from surface to the TOA
-        i_inverse = len(level) -1 - i
-        # the ln(p_plus/p_minus) is calculated, alpha is defined
-        # an exception lies in the TOA
-        # see equation 2.23 in ECMWF IFS 9220
-        if i_inverse == 0:
-            ln_p = np.log(p_half_plus[:,i_inverse,:,:]/10)
-            alpha = np.log(2)
-        else:
-            ln_p = np.log(p_half_plus[:,i_inverse,:,:]/p_half_minus[:,i_inverse,:,:])
-            delta_p = p_half_plus[:,i_inverse,:,:] - p_half_minus[:,i_inverse,:,:]
-            alpha = 1 - p_half_minus[:,i_inverse,:,:] / delta_p * ln_p
-        # calculate the geopotential of the full level (exclude surface geopotential)
-        # see equation 2.22 in ECMWF IFS 9220
-        gz_full = gz_half + alpha * constant['R_dry'] * Tv[:,i_inverse,:,:]
-        # add surface geopotential to the full level
-        # see equation 2.21 in ECMWF IFS 9220
-        gz[:,i_inverse,:,:] = z + gz_full
-        # renew the half level geopotential for next loop step (from p_half_minus level to p_half_plus level)
-        # see equation 2.20 in ECMWF IFS 9220
-        gz_half = gz_half + ln_p * constant['R_dry'] * Tv[:,i_inverse,:,:]
-    print '*******************************************************************'
-    print "***Computation of geopotential on each pressure level is finished**"
-    print '*******************************************************************'
-    logging.info("Computation of geopotential on model level is finished!")
+    var_next.close()
+    # surface pressure and precipitable water at the start and the end of the current month
+    state_start = stream.mean_state(month_stream.state(q_last, ps_last), month_stream.first)
+    state_end = stream.mean_state(month_stream.last, month_stream.state(q_next, ps_next))
+    logging.info("Finish calculating the column state for the moisture tendency and surface pressure tendency")
+    print "Finish calculating the column state for the moisture tendency and surface pressure tendency"
 
-    return gz
+    return state_start, state_end
 
-def meridional_energy_transport(var_key, gz):
+def var_retrieve(datapath, year, month, start, stop, dtype):
     '''
-    This module calculate the energy flux which are the componets of meridional
-    energy transport in the atmosphere.
-    These include:
-    internal energy flux
-    latent heat flux
-    geoptential heat flux
-    kinetic energy flux
+    This module extracts the time steps from start to stop (excluded) of a month.
+    Each file holds one day (8 time steps), so a chunk of time steps may cover
+    several days or a part of one day.
     '''
-    # extract variables
-    print "Start extracting variables for the quantification of meridional energy transport."
-    T = var_key.variables['T'][:]
-    q = var_key.variables['QV'][:]
-    ps = var_key.variables['PS'][:]
-    u = var_key.variables['U'][:]
-    v = var_key.variables['V'][:]
-    print 'Extracting variables successfully!'
-    logging.info("Extracting variables successfully!")
-
-    print 'Start calculating meridional energy transport on model level'
-    # calculate dp based on mean value of surface pressure
-    dp_level = np.zeros((len(time),len(level),len(latitude),len(longitude)),dtype = float)
-    # calculate the index of pressure levels
-    index_level = np.arange(len(level))
-    for i in index_level:
-        dp_level[:,i,:,:] = (A[i+1]*100 + B[i+1] * ps) - (A[i]*100 + B[i] * ps)
-    # calculate each component of total energy
-    # take the vertical integral
-    # mass correction component
-    # Internal Energy cpT
-    internal_flux = constant['cp'] * v * T * dp_level / constant['g']
-    internal_flux_int = np.mean(np.sum(internal_flux,1),0)
-    # Latent heat Lq
-    latent_flux = constant['Lv'] * v * q * dp_level / constant['g']
-    latent_flux_int = np.mean(np.sum(latent_flux,1),0)
-    # geopotential gz
-    geopotential_flux = v * gz * dp_level / constant['g']
-    geopotential_flux_int = np.mean(np.sum(geopotential_flux,1),0)
-    # kinetic energy
-    kinetic_flux = v * 1/2 *(u**2 + v**2) * dp_level / constant['g']
-    kinetic_flux_int = np.mean(np.sum(kinetic_flux,1),0)
-    # variables for correction
-    # for the correction of Internal Energy cpT
-    heat_flux = constant['cp'] * T * dp_level / constant['g']
-    heat_flux_int = np.mean(np.sum(heat_flux,1),0)
-    # for the correction of Latent Heat flux Lq
-    vapor_flux = constant['Lv'] * q* dp_level / constant['g']
-    vapor_flux_int = np.mean(np.sum(vapor_flux,1),0)
-    # for the correction of Geopotential flux gz
-    geo_flux = gz * dp_level / constant['g']
-    geo_flux_int = np.mean(np.sum(geo_flux,1),0)
-    # for the correction of Kinetic Energy flux u2
-    velocity_flux = 1/2 *(u**2 + v**2) * dp_level / constant['g']
-    velocity_flux_int = np.mean(np.sum(velocity_flux,1),0)
-
-    print 'Complete calculating meridional energy transport on model level'
-
-    return internal_flux_int, latent_flux_int, geopotential_flux_int, kinetic_flux_int,\
-           heat_flux_int, vapor_flux_int, geo_flux_int, velocity_flux_int
+    fields_chunk = {}
+    for day in np.arange(start // 8, (stop - 1) // 8 + 1):
+        var_key = var_key_retrieve(datapath,year,month,day)
+        # time steps of the chunk in the current day
+        day_start = max(start, day * 8)
+        day_stop = min(stop, day * 8 + 8)
+        # each variable of the current day is read from disk only once
+        fields = loader.MonthFields(chunk_levels, dtype, slice(day_start - day * 8, day_stop - day * 8))
+        for name in ['T', 'QV', 'U', 'V', 'PS', 'PHIS']:
+            fields.add(name, var_key)
+            if name not in fields_chunk:
+                fields_chunk[name] = np.empty((stop - start,) + fields[name].shape[1:], dtype = fields[name].dtype)
+            fields_chunk[name][day_start-start:day_stop-start] = fields[name]
+        # report the reading of the input
+        fields.report()
+        fields.release()
+        var_key.close()
+
+    return fields_chunk
 
 # make plots
 def visualization(E_total,E_internal,E_latent,E_geopotential,E_kinetic,output_path,year):
@@ -561,25 +391,25 @@ def create_netcdf_point (meridional_E_point_pool,meridional_E_internal_point_poo
     print '*******************************************************************'
     logging.info("Start creating netcdf file for total meridional energy transport and each component at each grid point.")
     # wrap the datasets into netcdf file
-    # 'NETCDF3_CLASSIC', 'NETCDF3_64BIT', 'NETCDF4_CLASSIC', and 'NETCDF4'
-    data_wrap = Dataset(output_path + os.sep + 'AMET_MERRA2_model_daily_%d_E_point.nc' % (year),'w',format = 'NETCDF3_64BIT')
+    # NETCDF4, compressed and chunked by time step (wizard.output)
+    data_wrap = output.create_dataset(output_path + os.sep + 'AMET_MERRA2_model_daily_%d_E_point.nc' % (year))
     # create dimensions for netcdf data
     month_wrap_dim = data_wrap.createDimension('month',Dim_month)
     lat_wrap_dim = data_wrap.createDimension('latitude',Dim_latitude)
     lon_wrap_dim = data_wrap.createDimension('longitude',Dim_longitude)
     # create coordinate variables for 3-dimensions
-    month_warp_var = data_wrap.createVariable('month',np.int32,('month',))
-    lat_warp_var = data_wrap.createVariable('latitude',np.float32,('latitude',))
-    lon_warp_var = data_wrap.createVariable('longitude',np.float32,('longitude',))
+    month_warp_var = output.create_variable(data_wrap,'month',np.int32,('month',))
+    lat_warp_var = output.create_variable(data_wrap,'latitude',np.float32,('latitude',))
+    lon_warp_var = output.create_variable(data_wrap,'longitude',np.float32,('longitude',))
     # create the actual 3-d variable
-    uc_warp_var = data_wrap.createVariable('uc',np.float32,('month','latitude','longitude'))
-    vc_warp_var = data_wrap.createVariable('vc',np.float32,('month','latitude','longitude'))
-
-    E_total_wrap_var = data_wrap.createVariable('E',np.float64,('month','latitude','longitude'))
-    E_internal_wrap_var = data_wrap.createVariable('E_cpT',np.float64,('month','latitude','longitude'))
-    E_latent_wrap_var = data_wrap.createVariable('E_Lvq',np.float64,('month','latitude','longitude'))
-    E_geopotential_wrap_var = data_wrap.createVariable('E_gz',np.float64,('month','latitude','longitude'))
-    E_kinetic_wrap_var = data_wrap.createVariable('E_uv2',np.float64,('month','latitude','longitude'))
+    uc_warp_var = output.create_variable(data_wrap,'uc',np.float32,('month','latitude','longitude'))
+    vc_warp_var = output.create_variable(data_wrap,'vc',np.float32,('month','latitude','longitude'))
+
+    E_total_wrap_var = output.create_variable(data_wrap,'E',np.float64,('month','latitude','longitude'),packing=output_packing)
+    E_internal_wrap_var = output.create_variable(data_wrap,'E_cpT',np.float64,('month','latitude','longitude'),packing=output_packing)
+    E_latent_wrap_var = output.create_variable(data_wrap,'E_Lvq',np.float64,('month','latitude','longitude'),packing=output_packing)
+    E_geopotential_wrap_var = output.create_variable(data_wrap,'E_gz',np.float64,('month','latitude','longitude'),packing=output_packing)
+    E_kinetic_wrap_var = output.create_variable(data_wrap,'E_uv2',np.float64,('month','latitude','longitude'),packing=output_packing)
     # global attributes
     data_wrap.description = 'Monthly mean meridional energy transport and each component at each grid point'
     # variable attributes
@@ -624,20 +454,20 @@ def create_netcdf_zonal_int (meridional_E_pool, meridional_E_internal_pool, meri
     print '*******************************************************************'
     logging.info("Start creating netcdf files for the zonal integral of total meridional energy transport and each component.")
     # wrap the datasets into netcdf file
-    # 'NETCDF3_CLASSIC', 'NETCDF3_64BIT', 'NETCDF4_CLASSIC', and 'NETCDF4'
-    data_wrap = Dataset(output_path + os.sep + 'AMET_MERRA2_model_daily_%d_E_zonal_int.nc' % (year),'w',format = 'NETCDF3_64BIT')
+    # NETCDF4, compressed and chunked by time step (wizard.output)
+    data_wrap = output.create_dataset(output_path + os.sep + 'AMET_MERRA2_model_daily_%d_E_zonal_int.nc' % (year))
     # create dimensions for netcdf data
     month_wrap_dim = data_wrap.createDimension('month',Dim_month)
     lat_wrap_dim = data_wrap.createDimension('latitude',Dim_latitude)
     # create coordinate variables for 3-dimensions
-    month_warp_var = data_wrap.createVariable('month',np.int32,('month',))
-    lat_warp_var = data_wrap.createVariable('latitude',np.float32,('latitude',))
+    month_warp_var = output.create_variable(data_wrap,'month',np.int32,('month',))
+    lat_warp_var = output.create_variable(data_wrap,'latitude',np.float32,('latitude',))
     # create the actual 3-d variable
-    E_total_wrap_var = data_wrap.createVariable('E',np.float64,('month','latitude'))
-    E_internal_wrap_var = data_wrap.createVariable('E_cpT',np.float64,('month','latitude'))
-    E_latent_wrap_var = data_wrap.createVariable('E_Lvq',np.float64,('month','latitude'))
-    E_geopotential_wrap_var = data_wrap.createVariable('E_gz',np.float64,('month','latitude'))
-    E_kinetic_wrap_var = data_wrap.createVariable('E_uv2',np.float64,('month','latitude'))
+    E_total_wrap_var = output.create_variable(data_wrap,'E',np.float64,('month','latitude'),packing=output_packing)
+    E_internal_wrap_var = output.create_variable(data_wrap,'E_cpT',np.float64,('month','latitude'),packing=output_packing)
+    E_latent_wrap_var = output.create_variable(data_wrap,'E_Lvq',np.float64,('month','latitude'),packing=output_packing)
+    E_geopotential_wrap_var = output.create_variable(data_wrap,'E_gz',np.float64,('month','latitude'),packing=output_packing)
+    E_kinetic_wrap_var = output.create_variable(data_wrap,'E_uv2',np.float64,('month','latitude'),packing=output_packing)
     # global attributes
     data_wrap.description = 'Monthly mean zonal integral of meridional energy transport and each component'
     # variable attributes
@@ -665,6 +495,84 @@ def create_netcdf_zonal_int (meridional_E_pool, meridional_E_internal_pool, meri
     print "Create netcdf file successfully"
     logging.info("The generation of netcdf files for the zonal integral of total meridional energy transport and each component is complete!!")
 
+def days_of_month(year, month):
+    '''
+    Index of the days in a month.
+    '''
+    if month in long_month_list:
+        days = index_days_long
+    elif month == 2:
+        if year in leap_year_list:
+            days = index_days_Feb_long
+        else:
+            days = index_days_Feb_short
+    else:
+        days = index_days_short
+
+    return days
+
+def amet_month(year, month, dtype=None):
+    '''
+    The complete procedure for one month, it runs in a worker process.
+    The 3D fields are kept in the precision dtype, by default field_dtype.
+    The global variables (grid, calendar) are defined in the main program.
+    '''
+    if dtype is None:
+        dtype = field_dtype
+    # determine how many days are there in a month
+    days = days_of_month(year, month)
+    # the variable key of the last day of the last month for the computation of tendency terms in mass correction
+    if month == 1:
+        var_last = var_key_retrieve(datapath,year-1,12,days_of_month(year-1,12)[-1])
+    else:
+        var_last = var_key_retrieve(datapath,year,month-1,days_of_month(year,month-1)[-1])
+    ####################################################################
+    ######      Mass Correction & Meridional Energy Transport    #######
+    ####################################################################
+    # the 2D column integrals are summed chunk by chunk over the month
+    # A is given in hPa
+    month_stream = stream.MonthStream(A*100, B, constant)
+    # number of time steps per chunk from the memory of a month (T,QV,U,V)
+    steps = stream.steps_per_chunk(memory_per_month, Dim_level, Dim_latitude, Dim_longitude,
+                                   itemsize = np.dtype(dtype).itemsize, n_fields = 4, n_steps = len(days)*8)
+    for start, stop in stream.time_chunks(len(days)*8, steps):
+        fields = var_retrieve(datapath, year, month, start, stop, dtype)
+        # the geopotential is computed level by level from the surface geopotential
+        month_stream.add(fields['T'], fields['QV'], fields['U'], fields['V'], fields['PS'], z = fields['PHIS'])
+        # remove variables to save memory
+        del fields
+    ####################################################################
+    ######                   Mass Correction                     #######
+    ####################################################################
+    # complete the mass correction and calculate the barotropic wind correcter
+    # calculate the tendency terms in mass correction (one day has 86400s)
+    state_start, state_end = mass_correction_tendency(datapath,year,month,var_last,month_stream)
+    var_last.close()
+    # calculate barotropic correction wind
+    # the latitude is from -90S to 90N, extra modification for points at polor mesh
+    uc, vc = month_stream.correction(dx, dy, len(days)*86400, polar_rows = [-1],
+                                     start = state_start, end = state_end)
+    print '********************************************************************************'
+    print "*** Computation of barotropic correction wind on each grid point is finished ***"
+    print '********************************************************************************'
+    logging.info("Computation of barotropic correction wind on each grid point is finished!")
+    ####################################################################
+    ######               Meridional Energy Transport             #######
+    ####################################################################
+    # calculate the total meridional energy transport and each component respectively
+    meridional_E, meridional_E_internal, meridional_E_latent, meridional_E_geopotential, meridional_E_kinetic,\
+    meridional_E_point, meridional_E_internal_point, meridional_E_latent_point, meridional_E_geopotential_point,\
+    meridional_E_kinetic_point = month_stream.energy_transport(vc, dx)
+    print '*****************************************************************************'
+    print "***Computation of meridional energy transport in the atmosphere is finished**"
+    print "************         The result is in tera-watt (1E+12)          ************"
+    print '*****************************************************************************'
+    logging.info("Computation of meridional energy transport on model level is finished!")
+
+    return meridional_E, meridional_E_internal, meridional_E_latent, meridional_E_geopotential, meridional_E_kinetic,\
+           meridional_E_point, meridional_E_internal_point, meridional_E_latent_point, meridional_E_geopotential_point,\
+           meridional_E_kinetic_point, uc, vc
+
 if __name__=="__main__":
     ####################################################################
     ######  Create time namelist matrix for variable extraction  #######
@@ -720,166 +628,20 @@ if __name__=="__main__":
     meridional_E_latent_point_pool = np.zeros((Dim_month,Dim_latitude,Dim_longitude),dtype = float)
     meridional_E_geopotential_point_pool = np.zeros((Dim_month,Dim_latitude,Dim_longitude),dtype = float)
     meridional_E_kinetic_point_pool = np.zeros((Dim_month,Dim_latitude,Dim_longitude),dtype = float)
-    # Initialize the variable key of the last day of the last month for the computation of tendency terms in mass correction
-    year_last = start_year - 1
-    if year_last < 1992:
-        datapath_last = datapath + os.sep + 'merra%d' % (year_last) + os.sep + 'MERRA2_100.inst3_3d_asm_Nv.%d1231.SUB.nc4' % (year_last)
-    elif year_last < 2001:
-        datapath_last = datapath + os.sep + 'merra%d' % (year_last) + os.sep + 'MERRA2_200.inst3_3d_asm_Nv.%d1231.SUB.nc4' % (year_last)
-    elif year_last < 2011:
-        datapath_last = datapath + os.sep + 'merra%d' % (year_last) + os.sep + 'MERRA2_300.inst3_3d_asm_Nv.%d1231.SUB.nc4' % (year_last)
-    else:
-        datapath_last = datapath + os.sep + 'merra%d' % (year_last) + os.sep + 'MERRA2_400.inst3_3d_asm_Nv.%d1231.SUB.nc4' % (year_last)
-    var_last = Dataset(datapath_last)
     # loop for calculation
-    for i in period:
-        for j in index_month:
-            # determine how many days are there in a month
-            if j in long_month_list:
-                days = index_days_long
-            elif j == 2:
-                if i in leap_year_list:
-                    days = index_days_Feb_long
-                else:
-                    days = index_days_Feb_short
-            else:
-                days = index_days_short
-            ####################################################################
-            ###  Create space for stroing intermediate variables and outputs ###
-            ####################################################################
-            # data pool for mass budget correction module
-            pool_div_moisture_flux_u = np.zeros((len(days),len(latitude),len(longitude)),dtype=float)
-            pool_div_moisture_flux_v = np.zeros((len(days),len(latitude),len(longitude)),dtype=float)
-            pool_div_mass_flux_u = np.zeros((len(days),len(latitude),len(longitude)),dtype=float)
-            pool_div_mass_flux_v = np.zeros((len(days),len(latitude),len(longitude)),dtype=float)
-            pool_precipitable_water = np.zeros((len(days),len(latitude),len(longitude)),dtype=float)
-            pool_ps_mean = np.zeros((len(days),len(latitude),len(longitude)),dtype=float)
-            # data pool for meridional energy tansport module
-            pool_internal_flux_int = np.zeros((len(days),len(latitude),len(longitude)),dtype=float)
-            pool_latent_flux_int = np.zeros((len(days),len(latitude),len(longitude)),dtype=float)
-            pool_geopotential_flux_int = np.zeros((len(days),len(latitude),len(longitude)),dtype=float)
-            pool_kinetic_flux_int = np.zeros((len(days),len(latitude),len(longitude)),dtype=float)
-            # data pool for the correction of meridional energy tansport
-            pool_heat_flux_int = np.zeros((len(days),len(latitude),len(longitude)),dtype=float)
-            pool_vapor_flux_int = np.zeros((len(days),len(latitude),len(longitude)),dtype=float)
-            pool_geo_flux_int = np.zeros((len(days),len(latitude),len(longitude)),dtype=float)
-            pool_velocity_flux_int = np.zeros((len(days),len(latitude),len(longitude)),dtype=float)
-            # days loop
-            for k in days:
-                # get the key of each variable
-                var_key = var_key_retrieve(datapath,i,j,k)
-                ####################################################################
-                ######                   Mass Correction                     #######
-                ####################################################################
-                # for the computation of tendency terms in the following function
-                if k == days[0]:
-                    var_start = var_key
-                elif k == days[-1]:
-                    var_end = var_key
-                # calculate divergence terms and other terms in mass correction
-                div_moisture_flux_u, div_moisture_flux_v, div_mass_flux_u, div_mass_flux_v, \
-                precipitable_water, ps_mean = mass_correction_divergence(var_key)
-                # save the divergence terms to the warehouse
-                pool_div_moisture_flux_u[k,:,:] = div_moisture_flux_u
-                pool_div_moisture_flux_v[k,:,:] = div_moisture_flux_v
-                pool_div_mass_flux_u[k,:,:] = div_mass_flux_u
-                pool_div_mass_flux_v[k,:,:] = div_mass_flux_v
-                pool_precipitable_water[k,:,:] = precipitable_water
-                pool_ps_mean[k,:,:] = ps_mean
-                ####################################################################
-                ######                       Geopotential                    #######
-                ####################################################################
-                # calculate the geopotential
-                gz = calc_geopotential(var_key)
-                ####################################################################
-                ######               Meridional Energy Transport             #######
-                ####################################################################
-                # calculate the energy flux terms in meridional energy Transport
-                internal_flux_int, latent_flux_int, geopotential_flux_int, kinetic_flux_int,\
-                heat_flux_int, vapor_flux_int, geo_flux_int, velocity_flux_int = meridional_energy_transport(var_key,gz)
-                # save the divergence terms to the warehouse
-                pool_internal_flux_int[k,:,:] = internal_flux_int
-                pool_latent_flux_int[k,:,:] = latent_flux_int
-                pool_geopotential_flux_int[k,:,:] = geopotential_flux_int
-                pool_kinetic_flux_int[k,:,:] = kinetic_flux_int
-                # variables for the correction of each energy component
-                pool_heat_flux_int[k,:,:] = heat_flux_int
-                pool_vapor_flux_int[k,:,:] = vapor_flux_int
-                pool_geo_flux_int[k,:,:] = geo_flux_int
-                pool_velocity_flux_int[k,:,:] = velocity_flux_int
-            ####################################################################
-            ######                   Mass Correction                     #######
-            ####################################################################
-            # complete the mass correction and calculate the barotropic wind correcter
-            # calculate the tendency terms in mass correction
-            moisture_tendency, ps_tendency = mass_correction_tendency(datapath,i,j,var_start,var_end,var_last,days)
-            # update the variable key of the last day of the last month
-            var_last = var_end
-            # calculate evaporation minus precipitation
-            E_P = moisture_tendency + np.mean(pool_div_moisture_flux_u,0) +np.mean(pool_div_moisture_flux_v,0)
-            print '*******************************************************************'
-            print "******  Computation of E-P on each grid point is finished   *******"
-            print '*******************************************************************'
-            logging.info("Computation of E-P on each grid point is finished!")
-            # calculate the mass residual
-            mass_residual = ps_tendency + constant['g'] * (np.mean(pool_div_mass_flux_u,0) +\
-                            np.mean(pool_div_mass_flux_v,0)) - constant['g'] * E_P
-            print '*******************************************************************'
-            print "*** Computation of mass residual on each grid point is finished ***"
-            print '*******************************************************************'
-            logging.info("Computation of mass residual on each grid point is finished!")
-            # calculate barotropic correction wind
-            print 'Begin the calculation of barotropic correction wind.'
-            uc = np.zeros((len(latitude),len(longitude)),dtype = float)
-            vc = np.zeros((len(latitude),len(longitude)),dtype = float)
-            vc = mass_residual * dy / (np.mean(pool_ps_mean,0) - constant['g'] * np.mean(pool_precipitable_water,0))
-            # extra modification for points at polor mesh
-            #vc[0,:] = 0
-            vc[-1,:] = 0
-            # Here we should avoid i,j,k as counter since they are used and will still function
-            for c in np.arange(len(latitude)):
-                uc[c,:] = mass_residual[c,:] * dx[c] / (np.mean(pool_ps_mean[:,c,:],0) - constant['g'] * np.mean(pool_precipitable_water[:,c,:],0))
-            print '********************************************************************************'
-            print "*** Computation of barotropic correction wind on each grid point is finished ***"
-            print '********************************************************************************'
-            logging.info("Computation of barotropic correction wind on each grid point is finished!")
-            ####################################################################
-            ######               Meridional Energy Transport             #######
-            ####################################################################
-            # calculate the correction terms
-            correction_internal_flux_int = vc * np.mean(pool_heat_flux_int,0)
-            correction_latent_flux_int = vc * np.mean(pool_vapor_flux_int,0)
-            correction_geopotential_flux_int = vc * np.mean(pool_geo_flux_int,0)
-            correction_kinetic_flux_int = vc * np.mean(pool_velocity_flux_int,0)
-            # calculate the total meridional energy transport and each component respectively
-            # energy on grid point
-            meridional_E_internal_point = np.zeros((len(latitude),len(longitude)),dtype=float)
-            meridional_E_latent_point = np.zeros((len(latitude),len(longitude)),dtype=float)
-            meridional_E_geopotential_point = np.zeros((len(latitude),len(longitude)),dtype=float)
-            meridional_E_kinetic_point = np.zeros((len(latitude),len(longitude)),dtype=float)
-            meridional_E_point = np.zeros((len(latitude),len(longitude)),dtype=float)
-            for c in np.arange(len(latitude)):
-                meridional_E_internal_point[c,:] = (np.mean(pool_internal_flux_int[:,c,:],0) - correction_internal_flux_int[c,:]) * dx[c]/1e+12
-                meridional_E_latent_point[c,:] = (np.mean(pool_latent_flux_int[:,c,:],0) - correction_latent_flux_int[c,:]) * dx[c]/1e+12
-                meridional_E_geopotential_point[c,:] = (np.mean(pool_geopotential_flux_int[:,c,:],0) - correction_geopotential_flux_int[c,:]) * dx[c]/1e+12
-                meridional_E_kinetic_point[c,:] = (np.mean(pool_kinetic_flux_int[:,c,:],0) - correction_kinetic_flux_int[c,:]) * dx[c]/1e+12
-            # total energy transport
-            meridional_E_point = meridional_E_internal_point + meridional_E_latent_point + meridional_E_geopotential_point + meridional_E_kinetic_point
-            # zonal integral of energy
-            meridional_E_internal = np.sum(meridional_E_internal_point,1)
-            meridional_E_latent = np.sum(meridional_E_latent_point,1)
-            meridional_E_geopotential = np.sum(meridional_E_geopotential_point,1)
-            meridional_E_kinetic = np.sum(meridional_E_kinetic_point,1)
-            # total energy transport
-            meridional_E = meridional_E_internal + meridional_E_latent + meridional_E_geopotential + meridional_E_kinetic
-            print '*****************************************************************************'
-            print "***Computation of meridional energy transport in the atmosphere is finished**"
-            print "************         The result is in tera-watt (1E+12)          ************"
-            print '*****************************************************************************'
-            logging.info("Computation of meridional energy transport on model level is finished!")
-            ####################################################################
-            ######                 Data Wrapping (NetCDF)                #######
-            ####################################################################
+    # the months are computed by the worker processes and handed back year by year
+    # check the float32 mode against float64 with the first month
+    if validate_precision and field_dtype != np.float64:
+        precision.validation_report(amet_month(period[0], index_month[0], np.float64)[:5],
+                                    amet_month(period[0], index_month[0])[:5],
+                                    ['total', 'internal', 'latent', 'geopotential', 'kinetic'])
+    # months which have been finished by an earlier job are taken from the checkpoint
+    amet_month_checkpoint = checkpoint.MonthCheckpoint(checkpoint_path, amet_month, input_files)
+    for i, results in driver.run_months(amet_month_checkpoint, period, index_month, workers, memory_per_month):
+        for j, result in zip(index_month, results):
+            meridional_E, meridional_E_internal, meridional_E_latent, meridional_E_geopotential, meridional_E_kinetic,\
+            meridional_E_point, meridional_E_internal_point, meridional_E_latent_point, meridional_E_geopotential_point,\
+            meridional_E_kinetic_point, uc, vc = result
             # save the total meridional energy and each component to the data pool
             meridional_E_pool[j-1,:] = meridional_E
             meridional_E_internal_pool[j-1,:] = meridional_E_internal
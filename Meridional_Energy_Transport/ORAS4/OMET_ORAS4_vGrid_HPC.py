@@ -45,6 +45,12 @@ import matplotlib
 matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 from mpl_toolkits.basemap import Basemap, cm
+# shared kernels of Energy-Wizard at the root of the repository
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir))
+from wizard import mesh
+from wizard import omet
+from wizard import output
+from wizard import overturning
 #import cartopy.crs as ccrs
 #from cartopy.mpl.gridliner import LONGITUDE_FORMATTER, LATITUDE_FORMATTER
 #import iris
@@ -101,6 +107,22 @@ output_path = '/project/Reanalysis/ORAS4/Monthly/Model/output'
 # benchmark datasets for basic dimensions
 #benchmark_path = 'F:\DataBase\ORAS\ORAS4\Monthly\model\\thetao_oras4_1m_1979_grid_T.nc'
 #benchmark = Dataset(benchmark_path)
+# packing of the output fields (wizard.output), None (float64), 'float32' or 'int16'
+output_packing = None
+# range (minimum, maximum) of the output fields for the int16 packing (wizard.output), required
+# since the fields are appended one by one and the first append does not cover the range
+# OMET at each grid point [TW]
+point_value_range = None
+# zonal integral of OMET of the globe and of the basins [TW]
+zonal_value_range = None
+# stream function of the globe and of the basins [Sv]
+psi_value_range = None
+# directory of the cache of the fields derived from the mesh (wizard.mesh), None for the directory of the mesh
+mesh_cache_path = None
+# basins of the zonal integral of OMET and of the stream function besides the globe (wizard.mesh)
+# 'atl' (Atlantic), 'inp' (Indo-Pacific), 'arc' (Arctic) or a polygon (name, [(lon, lat), ...])
+# e.g. ('nordic', [(-30,60),(20,60),(20,80),(-30,80)])
+basins = ['atl', 'inp', 'arc']
 ####################################################################################
 
 def var_key(datapath, year):
@@ -122,124 +144,26 @@ def var_key(datapath, year):
     logging.info("Retrieving variables for the year %d successfully!" % (year))
     return theta_key, s_key, u_key, v_key
 
-def var_coordinate(datapath):
-    '''
-    Retrive ORCA1_Z42 grid information and land-sea mask
-    '''
-    print "Start retrieving the datasets of ORCA1 coordinate and mask info"
-    logging.info('Start retrieving the datasets of ORCA1 coordinate and mask info')
-    # get the variable keys
-    mesh_mask_key = Dataset(datapath+ os.sep + 'mesh_mask.nc')
-    subbasin_mesh_key = Dataset(datapath+ os.sep + 'basinmask_050308_UKMO.nc') #sub-basin from DRAKKER project
-    #grid_T_key = Dataset(datapath+ os.sep + 'coordinates_grid_T.nc')
-    #grid_U_key = Dataset(datapath+ os.sep + 'coordinates_grid_U.nc')
-    #grid_V_key = Dataset(datapath+ os.sep + 'coordinates_grid_V.nc')
-    #extract variables
-    # lat-lon-depth coordinate info
-    nav_lat = mesh_mask_key.variables['nav_lat'][:]
-    nav_lon = mesh_mask_key.variables['nav_lon'][:]
-    nav_lev = mesh_mask_key.variables['nav_lev'][:]
-    # lat-lon coordinate of V grid
-    gphiv = mesh_mask_key.variables['gphiv'][0,:,:] # lat from -78 to -89
-    glamv = mesh_mask_key.variables['glamv'][0,:,:] # lon from -179 to 179
-    # land-sea mask
-    tmask = mesh_mask_key.variables['tmask'][0,:,:,:]
-    #umask = mesh_mask_key.variables['umask'][0,:,:,:]
-    vmask = mesh_mask_key.variables['vmask'][0,:,:,:]
-    # land-sea mask for sub-basin
-    tmaskatl = subbasin_mesh_key.variables['tmaskatl'][:] # attention that the size is different!
-    # grid spacing scale factors (zonal)
-    e1t = mesh_mask_key.variables['e1t'][0,:,:]
-    e2t = mesh_mask_key.variables['e2t'][0,:,:]
-    #e1u = mesh_mask_key.variables['e1u'][0,:,:]
-    #e2u = mesh_mask_key.variables['e2u'][0,:,:]
-    e1v = mesh_mask_key.variables['e1v'][0,:,:]
-    e2v = mesh_mask_key.variables['e2v'][0,:,:]
-    # take the bathymetry
-    mbathy = mesh_mask_key.variables['mbathy'][0,:,:]
-    # depth of each layer
-    e3t_0 = mesh_mask_key.variables['e3t_0'][0,:]
-    e3t_ps = mesh_mask_key.variables['e3t_ps'][0,:,:]
-    # comparison between variables
-    #lat_grid_T = grid_T_key.variables['lat'][:]
-    #lon_grid_T = grid_T_key.variables['lon'][:]
-    #tmask_grid_T = grid_T_key.variables['tmask'][:]
-
-    #lat_grid_U = grid_U_key.variables['lat'][:]
-    #lon_grid_U = grid_U_key.variables['lon'][:]
-    #umask_grid_U = grid_U_key.variables['umask'][:]
-
-    #lat_grid_V = grid_V_key.variables['lat'][:]
-    #lon_grid_V = grid_V_key.variables['lon'][:]
-    #vmask_grid_V = grid_V_key.variables['vmask'][:]
-
-    #Comparison
-    #print 'The tmask file from mesh_mask.nc and the grid T are the same %s' % \
-    #       np.array_equal(tmask,tmask_grid_T)
-
-    return nav_lat, nav_lon, nav_lev, tmask, vmask, tmaskatl, e1t, e2t, e1v, e2v, gphiv, glamv, mbathy, e3t_0, e3t_ps
-
 def stream_function(v_key,e1v):
     '''
     This function is used to calculate the mass transport.
     The unit is Sv (1E+6 m3/s)
     '''
-    print "Compute the meridional overturning stream function for globle and Atlantic!"
-    logging.info('Compute the meridional overturning stream function for globle and Atlantic!')
+    print "Compute the meridional overturning stream function for globle and each basin!"
+    logging.info('Compute the meridional overturning stream function for globle and each basin!')
     #dominant equation for stream function
     # psi = e1v(m) * rho(kg/m3) * v(m/s) * dz(m) = (kg/s)
     # extract variables
     #u = u_key.variables['uo'][:]
     v = v_key.variables['vo'][:]
-    # define the stream function psi
-    psi_globe = np.zeros((len(index_month),level,jj,ji),dtype=float)
-    psi_atlantic = np.zeros((len(index_month),level,jj,ji),dtype=float)
-    # expand the grid size matrix e1v to avoid more loops
-    e1v_3D = np.repeat(e1v[np.newaxis,:,:],level,0)
-    e1v_4D = np.repeat(e1v_3D[np.newaxis,:,:,:],len(index_month),0)
-    # increase the dimension of vmask
-    vmask_4D = np.repeat(vmask[np.newaxis,:,:,:],len(index_month),0)
-    tmaskatl_3D = np.repeat(tmaskatl[np.newaxis,:,:],level,0)
-    tmaskatl_4D = np.repeat(tmaskatl_3D[np.newaxis,:,:,:],len(index_month),0)
-    # increase the dimension and adjustment matrix
-    e3t_adjust_4D = np.repeat(e3t_adjust[np.newaxis,:,:,:],len(index_month),0)
-    # choose the integration order
-    int_order = 1  # 1 - from sea bottom to sea surface 2 from sea surfaca to sea bottom
-    if int_order == 1:
-        # take the integral from sea botton to the surface
-        for i in (level - np.arange(level) -1 ):
-            if i == level -1:
-                psi_globe[:,i,:,:] = e1v_4D[:,i,:,:] * v[:,i,:,:] * vmask_4D[:,i,:,:] * e3t_0[i] -\
-                                     e1v_4D[:,i,:,:] * v[:,i,:,:] * vmask_4D[:,i,:,:] * e3t_adjust_4D[:,i,:,:]
-            else:
-                psi_globe[:,i,:,:] = e1v_4D[:,i,:,:] * v[:,i,:,:] * vmask_4D[:,i,:,:] * e3t_0[i] + psi_globe[:,i+1,:,:] -\
-                                     e1v_4D[:,i,:,:] * v[:,i,:,:] * vmask_4D[:,i,:,:] * e3t_adjust_4D[:,i,:,:]
-    if int_order == 1:
-        # take the integral from sea botton to the surface
-        for i in (level - np.arange(level) -1 ):
-            if i == level -1:
-                psi_atlantic[:,i,:,:] = e1v_4D[:,i,:,:] * v[:,i,:,:] * vmask_4D[:,i,:,:] * e3t_0[i] * tmaskatl_4D[:,i,:,:] -\
-                                        e1v_4D[:,i,:,:] * v[:,i,:,:] * vmask_4D[:,i,:,:] * e3t_adjust_4D[:,i,:,:] * tmaskatl_4D[:,i,:,:]
-            else:
-                psi_atlantic[:,i,:,:] = e1v_4D[:,i,:,:] * v[:,i,:,:] * vmask_4D[:,i,:,:] * e3t_0[i] * tmaskatl_4D[:,i,:,:] + psi_atlantic[:,i+1,:,:] -\
-                                        e1v_4D[:,i,:,:] * v[:,i,:,:] * vmask_4D[:,i,:,:] * e3t_adjust_4D[:,i,:,:] * tmaskatl_4D[:,i,:,:]
-    elif int_order == 2:
-        # take the integral from sea surface to the bottom
-        for i in np.arange(level):
-            if i == 0:
-                psi_globe[:,i,:,:] = e1v_4D[:,i,:,:] * v[:,i,:,:] * vmask_4D[:,i,:,:] * e3t_0[i] -\
-                                     e1v_4D[:,i,:,:] * v[:,i,:,:] * vmask_4D[:,i,:,:] * e3t_adjust_4D[:,i,:,:]
-            else:
-                psi_globe[:,i,:,:] = e1v_4D[:,i,:,:] * v[:,i,:,:] * vmask_4D[:,i,:,:] * e3t_0[i] + psi_globe[:,i+1,:,:] -\
-                                     e1v_4D[:,i,:,:] * v[:,i,:,:] * vmask_4D[:,i,:,:] * e3t_adjust_4D[:,i,:,:]
-    # take the zonal integral
-    psi_stream_globe = np.sum(psi_globe,3)/1e+6 # the unit is changed to Sv
-    psi_stream_atlantic = np.sum(psi_atlantic,3)/1e+6 # the unit is changed to Sv
-
-    print "Compute the meridional overturning stream function for globle and Atlantic successfully!"
-    logging.info('Compute the meridional overturning stream function for globle and Atlantic successfully!')
-
-    return psi_stream_globe, psi_stream_atlantic
+    # integral from the sea bottom to the surface and zonal integral, for the globe and
+    # each basin in one pass (wizard.overturning)
+    psi_stream = overturning.stream_function(v, e1v, e3t_cell, vmask, [None] + basin_masks)
+
+    print "Compute the meridional overturning stream function for globle and each basin successfully!"
+    logging.info('Compute the meridional overturning stream function for globle and each basin successfully!')
+
+    return psi_stream[0], psi_stream[1:]
 
 def meridional_energy_transport(theta_key, s_key, u_key, v_key):
     '''
@@ -252,30 +176,11 @@ def meridional_energy_transport(theta_key, s_key, u_key, v_key):
     v = v_key.variables['vo'][:]
     print 'Extracting variables successfully!'
     #logging.info("Extracting variables successfully!")
-    # calculate the meridional velocity at T grid
-    T_vgrid = np.zeros((len(index_month),level,jj,ji),dtype=float)
-    # Interpolation of T on V grid through Nearest-Neighbor method
-    for i in np.arange(jj):
-        if i == jj-1:
-            T_vgrid[:,:,i,:] = theta[:,:,i,:]
-        else:
-            T_vgrid[:,:,i,:] = (theta[:,:,i,:] + theta[:,:,i+1,:])/2
-    # calculate heat flux at each grid point
-    Internal_E_flux = np.zeros((len(index_month),level,jj,ji),dtype=float)
-    partial = 1 # switch for the partial cells 1 = include & 0 = exclude
-    for i in index_month:
-        for j in np.arange(level):
-                if partial == 1: # include partial cells
-                    Internal_E_flux[i,j,:,:] = constant['rho'] * constant['cp'] * v[i,j,:,:] *\
-                                               T_vgrid[i,j,:,:] * e1v * e3t_0[j] * vmask[j,:,:] -\
-                                               constant['rho'] * constant['cp'] * v[i,j,:,:] *\
-                                               T_vgrid[i,j,:,:] * e1v * e3t_adjust[j,:,:] * vmask[j,:,:]
-                else:
-                    Internal_E_flux[i,j,:,:] = constant['rho'] * constant['cp'] * v[i,j,:,:] *\
-                                               T_vgrid[i,j,:,:] * e1v * e3t_0[j] * vmask[j,:,:]
-    # take the vertical integral
-    Internal_E_int = np.zeros((len(index_month),jj,ji))
-    Internal_E_int = np.sum(Internal_E_flux,1)/1e+12
+    # temperature on the V grid, the mean of the neighbouring T points (wizard.omet)
+    T_vgrid = omet.t_on_v(theta)
+    # vertical integral of the heat flux at each grid point, the partial cells are in the
+    # area of the V faces (wizard.omet)
+    Internal_E_int = omet.energy_transport(v, T_vgrid, vface_area, constant)
     print '*****************************************************************************'
     print "**** Computation of meridional energy transport in the ocean is finished ****"
     print "************         The result is in tera-watt (1E+12)          ************"
@@ -411,29 +316,31 @@ def visualization(cube_regrid,year):
 
     #return E_interpolation
 
-def create_netcdf_point (meridional_E_point_pool,output_path):
+def create_netcdf_point (output_path):
     print '*******************************************************************'
     print '*********************** create netcdf file ************************'
     print '***********************    OMET on ORCA   *************************'
     print '*******************************************************************'
     logging.info("Start creating netcdf file for total meridional energy transport at each grid point.")
     # wrap the datasets into netcdf file
-    # 'NETCDF3_CLASSIC', 'NETCDF3_64BIT', 'NETCDF4_CLASSIC', and 'NETCDF4'
-    data_wrap = Dataset(output_path + os.sep + 'oras4_model_monthly_orca1_E_point.nc' ,'w',format = 'NETCDF3_64BIT')
+    # NETCDF4, compressed and chunked by time step (wizard.output)
+    data_wrap = output.create_dataset(output_path + os.sep + 'oras4_model_monthly_orca1_E_point.nc')
     # create dimensions for netcdf data
-    year_wrap_dim = data_wrap.createDimension('year',len(period))
+    # the years are appended as soon as they are computed (unlimited)
+    year_wrap_dim = data_wrap.createDimension('year',None)
     month_wrap_dim = data_wrap.createDimension('month',12)
     lat_wrap_dim = data_wrap.createDimension('j',jj)
     lon_wrap_dim = data_wrap.createDimension('i',ji)
+    data_append = output.Appender(data_wrap, flush_interval=1)
     # create coordinate variables for 3-dimensions
     # 1D
-    year_wrap_var = data_wrap.createVariable('year',np.int32,('year',))
-    month_wrap_var = data_wrap.createVariable('month',np.int32,('month',))
+    year_wrap_var = data_append.create_variable('year',np.int32,('year',))
+    month_wrap_var = data_append.create_variable('month',np.int32,('month',))
     # 2D
-    lat_wrap_var = data_wrap.createVariable('latitude',np.float32,('j','i'))
-    lon_wrap_var = data_wrap.createVariable('longitude',np.float32,('j','i'))
+    lat_wrap_var = data_append.create_variable('latitude',np.float32,('j','i'))
+    lon_wrap_var = data_append.create_variable('longitude',np.float32,('j','i'))
     # 4D
-    E_total_wrap_var = data_wrap.createVariable('E',np.float64,('year','month','j','i'))
+    E_total_wrap_var = data_append.create_variable('E',np.float64,('year','month','j','i'),packing=output_packing,value_range=point_value_range)
     # global attributes
     data_wrap.description = 'Monthly mean meridional energy transport on ORCA grid'
     # variable attributes
@@ -444,16 +351,14 @@ def create_netcdf_point (meridional_E_point_pool,output_path):
     lat_wrap_var.long_name = 'ORCA1 grid latitude'
     lon_wrap_var.long_name = 'ORCA1 grid longitude'
     E_total_wrap_var.long_name = 'oceanic meridional energy transport'
-    # writing data
-    year_wrap_var[:] = period
+    # writing data, the years are appended by the main loop
     lat_wrap_var[:] = gphiv
     lon_wrap_var[:] = glamv
     month_wrap_var[:] = np.arange(1,13,1)
-    E_total_wrap_var[:] = meridional_E_point_pool
-    # close the file
-    data_wrap.close()
     print "Create netcdf file successfully"
-    logging.info("The generation of netcdf files for the total meridional energy transport on each grid point is complete!!")
+    logging.info("The netcdf file for the total meridional energy transport on each grid point is created!!")
+
+    return data_append
 
 def create_netcdf_regrid (meridional_E_point_regrid,output_path):
     print '*******************************************************************'
@@ -462,19 +367,19 @@ def create_netcdf_regrid (meridional_E_point_regrid,output_path):
     print '*******************************************************************'
     logging.info("Start creating netcdf file for total meridional energy transport at each grid point.")
     # wrap the datasets into netcdf file
-    # 'NETCDF3_CLASSIC', 'NETCDF3_64BIT', 'NETCDF4_CLASSIC', and 'NETCDF4'
-    data_wrap = Dataset(output_path + os.sep + 'oras4_model_monthly_lat-lon_E_point.nc' ,'w',format = 'NETCDF3_64BIT')
+    # NETCDF4, compressed and chunked by time step (wizard.output)
+    data_wrap = output.create_dataset(output_path + os.sep + 'oras4_model_monthly_lat-lon_E_point.nc')
     # create dimensions for netcdf data
     year_wrap_dim = data_wrap.createDimension('year',len(period))
     lat_wrap_dim = data_wrap.createDimension('latitude',180)
     lon_wrap_dim = data_wrap.createDimension('longitude',360)
     # create coordinate variables for 3-dimensions
     # 1D
-    year_wrap_var = data_wrap.createVariable('year',np.int32,('year',))
-    lat_wrap_var = data_wrap.createVariable('latitude',np.float32,('latitude',))
-    lon_wrap_var = data_wrap.createVariable('longitude',np.float32,('longitude',))
+    year_wrap_var = output.create_variable(data_wrap,'year',np.int32,('year',))
+    lat_wrap_var = output.create_variable(data_wrap,'latitude',np.float32,('latitude',))
+    lon_wrap_var = output.create_variable(data_wrap,'longitude',np.float32,('longitude',))
     # 3D
-    E_total_wrap_var = data_wrap.createVariable('E',np.float64,('year','latitude','longitude'))
+    E_total_wrap_var = output.create_variable(data_wrap,'E',np.float64,('year','latitude','longitude'),packing=output_packing)
     # global attributes
     data_wrap.description = 'Monthly mean meridional energy transport interpolated on lat-lon grid'
     # variable attributes
@@ -495,31 +400,40 @@ def create_netcdf_regrid (meridional_E_point_regrid,output_path):
     print "Create netcdf file successfully"
     logging.info("The generation of netcdf files for the total meridional energy transport on each grid point is complete!!")
 
-def create_netcdf_zonal_int (meridional_E_zonal_int_pool,meridional_psi_zonal_glo, meridional_psi_zonal_atl,output_path):
+def create_netcdf_zonal_int (output_path):
     print '*******************************************************************'
     print '*********************** create netcdf file ************************'
     print '***********************    OMET on ORCA   *************************'
     print '*******************************************************************'
     logging.info("Start creating netcdf file for total meridional energy transport at each grid point.")
     # wrap the datasets into netcdf file
-    # 'NETCDF3_CLASSIC', 'NETCDF3_64BIT', 'NETCDF4_CLASSIC', and 'NETCDF4'
-    data_wrap = Dataset(output_path + os.sep + 'oras4_model_monthly_orca1_E_zonal_int.nc' ,'w',format = 'NETCDF3_64BIT')
+    # NETCDF4, compressed and chunked by time step (wizard.output)
+    data_wrap = output.create_dataset(output_path + os.sep + 'oras4_model_monthly_orca1_E_zonal_int.nc')
     # create dimensions for netcdf data
-    year_wrap_dim = data_wrap.createDimension('year',len(period))
+    # the years are appended as soon as they are computed (unlimited)
+    year_wrap_dim = data_wrap.createDimension('year',None)
     month_wrap_dim = data_wrap.createDimension('month',12)
     lat_wrap_dim = data_wrap.createDimension('latitude_aux',jj)
     lev_wrap_dim = data_wrap.createDimension('lev',level)
+    data_append = output.Appender(data_wrap, flush_interval=1)
     # create coordinate variables for 3-dimensions
     # 1D
-    year_wrap_var = data_wrap.createVariable('year',np.int32,('year',))
-    month_wrap_var = data_wrap.createVariable('month',np.int32,('month',))
-    lat_wrap_var = data_wrap.createVariable('latitude_aux',np.float32,('latitude_aux',))
-    lev_wrap_var = data_wrap.createVariable('lev',np.float32,('lev',))
+    year_wrap_var = data_append.create_variable('year',np.int32,('year',))
+    month_wrap_var = data_append.create_variable('month',np.int32,('month',))
+    lat_wrap_var = data_append.create_variable('latitude_aux',np.float32,('latitude_aux',))
+    lev_wrap_var = data_append.create_variable('lev',np.float32,('lev',))
     # 3D
-    E_total_wrap_var = data_wrap.createVariable('E',np.float64,('year','month','latitude_aux'))
+    E_total_wrap_var = data_append.create_variable('E',np.float64,('year','month','latitude_aux'),packing=output_packing,value_range=zonal_value_range)
     # 4D
-    psi_glo_wrap_var = data_wrap.createVariable('Psi_glo',np.float64,('year','month','lev','latitude_aux'))
-    psi_atl_wrap_var = data_wrap.createVariable('Psi_atl',np.float64,('year','month','lev','latitude_aux'))
+    psi_glo_wrap_var = data_append.create_variable('Psi_glo',np.float64,('year','month','lev','latitude_aux'),packing=output_packing,value_range=psi_value_range)
+    # zonal integrals and stream functions of the basins, e.g. E_atl and Psi_atl
+    for name, long_name in zip(basin_names, basin_long_names):
+        E_basin_wrap_var = data_append.create_variable('E_%s' % (name),np.float64,('year','month','latitude_aux'),packing=output_packing,value_range=zonal_value_range)
+        psi_basin_wrap_var = data_append.create_variable('Psi_%s' % (name),np.float64,('year','month','lev','latitude_aux'),packing=output_packing,value_range=psi_value_range)
+        E_basin_wrap_var.units = 'tera watt'
+        psi_basin_wrap_var.units = 'Sv'
+        E_basin_wrap_var.long_name = 'Oceanic meridional energy transport of %s ocean' % (long_name)
+        psi_basin_wrap_var.long_name = 'Meridional overturning stream function of %s ocean' % (long_name)
     # global attributes
     data_wrap.description = 'Monthly mean zonal integral of meridional energy transport on ORCA grid'
     # variable attributes
@@ -527,25 +441,19 @@ def create_netcdf_zonal_int (meridional_E_zonal_int_pool,meridional_psi_zonal_gl
     E_total_wrap_var.units = 'tera watt'
     lev_wrap_var.units = 'm'
     psi_glo_wrap_var.units = 'Sv'
-    psi_atl_wrap_var.units = 'Sv'
 
     lev_wrap_var.long_name = 'depth'
     lat_wrap_var.long_name = 'auxillary latitude'
     E_total_wrap_var.long_name = 'Oceanic meridional energy transport'
     psi_glo_wrap_var.long_name = 'Meridional overturning stream function of global ocean'
-    psi_atl_wrap_var.long_name = 'Meridional overturning stream function of Atlantic ocean'
-    # writing data
-    year_wrap_var[:] = period
+    # writing data, the years are appended by the main loop
     lat_wrap_var[:] = gphiv[:,96]
     month_wrap_var[:] = np.arange(1,13,1)
     lev_wrap_var[:] = nav_lev
-    E_total_wrap_var[:] = meridional_E_zonal_int_pool
-    psi_glo_wrap_var[:] = meridional_psi_zonal_glo
-    psi_atl_wrap_var[:] = meridional_psi_zonal_atl
-    # close the file
-    data_wrap.close()
     print "Create netcdf file successfully"
-    logging.info("The generation of netcdf files for the total meridional energy transport on each grid point is complete!!")
+    logging.info("The netcdf file for the zonal integral of the meridional energy transport is created!!")
+
+    return data_append
 
 if __name__=="__main__":
     # create the year index
@@ -556,8 +464,11 @@ if __name__=="__main__":
     jj = 292
     level = 42
     # extract the mesh_mask and coordinate information
-    nav_lat, nav_lon, nav_lev, tmask, vmask, tmaskatl, e1t, e2t, e1v, e2v, gphiv,\
-    glamv, mbathy, e3t_0, e3t_ps = var_coordinate(datapath)
+    # mesh of ORCA1, the fields are read from the mesh files when they are used (wizard.mesh)
+    ocean_mesh = mesh.ORCAMesh('ORCA1', datapath, mesh_cache_path)
+    nav_lev, vmask, e1v, gphiv, glamv, e3t_0 = ocean_mesh.fields('nav_lev', 'vmask', 'e1v', 'gphiv', 'glamv', 'e3t_0')
+    # land-sea masks of the basins
+    basin_names, basin_long_names, basin_masks = ocean_mesh.basin_masks(basins)
     print '*******************************************************************'
     print '*******************  Partial cells correction   *******************'
     print '*******************************************************************'
@@ -566,33 +477,29 @@ if __name__=="__main__":
     # for the sake of simplicity of the code, just calculate the difference between e3t_0 and e3t_ps
     # then minus this adjustment when calculate the OMET at each layer with mask
     # Attention! Since python start with 0, the partial cell info given in mbathy should incoporate with this
-    e3t_adjust = np.zeros((level,jj,ji),dtype = float)
-    for i in np.arange(1,level,1): # start from 1
-        for j in np.arange(jj):
-            for k in np.arange(ji):
-                if i == mbathy[j,k]:
-                    e3t_adjust[i-1,j,k] = e3t_0[i-1] - e3t_ps[j,k] # python start with 0, so i-1
-    # create a data pool to save the OMET for each year and month
-    E_pool_point = np.zeros((len(period),12,jj,ji),dtype = float)
-    E_pool_zonal_int = np.zeros((len(period),12,jj),dtype = float)
-    # create a data pool to save the meridional overturning for each year and month
-    psi_pool_zonal_glo = np.zeros((len(period),12,level,jj),dtype = float)
-    psi_pool_zonal_atl = np.zeros((len(period),12,level,jj),dtype = float)
+    # the levels 1 to level-1 of mbathy have a partial cell, cached for each mesh (wizard.mesh)
+    e3t_adjust = ocean_mesh.e3t_adjust
+    # thickness of the cells with the partial cells
+    e3t_cell = overturning.cell_thickness(e3t_0, e3t_adjust)
+    # area of the V faces of the cells, with the partial cells and the land-sea mask
+    vface_area = omet.face_area(e1v, e3t_cell, vmask)
+    # create NetCDF files, the OMET and the meridional overturning of each year are
+    # appended as soon as they are computed
+    point_append = create_netcdf_point(output_path)
+    zonal_int_append = create_netcdf_zonal_int(output_path)
     #E_pool_point_regrid = np.zeros((len(period),180,360),dtype = float)
     # save the latitude and longitude for interpolation
     #interpolate_lat = np.zeros(180,dtype = float)
     #interpolate_lon = np.zeros(360,dtype = float)
     # loop for calculation
-    for i in period:
+    for n, i in enumerate(period):
         # get the key of each variable
         theta_key, s_key, u_key, v_key = var_key(datapath, i)
         # calculate the stokes stream function and plot
-        psi_glo, psi_atl = stream_function(v_key,e1v)
-        psi_pool_zonal_glo[i-1958,:,:,:] = psi_glo
-        psi_pool_zonal_atl[i-1958,:,:,:] = psi_atl
+        psi_glo, psi_basins = stream_function(v_key,e1v)
         # calculate the meridional energy transport in the ocean
         E_point = meridional_energy_transport(theta_key, s_key, u_key, v_key)
-        E_pool_point[i-1958,:,:,:] = E_point
+        point_append.append(n, {'year' : i, 'E' : E_point})
         # regridding for visualization
         #cube_regrid, E_regrid, x_coord, y_coord = regridding(E_point_mean, vmask[0,:,:])
         #E_pool_point_regrid[i-1958,:,:] = E_regrid
@@ -600,13 +507,21 @@ if __name__=="__main__":
         #visualization(cube_regrid,i)
         # plot the meridional energy transport in the ocean
         E_zonal_int = zonal_int_plot(E_point,i)
-        E_pool_zonal_int[i-1958,:,:] = E_zonal_int
+        # zonal integral of each basin, from the same OMET at each grid point
+        E_basins = overturning.zonal_integrals(E_point, basin_masks)
+        zonal_int_fields = {'year' : i, 'E' : E_zonal_int, 'Psi_glo' : psi_glo}
+        for name, E_basin, psi_basin in zip(basin_names, E_basins, psi_basins):
+            zonal_int_fields['E_%s' % (name)] = E_basin
+            zonal_int_fields['Psi_%s' % (name)] = psi_basin
+        zonal_int_append.append(n, zonal_int_fields)
+        del E_point, psi_glo, psi_basins, E_basins
         #if i == start_year:
             #interpolate_lat = y_coord
             #interpolate_lon = x_coord
-    # create NetCDF file and save the output
-    create_netcdf_point(E_pool_point,output_path)
+    # close the NetCDF files
+    point_append.close()
     #create_netcdf_regrid(E_pool_point_regrid,output_path)
-    create_netcdf_zonal_int(E_pool_zonal_int,psi_pool_zonal_glo,psi_pool_zonal_atl,output_path)
+    zonal_int_append.close()
+    logging.info("The generation of netcdf files for the total meridional energy transport is complete!!")
 
 print ("--- %s minutes ---" % ((tttt.time() - start_time)/60))
@@ -50,6 +50,12 @@ from cartopy.mpl.gridliner import LONGITUDE_FORMATTER, LATITUDE_FORMATTER
 import iris
 import iris.plot as iplt
 import iris.quickplot as qplt
+# shared kernels of Energy-Wizard at the root of the repository
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir))
+from wizard import mesh
+from wizard import omet
+from wizard import output
+from wizard import overturning
 
 ##########################################################################
 ###########################   Units vacabulory   #########################
@@ -101,6 +107,16 @@ output_path = '/project/Reanalysis/ORAS4/Monthly/Model/output'
 # benchmark datasets for basic dimensions
 #benchmark_path = 'F:\DataBase\ORAS\ORAS4\Monthly\model\\thetao_oras4_1m_1979_grid_T.nc'
 #benchmark = Dataset(benchmark_path)
+# packing of the output fields (wizard.output), None (float64), 'float32' or 'int16'
+output_packing = None
+# range (minimum, maximum) of the output fields for the int16 packing (wizard.output), required
+# since the fields are appended one by one and the first append does not cover the range
+# OMET at each grid point [TW]
+point_value_range = None
+# zonal integral of OMET of the globe and of the basins [TW]
+zonal_value_range = None
+# directory of the cache of the fields derived from the mesh (wizard.mesh), None for the directory of the mesh
+mesh_cache_path = None
 ####################################################################################
 
 def var_key(datapath, year):
@@ -122,59 +138,6 @@ def var_key(datapath, year):
     logging.info("Retrieving variables for the year %d successfully!" % (year))
     return theta_key, s_key, u_key, v_key
 
-def var_coordinate(datapath):
-    '''
-    Retrive ORCA1_Z42 grid information and land-sea mask
-    '''
-    print "Start retrieving the datasets of ORCA1 coordinate and mask info"
-    logging.info('Start retrieving the datasets of ORCA1 coordinate and mask info')
-    # get the variable keys
-    mesh_mask_key = Dataset(datapath+ os.sep + 'mesh_mask.nc')
-    #grid_T_key = Dataset(datapath+ os.sep + 'coordinates_grid_T.nc')
-    #grid_U_key = Dataset(datapath+ os.sep + 'coordinates_grid_U.nc')
-    #grid_V_key = Dataset(datapath+ os.sep + 'coordinates_grid_V.nc')
-    #extract variables
-    # lat-lon-depth coordinate info
-    nav_lat = mesh_mask_key.variables['nav_lat'][:]
-    nav_lon = mesh_mask_key.variables['nav_lon'][:]
-    nav_lev = mesh_mask_key.variables['nav_lev'][:]
-    # lat-lon coordinate of V grid
-    gphiv = mesh_mask_key.variables['gphiv'][0,:,:] # lat from -78 to -89
-    glamv = mesh_mask_key.variables['glamv'][0,:,:] # lon from -179 to 179
-    # land-sea mask
-    tmask = mesh_mask_key.variables['tmask'][0,:,:,:]
-    #umask = mesh_mask_key.variables['umask'][0,:,:,:]
-    vmask = mesh_mask_key.variables['vmask'][0,:,:,:]
-    # grid spacing scale factors (zonal)
-    e1t = mesh_mask_key.variables['e1t'][0,:,:]
-    e2t = mesh_mask_key.variables['e2t'][0,:,:]
-    #e1u = mesh_mask_key.variables['e1u'][0,:,:]
-    #e2u = mesh_mask_key.variables['e2u'][0,:,:]
-    e1v = mesh_mask_key.variables['e1v'][0,:,:]
-    e2v = mesh_mask_key.variables['e2v'][0,:,:]
-    # take the bathymetry
-    mbathy = mesh_mask_key.variables['mbathy'][0,:,:]
-    # depth of each layer
-    e3t_0 = mesh_mask_key.variables['e3t_0'][0,:]
-    # comparison between variables
-    #lat_grid_T = grid_T_key.variables['lat'][:]
-    #lon_grid_T = grid_T_key.variables['lon'][:]
-    #tmask_grid_T = grid_T_key.variables['tmask'][:]
-
-    #lat_grid_U = grid_U_key.variables['lat'][:]
-    #lon_grid_U = grid_U_key.variables['lon'][:]
-    #umask_grid_U = grid_U_key.variables['umask'][:]
-
-    #lat_grid_V = grid_V_key.variables['lat'][:]
-    #lon_grid_V = grid_V_key.variables['lon'][:]
-    #vmask_grid_V = grid_V_key.variables['vmask'][:]
-
-    #Comparison
-    #print 'The tmask file from mesh_mask.nc and the grid T are the same %s' % \
-    #       np.array_equal(tmask,tmask_grid_T)
-
-    return nav_lat, nav_lon, nav_lev, tmask, vmask, e1t, e2t, e1v, e2v, gphiv, glamv, mbathy, e3t_0
-
 def stream_function(v_key,e1v):
     '''
     This function is used to calculate the mass transport.
@@ -185,32 +148,9 @@ def stream_function(v_key,e1v):
     # extract variables
     #u = u_key.variables['uo'][:]
     v = v_key.variables['vo'][:]
-    # define the stream function psi
-    psi = np.zeros((len(index_month),level,jj,ji),dtype=float)
-    # expand the grid size matrix e1v to avoid more loops
-    e1v_3D = np.repeat(e1v[np.newaxis,:,:],level,0)
-    e1v_4D = np.repeat(e1v_3D[np.newaxis,:,:,:],len(index_month),0)
-    # increase the dimension of vmask
-    vmask_4D = np.repeat(vmask[np.newaxis,:,:,:],len(index_month),0)
-    # choose the integration order
-    int_order = 1  # 1 - from sea bottom to sea surface 2 from sea surfaca to sea bottom
-    if int_order == 1:
-        # take the integral from sea botton to the surface
-        for i in (level - np.arange(level) -1 ):
-            if i == level -1:
-                psi[:,i,:,:] = e1v_4D[:,i,:,:] * v[:,i,:,:] * vmask_4D[:,i,:,:] * e3t_0[i]
-            else:
-                psi[:,i,:,:] = e1v_4D[:,i,:,:] * v[:,i,:,:] * vmask_4D[:,i,:,:] * e3t_0[i] + psi[:,i+1,:,:]
-    elif int_order == 2:
-        # take the integral from sea surface to the bottom
-        for i in np.arange(level):
-            if i == 0:
-                psi[:,i,:,:] = e1v_4D[:,i,:,:] * v[:,i,:,:] * vmask_4D[:,i,:,:] * e3t_0[i]
-            else:
-                psi[:,i,:,:] = e1v_4D[:,i,:,:] * v[:,i,:,:] * vmask_4D[:,i,:,:] * e3t_0[i] + psi[:,i-1,:,:]
-    # take the mean value over the entire year
-    psi_mean = np.mean(psi,0)
-    psi_stream = np.sum(psi_mean,2)/1e+6 # the unit is changed to Sv
+    # integral from the sea bottom to the surface and zonal integral (wizard.overturning)
+    psi, = overturning.stream_function(v, e1v, overturning.cell_thickness(e3t_0), vmask)
+    psi_stream = np.mean(psi,0)
 
     fig0 = plt.figure()
 
@@ -242,23 +182,10 @@ def meridional_energy_transport(theta_key, s_key, u_key, v_key):
     v = v_key.variables['vo'][:]
     print 'Extracting variables successfully!'
     #logging.info("Extracting variables successfully!")
-    # calculate the meridional velocity at T grid
-    T_vgrid = np.zeros((len(index_month),level,jj,ji),dtype=float)
-    # Interpolation of T on V grid through Nearest-Neighbor method
-    for i in np.arange(jj):
-        if i == jj-1:
-            T_vgrid[:,:,i,:] = theta[:,:,i,:]
-        else:
-            T_vgrid[:,:,i,:] = (theta[:,:,i,:] + theta[:,:,i+1,:])/2
-    # calculate heat flux at each grid point
-    Internal_E_flux = np.zeros((len(index_month),level,jj,ji),dtype=float)
-    for i in index_month:
-        for j in np.arange(level):
-                Internal_E_flux[i,j,:,:] = constant['rho'] * constant['cp'] * v[i,j,:,:] *\
-                                           T_vgrid[i,j,:,:] * e1v * e3t_0[j] * vmask[j,:,:]
-    # take the vertical integral
-    Internal_E_int = np.zeros((len(index_month),jj,ji))
-    Internal_E_int = np.sum(Internal_E_flux,1)/1e+12
+    # temperature on the V grid, the mean of the neighbouring T points (wizard.omet)
+    T_vgrid = omet.t_on_v(theta)
+    # vertical integral of the heat flux at each grid point (wizard.omet)
+    Internal_E_int = omet.energy_transport(v, T_vgrid, vface_area, constant)
     print '*****************************************************************************'
     print "**** Computation of meridional energy transport in the ocean is finished ****"
     print "************         The result is in tera-watt (1E+12)          ************"
@@ -396,29 +323,31 @@ def visualization(cube_regrid,year):
 
     #return E_interpolation
 
-def create_netcdf_point (meridional_E_point_pool,output_path):
+def create_netcdf_point (output_path):
     print '*******************************************************************'
     print '*********************** create netcdf file ************************'
     print '***********************    OMET on ORCA   *************************'
     print '*******************************************************************'
     logging.info("Start creating netcdf file for total meridional energy transport at each grid point.")
     # wrap the datasets into netcdf file
-    # 'NETCDF3_CLASSIC', 'NETCDF3_64BIT', 'NETCDF4_CLASSIC', and 'NETCDF4'
-    data_wrap = Dataset(output_path + os.sep + 'oras4_model_monthly_orca1_E_point.nc' ,'w',format = 'NETCDF3_64BIT')
+    # NETCDF4, compressed and chunked by time step (wizard.output)
+    data_wrap = output.create_dataset(output_path + os.sep + 'oras4_model_monthly_orca1_E_point.nc')
     # create dimensions for netcdf data
-    year_wrap_dim = data_wrap.createDimension('year',len(period))
+    # the years are appended as soon as they are computed (unlimited)
+    year_wrap_dim = data_wrap.createDimension('year',None)
     month_wrap_dim = data_wrap.createDimension('month',12)
     lat_wrap_dim = data_wrap.createDimension('j',jj)
     lon_wrap_dim = data_wrap.createDimension('i',ji)
+    data_append = output.Appender(data_wrap, flush_interval=1)
     # create coordinate variables for 3-dimensions
     # 1D
-    year_wrap_var = data_wrap.createVariable('year',np.int32,('year',))
-    month_wrap_var = data_wrap.createVariable('month',np.int32,('month',))
+    year_wrap_var = data_append.create_variable('year',np.int32,('year',))
+    month_wrap_var = data_append.create_variable('month',np.int32,('month',))
     # 2D
-    lat_wrap_var = data_wrap.createVariable('latitude',np.float32,('j','i'))
-    lon_wrap_var = data_wrap.createVariable('longitude',np.float32,('j','i'))
+    lat_wrap_var = data_append.create_variable('latitude',np.float32,('j','i'))
+    lon_wrap_var = data_append.create_variable('longitude',np.float32,('j','i'))
     # 4D
-    E_total_wrap_var = data_wrap.createVariable('E',np.float64,('year','month','j','i'))
+    E_total_wrap_var = data_append.create_variable('E',np.float64,('year','month','j','i'),packing=output_packing,value_range=point_value_range)
     # global attributes
     data_wrap.description = 'Monthly mean meridional energy transport on ORCA grid'
     # variable attributes
@@ -426,37 +355,37 @@ def create_netcdf_point (meridional_E_point_pool,output_path):
     lon_wrap_var.units = 'degree_east'
     E_total_wrap_var.units = 'tera watt'
     E_total_wrap_var.long_name = 'oceanic meridional energy transport'
-    # writing data
-    year_wrap_var[:] = period
+    # writing data, the years are appended by the main loop
     lat_wrap_var[:] = gphiv
     lon_wrap_var[:] = glamv
     month_wrap_var[:] = np.arange(1,13,1)
-    E_total_wrap_var[:] = meridional_E_point_pool
-    # close the file
-    data_wrap.close()
     print "Create netcdf file successfully"
-    logging.info("The generation of netcdf files for the total meridional energy transport on each grid point is complete!!")
+    logging.info("The netcdf file for the total meridional energy transport on each grid point is created!!")
+
+    return data_append
 
-def create_netcdf_regrid (meridional_E_point_regrid,output_path):
+def create_netcdf_regrid (interpolate_lat,interpolate_lon,output_path):
     print '*******************************************************************'
     print '*********************** create netcdf file ************************'
     print '*********************    OMET on lat-lon   ************************'
     print '*******************************************************************'
     logging.info("Start creating netcdf file for total meridional energy transport at each grid point.")
     # wrap the datasets into netcdf file
-    # 'NETCDF3_CLASSIC', 'NETCDF3_64BIT', 'NETCDF4_CLASSIC', and 'NETCDF4'
-    data_wrap = Dataset(output_path + os.sep + 'oras4_model_monthly_lat-lon_E_point.nc' ,'w',format = 'NETCDF3_64BIT')
+    # NETCDF4, compressed and chunked by time step (wizard.output)
+    data_wrap = output.create_dataset(output_path + os.sep + 'oras4_model_monthly_lat-lon_E_point.nc')
     # create dimensions for netcdf data
-    year_wrap_dim = data_wrap.createDimension('year',len(period))
+    # the years are appended as soon as they are computed (unlimited)
+    year_wrap_dim = data_wrap.createDimension('year',None)
     lat_wrap_dim = data_wrap.createDimension('latitude',180)
     lon_wrap_dim = data_wrap.createDimension('longitude',360)
+    data_append = output.Appender(data_wrap, flush_interval=1)
     # create coordinate variables for 3-dimensions
     # 1D
-    year_wrap_var = data_wrap.createVariable('year',np.int32,('year',))
-    lat_wrap_var = data_wrap.createVariable('latitude',np.float32,('latitude',))
-    lon_wrap_var = data_wrap.createVariable('longitude',np.float32,('longitude',))
+    year_wrap_var = data_append.create_variable('year',np.int32,('year',))
+    lat_wrap_var = data_append.create_variable('latitude',np.float32,('latitude',))
+    lon_wrap_var = data_append.create_variable('longitude',np.float32,('longitude',))
     # 3D
-    E_total_wrap_var = data_wrap.createVariable('E',np.float64,('year','latitude','longitude'))
+    E_total_wrap_var = data_append.create_variable('E',np.float64,('year','latitude','longitude'),packing=output_packing,value_range=point_value_range)
     # global attributes
     data_wrap.description = 'Monthly mean meridional energy transport interpolated on lat-lon grid'
     # variable attributes
@@ -464,51 +393,49 @@ def create_netcdf_regrid (meridional_E_point_regrid,output_path):
     lon_wrap_var.units = 'degree_east'
     E_total_wrap_var.units = 'tera watt'
     E_total_wrap_var.long_name = 'oceanic meridional energy transport'
-    # writing data
-    year_wrap_var[:] = period
+    # writing data, the years are appended by the main loop
     lat_wrap_var[:] = interpolate_lat
     lon_wrap_var[:] = interpolate_lon
-    E_total_wrap_var[:] = meridional_E_point_regrid
-    # close the file
-    data_wrap.close()
     print "Create netcdf file successfully"
-    logging.info("The generation of netcdf files for the total meridional energy transport on each grid point is complete!!")
+    logging.info("The netcdf file for the total meridional energy transport on lat-lon grid is created!!")
 
-def create_netcdf_zonal_int (meridional_E_zonal_int_pool,output_path):
+    return data_append
+
+def create_netcdf_zonal_int (output_path):
     print '*******************************************************************'
     print '*********************** create netcdf file ************************'
     print '***********************    OMET on ORCA   *************************'
     print '*******************************************************************'
     logging.info("Start creating netcdf file for total meridional energy transport at each grid point.")
     # wrap the datasets into netcdf file
-    # 'NETCDF3_CLASSIC', 'NETCDF3_64BIT', 'NETCDF4_CLASSIC', and 'NETCDF4'
-    data_wrap = Dataset(output_path + os.sep + 'oras4_model_monthly_orca1_E_zonal_int.nc' ,'w',format = 'NETCDF3_64BIT')
+    # NETCDF4, compressed and chunked by time step (wizard.output)
+    data_wrap = output.create_dataset(output_path + os.sep + 'oras4_model_monthly_orca1_E_zonal_int.nc')
     # create dimensions for netcdf data
-    year_wrap_dim = data_wrap.createDimension('year',len(period))
+    # the years are appended as soon as they are computed (unlimited)
+    year_wrap_dim = data_wrap.createDimension('year',None)
     month_wrap_dim = data_wrap.createDimension('month',12)
     lat_wrap_dim = data_wrap.createDimension('latitude_aux',jj)
+    data_append = output.Appender(data_wrap, flush_interval=1)
     # create coordinate variables for 3-dimensions
     # 1D
-    year_wrap_var = data_wrap.createVariable('year',np.int32,('year',))
-    month_wrap_var = data_wrap.createVariable('month',np.int32,('month',))
-    lat_wrap_var = data_wrap.createVariable('latitude_aux',np.float32,('latitude_aux',))
+    year_wrap_var = data_append.create_variable('year',np.int32,('year',))
+    month_wrap_var = data_append.create_variable('month',np.int32,('month',))
+    lat_wrap_var = data_append.create_variable('latitude_aux',np.float32,('latitude_aux',))
     # 4D
-    E_total_wrap_var = data_wrap.createVariable('E',np.float64,('year','month','latitude_aux'))
+    E_total_wrap_var = data_append.create_variable('E',np.float64,('year','month','latitude_aux'),packing=output_packing,value_range=zonal_value_range)
     # global attributes
     data_wrap.description = 'Monthly mean zonal integral of meridional energy transport on ORCA grid'
     # variable attributes
     lat_wrap_var.units = 'degree_north'
     E_total_wrap_var.units = 'tera watt'
     E_total_wrap_var.long_name = 'oceanic meridional energy transport'
-    # writing data
-    year_wrap_var[:] = period
+    # writing data, the years are appended by the main loop
     lat_wrap_var[:] = gphiv[:,96]
     month_wrap_var[:] = np.arange(1,13,1)
-    E_total_wrap_var[:] = meridional_E_zonal_int_pool
-    # close the file
-    data_wrap.close()
     print "Create netcdf file successfully"
-    logging.info("The generation of netcdf files for the total meridional energy transport on each grid point is complete!!")
+    logging.info("The netcdf file for the zonal integral of the meridional energy transport is created!!")
+
+    return data_append
 
 if __name__=="__main__":
     # create the year index
@@ -519,39 +446,41 @@ if __name__=="__main__":
     jj = 292
     level = 42
     # extract the mesh_mask and coordinate information
-    nav_lat, nav_lon, nav_lev, tmask, vmask, e1t, e2t, e1v, e2v, gphiv, glamv, mbathy, e3t_0 = var_coordinate(datapath)
-    # create a data pool to save the OMET for each year and month
-    E_pool_point = np.zeros((len(period),12,jj,ji),dtype = float)
-    E_pool_zonal_int = np.zeros((len(period),12,jj),dtype = float)
-    E_pool_point_regrid = np.zeros((len(period),180,360),dtype = float)
-    # save the latitude and longitude for interpolation
-    interpolate_lat = np.zeros(180,dtype = float)
-    interpolate_lon = np.zeros(360,dtype = float)
+    # mesh of ORCA1, the fields are read from the mesh files when they are used (wizard.mesh)
+    ocean_mesh = mesh.ORCAMesh('ORCA1', datapath, mesh_cache_path)
+    nav_lev, vmask, e1v, gphiv, glamv, e3t_0 = ocean_mesh.fields('nav_lev', 'vmask', 'e1v', 'gphiv', 'glamv', 'e3t_0')
+    # area of the V faces of the cells with the land-sea mask, without partial cells
+    vface_area = omet.face_area(e1v, overturning.cell_thickness(e3t_0), vmask)
+    # create NetCDF files, the OMET of each year is appended as soon as it is computed
+    point_append = create_netcdf_point(output_path)
+    zonal_int_append = create_netcdf_zonal_int(output_path)
     # loop for calculation
-    for i in period:
+    for n, i in enumerate(period):
         # get the key of each variable
         theta_key, s_key, u_key, v_key = var_key(datapath, i)
         # calculate the stokes stream function and plot
         #psi = stream_function(v_key,e1v)
         # calculate the meridional energy transport in the ocean
         E_point = meridional_energy_transport(theta_key, s_key, u_key, v_key)
-        E_pool_point[i-1958,:,:,:] = E_point
+        point_append.append(n, {'year' : i, 'E' : E_point})
         # take the mean value over the entire year for basemap
         E_point_mean = np.mean(E_point,0)
         # regridding for visualization
         cube_regrid, E_regrid, x_coord, y_coord = regridding(E_point_mean, vmask[0,:,:])
-        E_pool_point_regrid[i-1958,:,:] = E_regrid
+        # the lat-lon grid is known after the first regridding
+        if i == start_year:
+            regrid_append = create_netcdf_regrid(y_coord,x_coord,output_path)
+        regrid_append.append(n, {'year' : i, 'E' : E_regrid})
         #visualization
         visualization(cube_regrid,i)
         # plot the meridional energy transport in the ocean
         E_zonal_int = zonal_int_plot(E_point,i)
-        E_pool_zonal_int[i-1958,:,:] = E_zonal_int
-        if i == start_year:
-            interpolate_lat = y_coord
-            interpolate_lon = x_coord
-    # create NetCDF file and save the output
-    create_netcdf_point(E_pool_point,output_path)
-    create_netcdf_regrid(E_pool_point_regrid,output_path)
-    create_netcdf_zonal_int(E_pool_zonal_int,output_path)
+        zonal_int_append.append(n, {'year' : i, 'E' : E_zonal_int})
+        del E_point
+    # close the NetCDF files
+    point_append.close()
+    regrid_append.close()
+    zonal_int_append.close()
+    logging.info("The generation of netcdf files for the total meridional energy transport is complete!!")
 
 print ("--- %s minutes ---" % ((tttt.time() - start_time)/60))
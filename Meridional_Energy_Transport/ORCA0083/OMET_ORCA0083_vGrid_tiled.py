@@ -0,0 +1,311 @@
+#!/usr/bin/env python
+"""
+Copyright Netherlands eScience Center
+Function        : Calculate Oceanic Meridional Energy Transport(NEMO ORCA0083) in tiles of rows
+Date            : 2026.10.17
+Last Update     : 2026.10.17
+Description     : The code aims to calculate the oceanic meridional energy
+                  transport based on the NEMO ORCA0083 hindcast (1/12 deg). The
+                  complete computaiton is accomplished on model level (original
+                  ORCA0083_z75 grid). All the interpolations are made on the V grid,
+                  as for ORAS4 and GLORYS2V3.
+                  A 3D field of ORCA0083 (75 x 3059 x 4322) takes 8 GB in float64, so
+                  the fields are never read in full: the domain is computed in tiles
+                  of rows j (wizard.omet.tiled_transport), with one halo row for the
+                  temperature on the V grid. The mesh, the temperature and the velocity
+                  of a tile are read from the files, the OMET at each grid point is
+                  written to the output row by row and the zonal integrals and the
+                  stream functions are filled in tile by tile. The memory is bounded
+                  by memory_budget. The OMET at each grid point is chunked by the tiles
+                  of rows in the output, so each chunk is compressed once. The int16
+                  packing of the outputs needs the range of the values
+                  (point_value_range, zonal_value_range and psi_value_range), since
+                  they are written month by month and tile by tile.
+Return Value    : NetCFD4 data file
+Dependencies    : os, time, numpy, netCDF4, sys, logging
+variables       : Potential Temperature                     Theta
+                  Meridional Current Velocity               v
+                  Zonal Grid Spacing Scale Factors          e1
+                  Land-Sea Mask                             mask
+Caveat!!        : Direction of Axis:
+                  Model Level: surface to bottom
+                  The data is monthly mean
+                  The variables (T,V) are saved in the form of masked arrays, the
+                  masked values are taken as 0 during calculation.
+"""
+import numpy as np
+import time as tttt
+from netCDF4 import Dataset,num2date
+import os
+import platform
+import sys
+import logging
+# shared kernels of Energy-Wizard at the root of the repository
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir))
+from wizard import mesh
+from wizard import omet
+from wizard import output
+from wizard import overturning
+
+##########################################################################
+###########################   Units vacabulory   #########################
+# cpT:  [J / kg C] * [C]     = [J / kg]
+# v*rho cpT dxdz = [m/s] * [J / kg] * [kg/m3] * m * m = [J / s] = [Wat]
+##########################################################################
+
+# print the system structure and the path of the kernal
+print platform.architecture()
+print os.path
+
+# calculate the time for the code execution
+start_time = tttt.time()
+
+# logging level 'DEBUG' 'INFO' 'WARNING' 'ERROR' 'CRITICAL'
+logging.basicConfig(filename = '/projects/0/blueactn/ORCA0083/history_E.log',
+                    filemode = 'w', level = logging.DEBUG,
+                    format = '%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+# define the constant:
+constant ={'g' : 9.80616,      # gravititional acceleration [m / s2]
+           'R' : 6371009,      # radius of the earth [m]
+           'cp': 3987,         # heat capacity of sea water [J/(Kg*C)]
+           'rho': 1027,        # sea water density [Kg/m3]
+            }
+
+################################   Input zone  ######################################
+# specify data path
+datapath = '/projects/0/blueactn/ORCA0083'
+# name of the monthly mean files of T and V, with year and month
+file_theta = 'ORCA0083-N06_%dm%sT.nc'
+file_v = 'ORCA0083-N06_%dm%sV.nc'
+# time of the data, which concerns with the name of input
+# starting time (year)
+start_year = 1979
+# Ending time, if only for 1 year, then it should be the same as starting year
+end_year = 2012
+# specify output path for the netCDF4 file
+output_path = '/projects/0/blueactn/ORCA0083/output'
+# packing of the output fields (wizard.output), None (float64), 'float32' or 'int16'
+output_packing = None
+# range (minimum, maximum) of the output fields for the int16 packing (wizard.output), required
+# since the fields are written tile by tile and month by month and the first write does not
+# cover the range
+# OMET at each grid point [TW]
+point_value_range = None
+# zonal integral of OMET of the globe and of the basins [TW]
+zonal_value_range = None
+# stream function of the globe and of the basins [Sv]
+psi_value_range = None
+# directory of the cache of the fields derived from the mesh (wizard.mesh), None for the directory of the mesh
+mesh_cache_path = None
+# basins of the zonal integral of OMET and of the stream function besides the globe (wizard.mesh)
+# 'atl' (Atlantic), 'inp' (Indo-Pacific), 'arc' (Arctic) or a polygon (name, [(lon, lat), ...])
+basins = ['atl']
+# memory for the fields of one tile of rows j [bytes] (wizard.omet.rows_per_tile)
+memory_budget = 8 * 1024**3
+# column of the grid whose latitude is taken as the auxillary latitude of the zonal integrals
+latitude_aux_column = 3180
+####################################################################################
+
+def var_key(datapath, year, month):
+    # get the path to each datasets
+    print "Start retrieving datasets for %d (y) %s (m)" % (year,namelist_month[month])
+    logging.info("Start retrieving variables theta,v for from %d (y) %s (m)" % (year,namelist_month[month]))
+    datapath_theta = datapath + os.sep + file_theta % (year,namelist_month[month])
+    datapath_v = datapath + os.sep + file_v % (year,namelist_month[month])
+    # get the variable keys, the fields are read tile by tile
+    theta_key = Dataset(datapath_theta)
+    v_key = Dataset(datapath_v)
+
+    print "Retrieving datasets for the %d (year) %s (month) successfully!" % (year, namelist_month[month])
+    logging.info("Retrieving variables for the year %d month %s successfully!" % (year,namelist_month[month]))
+    return theta_key, v_key
+
+def vface_area(rows):
+    '''
+    Area of the V faces of the rows of a tile, with the partial cells and the land-sea
+    mask (wizard.omet). The fields of the mesh are read for the rows only.
+    '''
+    e1v, vmask, mbathy, e3t_ps = [ocean_mesh.read_rows(name, rows) for name in ('e1v', 'vmask', 'mbathy', 'e3t_ps')]
+    # the levels 1 to level-1 of mbathy have a partial cell (wizard.mesh)
+    e3t_adjust = mesh.partial_cell_adjust(mbathy, e3t_ps, level, thickness=e3t_0, last=level-1)
+
+    return omet.face_area(e1v, overturning.cell_thickness(e3t_0, e3t_adjust), vmask)
+
+def meridional_energy_transport(theta_key, v_key, point_append, n, month):
+    '''
+    Meridional energy transport, its zonal integrals and the meridional overturning
+    stream functions of the globe and the basins, computed in tiles of rows j.
+    '''
+    print "Start the quantification of meridional energy transport in tiles of %d rows." % (rows)
+    logging.info("Start the quantification of meridional energy transport in tiles of %d rows." % (rows))
+    theta_var = theta_key.variables['votemper']
+    v_var = v_key.variables['vomecrty']
+    def read_theta(tile):
+        return theta_var[0,:,tile,:] # the unit of theta is Celsius!
+    def read_v(tile):
+        return v_var[0,:,tile,:]
+    def write_point(tile, E_point):
+        # the OMET at each grid point goes to the output row by row
+        point_append.variables['E'][n,month,tile,:] = E_point
+    E_zonal, psi = omet.tiled_transport(read_theta, read_v, vface_area, jj, rows, constant,
+                                        [None] + basin_masks, point=write_point)
+    print '*****************************************************************************'
+    print "**** Computation of meridional energy transport in the ocean is finished ****"
+    print "************         The result is in tera-watt (1E+12)          ************"
+    print '*****************************************************************************'
+    return E_zonal, psi
+
+def create_netcdf_point (output_path):
+    print '*******************************************************************'
+    print '*********************** create netcdf file ************************'
+    print '***********************    OMET on ORCA   *************************'
+    print '*******************************************************************'
+    logging.info("Start creating netcdf file for total meridional energy transport at each grid point.")
+    # wrap the datasets into netcdf file
+    # NETCDF4, compressed and chunked by time step (wizard.output)
+    data_wrap = output.create_dataset(output_path + os.sep + 'NEMO_model_monthly_orca0083_E_point.nc')
+    # create dimensions for netcdf data
+    # the months are appended as soon as they are computed (unlimited years)
+    year_wrap_dim = data_wrap.createDimension('year',None)
+    month_wrap_dim = data_wrap.createDimension('month',12)
+    lat_wrap_dim = data_wrap.createDimension('j',jj)
+    lon_wrap_dim = data_wrap.createDimension('i',ji)
+    data_append = output.Appender(data_wrap, flush_interval=12)
+    # create coordinate variables for 3-dimensions
+    # 1D
+    year_wrap_var = data_append.create_variable('year',np.int32,('year',))
+    month_wrap_var = data_append.create_variable('month',np.int32,('month',))
+    # 2D and 4D, chunked by the tiles of rows in which they are written, each chunk is compressed once
+    lat_wrap_var = data_append.create_variable('latitude',np.float32,('j','i'),chunks=(rows,ji))
+    lon_wrap_var = data_append.create_variable('longitude',np.float32,('j','i'),chunks=(rows,ji))
+    E_total_wrap_var = data_append.create_variable('E',np.float64,('year','month','j','i'),packing=output_packing,
+                                                   value_range=point_value_range,chunks=(1,1,rows,ji))
+    # global attributes
+    data_wrap.description = 'Monthly mean meridional energy transport on ORCA grid'
+    # variable attributes
+    lat_wrap_var.units = 'ORCA0083_latitude'
+    lon_wrap_var.units = 'ORCA0083_longitude'
+    E_total_wrap_var.units = 'tera watt'
+
+    lat_wrap_var.long_name = 'ORCA0083 grid latitude'
+    lon_wrap_var.long_name = 'ORCA0083 grid longitude'
+    E_total_wrap_var.long_name = 'oceanic meridional energy transport'
+    # writing data, the coordinates tile by tile and the months by the main loop
+    for tile in omet.row_tiles(jj, rows):
+        lat_wrap_var[tile,:] = ocean_mesh.read_rows('gphiv', tile)
+        lon_wrap_var[tile,:] = ocean_mesh.read_rows('glamv', tile)
+    month_wrap_var[:] = np.arange(1,13,1)
+    print "Create netcdf file successfully"
+    logging.info("The netcdf file for the total meridional energy transport on each grid point is created!!")
+
+    return data_append
+
+def create_netcdf_zonal_int (output_path):
+    print '*******************************************************************'
+    print '*********************** create netcdf file ************************'
+    print '***********************    OMET on ORCA   *************************'
+    print '*******************************************************************'
+    logging.info("Start creating netcdf file for total meridional energy transport at each grid point.")
+    # wrap the datasets into netcdf file
+    # NETCDF4, compressed and chunked by time step (wizard.output)
+    data_wrap = output.create_dataset(output_path + os.sep + 'NEMO_model_monthly_orca0083_E_zonal_int.nc')
+    # create dimensions for netcdf data
+    # the months are appended as soon as they are computed (unlimited years)
+    year_wrap_dim = data_wrap.createDimension('year',None)
+    month_wrap_dim = data_wrap.createDimension('month',12)
+    lat_wrap_dim = data_wrap.createDimension('latitude_aux',jj)
+    lev_wrap_dim = data_wrap.createDimension('lev',level)
+    data_append = output.Appender(data_wrap, flush_interval=12)
+    # create coordinate variables for 3-dimensions
+    # 1D
+    year_wrap_var = data_append.create_variable('year',np.int32,('year',))
+    month_wrap_var = data_append.create_variable('month',np.int32,('month',))
+    lat_wrap_var = data_append.create_variable('latitude_aux',np.float32,('latitude_aux',))
+    lev_wrap_var = data_append.create_variable('lev',np.float32,('lev',))
+    # 3D
+    E_total_wrap_var = data_append.create_variable('E',np.float64,('year','month','latitude_aux'),packing=output_packing,value_range=zonal_value_range)
+    # 4D
+    psi_glo_wrap_var = data_append.create_variable('Psi_glo',np.float64,('year','month','lev','latitude_aux'),packing=output_packing,value_range=psi_value_range)
+    # zonal integrals and stream functions of the basins, e.g. E_atl and Psi_atl
+    for name, long_name in zip(basin_names, basin_long_names):
+        E_basin_wrap_var = data_append.create_variable('E_%s' % (name),np.float64,('year','month','latitude_aux'),packing=output_packing,value_range=zonal_value_range)
+        psi_basin_wrap_var = data_append.create_variable('Psi_%s' % (name),np.float64,('year','month','lev','latitude_aux'),packing=output_packing,value_range=psi_value_range)
+        E_basin_wrap_var.units = 'tera watt'
+        psi_basin_wrap_var.units = 'Sv'
+        E_basin_wrap_var.long_name = 'Oceanic meridional energy transport of %s ocean' % (long_name)
+        psi_basin_wrap_var.long_name = 'Meridional overturning stream function of %s ocean' % (long_name)
+    # global attributes
+    data_wrap.description = 'Monthly mean zonal integral of meridional energy transport on ORCA grid'
+    # variable attributes
+    lat_wrap_var.units = 'degree_north'
+    E_total_wrap_var.units = 'tera watt'
+    lev_wrap_var.units = 'm'
+    psi_glo_wrap_var.units = 'Sv'
+
+    lev_wrap_var.long_name = 'depth'
+    lat_wrap_var.long_name = 'auxillary latitude'
+    E_total_wrap_var.long_name = 'Oceanic meridional energy transport'
+    psi_glo_wrap_var.long_name = 'Meridional overturning stream function of global ocean'
+    # writing data, the months are appended by the main loop
+    for tile in omet.row_tiles(jj, rows):
+        lat_wrap_var[tile] = ocean_mesh.read_rows('gphiv', tile)[:,latitude_aux_column]
+    month_wrap_var[:] = np.arange(1,13,1)
+    lev_wrap_var[:] = deptht
+    print "Create netcdf file successfully"
+    logging.info("The netcdf file for the zonal integral of the meridional energy transport is created!!")
+
+    return data_append
+
+if __name__=="__main__":
+    print '*******************************************************************'
+    print '******  Prepare all the constants and auxillary variables   *******'
+    print '*******************************************************************'
+    # create the year index
+    period = np.arange(start_year,end_year+1,1)
+    namelist_month = ['01','02','03','04','05','06','07','08','09','10','11','12']
+    index_month = np.arange(12)
+    # mesh of ORCA0083, the 3D fields are read in tiles of rows j (wizard.mesh)
+    ocean_mesh = mesh.ORCAMesh('ORCA0083', datapath, mesh_cache_path)
+    deptht, e3t_0 = ocean_mesh.fields('deptht', 'e3t_0')
+    level = len(e3t_0)
+    jj, ji = ocean_mesh.shape('e1v')
+    # number of rows per tile for the memory budget (the fields of one month)
+    rows = min(omet.rows_per_tile(memory_budget, level, ji), jj)
+    print "ORCA0083 grid %d x %d x %d, tiles of %d rows" % (level, jj, ji, rows)
+    logging.info("ORCA0083 grid %d x %d x %d, tiles of %d rows" % (level, jj, ji, rows))
+    # land-sea masks of the basins (j, i)
+    basin_names, basin_long_names, basin_masks = ocean_mesh.basin_masks(basins)
+    ####################################################################
+    ###  Create space for stroing intermediate variables and outputs ###
+    ####################################################################
+    # create NetCDF files, the OMET and the meridional overturning of each month are
+    # appended as soon as they are computed
+    point_append = create_netcdf_point(output_path)
+    zonal_int_append = create_netcdf_zonal_int(output_path)
+    # loop for calculation
+    for n, i in enumerate(period):
+        for j in index_month:
+            # get the key of each variable
+            theta_key, v_key = var_key(datapath, i, j)
+            # OMET at each grid point (written tile by tile), its zonal integrals and the
+            # stream functions of the globe and the basins
+            E_zonal, psi = meridional_energy_transport(theta_key, v_key, point_append, n, j)
+            theta_key.close()
+            v_key.close()
+            point_append.append((n,j), {'year' : i})
+            zonal_int_fields = {'year' : i, 'E' : E_zonal[0], 'Psi_glo' : psi[0]}
+            for name, E_basin, psi_basin in zip(basin_names, E_zonal[1:], psi[1:]):
+                zonal_int_fields['E_%s' % (name)] = E_basin
+                zonal_int_fields['Psi_%s' % (name)] = psi_basin
+            zonal_int_append.append((n,j), zonal_int_fields)
+            del E_zonal, psi
+    # close the NetCDF files
+    point_append.close()
+    zonal_int_append.close()
+
+    print 'Computation of meridional energy transport on ORCA grid for NEMO ORCA0083 is complete!!!'
+    print 'The output is in sleep, safe and sound!!!'
+    logging.info("The full pipeline of the quantification of meridional energy transport in the ocean is accomplished!")
+
+print ("--- %s minutes ---" % ((tttt.time() - start_time)/60))
@@ -48,6 +48,13 @@ import matplotlib
 # generate images without having a window appear
 matplotlib.use('Agg')
 import matplotlib.pyplot as plt
+# shared kernels of Energy-Wizard at the root of the repository
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir))
+from wizard import accumulate
+from wizard import dated
+from wizard import mesh
+from wizard import output
+from wizard import overturning
 #from mpl_toolkits.basemap import Basemap, cm
 #import cartopy.crs as ccrs
 #from cartopy.mpl.gridliner import LONGITUDE_FORMATTER, LATITUDE_FORMATTER
@@ -97,32 +104,38 @@ datapath = '/projects/0/blueactn/reanalysis/SODA3/5day/soda%d' % (input_year)
 # path of mask file
 datapath_mask = '/projects/0/blueactn/reanalysis/SODA3'
 # the input files are 5 days data
-# each file has a name with date
-# we have to load files for each month seperately, for the sake of monthly mean
-# each record for each month is placed in folders by month
-# the names are listed in a txt file line by line
-# we will load the name from the txt file
-datapath_namelist = '/projects/0/blueactn/reanalysis/SODA3/5day/soda%d' % (input_year)
-ff = open(datapath_namelist + os.sep + 'namelist.txt','r')
-# can not skip \n
-#namelist = ff.readlines()
-# remember to skip \n
-namelist = ff.read().splitlines()
-print namelist
-ff.close()
+# each file has a name with date, e.g. soda3.4.1_5dy_ocean_or_2015_01_03.nc
+# the files of the year are found by the date in their names (wizard.dated) and
+# folded month by month into the monthly means
+file_prefix = 'soda3.4.1_5dy_ocean_or_%d_' % (input_year)
+# write the annual mean as well
+annual_mean = True
 
 # specify output path for the netCDF4 file
 output_path = '/home/lwc16308/reanalysis/SODA3/output'
+# packing of the output fields (wizard.output), None (float64), 'float32' or 'int16'
+output_packing = None
+# range (minimum, maximum) of the output fields for the int16 packing (wizard.output), required
+# since the fields are appended one by one and the first append does not cover the range
+# OMET at each grid point [TW]
+point_value_range = None
+# zonal integral of OMET of the globe and of the basins [TW]
+zonal_value_range = None
+# stream function of the globe and of the basins [Sv]
+psi_value_range = None
+# directory of the cache of the fields derived from the mesh (wizard.mesh), None for the directory of the mesh
+mesh_cache_path = None
+# basins of the zonal integral of OMET and of the stream function besides the globe (wizard.mesh)
+# 'atl' (Atlantic), 'inp' (Indo-Pacific), 'arc' (Arctic) or a polygon (name, [(lon, lat), ...])
+# e.g. ('nordic', [(-30,60),(20,60),(20,80),(-30,80)])
+basins = ['atl', 'inp', 'arc']
 ####################################################################################
 
-def var_key(datapath, file_name):
+def var_key(datapath_var):
     # get the path to each datasets
+    file_name = os.path.basename(datapath_var)
     print "Start retrieving datasets %s" % (file_name)
     logging.info("Start retrieving variables from %s" % (file_name))
-    ####################################################################
-    #########  Pick up variables and deal with the naming rule #########
-    ####################################################################
-    datapath_var = datapath + os.sep + '%s' % (file_name)
     # get the variable keys
     soda_key = Dataset(datapath_var)
 
@@ -130,135 +143,26 @@ def var_key(datapath, file_name):
     logging.info("Retrieving variables from %s successfully!" % (file_name))
     return soda_key
 
-def var_coordinate(datapath_mask):
-    print "Start retrieving the MOM5 coordinate and mask info"
-    logging.info('Start retrieving the MOM5 coordinate and mask info')
-    # get the variable keys
-    mesh_mask_key = Dataset(datapath_mask + os.sep + 'topog.nc')
-    #subbasin_mesh_key = Dataset(datapath+ os.sep + '') #sub-basin from Andreas
-    #extract variables
-    # nominal coordinate info (1D)
-    grid_x_T = mesh_mask_key.variables['grid_x_T'][:]           # Nominal Longitude of T-cell center
-    grid_y_T = mesh_mask_key.variables['grid_y_T'][:]           # Nominal Latitude of T-cell center
-    grid_x_C = mesh_mask_key.variables['grid_x_C'][:]           # Nominal Longitude of C-cell center
-    grid_y_C = mesh_mask_key.variables['grid_y_C'][:]           # Nominal Latitude of C-cell center
-    # lat-lon-depth coordinate info (2D)
-    x_T = mesh_mask_key.variables['x_T'][:]                     # Geographic Longitude of T-cell center
-    y_T = mesh_mask_key.variables['y_T'][:]                     # Geographic Latitude of T-cell center
-    x_C = mesh_mask_key.variables['x_C'][:]                     # Geographic Longitude of C-cell center
-    y_C = mesh_mask_key.variables['y_C'][:]                     # Geographic Latitude of C-cell center
-    # depth
-    zt = mesh_mask_key.variables['zt'][:]                       # Depth of T cell (z50)
-    zb = mesh_mask_key.variables['zb'][:]                       # Depth of T cell edges (z50)
-    # calculate the depth of each layer
-    dz = np.zeros(zt.shape)
-    dz[0] = zb[0]
-    dz[1:] = zb[1:] - zb[:-1]
-    # area of T cell - for the computation onamelistf ocean heat content
-    area_T = mesh_mask_key.variables['area_T'][:]               # Area of T-cell
-    # width (e1t) and height (e2t) of T-cell
-    e1t = mesh_mask_key.variables['ds_01_21_T'][:]
-    e2t = mesh_mask_key.variables['ds_10_12_T'][:]
-    # width (e1c) and height (e2c) of C-cell
-    e1c = mesh_mask_key.variables['ds_01_21_C'][:]
-    e2c = mesh_mask_key.variables['ds_10_12_C'][:]
-    # land-sea mask (2D)
-    tmask = mesh_mask_key.variables['wet'][:]                   # land/sea flag (0=land) for T-cell
-    cmask = mesh_mask_key.variables['wet_c'][:]                 # land/sea flag (0=land) for C-cell
-    # number of vertical cells - topography
-    # this number also indicates the partial cells
-    mbathy_t = mesh_mask_key.variables['num_levels'][:]         # number of vertical T-cells
-    mbathy_c = mesh_mask_key.variables['num_levels_c'][:]       # number of vertical C-cells
-    # topographic depth of cell
-    topo_depth_t = mesh_mask_key.variables['depth'][:]          # topographic depth of T-cell
-    topo_depth_c = mesh_mask_key.variables['depth_c'][:]        # topographic depth of C-cell
-
-    # calculate the atlantic land sea mask
-    tmaskatl = tmask
-    tmaskatl[0:225,:] = 0 # boundary south
-    tmaskatl[:,0:727] = 0 # boundary west
-    tmaskatl[:,1200:] = 0 # boundary east
-    tmaskatl[y_T>70] = 0 # boundary north
-    # correction Mediterranean
-    tmaskatl[614:680,1100:1240] = 0
-    tmaskatl[660:720,1140:1280] = 0
-    # correction Pacific
-    tmaskatl[225:522,759:839] = 0
-    tmaskatl[225:545,670:780] = 0
-    tmaskatl[225:560,670:759] = 0
-
-    print "Retrieve the MOM5 coordinate and mask info successfully!"
-    logging.info('Finish retrieving the MOM5 coordinate and mask info')
-
-    return grid_x_T, grid_y_T, grid_x_C, grid_y_C, x_T, y_T, x_C, y_C, zt, zb, dz, area_T,\
-           e1t, e2t, e1c, e2c, tmask, tmaskatl, cmask, mbathy_t, mbathy_c, topo_depth_t, topo_depth_c
-
-
 def stream_function(soda_key,e1c):
     '''
     This function is used to calculate the mass transport.
     The unit is Sv (1E+6 m3/s)
     '''
-    print "Compute the meridional overturning stream function for globle and Atlantic!"
-    logging.info('Compute the meridional overturning stream function for globle and Atlantic!')
+    print "Compute the meridional overturning stream function for globle and each basin!"
+    logging.info('Compute the meridional overturning stream function for globle and each basin!')
     #dominant equation for stream function
     # psi = e1c(m) * rho(kg/m3) * v(m/s) * dz(m) = (kg/s)
     # extract variables
     #u = soda_key.variables['u'][0,:,:,:]
     v = soda_key.variables['v'][0,:,:,:]
-    # set the filled value to be 0
-    #np.ma.set_fill_value(u,0)
-    np.ma.set_fill_value(v,0)
-    # define the stream function psi
-    psi_globe = np.zeros((level,jj,ji),dtype=float)
-    psi_atlantic = np.zeros((level,jj,ji),dtype=float)
-    # expand the grid size matrix e1c to avoid more loops
-    #e1c_3D = np.repeat(e1c[np.newaxis,:,:],level,0)
-    # choose the integration order
-    int_order = 1  # 1 - from sea bottom to sea surface 2 from sea surfaca to sea bottom
-    if int_order == 1:
-        # take the integral from sea botton to the surface
-        # global meridional overturning stream function
-        for i in (level - np.arange(level) -1):
-            if i == level -1:
-                psi_globe[i,:,:] = e1c * v[i,:,:] * cmask * dz[i] -\
-                                   e1c * v[i,:,:] * cmask * dz_adjust_c[i,:,:]
-                # for old version of python to avoid the filling value during summation
-                psi_globe[i,:,:] = psi_globe[i,:,:] * cmask
-            else:
-                psi_globe[i,:,:] = e1c * v[i,:,:] * cmask * dz[i] + psi_globe[i+1,:,:] -\
-                                   e1c * v[i,:,:] * cmask * dz_adjust_c[i,:,:]
-                # for old version of python to avoid the filling value during summation
-                psi_globe[i,:,:] = psi_globe[i,:,:] * cmask
-        # Atlantic meridional overturning stream function
-        for i in (level - np.arange(level) -1 ):
-            if i == level -1:
-                psi_atlantic[i,:,:] = e1c * v[i,:,:] * cmask * tmaskatl * dz[i] -\
-                                      e1c * v[i,:,:] * cmask * tmaskatl * dz_adjust_c[i,:,:]
-                # for old version of python to avoid the filling value during summation
-                psi_atlantic[i,:,:] = psi_atlantic[i,:,:] * tmaskatl * cmask
-            else:
-                psi_atlantic[i,:,:] = e1c * v[i,:,:] * cmask * tmaskatl * dz[i] + psi_atlantic[i+1,:,:] -\
-                                      e1c * v[i,:,:] * cmask * tmaskatl * dz_adjust_c[i,:,:]
-                # for old version of python to avoid the filling value during summation
-                psi_atlantic[i,:,:] = psi_atlantic[i,:,:] * tmaskatl * cmask[:]
-    elif int_order == 2:
-        # take the integral from sea surface to the bottom
-        for i in np.arange(level):
-            if i == 0:
-                psi_globe[i,:,:] = e1c * v[i,:,:] * cmask * dz[i] -\
-                                   e1c * v[i,:,:] * cmask * dz_adjust_c[i,:,:]
-            else:
-                psi_globe[i,:,:] = e1c * v[i,:,:] * cmask * dz[i] + psi_globe[i+1,:,:] -\
-                                   e1c * v[i,:,:] * cmask * dz_adjust_c[i,:,:]
-    # take the zonal integral
-    psi_stream_globe = np.sum(psi_globe,2)/1e+6 # the unit is changed to Sv
-    psi_stream_atlantic = np.sum(psi_atlantic,2)/1e+6 # the unit is changed to Sv
-
-    print "Compute the meridional overturning stream function for globle and Atlantic successfully!"
-    logging.info('Compute the meridional overturning stream function for globle and Atlantic successfully!')
-
-    return psi_stream_globe, psi_stream_atlantic
+    # integral from the sea bottom to the surface and zonal integral, for the globe and
+    # each basin in one pass (wizard.overturning)
+    psi_stream = overturning.stream_function(v, e1c, dz_cell_c, cmask, [None] + basin_masks)
+
+    print "Compute the meridional overturning stream function for globle and each basin successfully!"
+    logging.info('Compute the meridional overturning stream function for globle and each basin successfully!')
+
+    return psi_stream[0], psi_stream[1:]
 
 def visualization_stream_function(psi_glo,psi_atl):
     print "Visualize meridional overturning stream function for globle and Atlantic."
@@ -379,134 +283,129 @@ def zonal_int_plot(E_monthly):
     fig3.savefig(output_path + os.sep + 'OMET_SODA3_monthly_%d.png' % (input_year),dpi = 500)
     plt.close(fig3)
 
-def create_netcdf_point (meridional_E_point_pool,output_path):
+def create_netcdf_point (output_path, period_name):
     print '*******************************************************************'
     print '*********************** create netcdf file ************************'
     print '***********************    OMET on MOM    *************************'
     print '*******************************************************************'
-    # take the monthly mean
-    meridional_E_point_pool_mean = np.mean(meridional_E_point_pool,0)
     logging.info("Start creating netcdf file for total meridional energy transport at each grid point.")
+    # the monthly means are appended along month, the annual mean along year
+    time_name = 'month' if period_name == 'monthly' else 'year'
     # wrap the datasets into netcdf file
-    # 'NETCDF3_CLASSIC', 'NETCDF3_64BIT', 'NETCDF4_CLASSIC', and 'NETCDF4'
-    data_wrap = Dataset(output_path + os.sep + 'SODA3_model_5daily_mom5_E_point_%d.nc' % (input_year),'w',format = 'NETCDF3_64BIT')
+    # NETCDF4, compressed and chunked by time step (wizard.output)
+    data_wrap = output.create_dataset(output_path + os.sep + 'SODA3_model_%s_mom5_E_point_%d.nc' % (period_name,input_year))
     # create dimensions for netcdf data
-    #year_wrap_dim = data_wrap.createDimension('year',len(period))
-    #month_wrap_dim = data_wrap.createDimension('month',12)
-    #time_wrap_dim = data_wrap.createDimension('time',len(namelist))
+    time_wrap_dim = data_wrap.createDimension(time_name,None)
     lat_wrap_dim = data_wrap.createDimension('j',jj)
     lon_wrap_dim = data_wrap.createDimension('i',ji)
+    data_append = output.Appender(data_wrap, flush_interval=1)
     # create coordinate variables for 3-dimensions
     # 1D
-    #year_wrap_var = data_wrap.createVariable('year',np.int32,('year',))
-    #month_wrap_var = data_wrap.createVariable('month',np.int32,('month',))
-    #time_wrap_var = data_wrap.createVariable('time',np.int32,('time',))
+    time_wrap_var = data_append.create_variable(time_name,np.int32,(time_name,))
     # 2D
-    lat_wrap_var = data_wrap.createVariable('latitude',np.float32,('j','i'))
-    lon_wrap_var = data_wrap.createVariable('longitude',np.float32,('j','i'))
-    # 4D
-    E_total_wrap_var = data_wrap.createVariable('E',np.float64,('j','i'))
+    lat_wrap_var = data_append.create_variable('latitude',np.float32,('j','i'))
+    lon_wrap_var = data_append.create_variable('longitude',np.float32,('j','i'))
+    # 3D
+    E_total_wrap_var = data_append.create_variable('E',np.float64,(time_name,'j','i'),packing=output_packing,value_range=point_value_range)
     # global attributes
-    data_wrap.description = '5 daily meridional energy transport on MOM5 grid'
+    data_wrap.description = '%s mean meridional energy transport on MOM5 grid, from the 5 daily data' % (period_name.capitalize())
     # variable attributes
     lat_wrap_var.units = 'MOM5_latitude'
     lon_wrap_var.units = 'MOM5_longitude'
-    #time_wrap_var.units = 'day'
     E_total_wrap_var.units = 'tera watt'
 
     lat_wrap_var.long_name = 'MOM5 grid latitude'
     lon_wrap_var.long_name = 'MOM5 grid longitude'
-    #time_wrap_var.long_name = '5 day time'
     E_total_wrap_var.long_name = 'oceanic meridional energy transport'
-    # writing data
-    #year_wrap_var[:] = period
+    # writing data, the means are appended by the main loop
     lat_wrap_var[:] = y_C
     lon_wrap_var[:] = x_C
-    #time_wrap_var[:] = np.arange(len(namelist))
-    #month_wrap_var[:] = np.arange(1,13,1)
-    E_total_wrap_var[:] = meridional_E_point_pool_mean
-    # close the file
-    data_wrap.close()
     print "Create netcdf file successfully"
-    logging.info("The generation of netcdf files for the total meridional energy transport on each grid point is complete!!")
+    logging.info("The netcdf file for the total meridional energy transport on each grid point is created!!")
+
+    return data_append
 
-def create_netcdf_zonal_int (meridional_E_zonal_int_pool, meridional_psi_zonal_glo, meridional_psi_zonal_atl,output_path):
+def create_netcdf_zonal_int (output_path, period_name):
     print '*******************************************************************'
     print '*********************** create netcdf file ************************'
     print '***********************    OMET on ORCA   *************************'
     print '*******************************************************************'
-    # take the monthly mean
-    meridional_E_zonal_int_pool_mean = np.mean(meridional_E_zonal_int_pool,0)
-    meridional_psi_zonal_glo_mean = np.mean(meridional_psi_zonal_glo,0)
-    meridional_psi_zonal_atl_mean = np.mean(meridional_psi_zonal_atl,0)
-    logging.info("Start creating netcdf file for total meridional energy transport at each grid point.")
+    logging.info("Start creating netcdf file for the zonal integral of meridional energy transport.")
+    # the monthly means are appended along month, the annual mean along year
+    time_name = 'month' if period_name == 'monthly' else 'year'
     # wrap the datasets into netcdf file
-    # 'NETCDF3_CLASSIC', 'NETCDF3_64BIT', 'NETCDF4_CLASSIC', and 'NETCDF4'
-    data_wrap = Dataset(output_path + os.sep + 'SODA3_model_5daily_mom5_E_zonal_int_%d.nc' % (input_year),'w',format = 'NETCDF3_64BIT')
+    # NETCDF4, compressed and chunked by time step (wizard.output)
+    data_wrap = output.create_dataset(output_path + os.sep + 'SODA3_model_%s_mom5_E_zonal_int_%d.nc' % (period_name,input_year))
     # create dimensions for netcdf data
-    #year_wrap_dim = data_wrap.createDimension('year',len(period))
-    #month_wrap_dim = data_wrap.createDimension('month',12)
-    #time_wrap_dim = data_wrap.createDimension('time',len(namelist))
+    time_wrap_dim = data_wrap.createDimension(time_name,None)
     lat_wrap_dim = data_wrap.createDimension('latitude_aux',jj)
     lev_wrap_dim = data_wrap.createDimension('lev',level)
+    data_append = output.Appender(data_wrap, flush_interval=1)
     # create coordinate variables for 3-dimensions
     # 1D
-    #year_wrap_var = data_wrap.createVariable('year',np.int32,('year',))
-    #month_wrap_var = data_wrap.createVariable('month',np.int32,('month',))
-    #time_wrap_var = data_wrap.createVariable('time',np.int32,('time',))
-    lat_wrap_var = data_wrap.createVariable('latitude_aux',np.float32,('latitude_aux',))
-    lev_wrap_var = data_wrap.createVariable('lev',np.float32,('lev',))
+    time_wrap_var = data_append.create_variable(time_name,np.int32,(time_name,))
+    lat_wrap_var = data_append.create_variable('latitude_aux',np.float32,('latitude_aux',))
+    lev_wrap_var = data_append.create_variable('lev',np.float32,('lev',))
+    # 2D
+    E_total_wrap_var = data_append.create_variable('E',np.float64,(time_name,'latitude_aux'),packing=output_packing,value_range=zonal_value_range)
     # 3D
-    E_total_wrap_var = data_wrap.createVariable('E',np.float64,('latitude_aux',))
-    # 4D
-    psi_glo_wrap_var = data_wrap.createVariable('Psi_glo',np.float64,('lev','latitude_aux'))
-    psi_atl_wrap_var = data_wrap.createVariable('Psi_atl',np.float64,('lev','latitude_aux'))
+    psi_glo_wrap_var = data_append.create_variable('Psi_glo',np.float64,(time_name,'lev','latitude_aux'),packing=output_packing,value_range=psi_value_range)
+    # zonal integrals and stream functions of the basins, e.g. E_atl and Psi_atl
+    for name, long_name in zip(basin_names, basin_long_names):
+        E_basin_wrap_var = data_append.create_variable('E_%s' % (name),np.float64,(time_name,'latitude_aux'),packing=output_packing,value_range=zonal_value_range)
+        psi_basin_wrap_var = data_append.create_variable('Psi_%s' % (name),np.float64,(time_name,'lev','latitude_aux'),packing=output_packing,value_range=psi_value_range)
+        E_basin_wrap_var.units = 'tera watt'
+        psi_basin_wrap_var.units = 'Sv'
+        E_basin_wrap_var.long_name = 'Oceanic meridional energy transport of %s ocean' % (long_name)
+        psi_basin_wrap_var.long_name = 'Meridional overturning stream function of %s ocean' % (long_name)
     # global attributes
-    data_wrap.description = 'Monthly mean zonal integral of meridional energy transport on ORCA grid'
+    data_wrap.description = '%s mean zonal integral of meridional energy transport on MOM5 grid, from the 5 daily data' % (period_name.capitalize())
     # variable attributes
     lat_wrap_var.units = 'degree_north'
     E_total_wrap_var.units = 'tera watt'
     lev_wrap_var.units = 'm'
-    #time_wrap_var.units = 'day'
     psi_glo_wrap_var.units = 'Sv'
-    psi_atl_wrap_var.units = 'Sv'
 
     lev_wrap_var.long_name = 'depth'
     lat_wrap_var.long_name = 'auxillary latitude'
-    #time_wrap_var.long_name = '5 day time'
     E_total_wrap_var.long_name = 'Oceanic meridional energy transport'
     psi_glo_wrap_var.long_name = 'Meridional overturning stream function of global ocean'
-    psi_atl_wrap_var.long_name = 'Meridional overturning stream function of Atlantic ocean'
-    # writing data
-    #year_wrap_var[:] = period
+    # writing data, the means are appended by the main loop
     lat_wrap_var[:] = grid_y_C
-    #month_wrap_var[:] = np.arange(1,13,1)
     lev_wrap_var[:] = zt
-    #time_wrap_var[:] = np.arange(len(namelist))
-    E_total_wrap_var[:] = meridional_E_zonal_int_pool_mean
-    psi_glo_wrap_var[:] = meridional_psi_zonal_glo_mean
-    psi_atl_wrap_var[:] = meridional_psi_zonal_atl_mean
-    # close the file
-    data_wrap.close()
     print "Create netcdf file successfully"
-    logging.info("The generation of netcdf files for the total meridional energy transport is complete!!")
+    logging.info("The netcdf file for the zonal integral of the meridional energy transport is created!!")
+
+    return data_append
+
+def zonal_int_fields(E_point_mean, psi_mean):
+    '''
+    Zonal integrals of the mean OMET and the mean stream functions (globe first, then
+    the basins) for the output.
+    '''
+    fields = {'E' : np.sum(E_point_mean,1), 'Psi_glo' : psi_mean[0]}
+    # the zonal integral is linear, the integral of the mean is the mean of the integrals
+    E_basins = overturning.zonal_integrals(E_point_mean, basin_masks)
+    for n, name in enumerate(basin_names):
+        fields['E_%s' % (name)] = E_basins[n]
+        fields['Psi_%s' % (name)] = psi_mean[n+1]
+
+    return fields
 
 if __name__=="__main__":
     print '*******************************************************************'
     print '******  Prepare all the constants and auxillary variables   *******'
     print '*******************************************************************'
-    # create the year index
-    #period = np.arange(start_year,end_year+1,1)
-    namelist_month = ['01','02','03','04','05','06','07','08','09','10','11','12']
-    #index_month = np.arange(12)
-    #index_filename = len(namelist)
     # ORCA1_z42 info (Madec and Imbard 1996)
     ji = 1440
     jj = 1070
     level = 50
     # extract the mesh_mask and coordinate information
-    grid_x_T, grid_y_T, grid_x_C, grid_y_C, x_T, y_T, x_C, y_C, zt, zb, dz, area_T, e1t,\
-    e2t, e1c, e2c, tmask, tmaskatl, cmask, mbathy_t, mbathy_c, topo_depth_t, topo_depth_c = var_coordinate(datapath_mask)
+    # mesh of MOM5, the fields are read from the mesh files when they are used (wizard.mesh)
+    ocean_mesh = mesh.MOMMesh(datapath_mask, mesh_cache_path)
+    grid_y_C, x_C, y_C, zt, dz, e1c, cmask = ocean_mesh.fields('grid_y_C', 'x_C', 'y_C', 'zt', 'dz', 'e1c', 'cmask')
+    # land-sea masks of the basins
+    basin_names, basin_long_names, basin_masks = ocean_mesh.basin_masks(basins)
     print '*******************************************************************'
     print '*******************  Partial cells correction   *******************'
     print '*******************************************************************'
@@ -517,54 +416,80 @@ if __name__=="__main__":
     # then minus this adjustment when calculate the OMET at each layer with mask
     # Attention! Since python start with 0, the partial cell info given in mbathy should incoporate with this
     # !!!
-    dz_adjust_t = np.zeros((level,jj,ji),dtype = float)
-    dz_adjust_c = np.zeros((level,jj,ji),dtype = float)
-    for i in np.arange(jj):
-        for j in np.arange(ji):
-            if mbathy_t[i,j] != 0:
-                counter_t = int(mbathy_t[i,j] - 1)
-                dz_adjust_t[counter_t,i,j] = zb[counter_t] - topo_depth_t[i,j]    # python start with 0, so i-1
-            if mbathy_c[i,j] != 0:
-                counter_c = int(mbathy_c[i,j] - 1)
-                dz_adjust_c[counter_c,i,j] = zb[counter_c] - topo_depth_c[i,j]    # python start with 0, so i-1
+    # the levels 1 to level of mbathy have a partial cell, cached for each mesh (wizard.mesh)
+    dz_adjust_t = ocean_mesh.dz_adjust_t
+    dz_adjust_c = ocean_mesh.dz_adjust_c
+    # thickness of the C-cells with the partial cells
+    dz_cell_c = overturning.cell_thickness(dz, dz_adjust_c)
     ####################################################################
     ###  Create space for stroing intermediate variables and outputs ###
     ####################################################################
-    #create a data pool to save the OMET for each year and month
-    E_pool_point = np.zeros((len(namelist),jj,ji),dtype = float)
-    E_pool_zonal_int = np.zeros((len(namelist),jj),dtype = float)
-    #E_pool_point_regrid = np.zeros((len(period),900,1440),dtype = float)
-    # Meridional overturning stream function
-    psi_pool_zonal_glo = np.zeros((len(namelist),level,jj),dtype = float) # for Globe
-    psi_pool_zonal_atl = np.zeros((len(namelist),level,jj),dtype = float) # for Atlantic
+    # the 5 daily files of the year, by the date in their names
+    files = dated.dated_files(datapath, prefix=file_prefix)
+    logging.info("Found %d files of %d in %s" % (len(files), input_year, datapath))
+    # create NetCDF files, the monthly means are appended as soon as the month is complete
+    point_append = create_netcdf_point(output_path, 'monthly')
+    zonal_int_append = create_netcdf_zonal_int(output_path, 'monthly')
+    # running means over the year (wizard.accumulate), the 5 daily fields are not kept
+    E_point_annual = accumulate.RunningMean()
+    psi_annual = accumulate.RunningMean()
+    # the zonal integral of each month is kept for the plot
+    E_monthly_zonal_int = []
     # loop for calculation
-    for i in np.arange(len(namelist)):
-        ####################################################################
-        #########################  Extract variables #######################
-        ####################################################################
-        # get the key of each variable
-        soda_key = var_key(datapath, namelist[i])
-        ####################################################################
-        ########  Calculate meridional overturning stream function #########
-        ####################################################################
-        # calculate the stokes stream function and plot
-        psi_glo, psi_atl = stream_function(soda_key,e1c)
-        psi_pool_zonal_glo[i,:,:] = psi_glo
-        psi_pool_zonal_atl[i,:,:] = psi_atl
-        ####################################################################
-        ##############  Calculate meridional energy transport ##############
-        ####################################################################
-        # calculate the meridional energy transport in the ocean
-        E_point = meridional_energy_transport(soda_key)
-        E_pool_point[i,:,:] = E_point
-        E_pool_zonal_int[i,:] = np.sum(E_point,1)
-        # plot the stream function
-        #visualization_stream_function(psi_pool_zonal_glo,psi_pool_zonal_atl)
-        # create NetCDF file and save the output
+    for n, ((year, month), month_files) in enumerate(dated.by_month(files)):
+        print "Compute the monthly mean of %d-%02d from %d files" % (year, month, len(month_files))
+        logging.info("Compute the monthly mean of %d-%02d from %d files" % (year, month, len(month_files)))
+        E_point_monthly = accumulate.RunningMean()
+        psi_monthly = accumulate.RunningMean()
+        for date, datapath_var in month_files:
+            ####################################################################
+            #########################  Extract variables #######################
+            ####################################################################
+            # get the key of each variable
+            soda_key = var_key(datapath_var)
+            ####################################################################
+            ########  Calculate meridional overturning stream function #########
+            ####################################################################
+            # calculate the stokes stream function, globe first and then the basins
+            psi_glo, psi_basins = stream_function(soda_key,e1c)
+            psi = np.array([psi_glo] + list(psi_basins))
+            ####################################################################
+            ##############  Calculate meridional energy transport ##############
+            ####################################################################
+            # calculate the meridional energy transport in the ocean
+            E_point = meridional_energy_transport(soda_key)
+            soda_key.close()
+            # fold the 5 daily fields into the running means
+            E_point_monthly.add(E_point)
+            psi_monthly.add(psi)
+            if annual_mean:
+                E_point_annual.add(E_point)
+                psi_annual.add(psi)
+            del E_point, psi_glo, psi_basins, psi
+        # write the monthly mean
+        E_point_mean = E_point_monthly.mean()
+        fields = zonal_int_fields(E_point_mean, psi_monthly.mean())
+        fields['month'] = month
+        point_append.append(n, {'month' : month, 'E' : E_point_mean})
+        zonal_int_append.append(n, fields)
+        E_monthly_zonal_int.append(fields['E'])
+        del E_point_monthly, psi_monthly, E_point_mean
+    point_append.close()
+    zonal_int_append.close()
+    # write the annual mean
+    if annual_mean and E_point_annual.n > 0:
+        point_append = create_netcdf_point(output_path, 'annual')
+        zonal_int_append = create_netcdf_zonal_int(output_path, 'annual')
+        E_point_mean = E_point_annual.mean()
+        fields = zonal_int_fields(E_point_mean, psi_annual.mean())
+        fields['year'] = input_year
+        point_append.append(0, {'year' : input_year, 'E' : E_point_mean})
+        zonal_int_append.append(0, fields)
+        point_append.close()
+        zonal_int_append.close()
     # plot the zonal int of all time
-    zonal_int_plot(E_pool_zonal_int)
-    create_netcdf_point(E_pool_point,output_path)
-    create_netcdf_zonal_int(E_pool_zonal_int,psi_pool_zonal_glo,psi_pool_zonal_atl,output_path)
+    if E_monthly_zonal_int:
+        zonal_int_plot(np.array(E_monthly_zonal_int))
 
     print 'Computation of meridional energy transport on MOM5 grid for SODA3 is complete!!!'
     print 'The output is in sleep, safe and sound!!!'
@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+"""
+Copyright Netherlands eScience Center
+
+Function        : Convert the EC-Earth output from GRIB to NetCDF4 (once)
+Date            : 2026.10.17
+Last Update     : 2026.10.17
+Description     : The code converts the input of the computation of AMET for EC-Earth
+                  (u, v, T, gz from the spectral file ICMSHECE3, q, sp and the surface
+                  and land parameters from the Gaussian grid file ICMGGECE3) into a
+                  NetCDF4 store (wizard.store), one file for each output file of
+                  EC-Earth (usually a month). The fields are compressed and chunked
+                  per record with all levels. The GRIB files are decoded once, one
+                  worker per variable (wizard.grib), and the provenance is recorded in
+                  the manifest of the store. Output which is in the store and whose
+                  GRIB files are unchanged is skipped.
+
+                  The AMET scripts of EC-Earth read the output from the store when it
+                  is available (store_path) and from GRIB otherwise.
+Return Value    : NetCDF4 data file and manifest.json
+Dependencies    : os, time, numpy, netCDF4, sys, logging, pygrib, wizard
+variables       : Zonal Wind                        u         [m/s]
+                  Meridional Wind                   v         [m/s]
+                  Absolute Temperature              T         [K]
+                  Geopotential                      gz        [m2/s2]
+                  Specific Humidity                 q         [kg/kg]
+                  Surface Pressure                  sp        [Pa]
+                  and the 13 surface and land parameters of AMET_ECearth_2nd_AMIP_exp
+Caveat!!        : Model Level: TOA to surface (1 to 91), as in the GRIB files
+                  Latitude: North to South (90 to -90)
+                  Lontitude: West to East (0 to 360)
+"""
+import numpy as np
+import time as tttt
+import os
+import platform
+import sys
+import logging
+import pygrib
+# shared kernels of Energy-Wizard at the root of the repository
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir))
+from wizard import grib
+from wizard import store
+
+# print the system structure and the path of the kernal
+print platform.architecture()
+print os.path
+
+# calculate the time for the code execution
+start_time = tttt.time()
+
+####################################################################################
+################################   Input zone  #####################################
+datapath = '/projects/0/blueactn/reanalysis/temp/'
+# time of the data, which concerns with the name of input
+line_in = sys.stdin.readline()
+file_name = int(line_in)
+# suffix of the GRIB files, e.g. '_sp2gpl' and '_gp' for the 1st AMIP run (store_1st_AMIP)
+suffix_SH = ''
+suffix_GG = ''
+# directory of the NetCDF4 store, the same as store_path in the AMET script of the run
+store_path = '/home/lwc16308/ecearth_postproc/store'
+# directory of the message index of each GRIB file (wizard.grib)
+index_path = '/home/lwc16308/ecearth_postproc/grib_index'
+# number of processes which decode the GRIB files (one per variable)
+decode_workers = 6
+####################################################################################
+###############################   stdout and log  ##################################
+# the store directory is created if it does not exist
+month_store = store.MonthStore(store_path, 'EC-Earth')
+# logging level 'DEBUG' 'INFO' 'WARNING' 'ERROR' 'CRITICAL'
+logging.basicConfig(filename = store_path + os.sep + 'history_ingest_%d.log' % (file_name),
+                    filemode = 'w', level = logging.DEBUG,
+                    format = '%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+####################################################################################
+
+# number of messages for one record
+num_SH_per = 457
+num_GG_per = 136
+# position of the messages (0 for the first message) in a record
+# spectral field: u (2-92), v (93-183), T (184-274) and gz (275-365)
+# Gaussian grid: q (35-125), sp (126) and the surface and land variables (1-10, 15, 24, 33)
+variables_SH = [('u', 'm/s', 'Zonal wind', np.arange(1,92)),
+                ('v', 'm/s', 'Meridional wind', np.arange(92,183)),
+                ('T', 'K', 'Absolute temperature', np.arange(183,274)),
+                ('gz', 'm2/s2', 'Geopotential', np.arange(274,365))]
+variables_GG = [('q', 'kg/kg', 'Specific humidity', np.arange(34,125)),
+                ('sp', 'Pa', 'Surface pressure', 125),
+                ('surface_runoff', 'm', 'Surface runoff', 0),
+                ('subsurface_runoff', 'm', 'Sub-surface runoff', 1),
+                ('snow_albedo', '0-1', 'Snow albedo', 2),
+                ('snow_density', 'kg/m3', 'Snow density', 3),
+                ('soil_water_layer_1', 'm3/m3', 'Volumetric soil water layer 1', 4),
+                ('soil_water_layer_2', 'm3/m3', 'Volumetric soil water layer 2', 5),
+                ('soil_water_layer_3', 'm3/m3', 'Volumetric soil water layer 3', 6),
+                ('soil_water_layer_4', 'm3/m3', 'Volumetric soil water layer 4', 7),
+                ('soil_temp_level_1', 'K', 'Soil temperature level 1', 8),
+                ('snow_depth', 'm', 'Snow depth', 9),
+                ('soil_temp_level_2', 'K', 'Soil temperature level 2', 14),
+                ('soil_temp_level_3', 'K', 'Soil temperature level 3', 23),
+                ('soil_temp_level_4', 'K', 'Soil temperature level 4', 32)]
+
+def read_records(path_SH, path_GG, start, stop):
+    '''
+    Fields of the records from start to stop (excluded).
+    '''
+    records = np.arange(start, stop)[:,np.newaxis]
+    blocks = [(path_SH, records * num_SH_per + messages) for name, units, long_name, messages in variables_SH]
+    # the 2D fields of the Gaussian grid are decoded by one worker
+    blocks.append((path_GG, records * num_GG_per + variables_GG[0][3]))
+    blocks.append((path_GG, records * num_GG_per + np.array([messages for name, units, long_name, messages in variables_GG[1:]])))
+    fields = grib.read_blocks(blocks, decode_workers, index_path)
+    names = [name for name, units, long_name, messages in variables_SH + variables_GG]
+    # the 2D fields as (record, latitude, longitude)
+    return dict(zip(names, fields[:5] + [fields[5][:,n] for n in range(len(variables_GG) - 1)]))
+
+if __name__=="__main__":
+    label = '%d' % (file_name)
+    if month_store.available(label):
+        print 'EC-Earth %s is already in the store' % (label)
+        logging.info('EC-Earth %s is already in the store' % (label))
+    else:
+        path_SH = datapath + os.sep + 'ICMSHECE3+%d%s' % (file_name, suffix_SH)
+        path_GG = datapath + os.sep + 'ICMGGECE3+%d%s' % (file_name, suffix_GG)
+        # number of records from the messages of the Gaussian grid
+        num_record = len(grib.open_index(path_GG, index_path).offset) // num_GG_per
+        benchmark_grbs = pygrib.open(path_GG)
+        lats, lons = benchmark_grbs.message(1).latlons()
+        benchmark_grbs.close()
+        latitude = lats[:,0]
+        longitude = lons[0,:]
+        month_store.convert(label, num_record, lambda start, stop: read_records(path_SH, path_GG, start, stop),
+                            [(name, units, long_name, True) for name, units, long_name, messages in variables_SH + variables_GG[:1]] +
+                            [(name, units, long_name, False) for name, units, long_name, messages in variables_GG[1:]],
+                            latitude, longitude, [path_SH, path_GG], level=np.arange(1,92), steps_per_block=1)
+    print 'The conversion of EC-Earth %d is complete!!!' % (file_name)
+    logging.info('The conversion of EC-Earth %d is complete!!!' % (file_name))
+
+print ("--- %s minutes ---" % ((tttt.time() - start_time)/60))
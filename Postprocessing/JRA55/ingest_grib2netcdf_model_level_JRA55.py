@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+"""
+Copyright Netherlands eScience Center
+
+Function        : Convert the JRA55 fields on model levels from GRIB to NetCDF4 (once)
+Date            : 2026.10.17
+Last Update     : 2026.10.17
+Description     : The code converts the input of the computation of AMET for JRA55
+                  (z, T, u, v and q on 60 model levels and the surface pressure,
+                  6 hourly) month by month into a NetCDF4 store (wizard.store). Each
+                  month is one file, compressed and chunked per time step with all
+                  levels. The GRIB files are decoded once, one worker per variable
+                  file (wizard.grib), and the provenance of each month is recorded
+                  in the manifest of the store. Months which are in the store and
+                  whose GRIB files are unchanged are skipped.
+
+                  The AMET scripts of JRA55 read a month from the store when it is
+                  available (store_path) and from GRIB otherwise.
+Return Value    : NetCDF4 data files and manifest.json
+Dependencies    : os, time, numpy, netCDF4, sys, logging, pygrib, wizard
+variables       : Geopotential Height               z         [gpm]
+                  Absolute Temperature              T         [K]
+                  Zonal Wind                        u         [m/s]
+                  Meridional Wind                   v         [m/s]
+                  Specific Humidity                 q         [kg/kg]
+                  Surface Pressure                  sp        [Pa]
+Caveat!!        : Model Level: surface to TOA (1 to 60), as in the GRIB files
+                  Latitude: North to South (90 to -90)
+                  Lontitude: West to East (0 to 360)
+"""
+import numpy as np
+import time as tttt
+import os
+import platform
+import sys
+import logging
+import pygrib
+# shared kernels of Energy-Wizard at the root of the repository
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir))
+from wizard import grib
+from wizard import store
+
+# print the system structure and the path of the kernal
+print platform.architecture()
+print os.path
+
+# calculate the time for the code execution
+start_time = tttt.time()
+
+####################################################################################
+################################   Input zone  #####################################
+datapath = '/projects/0/blueactn/reanalysis/JRA55/subdaily'
+# time of the data, which concerns with the name of input
+line_in = sys.stdin.readline()
+input_year = int(line_in)
+# directory of the NetCDF4 store, the same as store_path in the AMET scripts
+store_path = '/home/lwc16308/reanalysis/JRA55/store'
+# directory of the message index of each GRIB file (wizard.grib)
+index_path = '/home/lwc16308/reanalysis/JRA55/grib_index'
+# number of processes which decode the GRIB files (one per variable file)
+decode_workers = 5
+####################################################################################
+# ==============================  Initial test   ==================================
+# benchmark datasets for basic dimensions
+benchmark_grbs = pygrib.open(datapath + os.sep + 'jra2000' + os.sep + 'anl_mdl.011_tmp.reg_tl319.2000010100_2000011018')
+benchmark_key = benchmark_grbs.message(1)
+lats, lons = benchmark_key.latlons()
+latitude = lats[:,0]
+longitude = lons[0,:]
+benchmark_grbs.close()
+# =================================================================================
+###############################   stdout and log  ##################################
+# the store directory is created if it does not exist
+month_store = store.MonthStore(store_path, 'JRA55')
+# logging level 'DEBUG' 'INFO' 'WARNING' 'ERROR' 'CRITICAL'
+logging.basicConfig(filename = store_path + os.sep + 'history_ingest_%d.log' % (input_year),
+                    filemode = 'w', level = logging.DEBUG,
+                    format = '%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+####################################################################################
+
+namelist_month = ['01','02','03','04','05','06','07','08','09','10','11','12']
+long_month_list = np.array([1,3,5,7,8,10,12])
+leap_year_list = np.array([1976,1980,1984,1988,1992,1996,2000,2004,2008,2012,2016,2020])
+# variables on model levels and the number of their GRIB files
+variables_3D = [('z', '007_hgt', 'gpm', 'Geopotential height'),
+                ('T', '011_tmp', 'K', 'Absolute temperature'),
+                ('u', '033_ugrd', 'm/s', 'Zonal wind'),
+                ('v', '034_vgrd', 'm/s', 'Meridional wind'),
+                ('q', '051_spfh', 'kg/kg', 'Specific humidity')]
+
+def file_name(year, month, days, rounds):
+    '''
+    Name of the 10-day file (1-10, 11-20, 21-end) of a round, without variable.
+    '''
+    first_day, last_day = [(1,10),(11,20),(21,days)][rounds]
+    return 'reg_tl319.%d%s%02d00_%d%s%02d18' % (year,namelist_month[month-1],first_day,
+                                                 year,namelist_month[month-1],last_day)
+
+def sp_path(year, month, days):
+    '''
+    Surface pressure file, one file per year or, since 2014, one file per month.
+    '''
+    path = datapath + os.sep + 'jra_surf' + os.sep + 'anl_surf.001_pres.reg_tl319.%d010100_%d123118' % (year,year)
+    if not os.path.exists(path):
+        path = datapath + os.sep + 'jra_surf' + os.sep + 'anl_surf.001_pres.reg_tl319.%d%s0100_%d%s%d18' % (year,namelist_month[month-1],
+                                                                                                          year,namelist_month[month-1],days)
+    return path
+
+def read_day(year, month, days, start, stop):
+    '''
+    Fields of the time steps from start to stop (excluded) of one day.
+    '''
+    rounds = min(start // 40, 2)
+    times = grib.analysis_times(year, month, 1, days)[start:stop]
+    paths = [datapath + os.sep + 'jra%d' % (year) + os.sep + 'anl_mdl.%s.' % (number) + file_name(year, month, days, rounds)
+             for name, number, units, long_name in variables_3D]
+    # decode the variable files at the same time, one worker per file
+    fields = grib.read_blocks([(path, grib.open_index(path, index_path).locate(times, range(1,61))) for path in paths],
+                              decode_workers, index_path)
+    fields = dict(zip([name for name, number, units, long_name in variables_3D], fields))
+    fields['sp'] = grib.open_index(sp_path(year, month, days), index_path).read(times)
+
+    return fields
+
+if __name__=="__main__":
+    for j in np.arange(1,13):
+        # determine how many days are there in a month
+        if j in long_month_list:
+            days = 31
+        elif j == 2:
+            if input_year in leap_year_list:
+                days = 29
+            else:
+                days = 28
+        else:
+            days = 30
+        label = '%d_%s' % (input_year, namelist_month[j-1])
+        if month_store.available(label):
+            print 'JRA55 %s is already in the store' % (label)
+            logging.info('JRA55 %s is already in the store' % (label))
+            continue
+        sources = [datapath + os.sep + 'jra%d' % (input_year) + os.sep + 'anl_mdl.%s.' % (number) + file_name(input_year, j, days, rounds)
+                   for rounds in np.arange(3) for name, number, units, long_name in variables_3D] + [sp_path(input_year, j, days)]
+        # one day (4 time steps) per block, which never crosses the 10-day files
+        month_store.convert(label, days*4, lambda start, stop: read_day(input_year, j, days, start, stop),
+                            [(name, units, long_name, True) for name, number, units, long_name in variables_3D] +
+                            [('sp', 'Pa', 'Surface pressure', False)],
+                            latitude, longitude, sources, level=np.arange(1,61), steps_per_block=4)
+
+    print 'The conversion of JRA55 %d is complete!!!' % (input_year)
+    logging.info('The conversion of JRA55 %d is complete!!!' % (input_year))
+
+print ("--- %s minutes ---" % ((tttt.time() - start_time)/60))
@@ -87,12 +87,13 @@ def pack_netcdf_zonal_int(datapath,output_path,benchmark):
 
     for i in period:
         j = i - 1980
-        for ii in np.arange(12): # loop for month
-            dataset_path = datapath + os.sep + 'SODA3_model_5daily_mom5_E_zonal_int_%d%s.nc' % (i,namelist_month[ii])
-            dataset = Dataset(dataset_path)
-            E[j,ii,:] = dataset.variables['E'][:]
-            Psi_glo[j,ii,:,:] = dataset.variables['Psi_glo'][:]
-            Psi_atl[j,ii,:,:] = dataset.variables['Psi_atl'][:]
+        # the monthly means of each year are in one file (month, ...)
+        dataset_path = datapath + os.sep + 'SODA3_model_monthly_mom5_E_zonal_int_%d.nc' % (i)
+        dataset = Dataset(dataset_path)
+        E[j,:,:] = dataset.variables['E'][:]
+        Psi_glo[j,:,:,:] = dataset.variables['Psi_glo'][:]
+        Psi_atl[j,:,:,:] = dataset.variables['Psi_atl'][:]
+        dataset.close()
 
     print '*******************************************************************'
     print '*********************** create netcdf file*************************'
@@ -154,10 +155,11 @@ def pack_netcdf_point(datapath,output_path,benchmark):
 
     for i in period:
         j = i - 1980
-        for ii in np.arange(12):
-            dataset_path = datapath + os.sep + 'SODA3_model_5daily_mom5_E_point_%d%s.nc' % (i,namelist_month[ii])
-            dataset = Dataset(dataset_path)
-            E[j,ii,:,:] = dataset.variables['E'][:]
+        # the monthly means of each year are in one file (month, j, i)
+        dataset_path = datapath + os.sep + 'SODA3_model_monthly_mom5_E_point_%d.nc' % (i)
+        dataset = Dataset(dataset_path)
+        E[j,:,:,:] = dataset.variables['E'][:]
+        dataset.close()
 
     print '*******************************************************************'
     print '*********************** create netcdf file*************************'
@@ -71,6 +71,9 @@ from cartopy.mpl.gridliner import LONGITUDE_FORMATTER, LATITUDE_FORMATTER
 import iris
 import iris.plot as iplt
 import iris.quickplot as qplt
+# shared kernels of Energy-Wizard at the root of the repository
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from wizard import mesh
 # print the system structure and the path of the kernal
 print platform.architecture()
 print os.path
@@ -86,26 +89,25 @@ mask_GLORYS2V3 = '/home/yang/workbench/Core_Database_AMET_OMET_reanalysis/GLORYS
 mask_SODA3 = '/home/yang/workbench/Core_Database_AMET_OMET_reanalysis/SODA3'
 # specify output path
 output_path = '/home/yang/NLeSC/Computation_Modeling/BlueAction/Oceanography/mask_sea_ocean'
+# directory of the cache of the fields derived from the mesh (wizard.mesh), None for the directory of the mesh
+mesh_cache_path = None
 ####################################################################################
 print '*******************************************************************'
 print '*********************** extract variables *************************'
 print '*******************************************************************'
-# land-sea mask
-mesh_mask_ORAS4 = Dataset(mask_ORAS4 + os.sep + 'mesh_mask.nc')
-mesh_mask_GLORYS2V3 = Dataset(mask_GLORYS2V3 + os.sep + 'G2V3_mesh_mask_myocean.nc')
-mesh_mask_SODA3 = Dataset(mask_SODA3 + os.sep + 'topog.nc')
-# individual sea/ocean mask
-ocean_mask_ORAS4 = Dataset(mask_ORAS4 + os.sep + 'basinmask_050308_UKMO.nc')
-ocean_mask_GLORYS2V3 = Dataset(mask_GLORYS2V3 + os.sep + 'new_maskglo.nc')
+# land-sea mask and individual sea/ocean mask (wizard.mesh)
+mesh_ORAS4 = mesh.ORCAMesh('ORCA1', mask_ORAS4, mesh_cache_path)
+mesh_GLORYS2V3 = mesh.ORCAMesh('ORCA025', mask_GLORYS2V3, mesh_cache_path)
+mesh_SODA3 = mesh.MOMMesh(mask_SODA3, mesh_cache_path)
 
 # lat and lon of T grid
-lat_ORAS4 =  mesh_mask_ORAS4.variables['nav_lat'][:]
-lat_GLORYS2V3 =  mesh_mask_GLORYS2V3.variables['nav_lat'][:]
-lat_SODA3 =  mesh_mask_SODA3.variables['y_T'][:]
+lat_ORAS4 =  mesh_ORAS4.nav_lat
+lat_GLORYS2V3 =  mesh_GLORYS2V3.nav_lat
+lat_SODA3 =  mesh_SODA3.y_T
 
-lon_ORAS4 =  mesh_mask_ORAS4.variables['nav_lon'][:]
-lon_GLORYS2V3 =  mesh_mask_GLORYS2V3.variables['nav_lon'][:]
-lon_SODA3 =  mesh_mask_SODA3.variables['x_T'][:]
+lon_ORAS4 =  mesh_ORAS4.nav_lon
+lon_GLORYS2V3 =  mesh_GLORYS2V3.nav_lon
+lon_SODA3 =  mesh_SODA3.x_T
 # Caveat!! The original range of longitude is -280 - +80
 # change it to the range -180 - +180
 # the new value is only useful for determination of ocean/sea mask
@@ -114,13 +116,13 @@ aux_lon_SODA3 = lon_SODA3
 aux_lon_SODA3[aux_lon_SODA3<-180] = aux_lon_SODA3[aux_lon_SODA3<-180] + 360
 
 # tmask
-tmask_ORAS4 = mesh_mask_ORAS4.variables['tmask'][0,0,:,:]
-tmask_GLORYS2V3 = mesh_mask_GLORYS2V3.variables['tmask'][0,0,:,:]
-tmask_SODA3 = mesh_mask_SODA3.variables['wet'][:]
+tmask_ORAS4 = mesh_ORAS4.tmask[0,:,:]
+tmask_GLORYS2V3 = mesh_GLORYS2V3.tmask[0,:,:]
+tmask_SODA3 = mesh_SODA3.tmask
 # sea/ocean mask
 # Atlantic
-tmaskatl_ORAS4 = ocean_mask_ORAS4.variables['tmaskatl'][:]
-tmaskatl_GLORYS2V3 = ocean_mask_GLORYS2V3.variables['tmaskatl'][:,1:-1] # attention that the size is different!
+tmaskatl_ORAS4 = mesh_ORAS4.tmaskatl
+tmaskatl_GLORYS2V3 = mesh_GLORYS2V3.tmaskatl # attention that the size is different!
 
 print '*******************************************************************'
 print '************************** maps factory ***************************'
@@ -244,19 +246,8 @@ iplt.show()
 fig2.savefig(output_path + os.sep + 'atlantic_mask_GLORYS2V3.jpg',dpi = 500)
 
 print '========================  SODA3  ========================'
-# calculate the atlantic land sea mask
-tmaskatl_SODA3 = tmask_SODA3
-tmaskatl_SODA3[0:225,:] = 0 # boundary south
-tmaskatl_SODA3[:,0:727] = 0 # boundary west
-tmaskatl_SODA3[:,1200:] = 0 # boundary east
-tmaskatl_SODA3[lat_SODA3>70] = 0 # boundary north
-# correction Mediterranean
-tmaskatl_SODA3[614:680,1100:1240] = 0
-tmaskatl_SODA3[660:720,1140:1280] = 0
-# correction Pacific
-tmaskatl_SODA3[225:522,759:839] = 0
-tmaskatl_SODA3[225:545,670:780] = 0
-tmaskatl_SODA3[225:560,670:759] = 0
+# the atlantic land sea mask (index boxes on the MOM5 grid, see wizard.mesh)
+tmaskatl_SODA3 = mesh_SODA3.tmaskatl
 
 # define the cube for the use of iris package
 latitude_SODA3 = iris.coords.AuxCoord(lat_SODA3,standard_name='latitude',units='degrees')
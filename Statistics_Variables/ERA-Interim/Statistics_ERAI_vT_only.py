@@ -28,8 +28,6 @@ Caveat!!        : The dataset is the complete dataset of ERA-Interim from 20N -
                   Time: 00:00 06:00 12:00 18:00 (6 hourly)
 """
 import numpy as np
-import scipy
-import scipy.interpolate
 import time as tttt
 from netCDF4 import Dataset,num2date
 import os
@@ -40,6 +38,12 @@ import matplotlib
 # Generate images without having a window appear
 #matplotlib.use('Agg')
 #import matplotlib.pyplot as plt
+# shared kernels of Energy-Wizard at the root of the repository
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir))
+from wizard import geopotential
+from wizard import hybrid
+from wizard import output
+from wizard import vertical
 
 ##########################################################################
 ###########################   Units vacabulory   #########################
@@ -135,6 +139,10 @@ output_path = '/project/Reanalysis/ERA_Interim/Subdaily/Model/HPC_output/statist
 # benchmark datasets for basic dimensions
 benchmark_path = '/project/Reanalysis/ERA_Interim/Subdaily/Model/era1980/model_daily_075_1980_1_z_lnsp.nc'
 benchmark = Dataset(benchmark_path)
+# packing of the output fields (wizard.output), None (float64), 'float32' or 'int16'
+output_packing = None
+# interpolate to the pressure levels linearly in log-pressure instead of pressure (wizard.vertical)
+log_pressure = False
 ####################################################################################
 
 def var_key(datapath, year, month):
@@ -175,47 +183,9 @@ def calc_geopotential(T_q_key, z_lnsp_key):
     # calculate the surface pressure
     # the unit of pressure here is Pa!!!
     sp = np.exp(lnsp)
-    # define the half level pressure matrix
-    p_half_plus = np.zeros((len(time),len(level),len(latitude),len(longitude)),dtype = float)
-    p_half_minus = np.zeros((len(time),len(level),len(latitude),len(longitude)),dtype = float)
-    # calculate the index of pressure levels
-    index_level = np.arange(len(level))
-    # calculate the pressure at each half level
-    for i in index_level:
-        p_half_plus[:,i,:,:] = A[i+1] + B[i+1] * sp
-        p_half_minus[:,i,:,:] = A[i] + B[i] * sp
-    # calculate full pressure level
-    #level_full = (p_half_plus + p_half_minus) / 2
-    # compute the moist temperature (virtual temperature)
-    Tv = T * (1 + (constant['R_vap'] / constant['R_dry'] - 1) * q)
-    # initialize the first half level geopotential
-    gz_half = np.zeros((len(time),len(latitude),len(longitude)),dtype =float)
-    # initialize the full level geopotential
-    gz = np.zeros((len(time),len(level),len(latitude),len(longitude)),dtype = float)
-    # Calculate the geopotential at each level
-    # The integral should be taken from surface level to the TOA
-    for i in index_level:
-        # reverse the index
-        i_inverse = len(level) - 1 - i
-        # the ln(p_plus/p_minus) is calculated, alpha is defined
-        # an exception lies in the TOA
-        # see equation 2.23 in ECMWF IFS 9220
-        if i_inverse == 0:
-            ln_p = np.log(p_half_plus[:,i_inverse,:,:]/10)
-            alpha = np.log(2)
-        else:
-            ln_p = np.log(p_half_plus[:,i_inverse,:,:]/p_half_minus[:,i_inverse,:,:])
-            delta_p = p_half_plus[:,i_inverse,:,:] - p_half_minus[:,i_inverse,:,:]
-            alpha = 1 - p_half_minus[:,i_inverse,:,:] / delta_p * ln_p
-        # calculate the geopotential of the full level (exclude surface geopotential)
-        # see equation 2.22 in ECMWF IFS 9220
-        gz_full = gz_half + alpha * constant['R_dry'] * Tv[:,i_inverse,:,:]
-        # add surface geopotential to the full level
-        # see equation 2.21 in ECMWF IFS 9220
-        gz[:,i_inverse,:,:] = z + gz_full
-        # renew the half level geopotential for next loop step (from p_half_minus level to p_half_plus level)
-        # see equation 2.20 in ECMWF IFS 9220
-        gz_half = gz_half + ln_p * constant['R_dry'] * Tv[:,i_inverse,:,:]
+    # calculate the geopotential on each model level from the surface to the TOA
+    # see equation 2.20 - 2.23 in ECMWF IFS 9220
+    gz = geopotential.geopotential(T, q, z, hybrid.HybridLevels(A, B, sp), constant)
     print '*******************************************************************'
     print "***Computation of geopotential on each pressure level is finished**"
     print '*******************************************************************'
@@ -260,17 +230,10 @@ def field_statistics(T_q_key, z_lnsp_key, u_v_key):
     #!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!#
     # full model level pressure level
     p_level = (p_half_plus + p_half_minus) / 2.0
-    # create space for interpolation of fields
-    T_pressure_level = np.zeros((len(time),len(p_level_interpolate),len(latitude),len(longitude)),dtype = float)
-    v_pressure_level = np.zeros((len(time),len(p_level_interpolate),len(latitude),len(longitude)),dtype = float)
-    # interpolate fields on target pressure level
-    for i in np.arange(len(time)): # synoptic time
-        for j in np.arange(len(latitude)):
-            for k in np.arange(len(longitude)):
-                ius_T = scipy.interpolate.interp1d(p_level[i,:,j,k], T[i,:,j,k], kind='slinear',bounds_error=False,fill_value=0.0)
-                T_pressure_level[i,:,j,k] = ius_T(p_level_interpolate)
-                ius_v = scipy.interpolate.interp1d(p_level[i,:,j,k], v[i,:,j,k], kind='slinear',bounds_error=False,fill_value=0.0)
-                v_pressure_level[i,:,j,k] = ius_v(p_level_interpolate)
+    # interpolate fields on target pressure level, the bracketing levels and the weights
+    # of all the columns are computed once for all the fields (wizard.vertical)
+    interpolator = vertical.PressureInterpolator(p_level, p_level_interpolate, axis=1, log_pressure=log_pressure)
+    T_pressure_level, v_pressure_level = interpolator(T, v)
     # take the zonal mean
     T_zonal_mean = np.mean(np.mean(T_pressure_level,axis=3),0)
     v_zonal_mean = np.mean(np.mean(v_pressure_level,axis=3),0)
@@ -289,25 +252,25 @@ def create_netcdf_point(T_vert_mean_pool, v_vert_mean_pool, T_zonal_mean_pool, v
     print '*******************************************************************'
     logging.info("Start creating netcdf file for total meridional energy transport and each component at each grid point.")
     # wrap the datasets into netcdf file
-    # 'NETCDF3_CLASSIC', 'NETCDF3_64BIT', 'NETCDF4_CLASSIC', and 'NETCDF4'
-    data_wrap = Dataset(output_path + os.sep + 'AMET_ERAI_model_daily_%d_statistics_point.nc' % (year),'w',format = 'NETCDF3_64BIT')
+    # NETCDF4, compressed and chunked by time step (wizard.output)
+    data_wrap = output.create_dataset(output_path + os.sep + 'AMET_ERAI_model_daily_%d_statistics_point.nc' % (year))
     # create dimensions for netcdf data
     month_wrap_dim = data_wrap.createDimension('month',Dim_month)
     lat_wrap_dim = data_wrap.createDimension('latitude',Dim_latitude)
     lon_wrap_dim = data_wrap.createDimension('longitude',Dim_longitude)
     lev_wrap_dim = data_wrap.createDimension('level',Dim_level_interpolate)
     # create coordinate variables for 3-dimensions
-    month_wrap_var = data_wrap.createVariable('month',np.int32,('month',))
-    lat_wrap_var = data_wrap.createVariable('latitude',np.float32,('latitude',))
-    lon_wrap_var = data_wrap.createVariable('longitude',np.float32,('longitude',))
-    lev_wrap_var = data_wrap.createVariable('level',np.int32,('level',))
+    month_wrap_var = output.create_variable(data_wrap,'month',np.int32,('month',))
+    lat_wrap_var = output.create_variable(data_wrap,'latitude',np.float32,('latitude',))
+    lon_wrap_var = output.create_variable(data_wrap,'longitude',np.float32,('longitude',))
+    lev_wrap_var = output.create_variable(data_wrap,'level',np.int32,('level',))
     # create the actual 3-d variable
     # vertical mean
-    T_vert_wrap_var = data_wrap.createVariable('T_vert_mean',np.float64,('month','latitude','longitude'))
-    v_vert_wrap_var = data_wrap.createVariable('v_vert_mean',np.float64,('month','latitude','longitude'))
+    T_vert_wrap_var = output.create_variable(data_wrap,'T_vert_mean',np.float64,('month','latitude','longitude'),packing=output_packing)
+    v_vert_wrap_var = output.create_variable(data_wrap,'v_vert_mean',np.float64,('month','latitude','longitude'),packing=output_packing)
     # zonal mean
-    T_zonal_wrap_var = data_wrap.createVariable('T_zonal_mean',np.float64,('month','level','latitude'))
-    v_zonal_wrap_var = data_wrap.createVariable('v_zonal_mean',np.float64,('month','level','latitude'))
+    T_zonal_wrap_var = output.create_variable(data_wrap,'T_zonal_mean',np.float64,('month','level','latitude'),packing=output_packing)
+    v_zonal_wrap_var = output.create_variable(data_wrap,'v_zonal_mean',np.float64,('month','level','latitude'),packing=output_packing)
     # global attributes
     data_wrap.description = 'Monthly mean statistics of fields from ERA-Interim subdaily dataset'
     # variable attributes
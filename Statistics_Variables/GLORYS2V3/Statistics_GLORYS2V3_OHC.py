@@ -48,6 +48,12 @@ import matplotlib
 matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 from mpl_toolkits.basemap import Basemap, cm
+# shared kernels of Energy-Wizard at the root of the repository
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir))
+from wizard import mesh
+from wizard import ohc
+from wizard import output
+from wizard import overturning
 #import cartopy.crs as ccrs
 #from cartopy.mpl.gridliner import LONGITUDE_FORMATTER, LATITUDE_FORMATTER
 #import iris
@@ -97,6 +103,12 @@ start_year = 1993
 end_year = 2014
 # specify output path for the netCDF4 file
 output_path = '/project/Reanalysis/GLORYS2V3/monthly/output'
+# packing of the output fields (wizard.output), None (float64), 'float32' or 'int16'
+output_packing = None
+# directory of the cache of the fields derived from the mesh (wizard.mesh), None for the directory of the mesh
+mesh_cache_path = None
+# depth bands of the ocean heat content [m], (upper, lower), None for the sea bottom (wizard.ohc)
+depth_bands = [(0, None), (0, 500), (500, 1000), (1000, 2000), (2000, None)]
 ####################################################################################
 
 def var_key(datapath, year, month):
@@ -135,108 +147,43 @@ def var_key(datapath, year, month):
     logging.info("Retrieving variables for the year %d month %s successfully!" % (year,namelist_month[month]))
     return theta_key, uv_key
 
-def var_coordinate(datapath):
-    print "Start retrieving the ORCA025 coordinate and mask info"
-    logging.info('Start retrieving the ORCA025 coordinate and mask info')
-    # get the variable keys
-    mesh_mask_key = Dataset(datapath+ os.sep + 'G2V3_mesh_mask_myocean.nc')
-    subbasin_mesh_key = Dataset(datapath+ os.sep + 'new_maskglo.nc') #sub-basin from Andreas
-    #extract variables
-    # lat-lon-depth coordinate info
-    nav_lat = mesh_mask_key.variables['nav_lat'][:]
-    nav_lon = mesh_mask_key.variables['nav_lon'][:]
-    deptht = mesh_mask_key.variables['deptht'][:]
-    # lat-lon coordinate of V grid
-    gphiv = mesh_mask_key.variables['gphiv'][0,:,:] # lat from -78 to -89
-    glamv = mesh_mask_key.variables['glamv'][0,:,:] # lon from -179 to 179
-    gphiu = mesh_mask_key.variables['gphiu'][0,:,:] # lat from -78 to -89
-    glamu = mesh_mask_key.variables['glamu'][0,:,:] # lon from -179 to 179
-    # land-sea mask
-    tmask = mesh_mask_key.variables['tmask'][0,:,:,:]
-    umask = mesh_mask_key.variables['umask'][0,:,:,:]
-    vmask = mesh_mask_key.variables['vmask'][0,:,:,:]
-    # land-sea mask for sub-basin
-    tmaskatl = subbasin_mesh_key.variables['tmaskatl'][:,1:-1] # attention that the size is different!
-    # grid spacing scale factors (zonal)
-    e1t = mesh_mask_key.variables['e1t'][0,:,:]
-    e2t = mesh_mask_key.variables['e2t'][0,:,:]
-    e1u = mesh_mask_key.variables['e1u'][0,:,:]
-    e2u = mesh_mask_key.variables['e2u'][0,:,:]
-    e1v = mesh_mask_key.variables['e1v'][0,:,:]
-    e2v = mesh_mask_key.variables['e2v'][0,:,:]
-    # take the bathymetry
-    mbathy = mesh_mask_key.variables['mbathy'][0,:,:]
-    # depth of each layer
-    e3t_0 = mesh_mask_key.variables['e3t_0'][0,:]
-    # depth of partial cells
-    e3t_ps = mesh_mask_key.variables['e3t_ps'][0,:,:]
-    # depth of partial cell t point
-    hdept = mesh_mask_key.variables['hdept'][0,:,:]
-
-    print "Retrieve the ORCA025 coordinate and mask info successfully!"
-    logging.info('Finish retrieving the ORCA025 coordinate and mask info')
-
-    return nav_lat, nav_lon, deptht, tmask, umask, vmask, tmaskatl, e1t, e2t, e1u, e2u, e1v, e2v, gphiu, glamu, gphiv, glamv, mbathy, e3t_0, e3t_ps, hdept
-
 def ocean_heat_content(theta_key):
     '''
-    This function is used to compute the ocean heat content.
+    This function is used to compute the ocean heat content of each depth band at each grid point and its zonal integrals.
     '''
     # extract variables
-    print "Start extracting variables for the quantification of meridional energy transport."
+    print "Start extracting variables for the quantification of ocean heat content."
     theta = theta_key.variables['votemper'][0,:,:,:] # the unit of theta is Celsius!
     # set the filled value to be 0
     np.ma.set_fill_value(theta,0)
     # check the filled Value
     #print theta.filled()
     print 'Extracting variables successfully!'
-    # calculate heat flux at each grid point
-    OHC_globe = np.zeros((level,jj,ji),dtype=float)
-    OHC_atlantic = np.zeros((level,jj,ji),dtype=float)
-    for i in np.arange(level):
-        OHC_globe[i,:,:] = constant['rho'] * constant['cp'] * theta[i,:,:].filled() * e1t * e2t * e3t_0[i] * tmask[i,:,:] -\
-                           constant['rho'] * constant['cp'] * theta[i,:,:].filled() * e1t * e2t * e3t_adjust[i,:,:] * tmask[i,:,:]
-        OHC_atlantic[i,:,:] = constant['rho'] * constant['cp'] * theta[i,:,:].filled() * e1t * e2t * e3t_0[i] * tmask[i,:,:] * tmaskatl -\
-                              constant['rho'] * constant['cp'] * theta[i,:,:].filled() * e1t * e2t * e3t_adjust[i,:,:] * tmask[i,:,:] * tmaskatl
-    # take the zonal integral
-    OHC_globe_zonal_int = np.sum(OHC_globe,2)/1e+12 # the unit is changed to tera joule
-    OHC_atlantic_zonal_int = np.sum(OHC_atlantic,2)/1e+12 # the unit is changed to tera joule
-    # take the vertical integral
-    OHC_globe_vert_int = np.sum(OHC_globe,0)/1e+12 # the unit is changed to tera joule
-    OHC_atlantic_vert_int = np.sum(OHC_atlantic,0)/1e+12 # the unit is changed to tera joule
-    # ocean heat content for certain layers
-    # surface to 500m
-    OHC_globe_vert_0_500 = np.sum(OHC_globe[0:39,:,:],0)/1e+12 # the unit is changed to tera joule
-    OHC_atlantic_vert_0_500 = np.sum(OHC_atlantic[0:39,:,:],0)/1e+12 # the unit is changed to tera joule
-    # 500m to 1000m
-    OHC_globe_vert_500_1000 = np.sum(OHC_globe[39:46,:,:],0)/1e+12
-    OHC_atlantic_vert_500_1000 = np.sum(OHC_atlantic[39:46,:,:],0)/1e+12
-    # 1000m to 2000m
-    OHC_globe_vert_1000_2000 = np.sum(OHC_globe[46:54,:,:],0)/1e+12
-    OHC_atlantic_vert_1000_2000 = np.sum(OHC_atlantic[46:54,:,:],0)/1e+12
-    # 2000 to bottom
-    OHC_globe_vert_2000_inf = np.sum(OHC_globe[54:,:,:],0)/1e+12
-    OHC_atlantic_vert_2000_inf = np.sum(OHC_atlantic[54:,:,:],0)/1e+12
+    # vertical integral within each depth band (band, j, i), the cells at the
+    # boundaries of the bands are split between the bands (wizard.ohc)
+    OHC_globe_vert = ohc.heat_content(theta, cell_volume, ocean_bands, constant)
+    OHC_atlantic_vert = OHC_globe_vert * tmaskatl
+    # zonal integral at each level (level, j)
+    OHC_globe_zonal, OHC_atlantic_zonal = ohc.zonal_profiles(theta, cell_volume, constant, [None, tmaskatl])
+    # zonal integral of each depth band (band, j)
+    OHC_globe_zonal_int, OHC_atlantic_zonal_int = overturning.zonal_integrals(OHC_globe_vert, [None, tmaskatl])
     print '*****************************************************************************'
     print "****     Computation of ocean heat content in the ocean is finished      ****"
     print "************         The result is in tera-joule (1E+12)          ************"
     print '*****************************************************************************'
-    return OHC_globe_zonal_int, OHC_atlantic_zonal_int, OHC_globe_vert_int, OHC_atlantic_vert_int,\
-           OHC_globe_vert_0_500, OHC_atlantic_vert_0_500, OHC_globe_vert_500_1000, OHC_atlantic_vert_500_1000,\
-           OHC_globe_vert_1000_2000, OHC_atlantic_vert_1000_2000, OHC_globe_vert_2000_inf, OHC_atlantic_vert_2000_inf
+    return OHC_globe_zonal, OHC_atlantic_zonal, OHC_globe_vert, OHC_atlantic_vert,\
+           OHC_globe_zonal_int, OHC_atlantic_zonal_int
 
 def create_netcdf_point (OHC_pool_glo_zonal, OHC_pool_atl_zonal, OHC_pool_glo_vert, OHC_pool_atl_vert,\
-                        OHC_pool_glo_vert_0_500, OHC_pool_atl_vert_0_500, OHC_pool_glo_vert_500_1000,\
-                        OHC_pool_atl_vert_500_1000, OHC_pool_glo_vert_1000_2000, OHC_pool_atl_vert_1000_2000,\
-                        OHC_pool_glo_vert_2000_inf, OHC_pool_atl_vert_2000_inf,output_path):
+                        OHC_pool_glo_zonal_int, OHC_pool_atl_zonal_int, output_path):
     print '*******************************************************************'
     print '*********************** create netcdf file ************************'
     print '*********************   statistics on ORCA   **********************'
     print '*******************************************************************'
     logging.info("Start creating netcdf file for the statistics of fields at each grid point.")
     # wrap the datasets into netcdf file
-    # 'NETCDF3_CLASSIC', 'NETCDF3_64BIT', 'NETCDF4_CLASSIC', and 'NETCDF4'
-    data_wrap = Dataset(output_path + os.sep + 'GLORYS2V3_model_monthly_orca025_statistics_point.nc' ,'w',format = 'NETCDF4')
+    # NETCDF4, compressed and chunked by time step (wizard.output)
+    data_wrap = output.create_dataset(output_path + os.sep + 'GLORYS2V3_model_monthly_orca025_statistics_point.nc')
     # create dimensions for netcdf data
     year_wrap_dim = data_wrap.createDimension('year',len(period))
     month_wrap_dim = data_wrap.createDimension('month',12)
@@ -245,27 +192,16 @@ def create_netcdf_point (OHC_pool_glo_zonal, OHC_pool_atl_zonal, OHC_pool_glo_ve
     lev_wrap_dim = data_wrap.createDimension('lev',level)
     # create coordinate variables for 3-dimensions
     # 1D
-    year_wrap_var = data_wrap.createVariable('year',np.int32,('year',))
-    month_wrap_var = data_wrap.createVariable('month',np.int32,('month',))
-    lat_wrap_var = data_wrap.createVariable('latitude_aux',np.float32,('j',))
-    lev_wrap_var = data_wrap.createVariable('lev',np.float32,('lev',))
+    year_wrap_var = output.create_variable(data_wrap,'year',np.int32,('year',))
+    month_wrap_var = output.create_variable(data_wrap,'month',np.int32,('month',))
+    lat_wrap_var = output.create_variable(data_wrap,'latitude_aux',np.float32,('j',))
+    lev_wrap_var = output.create_variable(data_wrap,'lev',np.float32,('lev',))
     # 2D
-    gphit_wrap_var = data_wrap.createVariable('gphit',np.float32,('j','i'))
-    glamt_wrap_var = data_wrap.createVariable('glamt',np.float32,('j','i'))
+    gphit_wrap_var = output.create_variable(data_wrap,'gphit',np.float32,('j','i'))
+    glamt_wrap_var = output.create_variable(data_wrap,'glamt',np.float32,('j','i'))
     # 4D
-    OHC_glo_zonal_wrap_var = data_wrap.createVariable('OHC_glo_zonal',np.float64,('year','month','lev','j'),zlib=True)
-    OHC_atl_zonal_wrap_var = data_wrap.createVariable('OHC_atl_zonal',np.float64,('year','month','lev','j'),zlib=True)
-
-    OHC_glo_vert_wrap_var = data_wrap.createVariable('OHC_glo_vert',np.float64,('year','month','j','i'),zlib=True)
-    OHC_atl_vert_wrap_var = data_wrap.createVariable('OHC_atl_vert',np.float64,('year','month','j','i'),zlib=True)
-    OHC_glo_vert_0_500_wrap_var = data_wrap.createVariable('OHC_glo_vert_0_500',np.float64,('year','month','j','i'),zlib=True)
-    OHC_atl_vert_0_500_wrap_var = data_wrap.createVariable('OHC_atl_vert_0_500',np.float64,('year','month','j','i'),zlib=True)
-    OHC_glo_vert_500_1000_wrap_var = data_wrap.createVariable('OHC_glo_vert_500_1000',np.float64,('year','month','j','i'),zlib=True)
-    OHC_atl_vert_500_1000_wrap_var = data_wrap.createVariable('OHC_atl_vert_500_1000',np.float64,('year','month','j','i'),zlib=True)
-    OHC_glo_vert_1000_2000_wrap_var = data_wrap.createVariable('OHC_glo_vert_1000_2000',np.float64,('year','month','j','i'),zlib=True)
-    OHC_atl_vert_1000_2000_wrap_var = data_wrap.createVariable('OHC_atl_vert_1000_2000',np.float64,('year','month','j','i'),zlib=True)
-    OHC_glo_vert_2000_inf_wrap_var = data_wrap.createVariable('OHC_glo_vert_2000_inf',np.float64,('year','month','j','i'),zlib=True)
-    OHC_atl_vert_2000_inf_wrap_var = data_wrap.createVariable('OHC_atl_vert_2000_inf',np.float64,('year','month','j','i'),zlib=True)
+    OHC_glo_zonal_wrap_var = output.create_variable(data_wrap,'OHC_glo_zonal',np.float64,('year','month','lev','j'),packing=output_packing)
+    OHC_atl_zonal_wrap_var = output.create_variable(data_wrap,'OHC_atl_zonal',np.float64,('year','month','lev','j'),packing=output_packing)
     # global attributes
     data_wrap.description = 'Monthly mean OHC on ORCA grid'
     # variable attributes
@@ -276,17 +212,6 @@ def create_netcdf_point (OHC_pool_glo_zonal, OHC_pool_atl_zonal, OHC_pool_glo_ve
     OHC_glo_zonal_wrap_var.units = 'tera joule'
     OHC_atl_zonal_wrap_var.units = 'tera joule'
 
-    OHC_glo_vert_wrap_var.units = 'tera joule'
-    OHC_atl_vert_wrap_var.units = 'tera joule'
-    OHC_glo_vert_0_500_wrap_var.units = 'tera joule'
-    OHC_atl_vert_0_500_wrap_var.units = 'tera joule'
-    OHC_glo_vert_500_1000_wrap_var.units = 'tera joule'
-    OHC_atl_vert_500_1000_wrap_var.units = 'tera joule'
-    OHC_glo_vert_1000_2000_wrap_var.units = 'tera joule'
-    OHC_atl_vert_1000_2000_wrap_var.units = 'tera joule'
-    OHC_glo_vert_2000_inf_wrap_var.units = 'tera joule'
-    OHC_atl_vert_2000_inf_wrap_var.units = 'tera joule'
-
     lat_wrap_var.long_name = 'auxillary latitude'
     lev_wrap_var.long_name = 'depth'
     gphit_wrap_var.long_name = 'ORCA1 Tgrid latitude'
@@ -294,17 +219,6 @@ def create_netcdf_point (OHC_pool_glo_zonal, OHC_pool_atl_zonal, OHC_pool_glo_ve
 
     OHC_glo_zonal_wrap_var.long_name = 'Global Ocean Heat Content (zonal integral)'
     OHC_atl_zonal_wrap_var.long_name = 'Atlantic Ocean Heat Content (zonal integral)'
-
-    OHC_glo_vert_wrap_var.long_name = 'Global Ocean Heat Content (vertical integral)'
-    OHC_atl_vert_wrap_var.long_name = 'Atlantic Ocean Heat Content (vertical integral)'
-    OHC_glo_vert_0_500_wrap_var.long_name = 'Global Ocean Heat Content from surface to 500 m (vertical integral)'
-    OHC_atl_vert_0_500_wrap_var.long_name = 'Atlantic Ocean Heat Content from surface to 500 m (vertical integral)'
-    OHC_glo_vert_500_1000_wrap_var.long_name = 'Global Ocean Heat Content from 500 m to 1000 m (vertical integral)'
-    OHC_atl_vert_500_1000_wrap_var.long_name = 'Atlantic Ocean Heat Content from 500 m to 1000 m (vertical integral)'
-    OHC_glo_vert_1000_2000_wrap_var.long_name = 'Global Ocean Heat Content from 1000 m to 2000 m (vertical integral)'
-    OHC_atl_vert_1000_2000_wrap_var.long_name = 'Atlantic Ocean Heat Content from 1000 m to 2000 m (vertical integral)'
-    OHC_glo_vert_2000_inf_wrap_var.long_name = 'Global Ocean Heat Content from 2000 m to bottom (vertical integral)'
-    OHC_atl_vert_2000_inf_wrap_var.long_name = 'Atlantic Ocean Heat Content from 2000 m to bottom (vertical integral)'
     # writing data
     year_wrap_var[:] = period
     month_wrap_var[:] = np.arange(1,13,1)
@@ -315,17 +229,18 @@ def create_netcdf_point (OHC_pool_glo_zonal, OHC_pool_atl_zonal, OHC_pool_glo_ve
 
     OHC_glo_zonal_wrap_var[:] = OHC_pool_glo_zonal
     OHC_atl_zonal_wrap_var[:] = OHC_pool_atl_zonal
-
-    OHC_glo_vert_wrap_var[:] = OHC_pool_glo_vert
-    OHC_atl_vert_wrap_var[:] = OHC_pool_atl_vert
-    OHC_glo_vert_0_500_wrap_var[:] = OHC_pool_glo_vert_0_500
-    OHC_atl_vert_0_500_wrap_var[:] = OHC_pool_atl_vert_0_500
-    OHC_glo_vert_500_1000_wrap_var[:] = OHC_pool_glo_vert_500_1000
-    OHC_atl_vert_500_1000_wrap_var[:] = OHC_pool_atl_vert_500_1000
-    OHC_glo_vert_1000_2000_wrap_var[:] = OHC_pool_glo_vert_1000_2000
-    OHC_atl_vert_1000_2000_wrap_var[:] = OHC_pool_atl_vert_1000_2000
-    OHC_glo_vert_2000_inf_wrap_var[:] = OHC_pool_glo_vert_2000_inf
-    OHC_atl_vert_2000_inf_wrap_var[:] = OHC_pool_atl_vert_2000_inf
+    # vertical integral and its zonal integral of each depth band, e.g. OHC_glo_vert_0_500 and OHC_glo_zonal_int_0_500
+    for n, band in enumerate(depth_bands):
+        for basin, basin_name, OHC_pool_vert, OHC_pool_zonal_int in (('glo', 'Global', OHC_pool_glo_vert, OHC_pool_glo_zonal_int),
+                                                                    ('atl', 'Atlantic', OHC_pool_atl_vert, OHC_pool_atl_zonal_int)):
+            OHC_vert_wrap_var = output.create_variable(data_wrap,'OHC_%s_vert%s' % (basin, ohc.band_suffix(band)),np.float64,('year','month','j','i'),packing=output_packing)
+            OHC_zonal_int_wrap_var = output.create_variable(data_wrap,'OHC_%s_zonal_int%s' % (basin, ohc.band_suffix(band)),np.float64,('year','month','j'),packing=output_packing)
+            OHC_vert_wrap_var.units = 'tera joule'
+            OHC_zonal_int_wrap_var.units = 'tera joule'
+            OHC_vert_wrap_var.long_name = '%s Ocean Heat Content%s (vertical integral)' % (basin_name, ohc.band_description(band))
+            OHC_zonal_int_wrap_var.long_name = '%s Ocean Heat Content%s (zonal and vertical integral)' % (basin_name, ohc.band_description(band))
+            OHC_vert_wrap_var[:] = OHC_pool_vert[:,:,n,:,:]
+            OHC_zonal_int_wrap_var[:] = OHC_pool_zonal_int[:,:,n,:]
     # close the file
     data_wrap.close()
     print "Create netcdf file successfully"
@@ -344,8 +259,10 @@ if __name__=="__main__":
     jj = 1021
     level = 75
     # extract the mesh_mask and coordinate information
-    nav_lat, nav_lon, deptht, tmask, umask, vmask, tmaskatl, e1t, e2t, e1u, e2u, e1v, e2v, gphiu, glamu, \
-    gphiv, glamv, mbathy, e3t_0, e3t_ps, hdept = var_coordinate(datapath)
+    # mesh of ORCA025, the fields are read from the mesh files when they are used (wizard.mesh)
+    ocean_mesh = mesh.ORCAMesh('ORCA025', datapath, mesh_cache_path)
+    nav_lat, nav_lon, deptht, tmask, tmaskatl, e1t, e2t, gphiv, e3t_0 = ocean_mesh.fields('nav_lat', 'nav_lon', 'deptht', 'tmask',
+                                                                                          'tmaskatl', 'e1t', 'e2t', 'gphiv', 'e3t_0')
     print '*******************************************************************'
     print '*******************  Partial cells correction   *******************'
     print '*******************************************************************'
@@ -354,12 +271,12 @@ if __name__=="__main__":
     # for the sake of simplicity of the code, just calculate the difference between e3t_0 and e3t_ps
     # then minus this adjustment when calculate the OMET at each layer with mask
     # Attention! Since python start with 0, the partial cell info given in mbathy should incoporate with this
-    e3t_adjust = np.zeros((level,jj,ji),dtype = float)
-    for i in np.arange(1,level,1): # start from 1
-        for j in np.arange(jj):
-            for k in np.arange(ji):
-                if i == mbathy[j,k]:
-                    e3t_adjust[i-1,j,k] = e3t_0[i-1] - e3t_ps[j,k] # python start with 0, so i-1
+    # the levels 1 to level-1 of mbathy have a partial cell, cached for each mesh (wizard.mesh)
+    e3t_adjust = ocean_mesh.e3t_adjust
+    # volume of the cells with the partial cells and the land-sea mask, computed once (wizard.ohc)
+    cell_volume = ohc.cell_volume(e1t, e2t, overturning.cell_thickness(e3t_0, e3t_adjust), tmask)
+    # weights of the cells in each depth band
+    ocean_bands = ohc.DepthBands(e3t_0, depth_bands, e3t_adjust)
     ####################################################################
     ###  Create space for stroing intermediate variables and outputs ###
     ####################################################################
@@ -367,18 +284,12 @@ if __name__=="__main__":
     # zonal integral (vertical profile)
     OHC_pool_glo_zonal = np.zeros((len(period),12,level,jj),dtype = float)
     OHC_pool_atl_zonal = np.zeros((len(period),12,level,jj),dtype = float)
-    # vertical integral (horizontal profile)
-    OHC_pool_glo_vert = np.zeros((len(period),12,jj,ji),dtype = float)
-    OHC_pool_atl_vert = np.zeros((len(period),12,jj,ji),dtype = float)
-    # vertical integral (horizontal profile) and OHC for certain layers
-    OHC_pool_glo_vert_0_500 = np.zeros((len(period),12,jj,ji),dtype = float)
-    OHC_pool_atl_vert_0_500 = np.zeros((len(period),12,jj,ji),dtype = float)
-    OHC_pool_glo_vert_500_1000 = np.zeros((len(period),12,jj,ji),dtype = float)
-    OHC_pool_atl_vert_500_1000 = np.zeros((len(period),12,jj,ji),dtype = float)
-    OHC_pool_glo_vert_1000_2000 = np.zeros((len(period),12,jj,ji),dtype = float)
-    OHC_pool_atl_vert_1000_2000 = np.zeros((len(period),12,jj,ji),dtype = float)
-    OHC_pool_glo_vert_2000_inf = np.zeros((len(period),12,jj,ji),dtype = float)
-    OHC_pool_atl_vert_2000_inf = np.zeros((len(period),12,jj,ji),dtype = float)
+    # vertical integral (horizontal profile) of each depth band
+    OHC_pool_glo_vert = np.zeros((len(period),12,len(depth_bands),jj,ji),dtype = float)
+    OHC_pool_atl_vert = np.zeros((len(period),12,len(depth_bands),jj,ji),dtype = float)
+    # zonal and vertical integral of each depth band
+    OHC_pool_glo_zonal_int = np.zeros((len(period),12,len(depth_bands),jj),dtype = float)
+    OHC_pool_atl_zonal_int = np.zeros((len(period),12,len(depth_bands),jj),dtype = float)
     # loop for calculation
     for i in period:
         for j in index_month:
@@ -390,30 +301,14 @@ if __name__=="__main__":
             ####################################################################
             ##############      Calculate ocean heat content      ##############
             ####################################################################
-            # calculate the meridional energy transport in the ocean
-            # calculate the meridional energy transport in the ocean
-            OHC_glo_zonal, OHC_atl_zonal, OHC_glo_vert, OHC_atl_vert,\
-            OHC_glo_vert_0_500, OHC_atl_vert_0_500, OHC_glo_vert_500_1000, OHC_atl_vert_500_1000,\
-            OHC_glo_vert_1000_2000, OHC_atl_vert_1000_2000, OHC_glo_vert_2000_inf, OHC_atl_vert_2000_inf\
+            # calculate the ocean heat content and save output to the pool
+            OHC_pool_glo_zonal[i-1993,j,:,:], OHC_pool_atl_zonal[i-1993,j,:,:],\
+            OHC_pool_glo_vert[i-1993,j,:,:,:], OHC_pool_atl_vert[i-1993,j,:,:,:],\
+            OHC_pool_glo_zonal_int[i-1993,j,:,:], OHC_pool_atl_zonal_int[i-1993,j,:,:]\
             = ocean_heat_content(theta_key)
-            # save output to the pool
-            OHC_pool_glo_zonal[i-1993,j,:,:] = OHC_glo_zonal
-            OHC_pool_atl_zonal[i-1993,j,:,:] = OHC_atl_zonal
-            OHC_pool_glo_vert[i-1993,j,:,:] = OHC_glo_vert
-            OHC_pool_atl_vert[i-1993,j,:,:] = OHC_atl_vert
-            OHC_pool_glo_vert_0_500[i-1993,j,:,:] = OHC_glo_vert_0_500
-            OHC_pool_atl_vert_0_500[i-1993,j,:,:] = OHC_atl_vert_0_500
-            OHC_pool_glo_vert_500_1000[i-1993,j,:,:] = OHC_glo_vert_500_1000
-            OHC_pool_atl_vert_500_1000[i-1993,j,:,:] = OHC_atl_vert_500_1000
-            OHC_pool_glo_vert_1000_2000[i-1993,j,:,:] = OHC_glo_vert_1000_2000
-            OHC_pool_atl_vert_1000_2000[i-1993,j,:,:] = OHC_atl_vert_1000_2000
-            OHC_pool_glo_vert_2000_inf[i-1993,j,:,:] = OHC_glo_vert_2000_inf
-            OHC_pool_atl_vert_2000_inf[i-1993,j,:,:] = OHC_atl_vert_2000_inf
     # create NetCDF file and save the output
     create_netcdf_point(OHC_pool_glo_zonal, OHC_pool_atl_zonal, OHC_pool_glo_vert, OHC_pool_atl_vert,\
-                        OHC_pool_glo_vert_0_500, OHC_pool_atl_vert_0_500, OHC_pool_glo_vert_500_1000,\
-                        OHC_pool_atl_vert_500_1000, OHC_pool_glo_vert_1000_2000, OHC_pool_atl_vert_1000_2000,\
-                        OHC_pool_glo_vert_2000_inf, OHC_pool_atl_vert_2000_inf, output_path)
+                        OHC_pool_glo_zonal_int, OHC_pool_atl_zonal_int, output_path)
 
     print 'Computation of statistical matrix on ORCA grid for GLORYS2V3 is complete!!!'
     print 'The output is in sleep, safe and sound!!!'
@@ -48,6 +48,10 @@ import matplotlib
 matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 from mpl_toolkits.basemap import Basemap, cm
+# shared kernels of Energy-Wizard at the root of the repository
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir))
+from wizard import mesh
+from wizard import output
 #import cartopy.crs as ccrs
 #from cartopy.mpl.gridliner import LONGITUDE_FORMATTER, LATITUDE_FORMATTER
 #import iris
@@ -97,6 +101,10 @@ start_year = 1993
 end_year = 2014
 # specify output path for the netCDF4 file
 output_path = '/project/Reanalysis/GLORYS2V3/monthly/output'
+# packing of the output fields (wizard.output), None (float64), 'float32' or 'int16'
+output_packing = None
+# directory of the cache of the fields derived from the mesh (wizard.mesh), None for the directory of the mesh
+mesh_cache_path = None
 ####################################################################################
 
 def var_key(datapath, year, month):
@@ -135,49 +143,6 @@ def var_key(datapath, year, month):
     logging.info("Retrieving variables for the year %d month %s successfully!" % (year,namelist_month[month]))
     return theta_key, uv_key
 
-def var_coordinate(datapath):
-    print "Start retrieving the ORCA025 coordinate and mask info"
-    logging.info('Start retrieving the ORCA025 coordinate and mask info')
-    # get the variable keys
-    mesh_mask_key = Dataset(datapath+ os.sep + 'G2V3_mesh_mask_myocean.nc')
-    subbasin_mesh_key = Dataset(datapath+ os.sep + 'new_maskglo.nc') #sub-basin from Andreas
-    #extract variables
-    # lat-lon-depth coordinate info
-    nav_lat = mesh_mask_key.variables['nav_lat'][:]
-    nav_lon = mesh_mask_key.variables['nav_lon'][:]
-    deptht = mesh_mask_key.variables['deptht'][:]
-    # lat-lon coordinate of V grid
-    gphiv = mesh_mask_key.variables['gphiv'][0,:,:] # lat from -78 to -89
-    glamv = mesh_mask_key.variables['glamv'][0,:,:] # lon from -179 to 179
-    gphiu = mesh_mask_key.variables['gphiu'][0,:,:] # lat from -78 to -89
-    glamu = mesh_mask_key.variables['glamu'][0,:,:] # lon from -179 to 179
-    # land-sea mask
-    tmask = mesh_mask_key.variables['tmask'][0,:,:,:]
-    umask = mesh_mask_key.variables['umask'][0,:,:,:]
-    vmask = mesh_mask_key.variables['vmask'][0,:,:,:]
-    # land-sea mask for sub-basin
-    tmaskatl = subbasin_mesh_key.variables['tmaskatl'][:,1:-1] # attention that the size is different!
-    # grid spacing scale factors (zonal)
-    e1t = mesh_mask_key.variables['e1t'][0,:,:]
-    e2t = mesh_mask_key.variables['e2t'][0,:,:]
-    e1u = mesh_mask_key.variables['e1u'][0,:,:]
-    e2u = mesh_mask_key.variables['e2u'][0,:,:]
-    e1v = mesh_mask_key.variables['e1v'][0,:,:]
-    e2v = mesh_mask_key.variables['e2v'][0,:,:]
-    # take the bathymetry
-    mbathy = mesh_mask_key.variables['mbathy'][0,:,:]
-    # depth of each layer
-    e3t_0 = mesh_mask_key.variables['e3t_0'][0,:]
-    # depth of partial cells
-    e3t_ps = mesh_mask_key.variables['e3t_ps'][0,:,:]
-    # depth of partial cell t point
-    hdept = mesh_mask_key.variables['hdept'][0,:,:]
-
-    print "Retrieve the ORCA025 coordinate and mask info successfully!"
-    logging.info('Finish retrieving the ORCA025 coordinate and mask info')
-
-    return nav_lat, nav_lon, deptht, tmask, umask, vmask, tmaskatl, e1t, e2t, e1u, e2u, e1v, e2v, gphiu, glamu, gphiv, glamv, mbathy, e3t_0, e3t_ps, hdept
-
 def mass_transport(uv_key,e1v):
     '''
     This function is used to calculate the mass transport.
@@ -228,8 +193,8 @@ def create_netcdf_point (psi_pool_glo_zonal, psi_pool_atl_zonal, psi_pool_glo_ve
     print '*******************************************************************'
     logging.info("Start creating netcdf file for the statistics of fields at each grid point.")
     # wrap the datasets into netcdf file
-    # 'NETCDF3_CLASSIC', 'NETCDF3_64BIT', 'NETCDF4_CLASSIC', and 'NETCDF4'
-    data_wrap = Dataset(output_path + os.sep + 'GLORYS2V3_model_monthly_orca025_psi_point.nc' ,'w',format = 'NETCDF3_64BIT')
+    # NETCDF4, compressed and chunked by time step (wizard.output)
+    data_wrap = output.create_dataset(output_path + os.sep + 'GLORYS2V3_model_monthly_orca025_psi_point.nc')
     # create dimensions for netcdf data
     year_wrap_dim = data_wrap.createDimension('year',len(period))
     month_wrap_dim = data_wrap.createDimension('month',12)
@@ -238,19 +203,19 @@ def create_netcdf_point (psi_pool_glo_zonal, psi_pool_atl_zonal, psi_pool_glo_ve
     lev_wrap_dim = data_wrap.createDimension('lev',level)
     # create coordinate variables for 3-dimensions
     # 1D
-    year_wrap_var = data_wrap.createVariable('year',np.int32,('year',))
-    month_wrap_var = data_wrap.createVariable('month',np.int32,('month',))
-    lat_wrap_var = data_wrap.createVariable('latitude_aux',np.float32,('j',))
-    lev_wrap_var = data_wrap.createVariable('lev',np.float32,('lev',))
+    year_wrap_var = output.create_variable(data_wrap,'year',np.int32,('year',))
+    month_wrap_var = output.create_variable(data_wrap,'month',np.int32,('month',))
+    lat_wrap_var = output.create_variable(data_wrap,'latitude_aux',np.float32,('j',))
+    lev_wrap_var = output.create_variable(data_wrap,'lev',np.float32,('lev',))
     # 2D
-    gphiv_wrap_var = data_wrap.createVariable('gphiv',np.float32,('j','i'))
-    glamv_wrap_var = data_wrap.createVariable('glamv',np.float32,('j','i'))
+    gphiv_wrap_var = output.create_variable(data_wrap,'gphiv',np.float32,('j','i'))
+    glamv_wrap_var = output.create_variable(data_wrap,'glamv',np.float32,('j','i'))
     # 4D
-    psi_glo_zonal_wrap_var = data_wrap.createVariable('psi_glo_zonal',np.float64,('year','month','lev','j'))
-    psi_atl_zonal_wrap_var = data_wrap.createVariable('psi_atl_zonal',np.float64,('year','month','lev','j'))
+    psi_glo_zonal_wrap_var = output.create_variable(data_wrap,'psi_glo_zonal',np.float64,('year','month','lev','j'),packing=output_packing)
+    psi_atl_zonal_wrap_var = output.create_variable(data_wrap,'psi_atl_zonal',np.float64,('year','month','lev','j'),packing=output_packing)
 
-    psi_glo_vert_wrap_var = data_wrap.createVariable('psi_glo_vert',np.float64,('year','month','j','i'))
-    psi_atl_vert_wrap_var = data_wrap.createVariable('psi_atl_vert',np.float64,('year','month','j','i'))
+    psi_glo_vert_wrap_var = output.create_variable(data_wrap,'psi_glo_vert',np.float64,('year','month','j','i'),packing=output_packing)
+    psi_atl_vert_wrap_var = output.create_variable(data_wrap,'psi_atl_vert',np.float64,('year','month','j','i'),packing=output_packing)
     # global attributes
     data_wrap.description = 'Monthly mean statistics of fields on ORCA grid'
     # variable attributes
@@ -305,8 +270,10 @@ if __name__=="__main__":
     jj = 1021
     level = 75
     # extract the mesh_mask and coordinate information
-    nav_lat, nav_lon, deptht, tmask, umask, vmask, tmaskatl, e1t, e2t, e1u, e2u, e1v, e2v, gphiu, glamu, \
-    gphiv, glamv, mbathy, e3t_0, e3t_ps, hdept = var_coordinate(datapath)
+    # mesh of ORCA025, the fields are read from the mesh files when they are used (wizard.mesh)
+    ocean_mesh = mesh.ORCAMesh('ORCA025', datapath, mesh_cache_path)
+    deptht, vmask, tmaskatl, e1v, gphiv, glamv, e3t_0 = ocean_mesh.fields('deptht', 'vmask', 'tmaskatl', 'e1v', 'gphiv',
+                                                                          'glamv', 'e3t_0')
     print '*******************************************************************'
     print '*******************  Partial cells correction   *******************'
     print '*******************************************************************'
@@ -315,12 +282,8 @@ if __name__=="__main__":
     # for the sake of simplicity of the code, just calculate the difference between e3t_0 and e3t_ps
     # then minus this adjustment when calculate the OMET at each layer with mask
     # Attention! Since python start with 0, the partial cell info given in mbathy should incoporate with this
-    e3t_adjust = np.zeros((level,jj,ji),dtype = float)
-    for i in np.arange(1,level,1): # start from 1
-        for j in np.arange(jj):
-            for k in np.arange(ji):
-                if i == mbathy[j,k]:
-                    e3t_adjust[i-1,j,k] = e3t_0[i-1] - e3t_ps[j,k] # python start with 0, so i-1
+    # the levels 1 to level-1 of mbathy have a partial cell, cached for each mesh (wizard.mesh)
+    e3t_adjust = ocean_mesh.e3t_adjust
     ####################################################################
     ###  Create space for stroing intermediate variables and outputs ###
     ####################################################################
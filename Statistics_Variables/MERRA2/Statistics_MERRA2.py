@@ -33,7 +33,6 @@ Caveat!!	    : The dataset is the complete dataset of MERRA2 from 20N - 90N.
                              2. Quantify divergence terms in day loop
 """
 import numpy as np
-import scipy
 import time as tttt
 from netCDF4 import Dataset,num2date
 import os
@@ -44,6 +43,12 @@ import matplotlib
 # generate images without having a window appear
 matplotlib.use('Agg')
 import matplotlib.pyplot as plt
+# shared kernels of Energy-Wizard at the root of the repository
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir))
+from wizard import geopotential
+from wizard import hybrid
+from wizard import output
+from wizard import vertical
 
 ##########################################################################
 ###########################   Units vacabulory   #########################
@@ -137,6 +142,10 @@ output_path = '/home/lwc16308/reanalysis/MERRA2/output/statistics'
 # benchmark datasets for basic dimensions
 benchmark_path = '/projects/0/blueactn/reanalysis/MERRA2/subdaily/merra1980/MERRA2_100.inst3_3d_asm_Nv.19801221.SUB.nc4'
 benchmark = Dataset(benchmark_path)
+# packing of the output fields (wizard.output), None (float64), 'float32' or 'int16'
+output_packing = None
+# interpolate to the pressure levels linearly in log-pressure instead of pressure (wizard.vertical)
+log_pressure = False
 ####################################################################################
 
 ###############################   stdout and log  ##################################
@@ -191,47 +200,9 @@ def calc_geopotential(var_key):
     print 'Start calculating geopotential on model level'
     # calculate the surface pressure
     # the unit of pressure here is Pa!!!
-    # define the half level pressure matrix
-    p_half_plus = np.zeros((len(time),len(level),len(latitude),len(longitude)),dtype = float)
-    p_half_minus = np.zeros((len(time),len(level),len(latitude),len(longitude)),dtype = float)
-    # calculate the index of pressure levels
-    index_level = np.arange(len(level))
-    # calculate the pressure at each half level
-    for i in index_level:
-        p_half_plus[:,i,:,:] = A[i+1]*100 + B[i+1] * ps
-        p_half_minus[:,i,:,:] = A[i]*100 + B[i] * ps
-    # calculate full pressure level
-    #level_full = (p_half_plus + p_half_minus) / 2
-    # compute the moist temperature (virtual temperature)
-    Tv = T * (1 + (constant['R_vap'] / constant['R_dry'] - 1) * q)
-    # initialize the first half level geopotential
-    gz_half = np.zeros((len(time),len(latitude),len(longitude)),dtype =float)
-    # initialize the full level geopotential
-    gz = np.zeros((len(time),len(level),len(latitude),len(longitude)),dtype = float)
-    # Calculate the geopotential at each level
-    # The integral should be taken from surface level to the TOA
-    for i in index_level:
-        # reverse the index to make it from surface to the TOA
-        i_inverse = len(level) -1 - i
-        # the ln(p_plus/p_minus) is calculated, alpha is defined
-        # an exception lies in the TOA
-        # see equation 2.23 in ECMWF IFS 9220
-        if i_inverse == 0:
-            ln_p = np.log(p_half_plus[:,i_inverse,:,:]/10)
-            alpha = np.log(2)
-        else:
-            ln_p = np.log(p_half_plus[:,i_inverse,:,:]/p_half_minus[:,i_inverse,:,:])
-            delta_p = p_half_plus[:,i_inverse,:,:] - p_half_minus[:,i_inverse,:,:]
-            alpha = 1 - p_half_minus[:,i_inverse,:,:] / delta_p * ln_p
-        # calculate the geopotential of the full level (exclude surface geopotential)
-        # see equation 2.22 in ECMWF IFS 9220
-        gz_full = gz_half + alpha * constant['R_dry'] * Tv[:,i_inverse,:,:]
-        # add surface geopotential to the full level
-        # see equation 2.21 in ECMWF IFS 9220
-        gz[:,i_inverse,:,:] = z + gz_full
-        # renew the half level geopotential for next loop step (from p_half_minus level to p_half_plus level)
-        # see equation 2.20 in ECMWF IFS 9220
-        gz_half = gz_half + ln_p * constant['R_dry'] * Tv[:,i_inverse,:,:]
+    # calculate the geopotential on each model level from the surface to the TOA
+    # see equation 2.20 - 2.23 in ECMWF IFS 9220
+    gz = geopotential.geopotential(T, q, z, hybrid.HybridLevels(A*100, B, ps), constant)
     print '*******************************************************************'
     print "***Computation of geopotential on each pressure level is finished**"
     print '*******************************************************************'
@@ -272,26 +243,10 @@ def field_statistics(var_key, gz):
     #!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!#
     # full model level pressure level
     p_level = (p_half_plus + p_half_minus) / 2.0
-    # create space for interpolation of fields
-    T_pressure_level = np.zeros((len(time),len(p_level_interpolate),len(latitude),len(longitude)),dtype = float)
-    u_pressure_level = np.zeros((len(time),len(p_level_interpolate),len(latitude),len(longitude)),dtype = float)
-    v_pressure_level = np.zeros((len(time),len(p_level_interpolate),len(latitude),len(longitude)),dtype = float)
-    q_pressure_level = np.zeros((len(time),len(p_level_interpolate),len(latitude),len(longitude)),dtype = float)
-    gz_pressure_level = np.zeros((len(time),len(p_level_interpolate),len(latitude),len(longitude)),dtype = float)
-    # interpolate fields on target pressure level
-    for i in np.arange(len(time)): # synoptic time
-        for j in np.arange(len(latitude)):
-            for k in np.arange(len(longitude)):
-                ius_T = scipy.interpolate.interp1d(p_level[i,:,j,k], T[i,:,j,k], kind='slinear',bounds_error=False,fill_value=0.0)
-                T_pressure_level[i,:,j,k] = ius_T(p_level_interpolate)
-                ius_u = scipy.interpolate.interp1d(p_level[i,:,j,k], u[i,:,j,k], kind='slinear',bounds_error=False,fill_value=0.0)
-                u_pressure_level[i,:,j,k] = ius_u(p_level_interpolate)
-                ius_v = scipy.interpolate.interp1d(p_level[i,:,j,k], v[i,:,j,k], kind='slinear',bounds_error=False,fill_value=0.0)
-                v_pressure_level[i,:,j,k] = ius_v(p_level_interpolate)
-                ius_q = scipy.interpolate.interp1d(p_level[i,:,j,k], q[i,:,j,k], kind='slinear',bounds_error=False,fill_value=0.0)
-                q_pressure_level[i,:,j,k] = ius_q(p_level_interpolate)
-                ius_gz = scipy.interpolate.interp1d(p_level[i,:,j,k], gz[i,:,j,k], kind='slinear',bounds_error=False,fill_value=0.0)
-                gz_pressure_level[i,:,j,k] = ius_gz(p_level_interpolate)
+    # interpolate fields on target pressure level, the bracketing levels and the weights
+    # of all the columns are computed once for all the fields (wizard.vertical)
+    interpolator = vertical.PressureInterpolator(p_level, p_level_interpolate, axis=1, log_pressure=log_pressure)
+    T_pressure_level, u_pressure_level, v_pressure_level, q_pressure_level, gz_pressure_level = interpolator(T, u, v, q, gz)
     # take the zonal mean
     T_zonal_mean = np.mean(np.mean(T_pressure_level,axis=3),0)
     u_zonal_mean = np.mean(np.mean(u_pressure_level,axis=3),0)
@@ -311,8 +266,8 @@ def create_netcdf_point(T_vert_mean_pool, u_vert_mean_pool, v_vert_mean_pool, q_
     print '*******************************************************************'
     logging.info("Start creating netcdf file for statistics of fields at each grid point.")
     # wrap the datasets into netcdf file
-    # 'NETCDF3_CLASSIC', 'NETCDF3_64BIT', 'NETCDF4_CLASSIC', and 'NETCDF4'
-    data_wrap = Dataset(output_path + os.sep + 'AMET_MERRA2_model_daily_statistics_point.nc','w',format = 'NETCDF3_64BIT')
+    # NETCDF4, compressed and chunked by time step (wizard.output)
+    data_wrap = output.create_dataset(output_path + os.sep + 'AMET_MERRA2_model_daily_statistics_point.nc')
     # create dimensions for netcdf data
     year_wrap_dim = data_wrap.createDimension('year',Dim_year)
     month_wrap_dim = data_wrap.createDimension('month',Dim_month)
@@ -320,24 +275,24 @@ def create_netcdf_point(T_vert_mean_pool, u_vert_mean_pool, v_vert_mean_pool, q_
     lon_wrap_dim = data_wrap.createDimension('longitude',Dim_longitude)
     lev_wrap_dim = data_wrap.createDimension('level',Dim_level_interpolate)
     # create coordinate variables for 3-dimensions
-    year_wrap_var = data_wrap.createVariable('year',np.int32,('year',))
-    month_wrap_var = data_wrap.createVariable('month',np.int32,('month',))
-    lat_wrap_var = data_wrap.createVariable('latitude',np.float32,('latitude',))
-    lon_wrap_var = data_wrap.createVariable('longitude',np.float32,('longitude',))
-    lev_wrap_var = data_wrap.createVariable('level',np.int32,('level',))
+    year_wrap_var = output.create_variable(data_wrap,'year',np.int32,('year',))
+    month_wrap_var = output.create_variable(data_wrap,'month',np.int32,('month',))
+    lat_wrap_var = output.create_variable(data_wrap,'latitude',np.float32,('latitude',))
+    lon_wrap_var = output.create_variable(data_wrap,'longitude',np.float32,('longitude',))
+    lev_wrap_var = output.create_variable(data_wrap,'level',np.int32,('level',))
     # create the 4d variable
     # vertical mean
-    T_vert_wrap_var = data_wrap.createVariable('T_vert_mean',np.float64,('year','month','latitude','longitude'))
-    u_vert_wrap_var = data_wrap.createVariable('u_vert_mean',np.float64,('year','month','latitude','longitude'))
-    v_vert_wrap_var = data_wrap.createVariable('v_vert_mean',np.float64,('year','month','latitude','longitude'))
-    q_vert_wrap_var = data_wrap.createVariable('q_vert_mean',np.float64,('year','month','latitude','longitude'))
-    gz_vert_wrap_var = data_wrap.createVariable('gz_vert_mean',np.float64,('year','month','latitude','longitude'))
+    T_vert_wrap_var = output.create_variable(data_wrap,'T_vert_mean',np.float64,('year','month','latitude','longitude'),packing=output_packing)
+    u_vert_wrap_var = output.create_variable(data_wrap,'u_vert_mean',np.float64,('year','month','latitude','longitude'),packing=output_packing)
+    v_vert_wrap_var = output.create_variable(data_wrap,'v_vert_mean',np.float64,('year','month','latitude','longitude'),packing=output_packing)
+    q_vert_wrap_var = output.create_variable(data_wrap,'q_vert_mean',np.float64,('year','month','latitude','longitude'),packing=output_packing)
+    gz_vert_wrap_var = output.create_variable(data_wrap,'gz_vert_mean',np.float64,('year','month','latitude','longitude'),packing=output_packing)
     # zonal mean
-    T_zonal_wrap_var = data_wrap.createVariable('T_zonal_mean',np.float64,('year','month','level','latitude'))
-    u_zonal_wrap_var = data_wrap.createVariable('u_zonal_mean',np.float64,('year','month','level','latitude'))
-    v_zonal_wrap_var = data_wrap.createVariable('v_zonal_mean',np.float64,('year','month','level','latitude'))
-    q_zonal_wrap_var = data_wrap.createVariable('q_zonal_mean',np.float64,('year','month','level','latitude'))
-    gz_zonal_wrap_var = data_wrap.createVariable('gz_zonal_mean',np.float64,('year','month','level','latitude'))
+    T_zonal_wrap_var = output.create_variable(data_wrap,'T_zonal_mean',np.float64,('year','month','level','latitude'),packing=output_packing)
+    u_zonal_wrap_var = output.create_variable(data_wrap,'u_zonal_mean',np.float64,('year','month','level','latitude'),packing=output_packing)
+    v_zonal_wrap_var = output.create_variable(data_wrap,'v_zonal_mean',np.float64,('year','month','level','latitude'),packing=output_packing)
+    q_zonal_wrap_var = output.create_variable(data_wrap,'q_zonal_mean',np.float64,('year','month','level','latitude'),packing=output_packing)
+    gz_zonal_wrap_var = output.create_variable(data_wrap,'gz_zonal_mean',np.float64,('year','month','level','latitude'),packing=output_packing)
     # global attributes
     data_wrap.description = 'Monthly mean statistics of fields from MERRA2 subdaily dataset'
     # variable attributes
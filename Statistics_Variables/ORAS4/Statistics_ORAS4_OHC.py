@@ -44,6 +44,12 @@ import matplotlib
 matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 from mpl_toolkits.basemap import Basemap, cm
+# shared kernels of Energy-Wizard at the root of the repository
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir))
+from wizard import mesh
+from wizard import ohc
+from wizard import output
+from wizard import overturning
 #import cartopy.crs as ccrs
 #from cartopy.mpl.gridliner import LONGITUDE_FORMATTER, LATITUDE_FORMATTER
 #import iris
@@ -64,18 +70,8 @@ print os.path
 #sns.set()
 
 # calculate the time for the code execution
-start_time = tttt.time()# gz in [m2 / s2] = [ kg m2 / kg s2 ] = [J / kg]
-    OHC_globe_vert_0_500 = np.sum(OHC_globe[:,0:22,:,:],1)/1e+12 # the unit is changed to tera joule
-    OHC_atlantic_vert_0_500 = np.sum(OHC_atlantic[:,0:22,:,:],1)/1e+12 # the unit is changed to tera joule
-    # 500m to 1000m
-    OHC_globe_vert_500_1000 = np.sum(OHC_globe[:,22:26,:,:],1)/1e+12         # layer 26 is in between 800 - 1200
-    OHC_atlantic_vert_500_1000 = np.sum(OHC_atlantic[:,22:26,:,:],1)/1e+12
-    # 1000m to 2000m
-    OHC_globe_vert_1000_2000 = np.sum(OHC_globe[:,26:30,:,:],1)/1e+12
-    OHC_atlantic_vert_1000_2000 = np.sum(OHC_atlantic[:,26:30,:,:],1)/1e+12
-    # 2000 to bottom
-    OHC_globe_vert_2000_inf = np.sum(OHC_globe[:,30:,:,:],1)/1e+12
-    OHC_atlantic_vert_2000_inf = np.sum(OHC_atlantic[:,30:,:,:],1)/1e+12
+start_time = tttt.time()
+
 # Redirect all the console output to a file
 #sys.stdout = open('F:\DataBase\ORAS4\console.out','w')
 sys.stdout = open('/project/Reanalysis/ORAS4/Monthly/Model/console_OHC.out','w')
@@ -108,6 +104,12 @@ output_path = '/project/Reanalysis/ORAS4/Monthly/Model/output'
 # benchmark datasets for basic dimensions
 #benchmark_path = 'F:\DataBase\ORAS\ORAS4\Monthly\model\\thetao_oras4_1m_1979_grid_T.nc'
 #benchmark = Dataset(benchmark_path)
+# packing of the output fields (wizard.output), None (float64), 'float32' or 'int16'
+output_packing = None
+# directory of the cache of the fields derived from the mesh (wizard.mesh), None for the directory of the mesh
+mesh_cache_path = None
+# depth bands of the ocean heat content [m], (upper, lower), None for the sea bottom (wizard.ohc)
+depth_bands = [(0, None), (0, 500), (500, 1000), (1000, 2000), (2000, None)]
 ####################################################################################
 
 def var_key(datapath, year):
@@ -129,128 +131,40 @@ def var_key(datapath, year):
     logging.info("Retrieving variables for the year %d successfully!" % (year))
     return theta_key, s_key, u_key, v_key
 
-def var_coordinate(datapath):
-    '''
-    Retrive ORCA1_Z42 grid information and land-sea mask
-    '''
-    print "Start retrieving the datasets of ORCA1 coordinate and mask info"
-    logging.info('Start retrieving the datasets of ORCA1 coordinate and mask info')
-    # get the variable keys
-    mesh_mask_key = Dataset(datapath+ os.sep + 'mesh_mask.nc')
-    subbasin_mesh_key = Dataset(datapath+ os.sep + 'basinmask_050308_UKMO.nc') #sub-basin from DRAKKER project
-    #grid_T_key = Dataset(datapath+ os.sep + 'coordinates_grid_T.nc')
-    #grid_U_key = Dataset(datapath+ os.sep + 'coordinates_grid_U.nc')
-    #grid_V_key = Dataset(datapath+ os.sep + 'coordinates_grid_V.nc')
-    #extract variables
-    # lat-lon-depth coordinate info
-    nav_lat = mesh_mask_key.variables['nav_lat'][:]
-    nav_lon = mesh_mask_key.variables['nav_lon'][:]
-    nav_lev = mesh_mask_key.variables['nav_lev'][:]
-    # lat-lon coordinate of V grid
-    gphiv = mesh_mask_key.variables['gphiv'][0,:,:] # lat from -78 to -89
-    glamv = mesh_mask_key.variables['glamv'][0,:,:] # lon from -179 to 179
-    gphiu = mesh_mask_key.variables['gphiu'][0,:,:] # lat from -78 to -89
-    glamu = mesh_mask_key.variables['glamu'][0,:,:] # lon from -179 to 179
-    # land-sea mask
-    tmask = mesh_mask_key.variables['tmask'][0,:,:,:]
-    umask = mesh_mask_key.variables['umask'][0,:,:,:]
-    vmask = mesh_mask_key.variables['vmask'][0,:,:,:]
-    # land-sea mask for sub-basin
-    tmaskatl = subbasin_mesh_key.variables['tmaskatl'][:] # attention that the size is different!
-    # grid spacing scale factors (zonal)
-    e1t = mesh_mask_key.variables['e1t'][0,:,:]
-    e2t = mesh_mask_key.variables['e2t'][0,:,:]
-    #e1u = mesh_mask_key.variables['e1u'][0,:,:]
-    #e2u = mesh_mask_key.variables['e2u'][0,:,:]
-    e1v = mesh_mask_key.variables['e1v'][0,:,:]
-    e2v = mesh_mask_key.variables['e2v'][0,:,:]
-    # take the bathymetry
-    mbathy = mesh_mask_key.variables['mbathy'][0,:,:]
-    # depth of each layer
-    e3t_0 = mesh_mask_key.variables['e3t_0'][0,:]
-    e3t_ps = mesh_mask_key.variables['e3t_ps'][0,:,:]
-    # comparison between variables
-    #lat_grid_T = grid_T_key.variables['lat'][:]
-    #lon_grid_T = grid_T_key.variables['lon'][:]
-    #tmask_grid_T = grid_T_key.variables['tmask'][:]
-
-    #lat_grid_U = grid_U_key.variables['lat'][:]
-    #lon_grid_U = grid_U_key.variables['lon'][:]
-    #umask_grid_U = grid_U_key.variables['umask'][:]
-
-    #lat_grid_V = grid_V_key.variables['lat'][:]
-    #lon_grid_V = grid_V_key.variables['lon'][:]
-    #vmask_grid_V = grid_V_key.variables['vmask'][:]
-
-    return nav_lat, nav_lon, nav_lev, tmask, umask, vmask, tmaskatl, e1t, e2t, e1v, e2v, gphiu, glamu, gphiv, glamv, mbathy, e3t_0, e3t_ps
-
 def ocean_heat_content(theta_key):
     '''
-    Compute the meridional energy transport in the ocean
+    Compute the ocean heat content of each depth band at each grid point and its zonal integrals
     '''
     # extract variables
-    print "Start extracting variables for the quantification of meridional energy transport."
+    print "Start extracting variables for the quantification of ocean heat content."
     theta = theta_key.variables['thetao'][:] # the unit of theta is Celsius!
     print 'Extracting variables successfully!'
     #logging.info("Extracting variables successfully!")
-    # calculate heat flux at each grid point
-    OHC_globe = np.zeros((len(index_month),level,jj,ji),dtype=float)
-    OHC_atlantic = np.zeros((len(index_month),level,jj,ji),dtype=float)
-    # expand the grid size matrix e1v to avoid more loops
-    e1t_3D = np.repeat(e1t[np.newaxis,:,:],level,0)
-    e1t_4D = np.repeat(e1t_3D[np.newaxis,:,:,:],len(index_month),0)
-    e2t_3D = np.repeat(e2t[np.newaxis,:,:],level,0)
-    e2t_4D = np.repeat(e2t_3D[np.newaxis,:,:,:],len(index_month),0)
-    # increase the dimension of tmask
-    tmask_4D = np.repeat(tmask[np.newaxis,:,:,:],len(index_month),0)
-    tmaskatl_3D = np.repeat(tmaskatl[np.newaxis,:,:],level,0)
-    tmaskatl_4D = np.repeat(tmaskatl_3D[np.newaxis,:,:,:],len(index_month),0)
-    # increase the dimension of partial cell adjustment matrix
-    e3t_adjust_4D = np.repeat(e3t_adjust[np.newaxis,:,:,:],len(index_month),0)
-    for i in np.arange(level):
-        OHC_globe[:,i,:,:] = constant['rho'] * constant['cp'] * theta[:,i,:,:] * e1t_4D[:,i,:,:] * e2t_4D[:,i,:,:] * e3t_0[i] * tmask_4D[:,i,:,:] -\
-                             constant['rho'] * constant['cp'] * theta[:,i,:,:] * e1t_4D[:,i,:,:] * e2t_4D[:,i,:,:] * e3t_adjust_4D[:,i,:,:] * tmask_4D[:,i,:,:]
-        OHC_atlantic[:,i,:,:] = constant['rho'] * constant['cp'] * theta[:,i,:,:] * e1t_4D[:,i,:,:] * e2t_4D[:,i,:,:] * e3t_0[i] * tmask_4D[:,i,:,:] * tmaskatl_4D[:,i,:,:] -\
-                                constant['rho'] * constant['cp'] * theta[:,i,:,:] * e1t_4D[:,i,:,:] * e2t_4D[:,i,:,:] * e3t_adjust_4D[:,i,:,:] * tmask_4D[:,i,:,:] * tmaskatl_4D[:,i,:,:]
-    # take the zonal integral
-    OHC_globe_zonal_int = np.sum(OHC_globe,3)/1e+12 # the unit is changed to tera joule
-    OHC_atlantic_zonal_int = np.sum(OHC_atlantic,3)/1e+12 # the unit is changed to tera joule
-    # take the vertical integral
-    OHC_globe_vert_int = np.sum(OHC_globe,1)/1e+12 # the unit is changed to tera joule
-    OHC_atlantic_vert_int = np.sum(OHC_atlantic,1)/1e+12 # the unit is changed to tera joule
-    # ocean heat content for certain layers
-    # surface to 500m
-    OHC_globe_vert_0_500 = np.sum(OHC_globe[:,0:22,:,:],1)/1e+12 # the unit is changed to tera joule
-    OHC_atlantic_vert_0_500 = np.sum(OHC_atlantic[:,0:22,:,:],1)/1e+12 # the unit is changed to tera joule
-    # 500m to 1000m
-    OHC_globe_vert_500_1000 = np.sum(OHC_globe[:,22:26,:,:],1)/1e+12         # layer 26 is in between 800 - 1200
-    OHC_atlantic_vert_500_1000 = np.sum(OHC_atlantic[:,22:26,:,:],1)/1e+12
-    # 1000m to 2000m
-    OHC_globe_vert_1000_2000 = np.sum(OHC_globe[:,26:30,:,:],1)/1e+12
-    OHC_atlantic_vert_1000_2000 = np.sum(OHC_atlantic[:,26:30,:,:],1)/1e+12
-    # 2000 to bottom
-    OHC_globe_vert_2000_inf = np.sum(OHC_globe[:,30:,:,:],1)/1e+12
-    OHC_atlantic_vert_2000_inf = np.sum(OHC_atlantic[:,30:,:,:],1)/1e+12
+    # vertical integral within each depth band (month, band, j, i), the cells at the
+    # boundaries of the bands are split between the bands (wizard.ohc)
+    OHC_globe_vert = ohc.heat_content(theta, cell_volume, ocean_bands, constant)
+    OHC_atlantic_vert = OHC_globe_vert * tmaskatl
+    # zonal integral at each level (month, level, j)
+    OHC_globe_zonal, OHC_atlantic_zonal = ohc.zonal_profiles(theta, cell_volume, constant, [None, tmaskatl])
+    # zonal integral of each depth band (month, band, j)
+    OHC_globe_zonal_int, OHC_atlantic_zonal_int = overturning.zonal_integrals(OHC_globe_vert, [None, tmaskatl])
     print '*****************************************************************************'
     print "*****    Computation of ocean heat content in the ocean is finished     *****"
     print "************         The result is in tera-joule (1E+12)         ************"
     print '*****************************************************************************'
-    return OHC_globe_zonal_int, OHC_atlantic_zonal_int, OHC_globe_vert_int, OHC_atlantic_vert_int,\
-           OHC_globe_vert_0_500, OHC_atlantic_vert_0_500, OHC_globe_vert_500_1000, OHC_atlantic_vert_500_1000,\
-           OHC_globe_vert_1000_2000, OHC_atlantic_vert_1000_2000, OHC_globe_vert_2000_inf, OHC_atlantic_vert_2000_inf
+    return OHC_globe_zonal, OHC_atlantic_zonal, OHC_globe_vert, OHC_atlantic_vert,\
+           OHC_globe_zonal_int, OHC_atlantic_zonal_int
 
 def create_netcdf_point (OHC_pool_glo_zonal, OHC_pool_atl_zonal, OHC_pool_glo_vert, OHC_pool_atl_vert,\
-                        OHC_pool_glo_vert_0_500, OHC_pool_atl_vert_0_500, OHC_pool_glo_vert_500_1000,\
-                        OHC_pool_atl_vert_500_1000, OHC_pool_glo_vert_1000_2000, OHC_pool_atl_vert_1000_2000,\
-                        OHC_pool_glo_vert_2000_inf, OHC_pool_atl_vert_2000_inf, output_path):
+                        OHC_pool_glo_zonal_int, OHC_pool_atl_zonal_int, output_path):
     print '*******************************************************************'
     print '*********************** create netcdf file ************************'
     print '********************    statistics on ORCA   **********************'
     print '*******************************************************************'
     logging.info("Start creating netcdf file for the OHC at each grid point.")
     # wrap the datasets into netcdf file
-    # 'NETCDF3_CLASSIC', 'NETCDF3_64BIT', 'NETCDF4_CLASSIC', and 'NETCDF4'
-    data_wrap = Dataset(output_path + os.sep + 'oras4_model_monthly_orca1_OHC_point.nc' ,'w',format = 'NETCDF3_64BIT')
+    # NETCDF4, compressed and chunked by time step (wizard.output)
+    data_wrap = output.create_dataset(output_path + os.sep + 'oras4_model_monthly_orca1_OHC_point.nc')
     # create dimensions for netcdf data
     year_wrap_dim = data_wrap.createDimension('year',len(period))
     month_wrap_dim = data_wrap.createDimension('month',12)
@@ -259,28 +173,16 @@ def create_netcdf_point (OHC_pool_glo_zonal, OHC_pool_atl_zonal, OHC_pool_glo_ve
     lev_wrap_dim = data_wrap.createDimension('lev',level)
     # create variables
     # 1D
-    year_wrap_var = data_wrap.createVariable('year',np.int32,('year',))
-    month_wrap_var = data_wrap.createVariable('month',np.int32,('month',))
-    lat_wrap_var = data_wrap.createVariable('latitude_aux',np.float32,('j',))
-    lev_wrap_var = data_wrap.createVariable('lev',np.float32,('lev',))
+    year_wrap_var = output.create_variable(data_wrap,'year',np.int32,('year',))
+    month_wrap_var = output.create_variable(data_wrap,'month',np.int32,('month',))
+    lat_wrap_var = output.create_variable(data_wrap,'latitude_aux',np.float32,('j',))
+    lev_wrap_var = output.create_variable(data_wrap,'lev',np.float32,('lev',))
     # 2D
-    gphit_wrap_var = data_wrap.createVariable('gphit',np.float32,('j','i'))
-    glamt_wrap_var = data_wrap.createVariable('glamt',np.float32,('j','i'))
+    gphit_wrap_var = output.create_variable(data_wrap,'gphit',np.float32,('j','i'))
+    glamt_wrap_var = output.create_variable(data_wrap,'glamt',np.float32,('j','i'))
     # 4D
-    OHC_glo_zonal_wrap_var = data_wrap.createVariable('OHC_glo_zonal',np.float64,('year','month','lev','j'))
-    OHC_atl_zonal_wrap_var = data_wrap.createVariable('OHC_atl_zonal',np.float64,('year','month','lev','j'))
-
-    OHC_glo_vert_wrap_var = data_wrap.createVariable('OHC_glo_vert',np.float64,('year','month','j','i'))
-    OHC_atl_vert_wrap_var = data_wrap.createVariable('OHC_atl_vert',np.float64,('year','month','j','i'))
-    OHC_glo_vert_0_500_wrap_var = data_wrap.createVariable('OHC_glo_vert_0_500',np.float64,('year','month','j','i'))
-    OHC_atl_vert_0_500_wrap_var = data_wrap.createVariable('OHC_atl_vert_0_500',np.float64,('year','month','j','i'))
-    OHC_glo_vert_500_1000_wrap_var = data_wrap.createVariable('OHC_glo_vert_500_1000',np.float64,('year','month','j','i'))
-    OHC_atl_vert_500_1000_wrap_var = data_wrap.createVariable('OHC_atl_vert_500_1000',np.float64,('year','month','j','i'))
-    OHC_glo_vert_1000_2000_wrap_var = data_wrap.createVariable('OHC_glo_vert_1000_2000',np.float64,('year','month','j','i'))
-    OHC_atl_vert_1000_2000_wrap_var = data_wrap.createVariable('OHC_atl_vert_1000_2000',np.float64,('year','month','j','i'))
-    OHC_glo_vert_2000_inf_wrap_var = data_wrap.createVariable('OHC_glo_vert_2000_inf',np.float64,('year','month','j','i'))
-    OHC_atl_vert_2000_inf_wrap_var = data_wrap.createVariable('OHC_atl_vert_2000_inf',np.float64,('year','month','j','i'))
-
+    OHC_glo_zonal_wrap_var = output.create_variable(data_wrap,'OHC_glo_zonal',np.float64,('year','month','lev','j'),packing=output_packing)
+    OHC_atl_zonal_wrap_var = output.create_variable(data_wrap,'OHC_atl_zonal',np.float64,('year','month','lev','j'),packing=output_packing)
     # global attributes
     data_wrap.description = 'Monthly mean statistics of fields on ORCA grid'
     # variable attributes
@@ -291,17 +193,6 @@ def create_netcdf_point (OHC_pool_glo_zonal, OHC_pool_atl_zonal, OHC_pool_glo_ve
     OHC_glo_zonal_wrap_var.units = 'tera joule'
     OHC_atl_zonal_wrap_var.units = 'tera joule'
 
-    OHC_glo_vert_wrap_var.units = 'tera joule'
-    OHC_atl_vert_wrap_var.units = 'tera joule'
-    OHC_glo_vert_0_500_wrap_var.units = 'tera joule'
-    OHC_atl_vert_0_500_wrap_var.units = 'tera joule'
-    OHC_glo_vert_500_1000_wrap_var.units = 'tera joule'
-    OHC_atl_vert_500_1000_wrap_var.units = 'tera joule'
-    OHC_glo_vert_1000_2000_wrap_var.units = 'tera joule'
-    OHC_atl_vert_1000_2000_wrap_var.units = 'tera joule'
-    OHC_glo_vert_2000_inf_wrap_var.units = 'tera joule'
-    OHC_atl_vert_2000_inf_wrap_var.units = 'tera joule'
-
     lat_wrap_var.long_name = 'auxillary latitude'
     lev_wrap_var.long_name = 'depth'
     gphit_wrap_var.long_name = 'ORCA1 Tgrid latitude'
@@ -309,17 +200,6 @@ def create_netcdf_point (OHC_pool_glo_zonal, OHC_pool_atl_zonal, OHC_pool_glo_ve
 
     OHC_glo_zonal_wrap_var.long_name = 'Global Ocean Heat Content (zonal integral)'
     OHC_atl_zonal_wrap_var.long_name = 'Atlantic Ocean Heat Content (zonal integral)'
-
-    OHC_glo_vert_wrap_var.long_name = 'Global Ocean Heat Content (vertical integral)'
-    OHC_atl_vert_wrap_var.long_name = 'Atlantic Ocean Heat Content (vertical integral)'
-    OHC_glo_vert_0_500_wrap_var.long_name = 'Global Ocean Heat Content from surface to 500 m (vertical integral)'
-    OHC_atl_vert_0_500_wrap_var.long_name = 'Atlantic Ocean Heat Content from surface to 500 m (vertical integral)'
-    OHC_glo_vert_500_1000_wrap_var.long_name = 'Global Ocean Heat Content from 500 m to 1000 m (vertical integral)'
-    OHC_atl_vert_500_1000_wrap_var.long_name = 'Atlantic Ocean Heat Content from 500 m to 1000 m (vertical integral)'
-    OHC_glo_vert_1000_2000_wrap_var.long_name = 'Global Ocean Heat Content from 1000 m to 2000 m (vertical integral)'
-    OHC_atl_vert_1000_2000_wrap_var.long_name = 'Atlantic Ocean Heat Content from 1000 m to 2000 m (vertical integral)'
-    OHC_glo_vert_2000_inf_wrap_var.long_name = 'Global Ocean Heat Content from 2000 m to bottom (vertical integral)'
-    OHC_atl_vert_2000_inf_wrap_var.long_name = 'Atlantic Ocean Heat Content from 2000 m to bottom (vertical integral)'
     # writing data
     year_wrap_var[:] = period
     month_wrap_var[:] = np.arange(1,13,1)
@@ -330,17 +210,18 @@ def create_netcdf_point (OHC_pool_glo_zonal, OHC_pool_atl_zonal, OHC_pool_glo_ve
 
     OHC_glo_zonal_wrap_var[:] = OHC_pool_glo_zonal
     OHC_atl_zonal_wrap_var[:] = OHC_pool_atl_zonal
-
-    OHC_glo_vert_wrap_var[:] = OHC_pool_glo_vert
-    OHC_atl_vert_wrap_var[:] = OHC_pool_atl_vert
-    OHC_glo_vert_0_500_wrap_var[:] = OHC_pool_glo_vert_0_500
-    OHC_atl_vert_0_500_wrap_var[:] = OHC_pool_atl_vert_0_500
-    OHC_glo_vert_500_1000_wrap_var[:] = OHC_pool_glo_vert_500_1000
-    OHC_atl_vert_500_1000_wrap_var[:] = OHC_pool_atl_vert_500_1000
-    OHC_glo_vert_1000_2000_wrap_var[:] = OHC_pool_glo_vert_1000_2000
-    OHC_atl_vert_1000_2000_wrap_var[:] = OHC_pool_atl_vert_1000_2000
-    OHC_glo_vert_2000_inf_wrap_var[:] = OHC_pool_glo_vert_2000_inf
-    OHC_atl_vert_2000_inf_wrap_var[:] = OHC_pool_atl_vert_2000_inf
+    # vertical integral and its zonal integral of each depth band, e.g. OHC_glo_vert_0_500 and OHC_glo_zonal_int_0_500
+    for n, band in enumerate(depth_bands):
+        for basin, basin_name, OHC_pool_vert, OHC_pool_zonal_int in (('glo', 'Global', OHC_pool_glo_vert, OHC_pool_glo_zonal_int),
+                                                                    ('atl', 'Atlantic', OHC_pool_atl_vert, OHC_pool_atl_zonal_int)):
+            OHC_vert_wrap_var = output.create_variable(data_wrap,'OHC_%s_vert%s' % (basin, ohc.band_suffix(band)),np.float64,('year','month','j','i'),packing=output_packing)
+            OHC_zonal_int_wrap_var = output.create_variable(data_wrap,'OHC_%s_zonal_int%s' % (basin, ohc.band_suffix(band)),np.float64,('year','month','j'),packing=output_packing)
+            OHC_vert_wrap_var.units = 'tera joule'
+            OHC_zonal_int_wrap_var.units = 'tera joule'
+            OHC_vert_wrap_var.long_name = '%s Ocean Heat Content%s (vertical integral)' % (basin_name, ohc.band_description(band))
+            OHC_zonal_int_wrap_var.long_name = '%s Ocean Heat Content%s (zonal and vertical integral)' % (basin_name, ohc.band_description(band))
+            OHC_vert_wrap_var[:] = OHC_pool_vert[:,:,n,:,:]
+            OHC_zonal_int_wrap_var[:] = OHC_pool_zonal_int[:,:,n,:]
     # close the file
     data_wrap.close()
     print "Create netcdf file successfully"
@@ -355,8 +236,10 @@ if __name__=="__main__":
     jj = 292
     level = 42
     # extract the mesh_mask and coordinate information
-    nav_lat, nav_lon, nav_lev, tmask, umask, vmask, tmaskatl, e1t, e2t, e1v, e2v,\
-    gphiu, glamu, gphiv, glamv, mbathy, e3t_0, e3t_ps = var_coordinate(datapath)
+    # mesh of ORCA1, the fields are read from the mesh files when they are used (wizard.mesh)
+    ocean_mesh = mesh.ORCAMesh('ORCA1', datapath, mesh_cache_path)
+    nav_lat, nav_lon, nav_lev, tmask, tmaskatl, e1t, e2t, gphiv, e3t_0 = ocean_mesh.fields('nav_lat', 'nav_lon', 'nav_lev', 'tmask',
+                                                                                           'tmaskatl', 'e1t', 'e2t', 'gphiv', 'e3t_0')
     print '*******************************************************************'
     print '*******************  Partial cells correction   *******************'
     print '*******************************************************************'
@@ -365,12 +248,12 @@ if __name__=="__main__":
     # for the sake of simplicity of the code, just calculate the difference between e3t_0 and e3t_ps
     # then minus this adjustment when calculate the OMET at each layer with mask
     # Attention! Since python start with 0, the partial cell info given in mbathy should incoporate with this
-    e3t_adjust = np.zeros((level,jj,ji),dtype = float)
-    for i in np.arange(1,level,1): # start from 1
-        for j in np.arange(jj):
-            for k in np.arange(ji):
-                if i == mbathy[j,k]:
-                    e3t_adjust[i-1,j,k] = e3t_0[i-1] - e3t_ps[j,k] # python start with 0, so i-1
+    # the levels 1 to level-1 of mbathy have a partial cell, cached for each mesh (wizard.mesh)
+    e3t_adjust = ocean_mesh.e3t_adjust
+    # volume of the cells with the partial cells and the land-sea mask, computed once (wizard.ohc)
+    cell_volume = ohc.cell_volume(e1t, e2t, overturning.cell_thickness(e3t_0, e3t_adjust), tmask)
+    # weights of the cells in each depth band
+    ocean_bands = ohc.DepthBands(e3t_0, depth_bands, e3t_adjust)
     print '*******************************************************************'
     print '************************ create data pool *************************'
     print '*******************************************************************'
@@ -378,44 +261,23 @@ if __name__=="__main__":
     # zonal integral (vertical profile)
     OHC_pool_glo_zonal = np.zeros((len(period),12,level,jj),dtype = float)
     OHC_pool_atl_zonal = np.zeros((len(period),12,level,jj),dtype = float)
-    # vertical integral (horizontal profile)
-    OHC_pool_glo_vert = np.zeros((len(period),12,jj,ji),dtype = float)
-    OHC_pool_atl_vert = np.zeros((len(period),12,jj,ji),dtype = float)
-    # vertical integral (horizontal profile) and OHC for certain layers
-    OHC_pool_glo_vert_0_500 = np.zeros((len(period),12,jj,ji),dtype = float)
-    OHC_pool_atl_vert_0_500 = np.zeros((len(period),12,jj,ji),dtype = float)
-    OHC_pool_glo_vert_500_1000 = np.zeros((len(period),12,jj,ji),dtype = float)
-    OHC_pool_atl_vert_500_1000 = np.zeros((len(period),12,jj,ji),dtype = float)
-    OHC_pool_glo_vert_1000_2000 = np.zeros((len(period),12,jj,ji),dtype = float)
-    OHC_pool_atl_vert_1000_2000 = np.zeros((len(period),12,jj,ji),dtype = float)
-    OHC_pool_glo_vert_2000_inf = np.zeros((len(period),12,jj,ji),dtype = float)
-    OHC_pool_atl_vert_2000_inf = np.zeros((len(period),12,jj,ji),dtype = float)
+    # vertical integral (horizontal profile) of each depth band
+    OHC_pool_glo_vert = np.zeros((len(period),12,len(depth_bands),jj,ji),dtype = float)
+    OHC_pool_atl_vert = np.zeros((len(period),12,len(depth_bands),jj,ji),dtype = float)
+    # zonal and vertical integral of each depth band
+    OHC_pool_glo_zonal_int = np.zeros((len(period),12,len(depth_bands),jj),dtype = float)
+    OHC_pool_atl_zonal_int = np.zeros((len(period),12,len(depth_bands),jj),dtype = float)
     # loop for calculation
     for i in period:
         # get the key of each variable
         theta_key, s_key, u_key, v_key = var_key(datapath, i)
-        # calculate the meridional energy transport in the ocean
-        OHC_glo_zonal, OHC_atl_zonal, OHC_glo_vert, OHC_atl_vert,\
-        OHC_glo_vert_0_500, OHC_atl_vert_0_500, OHC_glo_vert_500_1000, OHC_atl_vert_500_1000,\
-        OHC_glo_vert_1000_2000, OHC_atl_vert_1000_2000, OHC_glo_vert_2000_inf, OHC_atl_vert_2000_inf\
+        # calculate the ocean heat content
+        OHC_pool_glo_zonal[i-1958,:,:,:], OHC_pool_atl_zonal[i-1958,:,:,:],\
+        OHC_pool_glo_vert[i-1958,:,:,:,:], OHC_pool_atl_vert[i-1958,:,:,:,:],\
+        OHC_pool_glo_zonal_int[i-1958,:,:,:], OHC_pool_atl_zonal_int[i-1958,:,:,:]\
         = ocean_heat_content(theta_key)
-        # save output to the pool
-        OHC_pool_glo_zonal[i-1958,:,:,:] = OHC_glo_zonal
-        OHC_pool_atl_zonal[i-1958,:,:,:] = OHC_atl_zonal
-        OHC_pool_glo_vert[i-1958,:,:,:] = OHC_glo_vert
-        OHC_pool_atl_vert[i-1958,:,:,:] = OHC_atl_vert
-        OHC_pool_glo_vert_0_500[i-1958,:,:,:] = OHC_glo_vert_0_500
-        OHC_pool_atl_vert_0_500[i-1958,:,:,:] = OHC_atl_vert_0_500
-        OHC_pool_glo_vert_500_1000[i-1958,:,:,:] = OHC_glo_vert_500_1000
-        OHC_pool_atl_vert_500_1000[i-1958,:,:,:] = OHC_atl_vert_500_1000
-        OHC_pool_glo_vert_1000_2000[i-1958,:,:,:] = OHC_glo_vert_1000_2000
-        OHC_pool_atl_vert_1000_2000[i-1958,:,:,:] = OHC_atl_vert_1000_2000
-        OHC_pool_glo_vert_2000_inf[i-1958,:,:,:] = OHC_glo_vert_2000_inf
-        OHC_pool_atl_vert_2000_inf[i-1958,:,:,:] = OHC_atl_vert_2000_inf
     # create NetCDF file and save the output
     create_netcdf_point(OHC_pool_glo_zonal, OHC_pool_atl_zonal, OHC_pool_glo_vert, OHC_pool_atl_vert,\
-                        OHC_pool_glo_vert_0_500, OHC_pool_atl_vert_0_500, OHC_pool_glo_vert_500_1000,\
-                        OHC_pool_atl_vert_500_1000, OHC_pool_glo_vert_1000_2000, OHC_pool_atl_vert_1000_2000,\
-                        OHC_pool_glo_vert_2000_inf, OHC_pool_atl_vert_2000_inf, output_path)
+                        OHC_pool_glo_zonal_int, OHC_pool_atl_zonal_int, output_path)
 
 print ("--- %s minutes ---" % ((tttt.time() - start_time)/60))
@@ -47,6 +47,12 @@ import matplotlib
 # generate images without having a window appear
 matplotlib.use('Agg')
 import matplotlib.pyplot as plt
+# shared kernels of Energy-Wizard at the root of the repository
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir))
+from wizard import mesh
+from wizard import ohc
+from wizard import output
+from wizard import overturning
 #from mpl_toolkits.basemap import Basemap, cm
 #import cartopy.crs as ccrs
 #from cartopy.mpl.gridliner import LONGITUDE_FORMATTER, LATITUDE_FORMATTER
@@ -111,6 +117,12 @@ ff.close()
 
 # specify output path for the netCDF4 file
 output_path = '/projects/0/blueactn/reanalysis/SODA3/statistics'
+# packing of the output fields (wizard.output), None (float64), 'float32' or 'int16'
+output_packing = None
+# directory of the cache of the fields derived from the mesh (wizard.mesh), None for the directory of the mesh
+mesh_cache_path = None
+# depth bands of the ocean heat content [m], (upper, lower), None for the sea bottom (wizard.ohc)
+depth_bands = [(0, None), (0, 500), (500, 1000), (1000, 2000), (2000, None)]
 ####################################################################################
 
 def var_key(datapath, file_name):
@@ -128,159 +140,57 @@ def var_key(datapath, file_name):
     logging.info("Retrieving variables from %s successfully!" % (file_name))
     return soda_key
 
-def var_coordinate(datapath_mask):
-    print "Start retrieving the MOM5 coordinate and mask info"
-    logging.info('Start retrieving the MOM5 coordinate and mask info')
-    # get the variable keys
-    mesh_mask_key = Dataset(datapath_mask + os.sep + 'topog.nc')
-    #extract variables
-    # nominal coordinate info (1D)
-    grid_x_T = mesh_mask_key.variables['grid_x_T'][:]           # Nominal Longitude of T-cell center
-    grid_y_T = mesh_mask_key.variables['grid_y_T'][:]           # Nominal Latitude of T-cell center
-    grid_x_C = mesh_mask_key.variables['grid_x_C'][:]           # Nominal Longitude of C-cell center
-    grid_y_C = mesh_mask_key.variables['grid_y_C'][:]           # Nominal Latitude of C-cell center
-    # lat-lon-depth coordinate info (2D)
-    x_T = mesh_mask_key.variables['x_T'][:]                     # Geographic Longitude of T-cell center
-    y_T = mesh_mask_key.variables['y_T'][:]                     # Geographic Latitude of T-cell center
-    x_C = mesh_mask_key.variables['x_C'][:]                     # Geographic Longitude of C-cell center
-    y_C = mesh_mask_key.variables['y_C'][:]                     # Geographic Latitude of C-cell center
-    # depth
-    zt = mesh_mask_key.variables['zt'][:]                       # Depth of T cell (z50)
-    zb = mesh_mask_key.variables['zb'][:]                       # Depth of T cell edges (z50)
-    # calculate the depth of each layer
-    dz = np.zeros(zt.shape)
-    dz[0] = zb[0]
-    dz[1:] = zb[1:] - zb[:-1]
-    # area of T cell - for the computation of ocean heat content
-    area_T = mesh_mask_key.variables['area_T'][:]               # Area of T-cell
-    # width (e1t) and height (e2t) of T-cell
-    e1t = mesh_mask_key.variables['ds_01_21_T'][:]
-    e2t = mesh_mask_key.variables['ds_10_12_T'][:]
-    # width (e1c) and height (e2c) of C-cell
-    e1c = mesh_mask_key.variables['ds_01_21_C'][:]
-    e2c = mesh_mask_key.variables['ds_10_12_C'][:]
-    # land-sea mask (2D)
-    tmask = mesh_mask_key.variables['wet'][:]                   # land/sea flag (0=land) for T-cell
-    cmask = mesh_mask_key.variables['wet_c'][:]                 # land/sea flag (0=land) for C-cell
-    # number of vertical cells - topography
-    # this number also indicates the partial cells
-    mbathy_t = mesh_mask_key.variables['num_levels'][:]         # number of vertical T-cells
-    mbathy_c = mesh_mask_key.variables['num_levels_c'][:]       # number of vertical C-cells
-    # topographic depth of cell
-    topo_depth_t = mesh_mask_key.variables['depth'][:]          # topographic depth of T-cell
-    topo_depth_c = mesh_mask_key.variables['depth_c'][:]        # topographic depth of C-cell
-    # calculate the atlantic land sea mask
-    tmaskatl = np.empty_like(tmask)                             # avoid address pointer issue
-    tmaskatl[:] = tmask
-    tmaskatl[0:225,:] = 0 # boundary south
-    tmaskatl[:,0:727] = 0 # boundary west
-    tmaskatl[:,1200:] = 0 # boundary east
-    tmaskatl[y_T>70] = 0 # boundary north
-    # correction Mediterranean
-    tmaskatl[614:680,1100:1240] = 0
-    tmaskatl[660:720,1140:1280] = 0
-    # correction Pacific
-    tmaskatl[225:522,759:839] = 0
-    tmaskatl[225:545,670:780] = 0
-    tmaskatl[225:560,670:759] = 0
-
-    print "Retrieve the MOM5 coordinate and mask info successfully!"
-    logging.info('Finish retrieving the MOM5 coordinate and mask info')
-
-    return grid_x_T, grid_y_T, grid_x_C, grid_y_C, x_T, y_T, x_C, y_C, zt, zb, dz, area_T,\
-           e1t, e2t, e1c, e2c, tmask, tmaskatl, cmask, mbathy_t, mbathy_c, topo_depth_t, topo_depth_c
-
 def ocean_heat_content(soda_key):
     '''
-    This function is used to compute the ocean heat content.
+    This function is used to compute the ocean heat content of each depth band at each grid point and its zonal integrals.
     '''
     # extract variables
-    print "Start extracting variables for the quantification of meridional energy transport."
+    print "Start extracting variables for the quantification of ocean heat content."
     temp = soda_key.variables['temp'][0,:,:,:]                      # potential temperature, the unit is Celsius!
     # set the filled value to be 0
     np.ma.set_fill_value(temp,0)
     # check the filled Value
     #print temp.filled()
     print 'Extracting variables successfully!'
-    # calculate heat flux at each grid point
-    OHC_globe = np.zeros((level,jj,ji),dtype=float)
-    OHC_atlantic = np.zeros((level,jj,ji),dtype=float)
-    # expand the grid size matrix e1v to avoid more loops
-    #e1t_3D = np.repeat(e1t[np.newaxis,:,:],level,0)
-    #e2t_3D = np.repeat(e2t[np.newaxis,:,:],level,0)
-    #tmaskatl_3D = np.repeat(tmaskatl[np.newaxis,:,:],level,0)
-    for i in np.arange(level):
-        OHC_globe[i,:,:] = constant['rho'] * constant['cp'] * temp[i,:,:] * e1t * e2t * dz[i] * tmask -\
-                           constant['rho'] * constant['cp'] * temp[i,:,:] * e1t * e2t * dz_adjust_t[i,:,:] * tmask
-        OHC_atlantic[i,:,:] = constant['rho'] * constant['cp'] * temp[i,:,:] * e1t * e2t * dz[i] * tmask * tmaskatl -\
-                              constant['rho'] * constant['cp'] * temp[i,:,:] * e1t * e2t * dz_adjust_t[i,:,:] * tmask * tmaskatl
-        OHC_globe[i,:,:] = OHC_globe[i,:,:] * tmask
-        OHC_atlantic[i,:,:] = OHC_atlantic[i,:,:] * tmask * tmaskatl
-    # take the zonal integral
-    OHC_globe_zonal_int = np.sum(OHC_globe,2)/1e+12 # the unit is changed to tera joule
-    OHC_atlantic_zonal_int = np.sum(OHC_atlantic,2)/1e+12 # the unit is changed to tera joule
-    # take the vertical integral
-    OHC_globe_vert_int = np.sum(OHC_globe,0)/1e+12 # the unit is changed to tera joule
-    OHC_atlantic_vert_int = np.sum(OHC_atlantic,0)/1e+12 # the unit is changed to tera joule
-    # ocean heat content for certain layers
-    # surface to 500m
-    OHC_globe_vert_0_500 = np.sum(OHC_globe[0:24,:,:],0)/1e+12 # the unit is changed to tera joule
-    OHC_atlantic_vert_0_500 = np.sum(OHC_atlantic[0:24,:,:],0)/1e+12 # the unit is changed to tera joule
-    # 500m to 1000m
-    OHC_globe_vert_500_1000 = np.sum(OHC_globe[24:29,:,:],0)/1e+12         # layer 26 is in between 800 - 1200
-    OHC_atlantic_vert_500_1000 = np.sum(OHC_atlantic[24:29,:,:],0)/1e+12
-    # 1000m to 2000m
-    OHC_globe_vert_1000_2000 = np.sum(OHC_globe[29:34,:,:],0)/1e+12
-    OHC_atlantic_vert_1000_2000 = np.sum(OHC_atlantic[29:34,:,:],0)/1e+12
-    # 2000 to bottom
-    OHC_globe_vert_2000_inf = np.sum(OHC_globe[34:,:,:],0)/1e+12
-    OHC_atlantic_vert_2000_inf = np.sum(OHC_atlantic[34:,:,:],0)/1e+12
+    # vertical integral within each depth band (band, j, i), the cells at the
+    # boundaries of the bands are split between the bands (wizard.ohc)
+    OHC_globe_vert = ohc.heat_content(temp, cell_volume, ocean_bands, constant)
+    OHC_atlantic_vert = OHC_globe_vert * tmaskatl
+    # zonal integral at each level (level, j)
+    OHC_globe_zonal, OHC_atlantic_zonal = ohc.zonal_profiles(temp, cell_volume, constant, [None, tmaskatl])
+    # zonal integral of each depth band (band, j)
+    OHC_globe_zonal_int, OHC_atlantic_zonal_int = overturning.zonal_integrals(OHC_globe_vert, [None, tmaskatl])
     print '*****************************************************************************'
     print "****     Computation of ocean heat content in the ocean is finished      ****"
-    print "************         The result is in tera-watt (1E+12)          ************"
+    print "************         The result is in tera-joule (1E+12)          ************"
     print '*****************************************************************************'
-    return OHC_globe_zonal_int, OHC_atlantic_zonal_int, OHC_globe_vert_int, OHC_atlantic_vert_int,\
-           OHC_globe_vert_0_500, OHC_atlantic_vert_0_500, OHC_globe_vert_500_1000, OHC_atlantic_vert_500_1000,\
-           OHC_globe_vert_1000_2000, OHC_atlantic_vert_1000_2000, OHC_globe_vert_2000_inf, OHC_atlantic_vert_2000_inf
+    return OHC_globe_zonal, OHC_atlantic_zonal, OHC_globe_vert, OHC_atlantic_vert,\
+           OHC_globe_zonal_int, OHC_atlantic_zonal_int
 
 def create_netcdf_point (OHC_pool_glo_zonal, OHC_pool_atl_zonal, OHC_pool_glo_vert, OHC_pool_atl_vert,\
-                        OHC_pool_glo_vert_0_500, OHC_pool_atl_vert_0_500, OHC_pool_glo_vert_500_1000,\
-                        OHC_pool_atl_vert_500_1000, OHC_pool_glo_vert_1000_2000, OHC_pool_atl_vert_1000_2000,\
-                        OHC_pool_glo_vert_2000_inf, OHC_pool_atl_vert_2000_inf,output_path):
+                        OHC_pool_glo_zonal_int, OHC_pool_atl_zonal_int, output_path):
     print '*******************************************************************'
     print '*********************** create netcdf file ************************'
     print '*********************   statistics on MOM   **********************'
     print '*******************************************************************'
     logging.info("Start creating netcdf file for the statistics of fields at each grid point.")
     # wrap the datasets into netcdf file
-    # 'NETCDF3_CLASSIC', 'NETCDF3_64BIT', 'NETCDF4_CLASSIC', and 'NETCDF4'
-    data_wrap = Dataset(output_path + os.sep + 'SODA3_model_5daily_mom5_OHC_point_%d.nc' % (input_year),'w',format = 'NETCDF4')
+    # NETCDF4, compressed and chunked by time step (wizard.output)
+    data_wrap = output.create_dataset(output_path + os.sep + 'SODA3_model_5daily_mom5_OHC_point_%d.nc' % (input_year))
     # create dimensions for netcdf data
     lat_wrap_dim = data_wrap.createDimension('j',jj)
     lon_wrap_dim = data_wrap.createDimension('i',ji)
     lev_wrap_dim = data_wrap.createDimension('lev',level)
     # create coordinate variables for 3-dimensions
     # 1D
-    lat_wrap_var = data_wrap.createVariable('latitude_aux',np.float32,('j',))
-    lev_wrap_var = data_wrap.createVariable('lev',np.float32,('lev',))
+    lat_wrap_var = output.create_variable(data_wrap,'latitude_aux',np.float32,('j',))
+    lev_wrap_var = output.create_variable(data_wrap,'lev',np.float32,('lev',))
     # 2D
-    gphit_wrap_var = data_wrap.createVariable('y_T',np.float32,('j','i'))
-    glamt_wrap_var = data_wrap.createVariable('x_T',np.float32,('j','i'))
+    gphit_wrap_var = output.create_variable(data_wrap,'y_T',np.float32,('j','i'))
+    glamt_wrap_var = output.create_variable(data_wrap,'x_T',np.float32,('j','i'))
     # 2D
-    OHC_glo_zonal_wrap_var = data_wrap.createVariable('OHC_glo_zonal',np.float64,('lev','j'),zlib=True)
-    OHC_atl_zonal_wrap_var = data_wrap.createVariable('OHC_atl_zonal',np.float64,('lev','j'),zlib=True)
-
-    OHC_glo_vert_wrap_var = data_wrap.createVariable('OHC_glo_vert',np.float64,('j','i'),zlib=True)
-    OHC_atl_vert_wrap_var = data_wrap.createVariable('OHC_atl_vert',np.float64,('j','i'),zlib=True)
-    OHC_glo_vert_0_500_wrap_var = data_wrap.createVariable('OHC_glo_vert_0_500',np.float64,('j','i'),zlib=True)
-    OHC_atl_vert_0_500_wrap_var = data_wrap.createVariable('OHC_atl_vert_0_500',np.float64,('j','i'),zlib=True)
-    OHC_glo_vert_500_1000_wrap_var = data_wrap.createVariable('OHC_glo_vert_500_1000',np.float64,('j','i'),zlib=True)
-    OHC_atl_vert_500_1000_wrap_var = data_wrap.createVariable('OHC_atl_vert_500_1000',np.float64,('j','i'),zlib=True)
-    OHC_glo_vert_1000_2000_wrap_var = data_wrap.createVariable('OHC_glo_vert_1000_2000',np.float64,('j','i'),zlib=True)
-    OHC_atl_vert_1000_2000_wrap_var = data_wrap.createVariable('OHC_atl_vert_1000_2000',np.float64,('j','i'),zlib=True)
-    OHC_glo_vert_2000_inf_wrap_var = data_wrap.createVariable('OHC_glo_vert_2000_inf',np.float64,('j','i'),zlib=True)
-    OHC_atl_vert_2000_inf_wrap_var = data_wrap.createVariable('OHC_atl_vert_2000_inf',np.float64,('j','i'),zlib=True)
-
+    OHC_glo_zonal_wrap_var = output.create_variable(data_wrap,'OHC_glo_zonal',np.float64,('lev','j'),packing=output_packing)
+    OHC_atl_zonal_wrap_var = output.create_variable(data_wrap,'OHC_atl_zonal',np.float64,('lev','j'),packing=output_packing)
     # global attributes
     data_wrap.description = 'Monthly mean statistics of fields on MOM grid'
     # variable attributes
@@ -291,17 +201,6 @@ def create_netcdf_point (OHC_pool_glo_zonal, OHC_pool_atl_zonal, OHC_pool_glo_ve
     OHC_glo_zonal_wrap_var.units = 'tera joule'
     OHC_atl_zonal_wrap_var.units = 'tera joule'
 
-    OHC_glo_vert_wrap_var.units = 'tera joule'
-    OHC_atl_vert_wrap_var.units = 'tera joule'
-    OHC_glo_vert_0_500_wrap_var.units = 'tera joule'
-    OHC_atl_vert_0_500_wrap_var.units = 'tera joule'
-    OHC_glo_vert_500_1000_wrap_var.units = 'tera joule'
-    OHC_atl_vert_500_1000_wrap_var.units = 'tera joule'
-    OHC_glo_vert_1000_2000_wrap_var.units = 'tera joule'
-    OHC_atl_vert_1000_2000_wrap_var.units = 'tera joule'
-    OHC_glo_vert_2000_inf_wrap_var.units = 'tera joule'
-    OHC_atl_vert_2000_inf_wrap_var.units = 'tera joule'
-
     lat_wrap_var.long_name = 'auxillary latitude'
     lev_wrap_var.long_name = 'depth'
     gphit_wrap_var.long_name = 'MOM5 Tgrid latitude'
@@ -309,18 +208,6 @@ def create_netcdf_point (OHC_pool_glo_zonal, OHC_pool_atl_zonal, OHC_pool_glo_ve
 
     OHC_glo_zonal_wrap_var.long_name = 'Global Ocean Heat Content (zonal integral)'
     OHC_atl_zonal_wrap_var.long_name = 'Atlantic Ocean Heat Content (zonal integral)'
-
-    OHC_glo_vert_wrap_var.long_name = 'Global Ocean Heat Content (vertical integral)'
-    OHC_atl_vert_wrap_var.long_name = 'Atlantic Ocean Heat Content (vertical integral)'
-    OHC_glo_vert_0_500_wrap_var.long_name = 'Global Ocean Heat Content from surface to 500 m (vertical integral)'
-    OHC_atl_vert_0_500_wrap_var.long_name = 'Atlantic Ocean Heat Content from surface to 500 m (vertical integral)'
-    OHC_glo_vert_500_1000_wrap_var.long_name = 'Global Ocean Heat Content from 500 m to 1000 m (vertical integral)'
-    OHC_atl_vert_500_1000_wrap_var.long_name = 'Atlantic Ocean Heat Content from 500 m to 1000 m (vertical integral)'
-    OHC_glo_vert_1000_2000_wrap_var.long_name = 'Global Ocean Heat Content from 1000 m to 2000 m (vertical integral)'
-    OHC_atl_vert_1000_2000_wrap_var.long_name = 'Atlantic Ocean Heat Content from 1000 m to 2000 m (vertical integral)'
-    OHC_glo_vert_2000_inf_wrap_var.long_name = 'Global Ocean Heat Content from 2000 m to bottom (vertical integral)'
-    OHC_atl_vert_2000_inf_wrap_var.long_name = 'Atlantic Ocean Heat Content from 2000 m to bottom (vertical integral)'
-
     # writing data
     lat_wrap_var[:] = grid_y_C
     lev_wrap_var[:] = zt
@@ -329,17 +216,18 @@ def create_netcdf_point (OHC_pool_glo_zonal, OHC_pool_atl_zonal, OHC_pool_glo_ve
 
     OHC_glo_zonal_wrap_var[:] = OHC_pool_glo_zonal
     OHC_atl_zonal_wrap_var[:] = OHC_pool_atl_zonal
-
-    OHC_glo_vert_wrap_var[:] = OHC_pool_glo_vert
-    OHC_atl_vert_wrap_var[:] = OHC_pool_atl_vert
-    OHC_glo_vert_0_500_wrap_var[:] = OHC_pool_glo_vert_0_500
-    OHC_atl_vert_0_500_wrap_var[:] = OHC_pool_atl_vert_0_500
-    OHC_glo_vert_500_1000_wrap_var[:] = OHC_pool_glo_vert_500_1000
-    OHC_atl_vert_500_1000_wrap_var[:] = OHC_pool_atl_vert_500_1000
-    OHC_glo_vert_1000_2000_wrap_var[:] = OHC_pool_glo_vert_1000_2000
-    OHC_atl_vert_1000_2000_wrap_var[:] = OHC_pool_atl_vert_1000_2000
-    OHC_glo_vert_2000_inf_wrap_var[:] = OHC_pool_glo_vert_2000_inf
-    OHC_atl_vert_2000_inf_wrap_var[:] = OHC_pool_atl_vert_2000_inf
+    # vertical integral and its zonal integral of each depth band, e.g. OHC_glo_vert_0_500 and OHC_glo_zonal_int_0_500
+    for n, band in enumerate(depth_bands):
+        for basin, basin_name, OHC_pool_vert, OHC_pool_zonal_int in (('glo', 'Global', OHC_pool_glo_vert, OHC_pool_glo_zonal_int),
+                                                                    ('atl', 'Atlantic', OHC_pool_atl_vert, OHC_pool_atl_zonal_int)):
+            OHC_vert_wrap_var = output.create_variable(data_wrap,'OHC_%s_vert%s' % (basin, ohc.band_suffix(band)),np.float64,('j','i'),packing=output_packing)
+            OHC_zonal_int_wrap_var = output.create_variable(data_wrap,'OHC_%s_zonal_int%s' % (basin, ohc.band_suffix(band)),np.float64,('j',),packing=output_packing)
+            OHC_vert_wrap_var.units = 'tera joule'
+            OHC_zonal_int_wrap_var.units = 'tera joule'
+            OHC_vert_wrap_var.long_name = '%s Ocean Heat Content%s (vertical integral)' % (basin_name, ohc.band_description(band))
+            OHC_zonal_int_wrap_var.long_name = '%s Ocean Heat Content%s (zonal and vertical integral)' % (basin_name, ohc.band_description(band))
+            OHC_vert_wrap_var[:] = OHC_pool_vert[n,:,:]
+            OHC_zonal_int_wrap_var[:] = OHC_pool_zonal_int[n,:]
     # close the file
     data_wrap.close()
     print "Create netcdf file successfully"
@@ -358,8 +246,10 @@ if __name__=="__main__":
     jj = 1070
     level = 50
     # extract the mesh_mask and coordinate information
-    grid_x_T, grid_y_T, grid_x_C, grid_y_C, x_T, y_T, x_C, y_C, zt, zb, dz, area_T, e1t,\
-    e2t, e1c, e2c, tmask, tmaskatl, cmask, mbathy_t, mbathy_c, topo_depth_t, topo_depth_c = var_coordinate(datapath_mask)
+    # mesh of MOM5, the fields are read from the mesh files when they are used (wizard.mesh)
+    ocean_mesh = mesh.MOMMesh(datapath_mask, mesh_cache_path)
+    grid_y_C, x_T, y_T, zt, dz, e1t, e2t, tmask, tmaskatl = ocean_mesh.fields('grid_y_C', 'x_T', 'y_T', 'zt', 'dz', 'e1t',
+                                                                              'e2t', 'tmask', 'tmaskatl')
     print '*******************************************************************'
     print '*******************  Partial cells correction   *******************'
     print '*******************************************************************'
@@ -370,35 +260,26 @@ if __name__=="__main__":
     # then minus this adjustment when calculate the OMET at each layer with mask
     # Attention! Since python start with 0, the partial cell info given in mbathy should incoporate with this
     # !!!
-    dz_adjust_t = np.zeros((level,jj,ji),dtype = float)
-    dz_adjust_c = np.zeros((level,jj,ji),dtype = float)
-    for i in np.arange(jj):
-        for j in np.arange(ji):
-            if mbathy_t[i,j] != 0:
-                counter_t = int(mbathy_t[i,j] - 1)
-                dz_adjust_t[counter_t,i,j] = zb[counter_t] - topo_depth_t[i,j]    # python start with 0, so i-1
-            if mbathy_c[i,j] != 0:
-                counter_c = int(mbathy_c[i,j] - 1)
-                dz_adjust_c[counter_c,i,j] = zb[counter_c] - topo_depth_c[i,j]    # python start with 0, so i-1
+    # the levels 1 to level of mbathy have a partial cell, cached for each mesh (wizard.mesh)
+    dz_adjust_t = ocean_mesh.dz_adjust_t
+    dz_adjust_c = ocean_mesh.dz_adjust_c
+    # volume of the cells with the partial cells and the land-sea mask, computed once (wizard.ohc)
+    cell_volume = ohc.cell_volume(e1t, e2t, overturning.cell_thickness(dz, dz_adjust_t), tmask)
+    # weights of the cells in each depth band
+    ocean_bands = ohc.DepthBands(dz, depth_bands, dz_adjust_t)
     ####################################################################
     ###  Create space for stroing intermediate variables and outputs ###
     ####################################################################
-    # create a data pool to save the OHC for each year and month
+    # create a data pool to sum the OHC over the files
     # zonal integral (vertical profile)
-    OHC_pool_glo_zonal = np.zeros((len(namelist),level,jj),dtype = float)
-    OHC_pool_atl_zonal = np.zeros((len(namelist),level,jj),dtype = float)
-    # vertical integral (horizontal profile)
-    OHC_pool_glo_vert = np.zeros((len(namelist),jj,ji),dtype = float)
-    OHC_pool_atl_vert = np.zeros((len(namelist),jj,ji),dtype = float)
-    # vertical integral (horizontal profile) and OHC for certain layers
-    OHC_pool_glo_vert_0_500 = np.zeros((len(namelist),jj,ji),dtype = float)
-    OHC_pool_atl_vert_0_500 = np.zeros((len(namelist),jj,ji),dtype = float)
-    OHC_pool_glo_vert_500_1000 = np.zeros((len(namelist),jj,ji),dtype = float)
-    OHC_pool_atl_vert_500_1000 = np.zeros((len(namelist),jj,ji),dtype = float)
-    OHC_pool_glo_vert_1000_2000 = np.zeros((len(namelist),jj,ji),dtype = float)
-    OHC_pool_atl_vert_1000_2000 = np.zeros((len(namelist),jj,ji),dtype = float)
-    OHC_pool_glo_vert_2000_inf = np.zeros((len(namelist),jj,ji),dtype = float)
-    OHC_pool_atl_vert_2000_inf = np.zeros((len(namelist),jj,ji),dtype = float)
+    OHC_pool_glo_zonal = np.zeros((level,jj),dtype = float)
+    OHC_pool_atl_zonal = np.zeros((level,jj),dtype = float)
+    # vertical integral (horizontal profile) of each depth band
+    OHC_pool_glo_vert = np.zeros((len(depth_bands),jj,ji),dtype = float)
+    OHC_pool_atl_vert = np.zeros((len(depth_bands),jj,ji),dtype = float)
+    # zonal and vertical integral of each depth band
+    OHC_pool_glo_zonal_int = np.zeros((len(depth_bands),jj),dtype = float)
+    OHC_pool_atl_zonal_int = np.zeros((len(depth_bands),jj),dtype = float)
     # loop for calculation
     for i in np.arange(len(namelist)):
         ####################################################################
@@ -409,43 +290,20 @@ if __name__=="__main__":
         ####################################################################
         ##############      Calculate ocean heat content      ##############
         ####################################################################
-        # calculate the meridional energy transport in the ocean
-        # calculate the meridional energy transport in the ocean
+        # calculate the ocean heat content
         OHC_glo_zonal, OHC_atl_zonal, OHC_glo_vert, OHC_atl_vert,\
-        OHC_glo_vert_0_500, OHC_atl_vert_0_500, OHC_glo_vert_500_1000, OHC_atl_vert_500_1000,\
-        OHC_glo_vert_1000_2000, OHC_atl_vert_1000_2000, OHC_glo_vert_2000_inf, OHC_atl_vert_2000_inf\
-        = ocean_heat_content(soda_key)
-        # save output to the pool
-        OHC_pool_glo_zonal[i,:,:] = OHC_glo_zonal
-        OHC_pool_atl_zonal[i,:,:] = OHC_atl_zonal
-        OHC_pool_glo_vert[i,:,:] = OHC_glo_vert
-        OHC_pool_atl_vert[i,:,:] = OHC_atl_vert
-        OHC_pool_glo_vert_0_500[i,:,:] = OHC_glo_vert_0_500
-        OHC_pool_atl_vert_0_500[i,:,:] = OHC_atl_vert_0_500
-        OHC_pool_glo_vert_500_1000[i,:,:] = OHC_glo_vert_500_1000
-        OHC_pool_atl_vert_500_1000[i,:,:] = OHC_atl_vert_500_1000
-        OHC_pool_glo_vert_1000_2000[i,:,:] = OHC_glo_vert_1000_2000
-        OHC_pool_atl_vert_1000_2000[i,:,:] = OHC_atl_vert_1000_2000
-        OHC_pool_glo_vert_2000_inf[i,:,:] = OHC_glo_vert_2000_inf
-        OHC_pool_atl_vert_2000_inf[i,:,:] = OHC_atl_vert_2000_inf
-    # take the monthly mean
-    OHC_pool_glo_zonal_mean = np.mean(OHC_pool_glo_zonal,0)
-    OHC_pool_atl_zonal_mean = np.mean(OHC_pool_atl_zonal,0)
-    OHC_pool_glo_vert_mean = np.mean(OHC_pool_glo_vert,0)
-    OHC_pool_atl_vert_mean = np.mean(OHC_pool_atl_vert,0)
-    OHC_pool_glo_vert_0_500_mean = np.mean(OHC_pool_glo_vert_0_500,0)
-    OHC_pool_atl_vert_0_500_mean = np.mean(OHC_pool_atl_vert_0_500,0)
-    OHC_pool_glo_vert_500_1000_mean = np.mean(OHC_pool_glo_vert_500_1000,0)
-    OHC_pool_atl_vert_500_1000_mean = np.mean(OHC_pool_atl_vert_500_1000,0)
-    OHC_pool_glo_vert_1000_2000_mean = np.mean(OHC_pool_glo_vert_1000_2000,0)
-    OHC_pool_atl_vert_1000_2000_mean = np.mean(OHC_pool_atl_vert_1000_2000,0)
-    OHC_pool_glo_vert_2000_inf_mean = np.mean(OHC_pool_glo_vert_2000_inf,0)
-    OHC_pool_atl_vert_2000_inf_mean = np.mean(OHC_pool_atl_vert_2000_inf,0)
-    # create NetCDF file and save the output
-    create_netcdf_point(OHC_pool_glo_zonal_mean, OHC_pool_atl_zonal_mean, OHC_pool_glo_vert_mean, OHC_pool_atl_vert_mean,\
-                        OHC_pool_glo_vert_0_500_mean, OHC_pool_atl_vert_0_500_mean, OHC_pool_glo_vert_500_1000_mean,\
-                        OHC_pool_atl_vert_500_1000_mean, OHC_pool_glo_vert_1000_2000_mean, OHC_pool_atl_vert_1000_2000_mean,\
-                        OHC_pool_glo_vert_2000_inf_mean, OHC_pool_atl_vert_2000_inf_mean, output_path)
+        OHC_glo_zonal_int, OHC_atl_zonal_int = ocean_heat_content(soda_key)
+        # sum the output in the pool
+        OHC_pool_glo_zonal += OHC_glo_zonal
+        OHC_pool_atl_zonal += OHC_atl_zonal
+        OHC_pool_glo_vert += OHC_glo_vert
+        OHC_pool_atl_vert += OHC_atl_vert
+        OHC_pool_glo_zonal_int += OHC_glo_zonal_int
+        OHC_pool_atl_zonal_int += OHC_atl_zonal_int
+    # take the mean over the files, create NetCDF file and save the output
+    create_netcdf_point(OHC_pool_glo_zonal / len(namelist), OHC_pool_atl_zonal / len(namelist),\
+                        OHC_pool_glo_vert / len(namelist), OHC_pool_atl_vert / len(namelist),\
+                        OHC_pool_glo_zonal_int / len(namelist), OHC_pool_atl_zonal_int / len(namelist), output_path)
 
     print 'Computation of meridional energy transport on MOM5 grid for SODA3 is complete!!!'
     print 'The output is in sleep, safe and sound!!!'
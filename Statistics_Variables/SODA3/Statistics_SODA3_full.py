@@ -48,6 +48,10 @@ import matplotlib
 matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 from mpl_toolkits.basemap import Basemap, cm
+# shared kernels of Energy-Wizard at the root of the repository
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir))
+from wizard import mesh
+from wizard import output
 #import cartopy.crs as ccrs
 #from cartopy.mpl.gridliner import LONGITUDE_FORMATTER, LATITUDE_FORMATTER
 #import iris
@@ -111,6 +115,10 @@ ff.close()
 
 # specify output path for the netCDF4 file
 output_path = '/projects/0/blueactn/reanalysis/SODA3/statistics'
+# packing of the output fields (wizard.output), None (float64), 'float32' or 'int16'
+output_packing = None
+# directory of the cache of the fields derived from the mesh (wizard.mesh), None for the directory of the mesh
+mesh_cache_path = None
 ####################################################################################
 
 def var_key(datapath, file_name):
@@ -128,68 +136,6 @@ def var_key(datapath, file_name):
     logging.info("Retrieving variables from %s successfully!" % (file_name))
     return soda_key
 
-def var_coordinate(datapath_mask):
-    print "Start retrieving the MOM5 coordinate and mask info"
-    logging.info('Start retrieving the MOM5 coordinate and mask info')
-    # get the variable keys
-    mesh_mask_key = Dataset(datapath_mask + os.sep + 'topog.nc')
-    #extract variables
-    # nominal coordinate info (1D)
-    grid_x_T = mesh_mask_key.variables['grid_x_T'][:]           # Nominal Longitude of T-cell center
-    grid_y_T = mesh_mask_key.variables['grid_y_T'][:]           # Nominal Latitude of T-cell center
-    grid_x_C = mesh_mask_key.variables['grid_x_C'][:]           # Nominal Longitude of C-cell center
-    grid_y_C = mesh_mask_key.variables['grid_y_C'][:]           # Nominal Latitude of C-cell center
-    # lat-lon-depth coordinate info (2D)
-    x_T = mesh_mask_key.variables['x_T'][:]                     # Geographic Longitude of T-cell center
-    y_T = mesh_mask_key.variables['y_T'][:]                     # Geographic Latitude of T-cell center
-    x_C = mesh_mask_key.variables['x_C'][:]                     # Geographic Longitude of C-cell center
-    y_C = mesh_mask_key.variables['y_C'][:]                     # Geographic Latitude of C-cell center
-    # depth
-    zt = mesh_mask_key.variables['zt'][:]                       # Depth of T cell (z50)
-    zb = mesh_mask_key.variables['zb'][:]                       # Depth of T cell edges (z50)
-    # calculate the depth of each layer
-    dz = np.zeros(zt.shape)
-    dz[0] = zb[0]
-    dz[1:] = zb[1:] - zb[:-1]
-    # area of T cell - for the computation of ocean heat content
-    area_T = mesh_mask_key.variables['area_T'][:]               # Area of T-cell
-    # width (e1t) and height (e2t) of T-cell
-    e1t = mesh_mask_key.variables['ds_01_21_T'][:]
-    e2t = mesh_mask_key.variables['ds_10_12_T'][:]
-    # width (e1c) and height (e2c) of C-cell
-    e1c = mesh_mask_key.variables['ds_01_21_C'][:]
-    e2c = mesh_mask_key.variables['ds_10_12_C'][:]
-    # land-sea mask (2D)
-    tmask = mesh_mask_key.variables['wet'][:]                   # land/sea flag (0=land) for T-cell
-    cmask = mesh_mask_key.variables['wet_c'][:]                 # land/sea flag (0=land) for C-cell
-    # number of vertical cells - topography
-    # this number also indicates the partial cells
-    mbathy_t = mesh_mask_key.variables['num_levels'][:]         # number of vertical T-cells
-    mbathy_c = mesh_mask_key.variables['num_levels_c'][:]       # number of vertical C-cells
-    # topographic depth of cell
-    topo_depth_t = mesh_mask_key.variables['depth'][:]          # topographic depth of T-cell
-    topo_depth_c = mesh_mask_key.variables['depth_c'][:]        # topographic depth of C-cell
-    # calculate the atlantic land sea mask
-    tmaskatl = np.empty_like(tmask)                             # avoid address pointer issue
-    tmaskatl[:] = tmask
-    tmaskatl[0:225,:] = 0 # boundary south
-    tmaskatl[:,0:727] = 0 # boundary west
-    tmaskatl[:,1200:] = 0 # boundary east
-    tmaskatl[y_T>70] = 0 # boundary north
-    # correction Mediterranean
-    tmaskatl[614:680,1100:1240] = 0
-    tmaskatl[660:720,1140:1280] = 0
-    # correction Pacific
-    tmaskatl[225:522,759:839] = 0
-    tmaskatl[225:545,670:780] = 0
-    tmaskatl[225:560,670:759] = 0
-
-    print "Retrieve the MOM5 coordinate and mask info successfully!"
-    logging.info('Finish retrieving the MOM5 coordinate and mask info')
-
-    return grid_x_T, grid_y_T, grid_x_C, grid_y_C, x_T, y_T, x_C, y_C, zt, zb, dz, area_T,\
-           e1t, e2t, e1c, e2c, tmask, tmaskatl, cmask, mbathy_t, mbathy_c, topo_depth_t, topo_depth_c
-
 def mass_transport(soda_key,e1c):
     '''
     This function is used to calculate the mass transport.
@@ -368,48 +314,48 @@ def create_netcdf_point (psi_pool_glo_zonal, psi_pool_atl_zonal, psi_pool_glo_ve
     print '*******************************************************************'
     logging.info("Start creating netcdf file for the statistics of fields at each grid point.")
     # wrap the datasets into netcdf file
-    # 'NETCDF3_CLASSIC', 'NETCDF3_64BIT', 'NETCDF4_CLASSIC', and 'NETCDF4'
-    data_wrap = Dataset(output_path + os.sep + 'SODA3_model_5daily_mom5_statistics_point_%d.nc' % (input_year),'w',format = 'NETCDF3_64BIT')
+    # NETCDF4, compressed and chunked by time step (wizard.output)
+    data_wrap = output.create_dataset(output_path + os.sep + 'SODA3_model_5daily_mom5_statistics_point_%d.nc' % (input_year))
     # create dimensions for netcdf data
     lat_wrap_dim = data_wrap.createDimension('j',jj)
     lon_wrap_dim = data_wrap.createDimension('i',ji)
     lev_wrap_dim = data_wrap.createDimension('lev',level)
     # create coordinate variables for 3-dimensions
     # 1D
-    lat_wrap_var = data_wrap.createVariable('latitude_aux',np.float32,('j',))
-    lev_wrap_var = data_wrap.createVariable('lev',np.float32,('lev',))
+    lat_wrap_var = output.create_variable(data_wrap,'latitude_aux',np.float32,('j',))
+    lev_wrap_var = output.create_variable(data_wrap,'lev',np.float32,('lev',))
     # 2D
-    gphit_wrap_var = data_wrap.createVariable('y_T',np.float32,('j','i'))
-    glamt_wrap_var = data_wrap.createVariable('x_T',np.float32,('j','i'))
-    gphic_wrap_var = data_wrap.createVariable('y_C',np.float32,('j','i'))
-    glamc_wrap_var = data_wrap.createVariable('x_C',np.float32,('j','i'))
+    gphit_wrap_var = output.create_variable(data_wrap,'y_T',np.float32,('j','i'))
+    glamt_wrap_var = output.create_variable(data_wrap,'x_T',np.float32,('j','i'))
+    gphic_wrap_var = output.create_variable(data_wrap,'y_C',np.float32,('j','i'))
+    glamc_wrap_var = output.create_variable(data_wrap,'x_C',np.float32,('j','i'))
     # 2D
-    psi_glo_zonal_wrap_var = data_wrap.createVariable('psi_glo_zonal',np.float64,('lev','j'))
-    psi_atl_zonal_wrap_var = data_wrap.createVariable('psi_atl_zonal',np.float64,('lev','j'))
-    OHC_glo_zonal_wrap_var = data_wrap.createVariable('OHC_glo_zonal',np.float64,('lev','j'))
-    OHC_atl_zonal_wrap_var = data_wrap.createVariable('OHC_atl_zonal',np.float64,('lev','j'))
-    temp_glo_zonal_wrap_var = data_wrap.createVariable('temp_glo_zonal',np.float64,('lev','j'))
-    temp_atl_zonal_wrap_var = data_wrap.createVariable('temp_atl_zonal',np.float64,('lev','j'))
-    u_glo_zonal_wrap_var = data_wrap.createVariable('u_glo_zonal',np.float64,('lev','j'))
-    u_atl_zonal_wrap_var = data_wrap.createVariable('u_atl_zonal',np.float64,('lev','j'))
-    v_glo_zonal_wrap_var = data_wrap.createVariable('v_glo_zonal',np.float64,('lev','j'))
-    v_atl_zonal_wrap_var = data_wrap.createVariable('v_atl_zonal',np.float64,('lev','j'))
-
-    psi_glo_vert_wrap_var = data_wrap.createVariable('psi_glo_vert',np.float64,('j','i'))
-    psi_atl_vert_wrap_var = data_wrap.createVariable('psi_atl_vert',np.float64,('j','i'))
-    OHC_glo_vert_wrap_var = data_wrap.createVariable('OHC_glo_vert',np.float64,('j','i'))
-    OHC_atl_vert_wrap_var = data_wrap.createVariable('OHC_atl_vert',np.float64,('j','i'))
-    OHC_glo_vert_0_500_wrap_var = data_wrap.createVariable('OHC_glo_vert_0_500',np.float64,('j','i'))
-    OHC_atl_vert_0_500_wrap_var = data_wrap.createVariable('OHC_atl_vert_0_500',np.float64,('j','i'))
-    OHC_glo_vert_500_1000_wrap_var = data_wrap.createVariable('OHC_glo_vert_500_1000',np.float64,('j','i'))
-    OHC_atl_vert_500_1000_wrap_var = data_wrap.createVariable('OHC_atl_vert_500_1000',np.float64,('j','i'))
-    OHC_glo_vert_1000_2000_wrap_var = data_wrap.createVariable('OHC_glo_vert_1000_2000',np.float64,('j','i'))
-    OHC_atl_vert_1000_2000_wrap_var = data_wrap.createVariable('OHC_atl_vert_1000_2000',np.float64,('j','i'))
-    OHC_glo_vert_2000_inf_wrap_var = data_wrap.createVariable('OHC_glo_vert_2000_inf',np.float64,('j','i'))
-    OHC_atl_vert_2000_inf_wrap_var = data_wrap.createVariable('OHC_atl_vert_2000_inf',np.float64,('j','i'))
-    temp_glo_vert_wrap_var = data_wrap.createVariable('temp_glo_vert',np.float64,('j','i'))
-    u_glo_vert_wrap_var = data_wrap.createVariable('u_glo_vert',np.float64,('j','i'))
-    v_glo_vert_wrap_var = data_wrap.createVariable('v_glo_vert',np.float64,('j','i'))
+    psi_glo_zonal_wrap_var = output.create_variable(data_wrap,'psi_glo_zonal',np.float64,('lev','j'),packing=output_packing)
+    psi_atl_zonal_wrap_var = output.create_variable(data_wrap,'psi_atl_zonal',np.float64,('lev','j'),packing=output_packing)
+    OHC_glo_zonal_wrap_var = output.create_variable(data_wrap,'OHC_glo_zonal',np.float64,('lev','j'),packing=output_packing)
+    OHC_atl_zonal_wrap_var = output.create_variable(data_wrap,'OHC_atl_zonal',np.float64,('lev','j'),packing=output_packing)
+    temp_glo_zonal_wrap_var = output.create_variable(data_wrap,'temp_glo_zonal',np.float64,('lev','j'),packing=output_packing)
+    temp_atl_zonal_wrap_var = output.create_variable(data_wrap,'temp_atl_zonal',np.float64,('lev','j'),packing=output_packing)
+    u_glo_zonal_wrap_var = output.create_variable(data_wrap,'u_glo_zonal',np.float64,('lev','j'),packing=output_packing)
+    u_atl_zonal_wrap_var = output.create_variable(data_wrap,'u_atl_zonal',np.float64,('lev','j'),packing=output_packing)
+    v_glo_zonal_wrap_var = output.create_variable(data_wrap,'v_glo_zonal',np.float64,('lev','j'),packing=output_packing)
+    v_atl_zonal_wrap_var = output.create_variable(data_wrap,'v_atl_zonal',np.float64,('lev','j'),packing=output_packing)
+
+    psi_glo_vert_wrap_var = output.create_variable(data_wrap,'psi_glo_vert',np.float64,('j','i'),packing=output_packing)
+    psi_atl_vert_wrap_var = output.create_variable(data_wrap,'psi_atl_vert',np.float64,('j','i'),packing=output_packing)
+    OHC_glo_vert_wrap_var = output.create_variable(data_wrap,'OHC_glo_vert',np.float64,('j','i'),packing=output_packing)
+    OHC_atl_vert_wrap_var = output.create_variable(data_wrap,'OHC_atl_vert',np.float64,('j','i'),packing=output_packing)
+    OHC_glo_vert_0_500_wrap_var = output.create_variable(data_wrap,'OHC_glo_vert_0_500',np.float64,('j','i'),packing=output_packing)
+    OHC_atl_vert_0_500_wrap_var = output.create_variable(data_wrap,'OHC_atl_vert_0_500',np.float64,('j','i'),packing=output_packing)
+    OHC_glo_vert_500_1000_wrap_var = output.create_variable(data_wrap,'OHC_glo_vert_500_1000',np.float64,('j','i'),packing=output_packing)
+    OHC_atl_vert_500_1000_wrap_var = output.create_variable(data_wrap,'OHC_atl_vert_500_1000',np.float64,('j','i'),packing=output_packing)
+    OHC_glo_vert_1000_2000_wrap_var = output.create_variable(data_wrap,'OHC_glo_vert_1000_2000',np.float64,('j','i'),packing=output_packing)
+    OHC_atl_vert_1000_2000_wrap_var = output.create_variable(data_wrap,'OHC_atl_vert_1000_2000',np.float64,('j','i'),packing=output_packing)
+    OHC_glo_vert_2000_inf_wrap_var = output.create_variable(data_wrap,'OHC_glo_vert_2000_inf',np.float64,('j','i'),packing=output_packing)
+    OHC_atl_vert_2000_inf_wrap_var = output.create_variable(data_wrap,'OHC_atl_vert_2000_inf',np.float64,('j','i'),packing=output_packing)
+    temp_glo_vert_wrap_var = output.create_variable(data_wrap,'temp_glo_vert',np.float64,('j','i'),packing=output_packing)
+    u_glo_vert_wrap_var = output.create_variable(data_wrap,'u_glo_vert',np.float64,('j','i'),packing=output_packing)
+    v_glo_vert_wrap_var = output.create_variable(data_wrap,'v_glo_vert',np.float64,('j','i'),packing=output_packing)
 
     # global attributes
     data_wrap.description = 'Monthly mean statistics of fields on MOM grid'
@@ -533,8 +479,11 @@ if __name__=="__main__":
     jj = 1070
     level = 50
     # extract the mesh_mask and coordinate information
-    grid_x_T, grid_y_T, grid_x_C, grid_y_C, x_T, y_T, x_C, y_C, zt, zb, dz, area_T, e1t,\
-    e2t, e1c, e2c, tmask, tmaskatl, cmask, mbathy_t, mbathy_c, topo_depth_t, topo_depth_c = var_coordinate(datapath_mask)
+    # mesh of MOM5, the fields are read from the mesh files when they are used (wizard.mesh)
+    ocean_mesh = mesh.MOMMesh(datapath_mask, mesh_cache_path)
+    grid_y_C, x_T, y_T, x_C, y_C, zt, dz, e1t, e2t, e1c, tmask, tmaskatl, cmask, topo_depth_t,\
+    topo_depth_c = ocean_mesh.fields('grid_y_C', 'x_T', 'y_T', 'x_C', 'y_C', 'zt', 'dz', 'e1t', 'e2t', 'e1c', 'tmask',
+                                     'tmaskatl', 'cmask', 'topo_depth_t', 'topo_depth_c')
     print '*******************************************************************'
     print '*******************  Partial cells correction   *******************'
     print '*******************************************************************'
@@ -545,16 +494,9 @@ if __name__=="__main__":
     # then minus this adjustment when calculate the OMET at each layer with mask
     # Attention! Since python start with 0, the partial cell info given in mbathy should incoporate with this
     # !!!
-    dz_adjust_t = np.zeros((level,jj,ji),dtype = float)
-    dz_adjust_c = np.zeros((level,jj,ji),dtype = float)
-    for i in np.arange(jj):
-        for j in np.arange(ji):
-            if mbathy_t[i,j] != 0:
-                counter_t = int(mbathy_t[i,j] - 1)
-                dz_adjust_t[counter_t,i,j] = zb[counter_t] - topo_depth_t[i,j]    # python start with 0, so i-1
-            if mbathy_c[i,j] != 0:
-                counter_c = int(mbathy_c[i,j] - 1)
-                dz_adjust_c[counter_c,i,j] = zb[counter_c] - topo_depth_c[i,j]    # python start with 0, so i-1
+    # the levels 1 to level of mbathy have a partial cell, cached for each mesh (wizard.mesh)
+    dz_adjust_t = ocean_mesh.dz_adjust_t
+    dz_adjust_c = ocean_mesh.dz_adjust_c
     ####################################################################
     ###  Create space for stroing intermediate variables and outputs ###
     ####################################################################
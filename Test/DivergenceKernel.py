@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+
+"""
+Copyright Netherlands eScience Center
+
+Function        : Regression test of the shared divergence kernel (wizard.divergence)
+Date            : 2026.10.17
+Last Update     : 2026.10.17
+Description     : The per-gridpoint loops which computed the divergence of moisture
+                  and mass flux in mass_correction() of the AMET scripts have been
+                  replaced by the array based kernel in wizard.divergence.
+                  This script keeps a verbatim copy of the legacy loops and checks
+                  that the kernel reproduces them bit for bit on synthetic fields,
+                  for the ERA-Interim (north to south, regional) grid, the MERRA2
+                  (south to north) grid and a 2D EC-Earth style field.
+Return Value    : exit status 0 if the kernel agrees with the loops
+Dependencies    : os, sys, numpy
+"""
+import numpy as np
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from wizard import divergence
+
+constant = {'R' : 6371009}  # radius of the earth [m]
+
+def legacy_loops(flux_u_int, flux_v_int, latitude, longitude, dx, dy, north_to_south):
+    # verbatim copy of the loops in AMET_ERAI_int2mean_HPCcloud (time, lat, lon)
+    div_flux_u = np.zeros(flux_u_int.shape, dtype = float)
+    div_flux_v = np.zeros(flux_v_int.shape, dtype = float)
+    for i in np.arange(len(latitude)):
+        for j in np.arange(len(longitude)):
+            if j == 0:
+                div_flux_u[:,i,j] = (flux_u_int[:,i,j+1] - flux_u_int[:,i,-1]) / (2 * dx[i])
+            elif j == (len(longitude)-1) :
+                div_flux_u[:,i,j] = (flux_u_int[:,i,0] - flux_u_int[:,i,j-1]) / (2 * dx[i])
+            else:
+                div_flux_u[:,i,j] = (flux_u_int[:,i,j+1] - flux_u_int[:,i,j-1]) / (2 * dx[i])
+    for i in np.arange(len(latitude)):
+        if north_to_south:
+            if i == 0:
+                div_flux_v[:,i,:] = -(flux_v_int[:,i+1,:] - flux_v_int[:,i,:]) / (2 * dy)
+            elif i == (len(latitude)-1):
+                div_flux_v[:,i,:] = -(flux_v_int[:,i,:] - flux_v_int[:,i-1,:]) / (2 * dy)
+            else:
+                div_flux_v[:,i,:] = -(flux_v_int[:,i+1,:] - flux_v_int[:,i-1,:]) / (2 * dy)
+        else:
+            if i == 0:
+                div_flux_v[:,i,:] = (flux_v_int[:,i+1,:] - flux_v_int[:,i,:]) / (2 * dy)
+            elif i == (len(latitude)-1):
+                div_flux_v[:,i,:] = (flux_v_int[:,i,:] - flux_v_int[:,i-1,:]) / (2 * dy)
+            else:
+                div_flux_v[:,i,:] = (flux_v_int[:,i+1,:] - flux_v_int[:,i-1,:]) / (2 * dy)
+
+    return div_flux_u, div_flux_v
+
+def check(name, latitude, longitude, dy, north_to_south, steps=4):
+    rng = np.random.RandomState(1979)
+    dx = 2 * np.pi * constant['R'] * np.cos(2 * np.pi * latitude / 360) / len(longitude)
+    # magnitude of the vertically integrated moisture / mass flux [kg/(m s)]
+    flux_u_int = rng.standard_normal((steps,len(latitude),len(longitude))) * 1e+4
+    flux_v_int = rng.standard_normal((steps,len(latitude),len(longitude))) * 1e+4
+    loop_u, loop_v = legacy_loops(flux_u_int, flux_v_int, latitude, longitude, dx, dy, north_to_south)
+    kernel_u, kernel_v = divergence.divergence(flux_u_int, flux_v_int, dx, dy, north_to_south)
+    assert np.array_equal(loop_u, kernel_u), '%s: zonal divergence differs from the loops' % (name)
+    assert np.array_equal(loop_v, kernel_v), '%s: meridional divergence differs from the loops' % (name)
+    # a single time step (lat, lon) as in the EC-Earth record loop
+    kernel_u_2D = divergence.zonal_divergence(flux_u_int[0], dx)
+    kernel_v_2D = divergence.meridional_divergence(flux_v_int[0], dy, north_to_south)
+    assert np.array_equal(loop_u[0], kernel_u_2D), '%s: 2D zonal divergence differs' % (name)
+    assert np.array_equal(loop_v[0], kernel_v_2D), '%s: 2D meridional divergence differs' % (name)
+    print('%s: bit for bit identical' % (name))
+
+if __name__=="__main__":
+    # ERA-Interim 0.75 deg, 30N - 90N, latitude from north to south
+    check('ERA-Interim', np.linspace(90, 30, 81), np.arange(0, 360, 0.75),
+          np.pi * constant['R'] / 240, True)
+    # MERRA2 0.5 x 0.625 deg, 20N - 90N, latitude from south to north
+    check('MERRA2', np.linspace(20, 90, 141), np.arange(-180, 180, 0.625),
+          np.pi * constant['R'] / 361, False)
+    # JRA55 / EC-Earth style global grid, latitude from north to south
+    latitude = np.linspace(90, -90, 160)
+    check('JRA55', latitude, np.arange(0, 360, 1.125),
+          np.pi * constant['R'] / (len(latitude)-1), True)
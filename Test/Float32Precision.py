@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+
+"""
+Copyright Netherlands eScience Center
+
+Function        : Validation of the float32 mode of AMET on synthetic fields
+Date            : 2026.10.17
+Last Update     : 2026.10.17
+Description     : The energy column integrals (wizard.column) are computed for one
+                  synthetic month on an ERA-Interim like grid (60 hybrid levels,
+                  30N - 90N) once with float64 fields and once with the fields
+                  stored in float32. The zonal integrals of the meridional energy
+                  transport, including the mass correction terms, are compared with
+                  wizard.precision.validation_report, which must stay within
+                  0.001 PW.
+Return Value    : exit status 0 if float32 agrees with float64 within 0.001 PW
+Dependencies    : os, sys, numpy
+"""
+import numpy as np
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from wizard import column
+from wizard import hybrid
+from wizard import precision
+
+constant ={'g' : 9.80616,      # gravititional acceleration [m / s2]
+           'R' : 6371009,      # radius of the earth [m]
+           'cp': 1004.64,      # heat capacity of air [J/(Kg*K)]
+           'Lv': 2264670,      # Latent heat of vaporization [J/Kg]
+           }
+
+def synthetic_month(steps=8, n_level=60, latitude=np.linspace(90, 30, 41), n_longitude=480):
+    rng = np.random.RandomState(1979)
+    # hybrid coefficients with a pure pressure top and a sigma surface level
+    eta = np.linspace(0, 1, n_level + 1)
+    B = eta ** 3
+    A = 101325 * (eta - B)
+    shape = (steps, len(latitude), n_longitude)
+    sp = 101325 + 1500 * rng.standard_normal(shape)
+    # profiles of temperature, humidity and geopotential from the TOA to the surface
+    profile = eta[1:][np.newaxis,:,np.newaxis,np.newaxis]
+    shape_4D = (steps, n_level, len(latitude), n_longitude)
+    T = 200 + 90 * profile + 5 * rng.standard_normal(shape_4D)
+    q = 0.015 * profile ** 4 * rng.uniform(0.5, 1.0, shape_4D)
+    gz = 6e+5 * (1 - profile) + 500 * rng.standard_normal(shape_4D)
+    u = 10 + 15 * rng.standard_normal(shape_4D)
+    v = 5 * rng.standard_normal(shape_4D)
+    vc = 0.1 * rng.standard_normal(shape[1:])
+    return A, B, sp, T, q, u, v, gz, vc, latitude
+
+def zonal_amet(A, B, sp, T, q, u, v, gz, vc, latitude):
+    # the same steps as meridional_energy_transport in the AMET scripts, in TW
+    levels = hybrid.HybridLevels(A, B, sp)
+    integrals = column.energy_column_integrals(T, q, u, v, gz, levels, constant)
+    flux = [np.mean(integral,0) for integral in integrals[:4]]
+    correction = [vc * np.mean(integral,0) for integral in integrals[4:]]
+    dx = 2 * np.pi * constant['R'] * np.cos(2 * np.pi * latitude / 360) / T.shape[-1]
+    components = [np.sum((f - c) * dx[:,np.newaxis], 1) / 1e+12 for f, c in zip(flux, correction)]
+    return [components[0] + components[1] + components[2] + components[3]] + components
+
+if __name__=="__main__":
+    A, B, sp, T, q, u, v, gz, vc, latitude = synthetic_month()
+    reference = zonal_amet(A, B, sp, T, q, u, v, gz, vc, latitude)
+    candidate = zonal_amet(A, B, sp, T.astype(np.float32), q.astype(np.float32), u.astype(np.float32),
+                           v.astype(np.float32), gz.astype(np.float32), vc, latitude)
+    difference = precision.validation_report(reference, candidate,
+                                             ['total', 'internal', 'latent', 'geopotential', 'kinetic'])
+    assert difference <= 0.001, 'float32 differs from float64 by %.2e PW' % (difference)
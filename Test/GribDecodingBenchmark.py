@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+
+"""
+Copyright Netherlands eScience Center
+
+Function        : Benchmark of the parallel GRIB decoding of JRA55 (wizard.grib)
+Date            : 2026.10.17
+Last Update     : 2026.10.17
+Description     : A 10-day chunk of JRA55 on model levels (z, T, u, v and q, 60 levels,
+                  4 analyses per day, i.e. 5 x 2400 messages) is decoded once with a
+                  single process and once with one worker process per variable
+                  file. The ingest throughput is reported in messages/s and both
+                  results are checked to be identical.
+
+                  The path of the data, the year, the month and the number of
+                  workers can be given on the command line, e.g.
+                  python GribDecodingBenchmark.py /projects/0/blueactn/reanalysis/JRA55/subdaily 2000 1 5
+                  The indexes of the files are built before the timing starts.
+Return Value    : messages/s for the serial and the parallel decoding
+Dependencies    : os, sys, time, numpy, pygrib, concurrent.futures
+"""
+import numpy as np
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from wizard import grib
+
+def ingest(paths, times, workers, index_directory):
+    requests = []
+    for path in paths:
+        messages = grib.open_index(path, index_directory).locate(times, range(1,61))
+        requests.append((path, messages, grib.shared_array(messages.shape + grib.open_index(path).message_shape(messages.flat[0])), 0))
+    start = time.time()
+    count = grib.read_parallel(requests, workers, index_directory)
+    seconds = time.time() - start
+    print('%d worker(s): %d messages in %.1f s, %.1f messages/s' % (workers, count, seconds, count / seconds))
+
+    return [request[2] for request in requests], count / seconds
+
+if __name__=="__main__":
+    datapath = sys.argv[1] if len(sys.argv) > 1 else '/projects/0/blueactn/reanalysis/JRA55/subdaily'
+    year = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    month = int(sys.argv[3]) if len(sys.argv) > 3 else 1
+    workers = int(sys.argv[4]) if len(sys.argv) > 4 else 5
+    index_directory = sys.argv[5] if len(sys.argv) > 5 else None
+    file_name = 'reg_tl319.%d%02d0100_%d%02d1018' % (year, month, year, month)
+    paths = [datapath + os.sep + 'jra%d' % (year) + os.sep + 'anl_mdl.%s.' % (name) + file_name
+             for name in ['007_hgt', '011_tmp', '033_ugrd', '034_vgrd', '051_spfh']]
+    times = grib.analysis_times(year, month, 1, 10)
+    serial, rate_serial = ingest(paths, times, 1, index_directory)
+    parallel, rate_parallel = ingest(paths, times, workers, index_directory)
+    for field_serial, field_parallel in zip(serial, parallel):
+        assert np.array_equal(field_serial, field_parallel), 'parallel decoding differs from serial decoding'
+    print('speed up with %d workers: %.2f' % (workers, rate_parallel / rate_serial))
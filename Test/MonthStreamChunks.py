@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+
+"""
+Copyright Netherlands eScience Center
+
+Function        : Test of the AMET of a month computed in chunks of time steps (wizard.stream)
+Date            : 2026.10.17
+Last Update     : 2026.10.17
+Description     : The AMET scripts of ERA-Interim, MERRA2, JRA55 and EC-Earth add the
+                  fields of a month to stream.MonthStream chunk by chunk, which keeps
+                  only running means of 2D column integrals. This script checks on a
+                  synthetic global month on hybrid levels that
+                  - the correction wind (uc, vc) and the energy transport (zonal
+                    integrals and grid points) do not depend on the number of time
+                    steps per chunk (1 for the records of EC-Earth up to the whole
+                    month),
+                  - they are the same as the pools of the record loop of the EC-Earth
+                    scripts before the port (the divergence of each time step, the
+                    mean over the (record, latitude, longitude) pools at the end),
+                    with 1/2 taken as 0.5 (it is 0 in Python 2) and without the
+                    extra 1/g of the surface pressure tendency,
+                  - the levels from the surface to the TOA (JRA55, surface_first)
+                    give the same result as from the TOA to the surface.
+Return Value    : exit status 0 if all the checks pass
+Dependencies    : os, sys, numpy
+"""
+import numpy as np
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from wizard import divergence
+from wizard import stream
+
+constant ={'g' : 9.80616,      # gravititional acceleration [m / s2]
+           'R' : 6371009,      # radius of the earth [m]
+           'cp': 1004.64,      # heat capacity of air [J/(Kg*K)]
+           'Lv': 2264670,      # Latent heat of vaporization [J/Kg]
+           'R_dry' : 286.9,    # gas constant of dry air [J/(kg*K)]
+           'R_vap' : 461.5,    # gas constant for water vapour [J/(kg*K)]
+            }
+# small global grid from the north to the south, 3 days of 3 hourly records
+steps = 24
+level = 20
+latitude = np.linspace(90, -90, 33)
+nx = 64
+days = 3
+
+def synthetic_month():
+    '''
+    Hybrid coefficients from the TOA to the surface and the fields of the month.
+    '''
+    random = np.random.RandomState(2018)
+    eta = np.linspace(0, 1, level + 1)
+    B = eta ** 3
+    A = 101325 * (eta - B)
+    sp = 101325 + 1500 * random.standard_normal((steps, len(latitude), nx))
+    profile = eta[1:][np.newaxis,:,np.newaxis,np.newaxis]
+    shape = (steps, level, len(latitude), nx)
+    fields = {'T' : 200 + 90 * profile + 5 * random.standard_normal(shape),
+              'q' : 0.015 * profile ** 4 * random.uniform(0.5, 1.0, shape),
+              'u' : 10 + 15 * random.standard_normal(shape),
+              'v' : 5 * random.standard_normal(shape),
+              'gz' : 6e+5 * (1 - profile) + 500 * random.standard_normal(shape),
+              'sp' : sp}
+
+    return A, B, fields
+
+def grid():
+    dx = 2 * np.pi * constant['R'] * np.cos(2 * np.pi * latitude / 360) / nx
+    dy = np.pi * constant['R'] / (len(latitude)-1)
+
+    return dx, dy
+
+def legacy_pools(A, B, fields):
+    '''
+    The record loop of the EC-Earth scripts with their (record, latitude, longitude) pools.
+    '''
+    dx, dy = grid()
+    names = ['div_moisture_flux_u', 'div_moisture_flux_v', 'div_mass_flux_u', 'div_mass_flux_v',
+             'precipitable_water', 'sp', 'internal_flux_int', 'latent_flux_int', 'geopotential_flux_int',
+             'kinetic_flux_int', 'heat_flux_int', 'vapor_flux_int', 'geo_flux_int', 'velocity_flux_int']
+    pool = dict((name, np.zeros((steps, len(latitude), nx))) for name in names)
+    dp = np.zeros((level, len(latitude), nx))
+    for i in np.arange(steps):
+        T, q, u, v, gz, sp = [fields[name][i] for name in ('T', 'q', 'u', 'v', 'gz', 'sp')]
+        if i == 0:
+            q_start = q
+            sp_start = sp
+        elif i == steps - 1:
+            q_end = q
+            sp_end = sp
+        for j in np.arange(level):
+            dp[j,:,:] = (A[j+1] + B[j+1] * sp) - (A[j] + B[j] * sp)
+        pool['internal_flux_int'][i] = np.sum(constant['cp'] * v * T * dp / constant['g'],0)
+        pool['latent_flux_int'][i] = np.sum(constant['Lv'] * v * q * dp / constant['g'],0)
+        pool['geopotential_flux_int'][i] = np.sum(v * gz * dp / constant['g'],0)
+        pool['kinetic_flux_int'][i] = np.sum(v * 0.5 *(u**2 + v**2) * dp / constant['g'],0)
+        pool['heat_flux_int'][i] = np.sum(constant['cp'] * T * dp / constant['g'],0)
+        pool['vapor_flux_int'][i] = np.sum(constant['Lv'] * q* dp / constant['g'],0)
+        pool['geo_flux_int'][i] = np.sum(gz * dp / constant['g'],0)
+        pool['velocity_flux_int'][i] = np.sum(0.5 *(u**2 + v**2) * dp / constant['g'],0)
+        moisture_flux_u_int = np.sum(u * q * dp / constant['g'],0)
+        moisture_flux_v_int = np.sum(v * q * dp / constant['g'],0)
+        pool['div_moisture_flux_u'][i] = divergence.zonal_divergence(moisture_flux_u_int, dx)
+        pool['div_moisture_flux_v'][i] = divergence.meridional_divergence(moisture_flux_v_int, dy, north_to_south=True)
+        mass_flux_u_int = np.sum(u * dp / constant['g'],0)
+        mass_flux_v_int = np.sum(v * dp / constant['g'],0)
+        pool['div_mass_flux_u'][i] = divergence.zonal_divergence(mass_flux_u_int, dx)
+        pool['div_mass_flux_v'][i] = divergence.meridional_divergence(mass_flux_v_int, dy, north_to_south=True)
+        pool['precipitable_water'][i] = np.sum(q * dp / constant['g'],0)
+        pool['sp'][i] = sp
+    # tendency terms
+    dp_start = np.array([(A[j+1] + B[j+1] * sp_start) - (A[j] + B[j] * sp_start) for j in np.arange(level)])
+    dp_end = np.array([(A[j+1] + B[j+1] * sp_end) - (A[j] + B[j] * sp_end) for j in np.arange(level)])
+    moisture_tendency = (np.sum(q_end * dp_end, 0) - np.sum(q_start * dp_start, 0)) / (days*86400) / constant['g']
+    sp_tendency = (sp_end - sp_start) / (days*86400)
+    mean = dict((name, np.mean(pool[name],0)) for name in names)
+    E_P = moisture_tendency + mean['div_moisture_flux_u'] + mean['div_moisture_flux_v']
+    mass_residual = sp_tendency + constant['g'] * (mean['div_mass_flux_u'] + mean['div_mass_flux_v']) - constant['g'] * E_P
+    column_mass = mean['sp'] - constant['g'] * mean['precipitable_water']
+    vc = mass_residual * dy / column_mass
+    vc[0,:] = 0
+    vc[-1,:] = 0
+    uc = mass_residual * dx[:,np.newaxis] / column_mass
+    point = []
+    for flux, correction in (('internal_flux_int', 'heat_flux_int'), ('latent_flux_int', 'vapor_flux_int'),
+                             ('geopotential_flux_int', 'geo_flux_int'), ('kinetic_flux_int', 'velocity_flux_int')):
+        point.append((mean[flux] - vc * mean[correction]) * dx[:,np.newaxis] / 1e+12)
+    point.insert(0, point[0] + point[1] + point[2] + point[3])
+
+    return [uc, vc] + [np.sum(field, 1) for field in point] + point
+
+def streamed(A, B, fields, chunk, surface_first=False):
+    '''
+    uc, vc and the energy transport of the month added in chunks of chunk time steps.
+    '''
+    dx, dy = grid()
+    month_stream = stream.MonthStream(A, B, constant, surface_first=surface_first)
+    for start, stop in stream.time_chunks(steps, chunk):
+        month_stream.add(fields['T'][start:stop], fields['q'][start:stop], fields['u'][start:stop],
+                         fields['v'][start:stop], fields['sp'][start:stop], gz=fields['gz'][start:stop])
+    uc, vc = month_stream.correction(dx, dy, days*86400, north_to_south=True, polar_rows=[0,-1])
+
+    return [uc, vc] + list(month_stream.energy_transport(vc, dx))
+
+def largest_difference(results, reference):
+    return max(np.max(np.abs(a - b)) / np.max(np.abs(b)) for a, b in zip(results, reference))
+
+if __name__=="__main__":
+    A, B, fields = synthetic_month()
+    reference = legacy_pools(A, B, fields)
+    whole = streamed(A, B, fields, steps)
+    error = largest_difference(whole, reference)
+    assert error < 1e-12, 'the whole month differs from the pools of the record loop by %.1e' % (error)
+    print('whole month: identical to the pools of the record loop up to rounding (relative error %.1e)' % (error))
+    for chunk in (1, 5, 7, 12):
+        error = largest_difference(streamed(A, B, fields, chunk), whole)
+        assert error < 1e-12, 'chunks of %d time steps differ from the whole month by %.1e' % (chunk, error)
+        print('chunks of %2d time steps: identical to the whole month up to rounding (relative error %.1e)' % (chunk, error))
+    # the same month with the levels from the surface to the TOA
+    flipped = dict((name, field[:,::-1] if field.ndim == 4 else field) for name, field in fields.items())
+    error = largest_difference(streamed(A[::-1], B[::-1], flipped, 5, surface_first=True), whole)
+    assert error < 1e-12, 'the levels from the surface to the TOA differ by %.1e' % (error)
+    print('levels from the surface to the TOA: identical up to rounding (relative error %.1e)' % (error))
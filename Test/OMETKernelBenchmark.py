@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+
+"""
+Copyright Netherlands eScience Center
+
+Function        : Benchmark of the OMET kernel (wizard.omet) against the loops of ORAS4
+Date            : 2026.10.17
+Last Update     : 2026.10.17
+Description     : meridional_energy_transport of OMET_ORAS4_vGrid_HPC computed the
+                  temperature on the V grid with a loop over the rows and the energy
+                  flux of each cell in a loop over the months and the levels, with
+                  the partial cells as a second term. This script keeps a verbatim
+                  copy of those loops and times them against t_on_v, face_area and
+                  energy_transport of wizard.omet on a synthetic year of ORAS4
+                  (12 x 42 x 292 x 362), with the partial cells of a random mbathy.
+                  The largest difference relative to the largest transport is
+                  reported, it should be at the level of rounding (1e-12).
+
+                  python OMETKernelBenchmark.py
+                  python OMETKernelBenchmark.py 3
+                  gives 3 months instead of a full year.
+Return Value    : time [s] of the loops and of the kernel, speed-up and difference
+Dependencies    : os, sys, time, numpy
+"""
+import numpy as np
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from wizard import mesh
+from wizard import omet
+from wizard import overturning
+
+constant = {'cp': 3987,         # heat capacity of sea water [J/(Kg*K)]
+            'rho': 1027,        # sea water density [Kg/m3]
+            }
+# ORCA1_z42 grid
+ji = 362
+jj = 292
+level = 42
+
+def synthetic_year(n_month):
+    '''
+    Temperature, velocity and mesh of ORCA1 with a random bathymetry.
+    '''
+    random = np.random.RandomState(0)
+    mbathy = random.randint(0, level + 1, (jj, ji))
+    vmask = (np.arange(level)[:,np.newaxis,np.newaxis] < mbathy[np.newaxis,:,:]).astype(float)
+    e1v = random.uniform(2e+4, 1.1e+5, (jj, ji))
+    e3t_0 = np.linspace(10, 300, level)
+    e3t_ps = random.uniform(5, 10, (jj, ji))
+    e3t_adjust = mesh.partial_cell_adjust(mbathy, e3t_ps, level, thickness=e3t_0, last=level-1)
+    theta = random.uniform(-2, 30, (n_month, level, jj, ji))
+    v = random.standard_normal((n_month, level, jj, ji)) * 0.1
+
+    return theta, v, e1v, e3t_0, e3t_adjust, vmask
+
+def legacy_loops(theta, v, e1v, e3t_0, e3t_adjust, vmask):
+    # verbatim copy of the loops in OMET_ORAS4_vGrid_HPC (partial = 1)
+    index_month = np.arange(theta.shape[0])
+    T_vgrid = np.zeros((len(index_month),level,jj,ji),dtype=float)
+    for i in np.arange(jj):
+        if i == jj-1:
+            T_vgrid[:,:,i,:] = theta[:,:,i,:]
+        else:
+            T_vgrid[:,:,i,:] = (theta[:,:,i,:] + theta[:,:,i+1,:])/2
+    Internal_E_flux = np.zeros((len(index_month),level,jj,ji),dtype=float)
+    for i in index_month:
+        for j in np.arange(level):
+                Internal_E_flux[i,j,:,:] = constant['rho'] * constant['cp'] * v[i,j,:,:] *\
+                                           T_vgrid[i,j,:,:] * e1v * e3t_0[j] * vmask[j,:,:] -\
+                                           constant['rho'] * constant['cp'] * v[i,j,:,:] *\
+                                           T_vgrid[i,j,:,:] * e1v * e3t_adjust[j,:,:] * vmask[j,:,:]
+    Internal_E_int = np.sum(Internal_E_flux,1)/1e+12
+
+    return Internal_E_int
+
+def kernel(theta, v, vface_area):
+    T_vgrid = omet.t_on_v(theta)
+
+    return omet.energy_transport(v, T_vgrid, vface_area, constant)
+
+if __name__=="__main__":
+    n_month = int(sys.argv[1]) if len(sys.argv) > 1 else 12
+    theta, v, e1v, e3t_0, e3t_adjust, vmask = synthetic_year(n_month)
+    print('%d months of ORCA1 (%d x %d x %d x %d)' % (n_month, n_month, level, jj, ji))
+    start = time.time()
+    E_loops = legacy_loops(theta, v, e1v, e3t_0, e3t_adjust, vmask)
+    seconds_loops = time.time() - start
+    # the area of the V faces depends on the mesh only, it is computed once per job
+    start = time.time()
+    vface_area = omet.face_area(e1v, overturning.cell_thickness(e3t_0, e3t_adjust), vmask)
+    seconds_area = time.time() - start
+    start = time.time()
+    E_kernel = kernel(theta, v, vface_area)
+    seconds_kernel = time.time() - start
+    difference = np.max(np.abs(E_kernel - E_loops)) / np.max(np.abs(E_loops))
+    print('%-24s %10s' % ('', 'time [s]'))
+    print('%-24s %10.2f' % ('loops', seconds_loops))
+    print('%-24s %10.2f' % ('kernel', seconds_kernel))
+    print('%-24s %10.2f' % ('face area (once)', seconds_area))
+    print('speed-up %.1f, largest relative difference %.1e' % (seconds_loops / seconds_kernel, difference))
+    if difference > 1e-10:
+        sys.exit(1)
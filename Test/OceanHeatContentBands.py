@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+
+"""
+Copyright Netherlands eScience Center
+
+Function        : Test of the ocean heat content in depth bands (wizard.ohc)
+Date            : 2026.10.17
+Last Update     : 2026.10.17
+Description     : ocean_heat_content() of the Statistics scripts of ORAS4, GLORYS2V3
+                  and SODA3 now takes the heat content of any list of depth bands,
+                  with the cells which are cut by the boundary of a band split between
+                  the bands (wizard.ohc). This script checks on a synthetic ORCA1 like
+                  grid with partial cells that
+                  - bands whose boundaries are the interfaces of the levels give the
+                    sums over the levels of the loop of Statistics_ORAS4_OHC (a
+                    verbatim copy is kept here),
+                  - bands which cover the column add up to the full depth,
+                  - for a temperature of 1 C everywhere, the heat content of each band
+                    is rho * cp * e1t * e2t * the thickness of the water column within
+                    the band, with the boundaries of the bands within the cells,
+                  - the zonal integrals at each level agree with the loop.
+Return Value    : exit status 0 if all the checks pass
+Dependencies    : os, sys, numpy
+"""
+import numpy as np
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from wizard import mesh
+from wizard import ohc
+from wizard import overturning
+
+constant = {'cp': 3987,         # heat capacity of sea water [J/(Kg*K)]
+            'rho': 1027,        # sea water density [Kg/m3]
+            }
+# small ORCA1_z42 like grid with 3 months
+n_month = 3
+ji = 72
+jj = 50
+level = 42
+
+def synthetic_mesh():
+    random = np.random.RandomState(1958)
+    e3t_0 = np.linspace(10, 300, level)
+    mbathy = random.randint(0, level + 1, (jj, ji))
+    e3t_ps = random.uniform(0.2, 1.0, (jj, ji)) * e3t_0[np.clip(mbathy - 1, 0, level - 1)]
+    e3t_adjust = mesh.partial_cell_adjust(mbathy, e3t_ps, level, thickness=e3t_0, last=level-1)
+    tmask = (np.arange(level)[:,np.newaxis,np.newaxis] < mbathy[np.newaxis,:,:]).astype(float)
+    tmaskatl = (random.uniform(size=(jj, ji)) > 0.6).astype(float)
+    e1t = random.uniform(2e+4, 1.1e+5, (jj, ji))
+    e2t = random.uniform(2e+4, 1.1e+5, (jj, ji))
+    theta = random.uniform(-2, 30, (n_month, level, jj, ji))
+
+    return e3t_0, e3t_adjust, tmask, tmaskatl, e1t, e2t, theta
+
+def legacy_loop(theta, e1t, e2t, e3t_0, e3t_adjust, tmask, tmaskatl):
+    # verbatim copy of the loop of ocean_heat_content() in Statistics_ORAS4_OHC
+    index_month = np.arange(theta.shape[0])
+    OHC_globe = np.zeros((len(index_month),level,jj,ji),dtype=float)
+    OHC_atlantic = np.zeros((len(index_month),level,jj,ji),dtype=float)
+    # expand the grid size matrix e1v to avoid more loops
+    e1t_3D = np.repeat(e1t[np.newaxis,:,:],level,0)
+    e1t_4D = np.repeat(e1t_3D[np.newaxis,:,:,:],len(index_month),0)
+    e2t_3D = np.repeat(e2t[np.newaxis,:,:],level,0)
+    e2t_4D = np.repeat(e2t_3D[np.newaxis,:,:,:],len(index_month),0)
+    # increase the dimension of tmask
+    tmask_4D = np.repeat(tmask[np.newaxis,:,:,:],len(index_month),0)
+    tmaskatl_3D = np.repeat(tmaskatl[np.newaxis,:,:],level,0)
+    tmaskatl_4D = np.repeat(tmaskatl_3D[np.newaxis,:,:,:],len(index_month),0)
+    # increase the dimension of partial cell adjustment matrix
+    e3t_adjust_4D = np.repeat(e3t_adjust[np.newaxis,:,:,:],len(index_month),0)
+    for i in np.arange(level):
+        OHC_globe[:,i,:,:] = constant['rho'] * constant['cp'] * theta[:,i,:,:] * e1t_4D[:,i,:,:] * e2t_4D[:,i,:,:] * e3t_0[i] * tmask_4D[:,i,:,:] -\
+                             constant['rho'] * constant['cp'] * theta[:,i,:,:] * e1t_4D[:,i,:,:] * e2t_4D[:,i,:,:] * e3t_adjust_4D[:,i,:,:] * tmask_4D[:,i,:,:]
+        OHC_atlantic[:,i,:,:] = constant['rho'] * constant['cp'] * theta[:,i,:,:] * e1t_4D[:,i,:,:] * e2t_4D[:,i,:,:] * e3t_0[i] * tmask_4D[:,i,:,:] * tmaskatl_4D[:,i,:,:] -\
+                                constant['rho'] * constant['cp'] * theta[:,i,:,:] * e1t_4D[:,i,:,:] * e2t_4D[:,i,:,:] * e3t_adjust_4D[:,i,:,:] * tmask_4D[:,i,:,:] * tmaskatl_4D[:,i,:,:]
+
+    return OHC_globe / 1e+12, OHC_atlantic / 1e+12
+
+def close(a, b):
+    return np.allclose(a, b, rtol=1e-12, atol=1e-12 * np.max(np.abs(b)))
+
+if __name__=="__main__":
+    e3t_0, e3t_adjust, tmask, tmaskatl, e1t, e2t, theta = synthetic_mesh()
+    volume = ohc.cell_volume(e1t, e2t, overturning.cell_thickness(e3t_0, e3t_adjust), tmask)
+    OHC_globe, OHC_atlantic = legacy_loop(theta, e1t, e2t, e3t_0, e3t_adjust, tmask, tmaskatl)
+    # bands on the interfaces of the levels 0 - 21, 22 - 25 and 26 to the bottom
+    interface = np.cumsum(e3t_0)
+    bands = [(0, None), (0, interface[21]), (interface[21], interface[25]), (interface[25], None)]
+    OHC_bands = ohc.heat_content(theta, volume, ohc.DepthBands(e3t_0, bands, e3t_adjust), constant)
+    for n, layers in enumerate((slice(None), slice(0,22), slice(22,26), slice(26,None))):
+        assert close(OHC_bands[:,n], np.sum(OHC_globe[:,layers], 1)), 'band %d differs from the sum over its levels' % (n)
+        assert close(OHC_bands[:,n] * tmaskatl, np.sum(OHC_atlantic[:,layers], 1)), 'Atlantic band %d differs' % (n)
+    print('bands on the interfaces of the levels: identical to the loop up to rounding')
+    # the usual bands, their boundaries cut the cells
+    bands = [(0, None), (0, 500), (500, 1000), (1000, 2000), (2000, None)]
+    depth_bands = ohc.DepthBands(e3t_0, bands, e3t_adjust)
+    OHC_bands = ohc.heat_content(theta, volume, depth_bands, constant)
+    assert close(np.sum(OHC_bands[:,1:], 1), OHC_bands[:,0]), 'the bands do not add up to the full depth'
+    print('bands 0 - 500 - 1000 - 2000 - bottom: add up to the full depth')
+    # a temperature of 1 C, the heat content is proportional to the water within the band
+    column = np.sum(overturning.cell_thickness(e3t_0, e3t_adjust) * tmask, 0)
+    OHC_uniform = ohc.heat_content(np.ones((1, level, jj, ji)), volume, depth_bands, constant)[0]
+    for n, (upper, lower) in enumerate(bands):
+        water = ohc.overlap(0.0, column, upper, np.inf if lower is None else lower)
+        expected = constant['rho'] * constant['cp'] * e1t * e2t * water / 1e+12
+        assert close(OHC_uniform[n], expected), 'band %s of a uniform temperature is wrong' % (ohc.band_name((upper, lower)))
+    print('uniform temperature: the cells are split at the boundaries of the bands')
+    # zonal integral at each level
+    profiles = ohc.zonal_profiles(theta, volume, constant, [None, tmaskatl])
+    assert close(profiles[0], np.sum(OHC_globe, 3)), 'zonal integral of the globe differs'
+    assert close(profiles[1], np.sum(OHC_atlantic, 3)), 'zonal integral of the Atlantic differs'
+    print('zonal integrals at each level: identical to the loop up to rounding')
@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+
+"""
+Copyright Netherlands eScience Center
+
+Function        : Test of the barotropic mass correction on the ORCA grids (wizard.barotropic)
+Date            : 2026.10.17
+Last Update     : 2026.10.17
+Description     : mass_correction() of OMET_GLORYS2V3_1993_vGrid_mass_correct now takes
+                  the divergence of the vertically integrated flux on the T points as
+                  NEMO does, with the scale factors e1/e2 of the curvilinear grid
+                  (wizard.barotropic). This script checks on a synthetic grid with
+                  random scale factors and partial cells that
+                  - a flow given by a stream function on the F points, which is
+                    divergence free, has a residual and a correction velocity of 0
+                    up to rounding,
+                  - a source of water in one cell is found in that cell only, with
+                    the right sign and size,
+                  - the depth of the sea bottom is the same as the loop over all
+                    the points deptht[mbathy] of the script.
+Return Value    : exit status 0 if all the checks pass
+Dependencies    : os, sys, numpy
+"""
+import numpy as np
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from wizard import barotropic
+from wizard import overturning
+
+# small ORCA like grid
+ji = 96
+jj = 64
+level = 12
+
+def synthetic_mesh():
+    '''
+    Scale factors of a curvilinear grid, partial bottom cells and a sea everywhere.
+    '''
+    random = np.random.RandomState(2017)
+    mesh = {}
+    for name in ('e1t', 'e2t', 'e1u', 'e2u', 'e1v', 'e2v'):
+        mesh[name] = random.uniform(1.5e+4, 2.8e+4, (jj, ji))
+    mesh['e3t_0'] = np.linspace(1, 200, level)
+    mesh['deptht'] = np.cumsum(mesh['e3t_0']) - mesh['e3t_0'] / 2
+    mesh['mbathy'] = random.randint(1, level, (jj, ji))
+    adjust = random.uniform(0, 0.5, (level, jj, ji)) * mesh['e3t_0'][:,np.newaxis,np.newaxis]
+    mesh['thickness'] = overturning.cell_thickness(mesh['e3t_0'], adjust)
+    mesh['umask'] = np.ones((level, jj, ji))
+    mesh['vmask'] = np.ones((level, jj, ji))
+
+    return mesh
+
+def divergence_free(mesh):
+    '''
+    u and v on the levels of a flow with the stream function psi on the F points,
+    e2u * U = psi[j,i] - psi[j-1,i] and e1v * V = psi[j,i-1] - psi[j,i]; psi is periodic
+    in i and 0 south of the first row.
+    '''
+    random = np.random.RandomState(1993)
+    psi = random.standard_normal((jj, ji)) * 1e+6
+    psi_south = np.concatenate((np.zeros((1, ji)), psi[:-1,:]), 0)
+    psi_west = np.roll(psi, 1, 1)
+    transport_u = (psi - psi_south) / mesh['e2u']
+    transport_v = (psi_west - psi) / mesh['e1v']
+    # spread the transport over the water column
+    column = np.sum(mesh['thickness'], 0)
+    u = transport_u[np.newaxis,:,:] / column * np.ones((level, 1, 1))
+    v = transport_v[np.newaxis,:,:] / column * np.ones((level, 1, 1))
+
+    return u, v, transport_u
+
+def residual_of(mesh, u, v):
+    transport_u = barotropic.transport(u, mesh['thickness'], mesh['umask'])
+    transport_v = barotropic.transport(v, mesh['thickness'], mesh['vmask'])
+
+    return barotropic.flux_divergence(transport_u, transport_v, mesh['e2u'], mesh['e1v'],
+                                      mesh['e1t'], mesh['e2t'])
+
+def legacy_bottom_depth(deptht, mbathy):
+    # verbatim copy of the loop in mass_correction() of OMET_GLORYS2V3_1993_vGrid_mass_correct
+    max_bathy = np.zeros((jj,ji),dtype = float)
+    for i in np.arange(jj):
+        for j in np.arange(ji):
+            counter = mbathy[i,j]
+            max_bathy[i,j] = deptht[counter]
+
+    return max_bathy
+
+if __name__=="__main__":
+    mesh = synthetic_mesh()
+    max_bathy = barotropic.bottom_depth(mesh['deptht'], mesh['mbathy'])
+    assert np.array_equal(max_bathy, legacy_bottom_depth(mesh['deptht'], mesh['mbathy'])), 'depth of the sea bottom differs from the loop'
+    print('depth of the sea bottom: identical to the loop')
+    # divergence free flow
+    u, v, transport_u = divergence_free(mesh)
+    residual = residual_of(mesh, u, v)
+    # the size of a divergence of the flow through one face
+    scale = np.max(np.abs(transport_u * mesh['e2u'] / (mesh['e1t'] * mesh['e2t'])))
+    uc, vc = barotropic.correction_velocity(residual, max_bathy, mesh['e1u'], mesh['e2v'],
+                                            mesh['umask'][0], mesh['vmask'][0])
+    print('divergence free flow: largest residual %.1e of %.1e m/s, correction %.1e m/s' %
+          (np.max(np.abs(residual)), scale, max(np.max(np.abs(uc)), np.max(np.abs(vc)))))
+    assert np.max(np.abs(residual)) < 1e-12 * scale, 'the residual of a divergence free flow is not 0'
+    assert max(np.max(np.abs(uc)), np.max(np.abs(vc))) < 1e-12 * np.max(np.abs(u)), 'the correction of a divergence free flow is not 0'
+    # a source in the cell (j0, i0) at the periodic edge, the water leaves through its eastern face
+    j0, i0 = jj // 2, ji - 1
+    source = 1e+5 # [m3/s]
+    u_source = u.copy()
+    u_source[:,j0,i0] += source / (mesh['e2u'][j0,i0] * np.sum(mesh['thickness'][:,j0,i0]))
+    residual = residual_of(mesh, u_source, v)
+    expected = np.zeros((jj, ji))
+    expected[j0,i0] = source / (mesh['e1t'][j0,i0] * mesh['e2t'][j0,i0])
+    expected[j0,0] = -source / (mesh['e1t'][j0,0] * mesh['e2t'][j0,0])
+    assert np.allclose(residual, expected, rtol=1e-9, atol=1e-12 * scale), 'the divergence of a source is misplaced'
+    print('source at the periodic edge: found in the cell and its eastern neighbour')
+    # the sum of the divergence times the area is the flux out of the domain (none)
+    total = np.sum(residual * mesh['e1t'] * mesh['e2t'])
+    assert abs(total) < 1e-9 * source, 'water is not conserved'
+    print('conservation: total flux %.1e m3/s' % (total))
@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+
+"""
+Copyright Netherlands eScience Center
+
+Function        : Benchmark of the output writer (wizard.output) against NETCDF3_64BIT
+Date            : 2026.10.17
+Last Update     : 2026.10.17
+Description     : The output of AMET (the 5 components at each grid point) is written
+                  as NETCDF3_64BIT float64, the way the scripts used to do, and with
+                  wizard.output as compressed NETCDF4 without packing, with float32
+                  and with int16 packing. For each file the size, the throughput of
+                  writing and reading [MB/s of float64 data] and the largest error
+                  relative to the range of the field are reported.
+
+                  Without arguments a synthetic monthly AMET file on the grid of
+                  ERA-Interim (0.75 deg) is used, e.g.
+                  python OutputWriterBenchmark.py
+                  python OutputWriterBenchmark.py 5
+                  gives 5 years instead of 2. An existing output file can be given
+                  instead, its variables are then written again in each format, e.g.
+                  python OutputWriterBenchmark.py /home/lwc16308/reanalysis/ERAI/output/model_daily_075_1979_2016_E_point.nc
+Return Value    : size [MB], throughput [MB/s] and error of each format
+Dependencies    : os, sys, time, tempfile, numpy, netCDF4
+"""
+import numpy as np
+import os
+import sys
+import time
+import tempfile
+from netCDF4 import Dataset
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from wizard import output
+
+def synthetic_fields(n_year, n_lat=241, n_lon=480):
+    '''
+    Smooth meridional energy transport with noise, 5 components [TW].
+    '''
+    latitude = np.linspace(90, -90, n_lat)
+    longitude = np.linspace(0, 360, n_lon, endpoint=False)
+    random = np.random.RandomState(0)
+    profile = np.sin(np.deg2rad(2 * latitude))[:,np.newaxis] * np.cos(np.deg2rad(3 * longitude))[np.newaxis,:]
+    fields = {}
+    for n, name in enumerate(['E', 'E_cpT', 'E_Lvq', 'E_gz', 'E_uv2']):
+        fields[name] = (10.0 ** (2 - n // 2) * profile[np.newaxis,np.newaxis,:,:] +
+                        random.standard_normal((n_year, 12, n_lat, n_lon)))
+    dimensions = [('year', n_year), ('month', 12), ('latitude', n_lat), ('longitude', n_lon)]
+
+    return dimensions, {'latitude' : latitude, 'longitude' : longitude}, fields
+
+def existing_fields(path):
+    '''
+    Dimensions, coordinates and data variables of an existing output file.
+    '''
+    dataset = Dataset(path)
+    dimensions = [(name, len(dimension)) for name, dimension in dataset.dimensions.items()]
+    coordinates = {}
+    fields = {}
+    for name, variable in dataset.variables.items():
+        if variable.dimensions == (name,) or variable.dtype.kind != 'f' or variable.ndim < 2:
+            coordinates[name] = variable[:]
+        else:
+            fields[name] = np.ma.filled(variable[:].astype(float), np.nan)
+    variables = dict((name, variable.dimensions) for name, variable in dataset.variables.items())
+    dataset.close()
+
+    return dimensions, coordinates, fields, variables
+
+def write(path, packing, dimensions, coordinates, fields, variables):
+    start = time.time()
+    if packing == 'NETCDF3_64BIT':
+        dataset = Dataset(path, 'w', format='NETCDF3_64BIT')
+    else:
+        dataset = output.create_dataset(path)
+    for name, size in dimensions:
+        dataset.createDimension(name, size)
+    for name, values in coordinates.items():
+        if packing == 'NETCDF3_64BIT':
+            variable = dataset.createVariable(name, np.asarray(values).dtype, variables[name])
+        else:
+            variable = output.create_variable(dataset, name, np.asarray(values).dtype, variables[name])
+        variable[:] = values
+    for name, values in fields.items():
+        if packing == 'NETCDF3_64BIT':
+            variable = dataset.createVariable(name, np.float64, variables[name])
+        else:
+            variable = output.create_variable(dataset, name, np.float64, variables[name], packing=packing)
+        # the scripts write the whole field in one go
+        variable[:] = values
+    dataset.close()
+
+    return time.time() - start
+
+def read(path, fields):
+    start = time.time()
+    dataset = Dataset(path)
+    error = 0.0
+    for name, values in fields.items():
+        stored = np.ma.filled(dataset.variables[name][:].astype(float), np.nan)
+        value_range = np.nanmax(values) - np.nanmin(values)
+        if value_range > 0:
+            error = max(error, np.nanmax(np.abs(stored - values)) / value_range)
+    dataset.close()
+
+    return time.time() - start, error
+
+if __name__=="__main__":
+    if len(sys.argv) > 1 and os.path.exists(sys.argv[1]):
+        dimensions, coordinates, fields, variables = existing_fields(sys.argv[1])
+    else:
+        n_year = int(sys.argv[1]) if len(sys.argv) > 1 else 2
+        dimensions, coordinates, fields = synthetic_fields(n_year)
+        variables = {'latitude' : ('latitude',), 'longitude' : ('longitude',)}
+        variables.update((name, ('year', 'month', 'latitude', 'longitude')) for name in fields)
+    # the data in float64, as they are computed by the scripts
+    megabytes = sum(values.size for values in fields.values()) * 8 / 1e+6
+    print('%d variables, %.1f MB of float64 data' % (len(fields), megabytes))
+    directory = tempfile.mkdtemp()
+    print('%-14s %10s %8s %12s %12s %10s' % ('format', 'size [MB]', 'ratio', 'write [MB/s]', 'read [MB/s]', 'max error'))
+    size_reference = None
+    for packing in ['NETCDF3_64BIT', None, 'float32', 'int16']:
+        path = os.path.join(directory, 'output_%s.nc' % (packing))
+        seconds_write = write(path, packing, dimensions, coordinates, fields, variables)
+        seconds_read, error = read(path, fields)
+        size = os.path.getsize(path) / 1e+6
+        if size_reference is None:
+            size_reference = size
+        print('%-14s %10.1f %8.2f %12.1f %12.1f %10.1e' % ('NETCDF4' if packing is None else packing, size,
+                                                          size_reference / size, megabytes / seconds_write,
+                                                          megabytes / seconds_read, error))
+        os.remove(path)
+    os.rmdir(directory)
@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+
+"""
+Copyright Netherlands eScience Center
+
+Function        : Test of the interpolation from model levels to pressure levels (wizard.vertical)
+Date            : 2026.10.17
+Last Update     : 2026.10.17
+Description     : The Statistics scripts of ERA-Interim and MERRA2 interpolate the
+                  fields on the model levels to pressure levels with one
+                  scipy.interpolate.interp1d(kind='slinear', bounds_error=False,
+                  fill_value=0.0) per column, wizard.vertical.PressureInterpolator
+                  does all the columns at once. This script checks on synthetic
+                  terrain following levels p = p_top + sigma * (ps - p_top), with a
+                  random surface pressure in each column, that the interpolator gives
+                  the same fields as interp1d column by column
+                  - with the model levels from the top to the surface (increasing
+                    pressure, ERA-Interim) and from the surface to the top
+                    (decreasing pressure, MERRA2),
+                  - for the target levels above the top and below the surface of
+                    the column (fill_value) and on the top level itself,
+                  - linear in log-pressure (log_pressure=True), against interp1d on
+                    ln(p).
+Return Value    : exit status 0 if all the checks pass
+Dependencies    : os, sys, numpy, scipy
+"""
+import numpy as np
+import os
+import sys
+from scipy.interpolate import interp1d
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from wizard import vertical
+
+# small grid (time, level, latitude, longitude)
+nt = 4
+level = 30
+ny = 16
+nx = 24
+p_top = 1000.0 # [Pa]
+# targets above the top, on the top level and below the lowest surface pressure
+p_target = np.array([500, 1000, 5000, 20000, 50000, 70000, 85000, 92500, 100000, 105000], dtype=float)
+
+def synthetic_levels():
+    '''
+    Pressure of the model levels from the top to the surface (increasing) and three
+    fields on these levels.
+    '''
+    random = np.random.RandomState(1979)
+    sigma = np.sort(random.uniform(0, 1, level))
+    sigma[-1] = 1.0
+    ps = random.uniform(5e+4, 1.03e+5, (nt, 1, ny, nx))
+    p_level = p_top + sigma[np.newaxis,:,np.newaxis,np.newaxis] * (ps - p_top)
+    fields = [random.standard_normal((nt, level, ny, nx)) * scale for scale in (30.0, 10.0, 1e-3)]
+
+    return p_level, fields
+
+def reference(p_level, field, log_pressure=False):
+    '''
+    One interp1d per column as the Statistics scripts.
+    '''
+    values = np.zeros((nt, len(p_target), ny, nx), dtype=float)
+    for t in np.arange(nt):
+        for j in np.arange(ny):
+            for i in np.arange(nx):
+                if log_pressure:
+                    interpolate = interp1d(np.log(p_level[t,:,j,i]), field[t,:,j,i], kind='slinear',
+                                           bounds_error=False, fill_value=0.0)
+                    values[t,:,j,i] = interpolate(np.log(p_target))
+                else:
+                    interpolate = interp1d(p_level[t,:,j,i], field[t,:,j,i], kind='slinear',
+                                           bounds_error=False, fill_value=0.0)
+                    values[t,:,j,i] = interpolate(p_target)
+
+    return values
+
+def compare(p_level, fields, log_pressure, label):
+    interpolator = vertical.PressureInterpolator(p_level, p_target, axis=1, log_pressure=log_pressure)
+    error = 0.0
+    for field, values in zip(fields, interpolator(*fields)):
+        expected = reference(p_level, field, log_pressure)
+        assert values.shape == expected.shape, 'shape of the interpolated field differs'
+        # the same targets are outside the column
+        assert np.array_equal(values == 0.0, expected == 0.0), 'the fill_value is not at the same points'
+        error = max(error, np.max(np.abs(values - expected)) / np.max(np.abs(field)))
+    assert error < 1e-12, 'the interpolation differs from interp1d'
+    print('%s: identical to interp1d up to rounding (relative error %.1e)' % (label, error))
+
+if __name__=="__main__":
+    p_level, fields = synthetic_levels()
+    # the checks are only meaningful if some targets are outside some columns
+    assert np.any(p_target[-1] > p_level[:,-1]) and p_target[0] < p_top, 'no target outside the columns'
+    compare(p_level, fields, False, 'increasing pressure')
+    compare(p_level[:,::-1], [field[:,::-1] for field in fields], False, 'decreasing pressure')
+    compare(p_level, fields, True, 'increasing pressure, log-pressure')
+    compare(p_level[:,::-1], [field[:,::-1] for field in fields], True, 'decreasing pressure, log-pressure')
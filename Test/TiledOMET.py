@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+
+"""
+Copyright Netherlands eScience Center
+
+Function        : Test of the OMET in tiles of rows (wizard.omet.tiled_transport)
+Date            : 2026.10.17
+Last Update     : 2026.10.17
+Description     : The OMET of the eddy resolving grids (ORCA0083) is computed in
+                  tiles of rows j with one halo row for the temperature on the V grid.
+                  This script computes the OMET at each point, the zonal integrals and
+                  the stream functions of the globe and two basins on a synthetic grid
+                  once on the full domain (wizard.omet, wizard.overturning) and once in
+                  tiles of 1 row, of a number of rows which does not divide the domain
+                  and of the full domain, and checks that they agree to rounding.
+                  With python 3 the peak memory of the tiled computation is reported
+                  (tracemalloc), it follows the size of a tile and not of the domain.
+
+                  python TiledOMET.py
+Return Value    : exit status 0 if the tiles agree with the full domain
+Dependencies    : os, sys, numpy
+"""
+import numpy as np
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from wizard import omet
+from wizard import overturning
+
+constant = {'cp': 3987,         # heat capacity of sea water [J/(Kg*C)]
+            'rho': 1027,        # sea water density [Kg/m3]
+            }
+# small ORCA like grid with 2 months
+n_month = 2
+ji = 180
+jj = 149
+level = 20
+
+def synthetic_fields():
+    random = np.random.RandomState(83)
+    mbathy = random.randint(0, level + 1, (jj, ji))
+    vmask = (np.arange(level)[:,np.newaxis,np.newaxis] < mbathy[np.newaxis,:,:]).astype(float)
+    e1v = random.uniform(4e+3, 9e+3, (jj, ji))
+    thickness = overturning.cell_thickness(np.linspace(1, 250, level))
+    area = omet.face_area(e1v, thickness, vmask)
+    theta = np.ma.masked_array(random.uniform(-2, 30, (n_month, level, jj, ji)), mask=(vmask == 0)[np.newaxis] * np.ones((n_month, 1, 1, 1), bool))
+    v = random.standard_normal((n_month, level, jj, ji)) * 0.1
+    basins = [None, (random.uniform(size=(jj, ji)) > 0.5).astype(float), np.ones((jj, ji)) * (np.arange(jj) > jj // 3)[:,np.newaxis]]
+
+    return theta, v, area, basins
+
+def full_domain(theta, v, area, basins):
+    E_point = omet.energy_transport(v, omet.t_on_v(theta), area, constant)
+    E_zonal = overturning.zonal_integrals(E_point, basins)
+    psi = overturning.stream_function(v, 1.0, area, basins=basins)
+
+    return E_point, E_zonal, psi
+
+def tiles(theta, v, area, basins, rows):
+    E_point = np.zeros((n_month, jj, ji))
+    def point(tile, E_tile):
+        E_point[...,tile,:] = E_tile
+    E_zonal, psi = omet.tiled_transport(lambda tile: theta[...,tile,:], lambda tile: v[...,tile,:],
+                                        lambda tile: area[:,tile,:], jj, rows, constant, basins, point)
+
+    return E_point, E_zonal, psi
+
+def peak_memory(function, *args):
+    # peak of the memory allocated by numpy during the call [MB], None without tracemalloc
+    try:
+        import tracemalloc
+    except ImportError:
+        return None
+    tracemalloc.start()
+    function(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return peak / 1e+6
+
+if __name__=="__main__":
+    theta, v, area, basins = synthetic_fields()
+    E_point, E_zonal, psi = full_domain(theta, v, area, basins)
+    for rows in (1, 17, jj):
+        E_point_tiles, E_zonal_tiles, psi_tiles = tiles(theta, v, area, basins, rows)
+        assert np.allclose(E_point_tiles, E_point, rtol=1e-12, atol=1e-12 * np.max(np.abs(E_point))), 'OMET at each point differs for tiles of %d rows' % (rows)
+        for n in range(len(basins)):
+            assert np.allclose(E_zonal_tiles[n], E_zonal[n], rtol=1e-12, atol=1e-12 * np.max(np.abs(E_zonal[n]))), 'zonal integral differs for tiles of %d rows' % (rows)
+            assert np.allclose(psi_tiles[n], psi[n], rtol=1e-12, atol=1e-12 * np.max(np.abs(psi[n]))), 'stream function differs for tiles of %d rows' % (rows)
+        print('tiles of %3d rows: identical to the full domain up to rounding' % (rows))
+    fields = (theta.filled(0.0), v, area, basins)
+    for rows in (8, jj):
+        peak = peak_memory(tiles, *(fields + (rows,)))
+        if peak is not None:
+            print('tiles of %3d rows: peak memory %.1f MB' % (rows, peak))
+    print('tiles of %3d rows for a budget of 512 MB on ORCA0083 (75 x 3059 x 4322)' % (omet.rows_per_tile(512 * 1024**2, 75, 4322)))
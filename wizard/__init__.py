@@ -0,0 +1,20 @@
+"""
+Copyright Netherlands eScience Center
+
+Function        : Shared toolbox for the quantification of AMET and OMET
+Description     : The scripts in /Meridional_Energy_Transport, /Postprocessing and
+                  /Statistics_Variables are standalone programs for the different
+                  reanalysis products. The numerical kernels they have in common
+                  are collected in this package, so that every script calls the
+                  same (tested) implementation instead of a private copy.
+
+                  The scripts make the package importable by appending the root
+                  of the repository to sys.path before importing it, e.g.
+
+                  sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                               os.pardir, os.pardir))
+                  from wizard import divergence
+
+                  The package works with both python 2.7 and python 3.
+Dependencies    : numpy
+"""
@@ -0,0 +1,99 @@
+"""
+Copyright Netherlands eScience Center
+
+Function        : Running mean (and variance) of 2D fields over time
+Date            : 2026.10.17
+Last Update     : 2026.10.17
+Description     : The AMET scripts used to keep every time step (or every day) of the
+                  column integrals in pools of shape (days*4, latitude, longitude),
+                  only to take np.mean(pool,0) at the end of the month. RunningMean
+                  keeps a single (latitude, longitude) array instead, so the memory
+                  no longer depends on the length of the month or on the time
+                  resolution.
+
+                  Fields are added one at a time (add) or as a chunk of time steps
+                  along the first axis (add_chunk). Without variance only the sum is
+                  kept in float64 and mean() is sum / n, which is np.mean of the pool
+                  up to rounding. With variance the mean and the sum of squared
+                  deviations are updated with the algorithm of Welford (1962); a chunk
+                  is merged with the formula of Chan et al. (1979).
+Return Value    : numpy arrays
+Dependencies    : numpy
+"""
+import numpy as np
+
+class RunningMean(object):
+    '''
+    Mean over time of fields which are added one after the other.
+    param variance: True to keep the variance as well (Welford)
+    '''
+    def __init__(self, variance=False):
+        self.keep_variance = variance
+        self.n = 0
+        self._sum = None
+        self._mean = None
+        self._m2 = None
+
+    def add(self, field):
+        '''
+        Add a single field, e.g. one time step or the mean of one day.
+        '''
+        field = np.asarray(field, dtype=float)
+        self.n += 1
+        if not self.keep_variance:
+            if self._sum is None:
+                self._sum = field.copy()
+            else:
+                self._sum += field
+            return
+        if self._mean is None:
+            self._mean = field.copy()
+            self._m2 = np.zeros(field.shape, dtype=float)
+            return
+        delta = field - self._mean
+        self._mean += delta / self.n
+        self._m2 += delta * (field - self._mean)
+
+    def add_chunk(self, fields):
+        '''
+        Add a chunk of fields along the first axis, e.g. (time, latitude, longitude).
+        '''
+        fields = np.asarray(fields)
+        n_chunk = fields.shape[0]
+        if n_chunk == 0:
+            return
+        if not self.keep_variance:
+            if self._sum is None:
+                self._sum = np.sum(fields, 0, dtype=float)
+            else:
+                self._sum += np.sum(fields, 0, dtype=float)
+            self.n += n_chunk
+            return
+        mean_chunk = np.mean(fields, 0, dtype=float)
+        m2_chunk = np.sum((fields - mean_chunk) ** 2, 0, dtype=float)
+        if self._mean is None:
+            self._mean = mean_chunk
+            self._m2 = m2_chunk
+            self.n = n_chunk
+            return
+        n = self.n + n_chunk
+        delta = mean_chunk - self._mean
+        self._mean += delta * n_chunk / n
+        self._m2 += m2_chunk + delta ** 2 * self.n * n_chunk / n
+        self.n = n
+
+    def mean(self):
+        '''
+        Mean of all fields added so far.
+        '''
+        if self.keep_variance:
+            return self._mean.copy()
+        return self._sum / self.n
+
+    def variance(self, ddof=0):
+        '''
+        Variance of all fields added so far (ddof as in np.var).
+        '''
+        if not self.keep_variance:
+            raise ValueError('RunningMean was created without variance')
+        return self._m2 / (self.n - ddof)
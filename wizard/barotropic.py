@@ -0,0 +1,105 @@
+"""
+Copyright Netherlands eScience Center
+
+Function        : Barotropic mass budget correction on the ORCA grids of NEMO
+Date            : 2026.10.17
+Last Update     : 2026.10.17
+Description     : mass_correction() of OMET_GLORYS2V3_1993_vGrid_mass_correct moved u
+                  onto the V grid in a loop over the 1021 x 1440 points of ORCA025,
+                  took centred differences of the vertically integrated flux on the
+                  V grid (the zonal one wrote into the column of a stale index j) and
+                  read the depth of the sea bottom deptht[mbathy] in another loop over
+                  all the points. It was too slow to correct more than one year.
+
+                  The divergence is taken as in NEMO (divhor), on the T points with
+                  the fluxes through the faces of the cell and the scale factors of
+                  the curvilinear grid:
+                  div = (e2u * U[i] - e2u * U[i-1] + e1v * V[j] - e1v * V[j-1]) / (e1t * e2t)
+                  with U and V the vertical integrals of u * e3 and v * e3 on the U and
+                  V points. The grid is periodic in i, no water enters through the
+                  southern edge (Antarctica). A field given by a stream function on
+                  the F points gives a divergence of 0 up to rounding.
+
+                  The correction velocity is the one of the script, the residual
+                  times the grid spacing over the depth of the water column, moved
+                  from the T points to the U and V points.
+Return Value    : numpy arrays
+Dependencies    : numpy
+"""
+import numpy as np
+
+def transport(velocity, thickness, mask):
+    '''
+    Vertical integral of the velocity times the thickness of the cells.
+    param velocity: u or v (..., level, j, i) [m/s], the masked values are 0
+    param thickness: thickness of the cells (level, j, i) or (level, 1, 1) [m], see
+                     wizard.overturning.cell_thickness
+    param mask: land-sea mask of the U or V points (level, j, i)
+    return: transport per unit width (..., j, i) [m2/s]
+    '''
+    weight = thickness * np.ma.filled(mask, 0)
+
+    return np.einsum('...kji,kji->...ji', np.ma.filled(velocity, 0.0), weight)
+
+def flux_divergence(transport_u, transport_v, e2u, e1v, e1t, e2t):
+    '''
+    Horizontal divergence of the transport on the T points (NEMO divhor).
+    param transport_u: transport on the U points (..., j, i) [m2/s], see transport
+    param transport_v: transport on the V points (..., j, i) [m2/s]
+    param e2u: meridional grid spacing at the U points (j, i) [m]
+    param e1v: zonal grid spacing at the V points (j, i) [m]
+    param e1t, e2t: grid spacing at the T points (j, i) [m]
+    return: divergence (..., j, i) [m/s]
+    '''
+    # volume flux through the eastern and the northern face of each T cell
+    flux_u = np.ma.filled(e2u, 0.0) * np.ma.filled(transport_u, 0.0)
+    flux_v = np.ma.filled(e1v, 0.0) * np.ma.filled(transport_v, 0.0)
+    div = flux_u + flux_v
+    # the western face is the eastern face of the cell i-1, periodic in i
+    div[...,1:] -= flux_u[...,:-1]
+    div[...,0] -= flux_u[...,-1]
+    # the southern face is the northern face of the cell j-1, closed at j = 0
+    div[...,1:,:] -= flux_v[...,:-1,:]
+    div /= np.ma.filled(e1t, 1.0) * np.ma.filled(e2t, 1.0)
+
+    return div
+
+def bottom_depth(depth, mbathy):
+    '''
+    Depth of the sea bottom, depth[mbathy] at each point; mbathy beyond the last
+    level takes the last level.
+    param depth: depth of the levels (NEMO deptht) (level) [m]
+    param mbathy: number of wet levels (j, i)
+    return: depth (j, i) [m]
+    '''
+    depth = np.asarray(np.ma.filled(depth, 0.0), dtype=float)
+    index = np.clip(np.ma.filled(mbathy, 0), 0, len(depth) - 1)
+
+    return depth[index]
+
+def correction_velocity(residual, depth, e1u, e2v, umask, vmask):
+    '''
+    Barotropic velocity which corrects the mass residual, residual * e / depth.
+    param residual: divergence of the transport on the T points (..., j, i) [m/s],
+                    see flux_divergence
+    param depth: depth of the sea bottom on the T points (j, i) [m], see bottom_depth
+    param e1u: zonal grid spacing at the U points (j, i) [m]
+    param e2v: meridional grid spacing at the V points (j, i) [m]
+    param umask, vmask: land-sea mask of the U and V points at the surface (j, i)
+    return: correction of u on the U points and of v on the V points (..., j, i) [m/s]
+    '''
+    depth = np.asarray(depth, dtype=float)
+    rate = np.where(depth > 0, residual / np.where(depth > 0, depth, 1.0), 0.0)
+    # mean of the T points i and i+1 (periodic) and of the T points j and j+1
+    rate_u = np.empty(rate.shape, dtype=float)
+    np.add(rate[...,:-1], rate[...,1:], out=rate_u[...,:-1])
+    rate_u[...,-1] = rate[...,-1] + rate[...,0]
+    rate_u /= 2
+    rate_v = np.empty(rate.shape, dtype=float)
+    np.add(rate[...,:-1,:], rate[...,1:,:], out=rate_v[...,:-1,:])
+    rate_v[...,:-1,:] /= 2
+    rate_v[...,-1,:] = rate[...,-1,:]
+    uc = rate_u * np.ma.filled(e1u, 0.0) * np.ma.filled(umask, 0)
+    vc = rate_v * np.ma.filled(e2v, 0.0) * np.ma.filled(vmask, 0)
+
+    return uc, vc
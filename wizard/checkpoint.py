@@ -0,0 +1,186 @@
+"""
+Copyright Netherlands eScience Center
+
+Function        : Checkpoint and resume of the months of a long AMET run
+Date            : 2026.10.17
+Last Update     : 2026.10.17
+Description     : The AMET scripts only write their output at the end of each year,
+                  so a job which dies in November loses the whole year. With
+                  MonthCheckpoint the result of every month (zonal integrals, grid
+                  point fields, uc and vc) is saved to a numpy file (.npz) in a
+                  checkpoint directory as soon as the month is done. A manifest
+                  (manifest.json) in the same directory records the finished
+                  (year, month) units and the size, the modification time and a
+                  content hash of their input files.
+
+                  When the run is started again, a month is taken from its
+                  checkpoint if it is in the manifest, its .npz file exists and the
+                  input files are unchanged. The input files of a month are several
+                  GB, and hashing all of them would read them a second time, so the
+                  content hash is the sha1 of the size and of the first and the last
+                  MB of the file (file_ends_hash), computed at most once per file and
+                  process. A file with the size and the modification time of the
+                  manifest is unchanged; with the same size but another modification
+                  time (e.g. a copy of the data) the content hash is compared.
+
+                  MonthCheckpoint wraps the month function of a script and can be
+                  passed to wizard.driver.run_months instead of it. The worker
+                  processes update the manifest under a file lock.
+Return Value    : the result of the month function (tuple of numpy arrays)
+Dependencies    : os, json, hashlib, fcntl, logging, numpy
+"""
+import numpy as np
+import os
+import json
+import hashlib
+import fcntl
+import logging
+
+def file_hash(path, block_size=2**20):
+    '''
+    sha1 of the content of a file, read in blocks of block_size bytes.
+    '''
+    sha1 = hashlib.sha1()
+    with open(path, 'rb') as content:
+        block = content.read(block_size)
+        while block:
+            sha1.update(block)
+            block = content.read(block_size)
+
+    return sha1.hexdigest()
+
+def file_ends_hash(path, block_size=2**20):
+    '''
+    sha1 of the size, the first and the last block_size bytes of a file, a cheap
+    content hash of the input files of several GB.
+    '''
+    sha1 = hashlib.sha1()
+    size = os.path.getsize(path)
+    sha1.update(str(size).encode('ascii'))
+    with open(path, 'rb') as content:
+        sha1.update(content.read(block_size))
+        if size > block_size:
+            content.seek(max(size - block_size, block_size))
+            sha1.update(content.read(block_size))
+
+    return sha1.hexdigest()
+
+class MonthCheckpoint(object):
+    '''
+    Save the result of each month and skip the months which are done.
+    param directory: checkpoint directory, created if it does not exist
+    param task: function of (year, month) which returns a tuple of numpy arrays
+    param inputs: function of (year, month) which returns the list of input files
+    '''
+    def __init__(self, directory, task, inputs):
+        self.directory = directory
+        self.task = task
+        self.inputs = inputs
+        self.manifest_path = os.path.join(directory, 'manifest.json')
+        # content hash of the input files in this run, by (path, size, modification time)
+        self.hashes = {}
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def __call__(self, year, month):
+        result = self.load(year, month)
+        if result is not None:
+            print('%d (y) - %d (m) is taken from the checkpoint' % (year, month))
+            logging.info('%d (y) - %d (m) is taken from the checkpoint' % (year, month))
+            return result
+        result = self.task(year, month)
+        self.save(year, month, result)
+
+        return result
+
+    def unit_path(self, year, month):
+        return os.path.join(self.directory, 'amet_%d_%02d.npz' % (year, month))
+
+    def load(self, year, month):
+        '''
+        Result of a finished month, None if the month has to be computed.
+        '''
+        entry = self.read_manifest().get('%d-%02d' % (year, month))
+        if entry is None or not os.path.exists(self.unit_path(year, month)):
+            return None
+        if sorted(entry['inputs']) != sorted(self.inputs(year, month)) or\
+           not all(self.unchanged(path, old) for path, old in entry['inputs'].items()):
+            logging.info('The input of %d (y) - %d (m) has changed' % (year, month))
+            return None
+        with np.load(self.unit_path(year, month)) as unit:
+            return tuple(unit['field_%d' % (n)] for n in range(entry['fields']))
+
+    def save(self, year, month, result):
+        '''
+        Save the result of a month and add it to the manifest.
+        '''
+        path = self.unit_path(year, month)
+        # write to a temporary file first, a killed job must not leave a broken unit
+        path_tmp = path[:-len('.npz')] + '_tmp.npz'
+        np.savez(path_tmp, **dict(('field_%d' % (n), np.asarray(field)) for n, field in enumerate(result)))
+        os.rename(path_tmp, path)
+        entry = {'year' : int(year),
+                 'month' : int(month),
+                 'fields' : len(result),
+                 'inputs' : self.describe_inputs(year, month)}
+        with open(self.manifest_path + '.lock', 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            manifest = self.read_manifest()
+            manifest['%d-%02d' % (year, month)] = entry
+            with open(self.manifest_path + '.tmp', 'w') as manifest_file:
+                json.dump(manifest, manifest_file, indent=1, sort_keys=True)
+            os.rename(self.manifest_path + '.tmp', self.manifest_path)
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def read_manifest(self):
+        if not os.path.exists(self.manifest_path):
+            return {}
+        with open(self.manifest_path) as manifest_file:
+            return json.load(manifest_file)
+
+    def status(self, path):
+        '''
+        Size and modification time of an input file.
+        '''
+        status = os.stat(path)
+
+        return {'size' : status.st_size, 'mtime' : int(status.st_mtime)}
+
+    def content_hash(self, path, description):
+        '''
+        Content hash of an input file (file_ends_hash), once per file in this run.
+        '''
+        key = (path, description['size'], description['mtime'])
+        if key not in self.hashes:
+            self.hashes[key] = file_ends_hash(path)
+
+        return self.hashes[key]
+
+    def describe_inputs(self, year, month):
+        '''
+        Size, modification time and content hash of each input file of a month.
+        '''
+        inputs = {}
+        for path in self.inputs(year, month):
+            description = self.status(path)
+            description['sha1_ends'] = self.content_hash(path, description)
+            inputs[path] = description
+
+        return inputs
+
+    def unchanged(self, path, old):
+        '''
+        Whether an input file is the same as its description in the manifest.
+        '''
+        if not os.path.exists(path):
+            return False
+        description = self.status(path)
+        if description['size'] != old['size']:
+            return False
+        if description['mtime'] == old['mtime']:
+            return True
+        # same size and another modification time, e.g. a copy, compare the content
+        if 'sha1_ends' not in old:
+            return False
+
+        return self.content_hash(path, description) == old['sha1_ends']
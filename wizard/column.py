@@ -0,0 +1,108 @@
+"""
+Copyright Netherlands eScience Center
+
+Function        : Fused vertical integration of the AMET energy components
+Date            : 2026.10.17
+Last Update     : 2026.10.17
+Description     : The column integrals needed for the atmospheric meridional energy
+                  transport are accumulated in a single pass over the model levels.
+                  At each level the layer thickness dp is taken from the hybrid level
+                  context (wizard.hybrid.HybridLevels), and the eight integrals
+
+                  internal energy flux          cpT * v * dp / g
+                  latent heat flux              Lvq * v * dp / g
+                  geopotential energy flux      gz * v * dp / g
+                  kinetic energy flux           1/2 (u2 + v2) * v * dp / g
+                  internal energy (correction)  cpT * dp / g
+                  latent heat (correction)      Lvq * dp / g
+                  geopotential (correction)     gz * dp / g
+                  kinetic energy (correction)   1/2 (u2 + v2) * dp / g
+
+                  are added to 2D (time, latitude, longitude) buffers. No 4D
+                  (time, level, latitude, longitude) temporary is created, so the
+                  peak memory is the input fields plus a handful of 3D arrays.
+
+                  The input fields only need to support "field[:,k,:,:]", which means
+                  netCDF4 variables can be passed directly and are then read level
+                  by level from disk.
+                  The fields may be float32 (see the float32 mode of the AMET scripts);
+                  every level is converted to float64 before it is added, so the
+                  column integrals are always accumulated in float64.
+
+                  Instead of gz on all levels, the surface geopotential z can be
+                  given. The geopotential of each level is then computed on the way
+                  up by wizard.geopotential and gz is never stored.
+Return Value    : numpy arrays with shape (time, latitude, longitude)
+Dependencies    : numpy
+"""
+import numpy as np
+
+from wizard import geopotential
+
+def energy_column_integrals(T, q, u, v, gz, levels, constant, z=None):
+    '''
+    Vertical integral of the energy fluxes and the correction terms in one pass.
+    param T: absolute temperature [K] with shape (time, level, latitude, longitude)
+    param q: specific humidity [kg/kg], same shape as T
+    param u: zonal wind [m/s], same shape as T
+    param v: meridional wind [m/s], same shape as T
+    param gz: geopotential [m2/s2] on model levels, same shape as T, or None
+    param levels: wizard.hybrid.HybridLevels with sp of shape (time, latitude, longitude)
+    param constant: dictionary of constants with at least g, cp and Lv
+                    (and R_dry, R_vap if gz is None)
+    param z: surface geopotential [m2/s2] with the shape of sp, used if gz is None
+    return: internal_flux_int, latent_flux_int, geopotential_flux_int, kinetic_flux_int,
+            heat_flux_int, vapor_flux_int, geo_flux_int, velocity_flux_int
+    '''
+    shape = levels.sp.shape
+    # integrals of the energy flux and of the energy for the correction
+    internal_flux_int = np.zeros(shape, dtype=float)
+    latent_flux_int = np.zeros(shape, dtype=float)
+    geopotential_flux_int = np.zeros(shape, dtype=float)
+    kinetic_flux_int = np.zeros(shape, dtype=float)
+    heat_flux_int = np.zeros(shape, dtype=float)
+    vapor_flux_int = np.zeros(shape, dtype=float)
+    geo_flux_int = np.zeros(shape, dtype=float)
+    velocity_flux_int = np.zeros(shape, dtype=float)
+    # work space for the current level
+    mass = np.empty(shape, dtype=float)
+    energy = np.empty(shape, dtype=float)
+    # the levels are taken from the surface to the TOA, as the geopotential is integrated upwards
+    if gz is None:
+        gz_levels = geopotential.level_geopotential(T, q, z, levels, constant)
+    else:
+        gz_levels = ((k, gz[:,k,:,:]) for k in levels.index_up)
+    for k, gz_level in gz_levels:
+        # mass of the layer per unit area dp / g [kg/m2]
+        mass[:] = levels.dp(k)
+        mass /= constant['g']
+        v_level = np.asarray(v[:,k,:,:], dtype=float)
+        # internal energy cpT
+        np.multiply(np.asarray(T[:,k,:,:], dtype=float), mass, out=energy)
+        energy *= constant['cp']
+        heat_flux_int += energy
+        energy *= v_level
+        internal_flux_int += energy
+        # latent heat Lvq
+        np.multiply(np.asarray(q[:,k,:,:], dtype=float), mass, out=energy)
+        energy *= constant['Lv']
+        vapor_flux_int += energy
+        energy *= v_level
+        latent_flux_int += energy
+        # geopotential gz
+        np.multiply(np.asarray(gz_level, dtype=float), mass, out=energy)
+        geo_flux_int += energy
+        energy *= v_level
+        geopotential_flux_int += energy
+        # kinetic energy 1/2 (u2 + v2)
+        u_level = np.asarray(u[:,k,:,:], dtype=float)
+        np.multiply(u_level, u_level, out=energy)
+        energy += v_level * v_level
+        energy *= 0.5
+        energy *= mass
+        velocity_flux_int += energy
+        energy *= v_level
+        kinetic_flux_int += energy
+
+    return internal_flux_int, latent_flux_int, geopotential_flux_int, kinetic_flux_int,\
+           heat_flux_int, vapor_flux_int, geo_flux_int, velocity_flux_int
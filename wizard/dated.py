@@ -0,0 +1,58 @@
+"""
+Copyright Netherlands eScience Center
+
+Function        : Input files which carry their date in the name
+Date            : 2026.10.17
+Last Update     : 2026.10.17
+Description     : The 5 daily files of SODA3 (soda3.4.1_5dy_ocean_or_2015_01_03.nc)
+                  used to be listed month by month by the job script with ls into a
+                  namelist.txt, which the OMET script read back to know its input.
+
+                  dated_files finds the files of a directory by the date in their
+                  name (year_month_day by default) and sorts them by date; by_month
+                  and by_year group them, so that a script can go through the files
+                  of each month in order and fold them into running means
+                  (wizard.accumulate) without a list of names on disk.
+Return Value    : list of dates and paths
+Dependencies    : os, re, itertools
+"""
+import os
+import re
+import itertools
+
+# date in the name of the files, year_month_day
+date_pattern = r'(\d{4})_(\d{2})_(\d{2})'
+
+def dated_files(directory, prefix='', pattern=date_pattern):
+    '''
+    Files of a directory with a date in their name, sorted by date.
+    param prefix: start of the names, e.g. soda3.4.1_5dy_ocean_or_2015_
+    param pattern: regular expression of the date, with the groups year, month and day
+    return: list of ((year, month, day), path)
+    '''
+    expression = re.compile(pattern)
+    files = []
+    for name in os.listdir(directory):
+        if not name.startswith(prefix):
+            continue
+        match = expression.search(name)
+        if match is None:
+            continue
+        date = tuple(int(group) for group in match.groups())
+        files.append((date, os.path.join(directory, name)))
+
+    return sorted(files)
+
+def by_month(files):
+    '''
+    Group the dated files by month.
+    return: list of ((year, month), [((year, month, day), path), ...])
+    '''
+    return [(key, list(group)) for key, group in itertools.groupby(files, lambda item: item[0][:2])]
+
+def by_year(files):
+    '''
+    Group the dated files by year.
+    return: list of (year, [((year, month, day), path), ...])
+    '''
+    return [(key, list(group)) for key, group in itertools.groupby(files, lambda item: item[0][0])]
@@ -0,0 +1,73 @@
+"""
+Copyright Netherlands eScience Center
+
+Function        : Divergence of vertically integrated fluxes on a regular lat-lon grid
+Date            : 2026.10.17
+Last Update     : 2026.10.17
+Description     : Array based finite difference kernels for the divergence terms
+                  in the mass budget correction (Trenberth, 1991). They replace the
+                  loops "for i in latitude / for j in longitude" that used to be
+                  copied into every AMET script.
+
+                  The zonal derivative is a centred difference with periodic wrap
+                  in longitude. The meridional derivative is a centred difference
+                  in the interior; at the first and the last latitude (poles or the
+                  edges of a regional domain) a one-sided difference is taken.
+                  Both kernels reproduce the legacy loops bit for bit, including
+                  the factor 2 * dy in the one-sided differences at the edges.
+
+                  The last two axes of the input are (latitude, longitude), any
+                  number of leading axes (time, ...) is allowed.
+Return Value    : numpy arrays with the shape of the input flux
+Dependencies    : numpy
+"""
+import numpy as np
+
+def zonal_divergence(flux, dx):
+    '''
+    Zonal divergence d(flux)/dx with periodic boundary in longitude.
+    param flux: vertically integrated zonal flux with shape (..., latitude, longitude)
+    param dx: zonal grid length for each latitude [m] with shape (latitude)
+    '''
+    flux = np.asarray(flux)
+    # 2 * dx is evaluated per latitude, as the legacy loops did
+    dx2 = (2 * np.asarray(dx, dtype=float))[:,np.newaxis]
+    div = np.empty(flux.shape, dtype=np.result_type(flux, dx2))
+    # the longitude could be from 0 to 360 or -180 to 180, but the index remains the same
+    div[...,1:-1] = (flux[...,2:] - flux[...,:-2]) / dx2
+    div[...,0] = (flux[...,1] - flux[...,-1]) / dx2[:,0]
+    div[...,-1] = (flux[...,0] - flux[...,-2]) / dx2[:,0]
+
+    return div
+
+def meridional_divergence(flux, dy, north_to_south=False):
+    '''
+    Meridional divergence d(flux)/dy with one-sided differences at the edges.
+    param flux: vertically integrated meridional flux with shape (..., latitude, longitude)
+    param dy: meridional grid length [m], either a scalar or an array with shape (latitude)
+    param north_to_south: True if latitude is ordered from north to south (ERA-Interim,
+                          JRA55, EC-Earth), then the sign of the difference is flipped
+    '''
+    flux = np.asarray(flux)
+    dy2 = 2 * np.asarray(dy, dtype=float)
+    if dy2.ndim:
+        dy2 = dy2[:,np.newaxis]
+        dy2_first, dy2_last, dy2_inner = dy2[0], dy2[-1], dy2[1:-1]
+    else:
+        dy2_first = dy2_last = dy2_inner = dy2
+    div = np.empty(flux.shape, dtype=np.result_type(flux, dy2))
+    div[...,1:-1,:] = (flux[...,2:,:] - flux[...,:-2,:]) / dy2_inner
+    div[...,0,:] = (flux[...,1,:] - flux[...,0,:]) / dy2_first
+    div[...,-1,:] = (flux[...,-1,:] - flux[...,-2,:]) / dy2_last
+    ######################## Attnention to the coordinate and symbol #######################
+    if north_to_south:
+        np.negative(div, out=div)
+
+    return div
+
+def divergence(flux_u, flux_v, dx, dy, north_to_south=False):
+    '''
+    Zonal and meridional divergence of a vertically integrated flux (u, v).
+    See zonal_divergence and meridional_divergence for the arguments.
+    '''
+    return zonal_divergence(flux_u, dx), meridional_divergence(flux_v, dy, north_to_south)
@@ -0,0 +1,118 @@
+"""
+Copyright Netherlands eScience Center
+
+Function        : Parallel driver for the year x month loop of the AMET scripts
+Date            : 2026.10.17
+Last Update     : 2026.10.17
+Description     : The months of a reanalysis are independent once the tendency terms
+                  of the mass correction take the fields of the neighbouring months
+                  from disk. run_months hands the months to a pool of worker
+                  processes (concurrent.futures) and gives the results back year by
+                  year, with the months of each year in order, as soon as a year is
+                  complete. The caller fills the pools of the year and writes them,
+                  exactly as in the serial loop.
+
+                  The number of workers is the number of cores, unless given, and it
+                  is limited further by the memory available on the node divided by
+                  the memory needed for one month. A month which raises an exception
+                  is submitted again, up to "retries" times, before the run stops.
+
+                  With one worker the months are computed in the calling process,
+                  which is handy for debugging.
+Return Value    : generator of (year, [result of each month])
+Dependencies    : os, logging, multiprocessing, concurrent.futures (python 2 needs
+                  the backport "futures")
+"""
+import os
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+def available_memory():
+    '''
+    Memory [bytes] available for new processes on this node, None if unknown.
+    '''
+    try:
+        with open('/proc/meminfo') as meminfo:
+            for line in meminfo:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) * 1024
+    except (IOError, OSError):
+        pass
+    try:
+        return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+    except (ValueError, OSError, AttributeError):
+        return None
+
+def number_of_workers(workers=None, memory_per_task=None):
+    '''
+    Number of worker processes, limited by the cores and by the available memory.
+    param workers: requested number of workers, None for the number of cores
+    param memory_per_task: memory [bytes] needed by one month, None for no limit
+    '''
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+    if memory_per_task:
+        memory = available_memory()
+        if memory is not None:
+            workers = min(workers, max(1, int(memory // memory_per_task)))
+
+    return max(1, workers)
+
+def run_months(task, years, months, workers=None, memory_per_task=None, retries=2):
+    '''
+    Run task(year, month) for all months and return the results year by year.
+    param task: function of (year, month), defined at the top level of the script
+    param years: the years in the order of output
+    param months: the months of each year in the order of output
+    param workers: number of worker processes, None for the number of cores
+    param memory_per_task: memory [bytes] needed by one month, None for no limit
+    param retries: number of times a failed month is computed again
+    yield: year, list with the result of each month
+    '''
+    years = list(years)
+    months = list(months)
+    workers = number_of_workers(workers, memory_per_task)
+    print('Compute %d months with %d worker(s)' % (len(years) * len(months), workers))
+    logging.info('Compute %d months with %d worker(s)' % (len(years) * len(months), workers))
+    if workers == 1:
+        for year in years:
+            yield year, [_call(task, year, month, retries) for month in months]
+        return
+    results = {}
+    attempts = {}
+    next_year = 0
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = {}
+        for year in years:
+            for month in months:
+                pending[executor.submit(task, year, month)] = (year, month)
+        while pending:
+            done, not_done = wait(list(pending), return_when=FIRST_COMPLETED)
+            for future in done:
+                year, month = pending.pop(future)
+                try:
+                    results[(year, month)] = future.result()
+                except Exception as error:
+                    attempts[(year, month)] = attempts.get((year, month), 0) + 1
+                    if attempts[(year, month)] > retries:
+                        for future_left in pending:
+                            future_left.cancel()
+                        raise
+                    logging.warning('%d (y) - %d (m) failed (%s), try again' % (year, month, error))
+                    pending[executor.submit(task, year, month)] = (year, month)
+            # hand over the complete years in order
+            while next_year < len(years) and \
+                  all((years[next_year], month) in results for month in months):
+                year = years[next_year]
+                yield year, [results.pop((year, month)) for month in months]
+                next_year += 1
+
+def _call(task, year, month, retries):
+    for attempt in range(retries + 1):
+        try:
+            return task(year, month)
+        except Exception as error:
+            if attempt == retries:
+                raise
+            logging.warning('%d (y) - %d (m) failed (%s), try again' % (year, month, error))
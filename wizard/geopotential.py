@@ -0,0 +1,71 @@
+"""
+Copyright Netherlands eScience Center
+
+Function        : Geopotential on hybrid model levels
+Date            : 2026.10.17
+Last Update     : 2026.10.17
+Description     : The geopotential on the full model levels is integrated upwards
+                  from the surface geopotential, following ECMWF IFS 9220 equations
+                  2.20 - 2.23, with the virtual temperature
+
+                  Tv = T * (1 + (R_vap / R_dry - 1) * q)
+                  gz_full(k) = z + gz_half + alpha(k) * R_dry * Tv(k)         (2.21, 2.22)
+                  gz_half = gz_half + ln(p_half_plus / p_half_minus) * R_dry * Tv(k)   (2.20)
+
+                  where gz_half is the geopotential (without z) at the half level
+                  below level k. Only gz_half is carried from one level to the next;
+                  the half level pressure, ln_p and alpha of each level come from
+                  wizard.hybrid.HybridLevels, so no 4D half level pressure is made.
+                  Both level orderings are supported through HybridLevels
+                  (TOA to surface for ERA-Interim and MERRA2, surface to TOA for
+                  JRA55).
+
+                  geopotential returns gz on all levels. For the column integrals
+                  gz * dp / g and v * gz * dp / g of the energy transport alone, gz
+                  is not kept: wizard.column.energy_column_integrals takes the
+                  surface geopotential (z) and adds level_geopotential level by level.
+Return Value    : numpy arrays
+Dependencies    : numpy
+"""
+import numpy as np
+
+def level_geopotential(T, q, z, levels, constant):
+    '''
+    Geopotential of each model level, from the surface to the TOA.
+    param T: absolute temperature [K] with the level axis at position -3
+    param q: specific humidity [kg/kg], same shape as T
+    param z: surface geopotential [m2/s2] with the shape of levels.sp
+    param levels: wizard.hybrid.HybridLevels
+    param constant: dictionary of constants with at least R_dry and R_vap
+    yield: index of the level, geopotential [m2/s2] of that level
+    '''
+    z = np.asarray(z, dtype=float)
+    # initialize the half level geopotential at the surface
+    gz_half = np.zeros(levels.sp.shape, dtype=float)
+    for k in levels.index_up:
+        # compute the moist temperature (virtual temperature)
+        Tv = np.asarray(T[...,k,:,:], dtype=float) * \
+             (1 + (constant['R_vap'] / constant['R_dry'] - 1) * np.asarray(q[...,k,:,:], dtype=float))
+        Tv *= constant['R_dry']
+        # calculate the geopotential of the full level and add surface geopotential
+        # see equation 2.21 and 2.22 in ECMWF IFS 9220
+        gz_full = z + gz_half + levels.alpha(k) * Tv
+        # renew the half level geopotential for next loop step (the half level above level k)
+        # see equation 2.20 in ECMWF IFS 9220
+        gz_half += levels.ln_p(k) * Tv
+        yield k, gz_full
+
+def geopotential(T, q, z, levels, constant, dtype=None):
+    '''
+    Geopotential [m2/s2] on all model levels, with the shape of T.
+    param dtype: precision of the result, by default float32 for float32 input
+                 and float64 otherwise
+    See level_geopotential for the other arguments.
+    '''
+    if dtype is None:
+        dtype = np.float32 if T.dtype == np.float32 else float
+    gz = np.zeros(T.shape, dtype=dtype)
+    for k, gz_full in level_geopotential(T, q, z, levels, constant):
+        gz[...,k,:,:] = gz_full
+
+    return gz
@@ -0,0 +1,388 @@
+"""
+Copyright Netherlands eScience Center
+
+Function        : Indexed random access to the messages of a GRIB file
+Date            : 2026.10.17
+Last Update     : 2026.10.17
+Description     : The JRA55 scripts read the model level fields with pygrib,
+                  message by message (open.message(n)), in lock-step over the files
+                  of z, T, u, v and q, and the annual surface pressure file is opened
+                  again for every 10 days with a message counter which has to be
+                  carried through the month loop by hand.
+
+                  GribIndex scans a GRIB file once. The byte offset and the length
+                  of each message are found by walking the section 0 headers (GRIB1
+                  and GRIB2) and the analysis time (YYYYMMDDHH) and the level of each
+                  message are taken from pygrib. The index is saved next to the file,
+                  or in index_directory, as a sidecar numpy file (.idx.npz) together
+                  with the size and the modification time of the GRIB file, so a later
+                  run only has to load the sidecar.
+
+                  read takes a block of (time, level) messages straight into a numpy
+                  array. The messages are read in the order of their position in the
+                  file, with one read for each run of adjacent messages (up to
+                  max_bytes), and only decoded (pygrib.fromstring) in memory.
+                  open_index keeps the index of each file for the lifetime of the
+                  process, e.g. the annual surface pressure file is scanned once and
+                  each month is sliced from it by time.
+
+                  Decoding is bound by the CPU and independent for each file (or each
+                  variable in a file). read_parallel decodes several requests at the
+                  same time in a pool of worker processes (concurrent.futures), one
+                  worker for each request, and each worker still reads its messages
+                  forward. The workers write into arrays in memory mapped files
+                  (shared_array, in /dev/shm by default), which the calling process
+                  sees without a copy. read_blocks allocates those arrays as well,
+                  with the shape of the fields of the messages it reads (the ICMSH
+                  and ICMGG files of EC-Earth mix spectral and grid point fields).
+                  The files of the arrays are removed when the decoding is done or
+                  fails. They are kept in a directory for each process
+                  (grib_buffers_<pid>), and the directories of processes which are
+                  gone, e.g. a job which was killed, are removed by the next run.
+Return Value    : numpy arrays
+Dependencies    : os, atexit, errno, shutil, struct, tempfile, logging, numpy, pygrib (imported when a file
+                  is scanned or a message is decoded), concurrent.futures (python 2
+                  needs the backport "futures", only for more than one worker)
+"""
+import numpy as np
+import os
+import atexit
+import errno
+import shutil
+import struct
+import tempfile
+import logging
+
+# indexes of the files opened by open_index
+_indexes = {}
+# prefix of the directories of the memory mapped files of each process
+buffer_prefix = 'grib_buffers_'
+
+def analysis_times(year, month, first_day, last_day, hours=(0, 6, 12, 18)):
+    '''
+    Analysis times (YYYYMMDDHH) from first_day to last_day (included) of a month.
+    '''
+    return [((year * 100 + month) * 100 + day) * 100 + hour
+            for day in range(first_day, last_day + 1) for hour in hours]
+
+def scan_messages(path, block_size=2**20):
+    '''
+    Byte offset and length of each message of a GRIB file (edition 1 and 2).
+    '''
+    offsets = []
+    lengths = []
+    with open(path, 'rb') as grib_file:
+        offset = 0
+        while True:
+            grib_file.seek(offset)
+            block = grib_file.read(block_size)
+            start = block.find(b'GRIB')
+            if start < 0:
+                # padding between the messages or the end of the file
+                if len(block) < block_size:
+                    break
+                offset += block_size - 3
+                continue
+            offset += start
+            grib_file.seek(offset)
+            header = grib_file.read(16)
+            edition = bytearray(header)[7]
+            if edition == 1:
+                length = struct.unpack('>I', b'\x00' + header[4:7])[0]
+                if length & 0x800000:
+                    raise ValueError('large GRIB1 message at byte %d of %s is not supported' % (offset, path))
+            elif edition == 2:
+                length = struct.unpack('>Q', header[8:16])[0]
+            else:
+                raise ValueError('unknown GRIB edition %d at byte %d of %s' % (edition, offset, path))
+            offsets.append(offset)
+            lengths.append(length)
+            offset += length
+
+    return np.array(offsets, dtype=np.int64), np.array(lengths, dtype=np.int64)
+
+def decode(message):
+    '''
+    Values of a single GRIB message given as bytes.
+    '''
+    import pygrib
+    return pygrib.fromstring(message).values
+
+def open_index(path, index_directory=None):
+    '''
+    GribIndex of a file, scanned or loaded only once per process.
+    '''
+    if path not in _indexes:
+        _indexes[path] = GribIndex(path, index_directory)
+
+    return _indexes[path]
+
+def _running(pid):
+    # whether a process exists, the processes of other users included
+    try:
+        os.kill(pid, 0)
+    except OSError as error:
+        return error.errno != errno.ESRCH
+    return True
+
+def buffer_directory(directory=None):
+    '''
+    Directory of the memory mapped files of this process. The directories left behind
+    by processes which are gone (e.g. killed jobs) are removed.
+    param directory: parent directory, by default /dev/shm (memory) if it exists
+    '''
+    if directory is None:
+        directory = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+    for name in os.listdir(directory):
+        if name.startswith(buffer_prefix) and name[len(buffer_prefix):].isdigit() and \
+           not _running(int(name[len(buffer_prefix):])):
+            logging.info('Remove the GRIB buffers of a stopped process in %s' % (os.path.join(directory, name)))
+            shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+    own = os.path.join(directory, buffer_prefix + '%d' % (os.getpid()))
+    if not os.path.isdir(own):
+        os.makedirs(own)
+        atexit.register(_remove_buffers, own, os.getpid())
+
+    return own
+
+def _remove_buffers(directory, pid):
+    # at the exit of the process which made the directory, not of its forked workers
+    if os.getpid() == pid:
+        shutil.rmtree(directory, ignore_errors=True)
+
+def shared_array(shape, dtype=float, directory=None):
+    '''
+    Array in a memory mapped file, which worker processes of read_parallel can fill.
+    The file is removed by read_parallel, or by release.
+    param directory: parent directory of the file, see buffer_directory
+    '''
+    handle, filename = tempfile.mkstemp(suffix='.grib_buffer', dir=buffer_directory(directory))
+    os.close(handle)
+    try:
+        return np.memmap(filename, dtype=dtype, mode='w+', shape=shape)
+    except:
+        os.remove(filename)
+        raise
+
+def release(buffer):
+    '''
+    Remove the file of an array of shared_array, the array stays valid.
+    '''
+    if isinstance(buffer, np.memmap) and buffer.filename is not None and os.path.exists(buffer.filename):
+        os.remove(buffer.filename)
+
+def read_parallel(requests, workers=None, index_directory=None):
+    '''
+    Decode the messages of several GRIB files at the same time, one worker process
+    for each request (e.g. one request per variable file).
+    param requests: list of (path, messages, buffer, start); the messages (positions,
+                    see GribIndex.locate) are decoded into buffer[start:start+len(messages)].
+                    With more than one worker the buffer must come from shared_array.
+    param workers: number of worker processes, by default one per request; with one
+                   worker the requests are read in the calling process
+    param index_directory: directory of the sidecar indexes
+    return: number of messages decoded
+    '''
+    try:
+        # build or load the indexes here, so the workers only load the sidecars
+        for path, messages, buffer, start in requests:
+            open_index(path, index_directory)
+        if workers is None:
+            workers = len(requests)
+        if workers <= 1:
+            for path, messages, buffer, start in requests:
+                open_index(path).read_messages(messages, out=buffer[start:start+len(messages)])
+        else:
+            from concurrent.futures import ProcessPoolExecutor
+            with ProcessPoolExecutor(max_workers=min(workers, len(requests))) as executor:
+                futures = [executor.submit(_read_shared, path, index_directory, messages,
+                                           buffer.filename, buffer.dtype, buffer.shape, start)
+                           for path, messages, buffer, start in requests]
+                # raise the exception of a worker, if any
+                for future in futures:
+                    future.result()
+    finally:
+        # the memory mapped files are not needed any more, also when a worker fails;
+        # the arrays stay valid
+        for path, messages, buffer, start in requests:
+            release(buffer)
+
+    return sum(np.size(request[1]) for request in requests)
+
+def read_blocks(blocks, workers=None, index_directory=None, dtype=float):
+    '''
+    Decode blocks of messages, one worker process for each block.
+    param blocks: list of (path, messages), see GribIndex.locate for the messages; the
+                  messages of a block are on the same grid
+    return: list of arrays, one for each block
+    '''
+    fields = []
+    try:
+        # the shape of the fields of each block is the shape of its first message
+        for path, messages in blocks:
+            field_shape = open_index(path, index_directory).message_shape(np.ravel(messages)[0])
+            fields.append(shared_array(np.shape(messages) + field_shape, dtype))
+    except:
+        for field in fields:
+            release(field)
+        raise
+    read_parallel([(path, messages, field, 0) for (path, messages), field in zip(blocks, fields)],
+                  workers, index_directory)
+
+    return fields
+
+def _read_shared(path, index_directory, messages, filename, dtype, shape, start):
+    # worker of read_parallel, the buffer is opened again from its file
+    buffer = np.memmap(filename, dtype=dtype, mode='r+', shape=shape)
+    open_index(path, index_directory).read_messages(messages, out=buffer[start:start+len(messages)])
+    buffer.flush()
+
+class GribIndex(object):
+    '''
+    Byte offset, length, analysis time and level of each message of a GRIB file.
+    param path: GRIB file
+    param index_directory: directory of the sidecar index, by default the directory
+                           of the GRIB file
+    '''
+    def __init__(self, path, index_directory=None):
+        self.path = path
+        if index_directory is None:
+            index_directory = os.path.dirname(os.path.abspath(path))
+        elif not os.path.isdir(index_directory):
+            os.makedirs(index_directory)
+        self.index_path = os.path.join(index_directory, os.path.basename(path) + '.idx.npz')
+        if not self.load():
+            self.scan()
+            self.save()
+        # files with more than one variable (EC-Earth) can only be read by message
+        self.position = dict((key, n) for n, key in enumerate(zip(self.time.tolist(), self.level.tolist())))
+        if len(self.position) != len(self.time):
+            self.position = None
+        self.times = sorted(set(self.time.tolist()))
+        self.levels = sorted(set(self.level.tolist()))
+        # shape of the fields of the messages which are decoded by message_shape
+        self.shapes = {}
+
+    def scan(self):
+        '''
+        Find the messages of the file and their time and level.
+        '''
+        import pygrib
+        print('Scan the messages of %s' % (self.path))
+        logging.info('Scan the messages of %s' % (self.path))
+        self.offset, self.length = scan_messages(self.path)
+        time = []
+        level = []
+        grbs = pygrib.open(self.path)
+        for message in grbs:
+            if not time:
+                # shape of the values of a message
+                self.shape = np.array(message.values.shape, dtype=np.int64)
+            time.append(message['dataDate'] * 100 + message['dataTime'] // 100)
+            level.append(message['level'])
+        grbs.close()
+        if len(time) != len(self.offset):
+            raise ValueError('pygrib finds %d messages in %s, the headers %d' % (len(time), self.path, len(self.offset)))
+        self.time = np.array(time, dtype=np.int64)
+        self.level = np.array(level, dtype=np.int64)
+
+    def load(self):
+        '''
+        Take the index from the sidecar, False if it is missing or out of date.
+        '''
+        if not os.path.exists(self.index_path):
+            return False
+        status = os.stat(self.path)
+        with np.load(self.index_path) as index:
+            if 'shape' not in index.files or int(index['size']) != status.st_size or int(index['mtime']) != int(status.st_mtime):
+                logging.info('The index of %s is out of date' % (self.path))
+                return False
+            self.offset = index['offset']
+            self.length = index['length']
+            self.time = index['time']
+            self.level = index['level']
+            self.shape = index['shape']
+
+        return True
+
+    def save(self):
+        '''
+        Write the sidecar index, the index is only kept in memory if this fails.
+        '''
+        status = os.stat(self.path)
+        # write to a temporary file first, a killed job must not leave a broken index
+        index_tmp = self.index_path[:-len('.npz')] + '_tmp.npz'
+        try:
+            np.savez(index_tmp, offset=self.offset, length=self.length, time=self.time, level=self.level, shape=self.shape,
+                     size=status.st_size, mtime=int(status.st_mtime))
+            os.rename(index_tmp, self.index_path)
+        except (IOError, OSError):
+            logging.warning('The index of %s can not be saved to %s' % (self.path, self.index_path))
+
+    def locate(self, times, levels=None):
+        '''
+        Position of the messages of a block (time, level) in the file.
+        param times: analysis times (YYYYMMDDHH) of the block
+        param levels: levels of the block, by default all levels of the file; for a
+                      file with a single level the level axis is left out
+        '''
+        if self.position is None:
+            raise ValueError('%s has more than one message for a time and level, use read_messages' % (self.path))
+        if levels is None and len(self.levels) == 1:
+            return np.array([self.position[(time, self.levels[0])] for time in times], dtype=np.int64)
+        if levels is None:
+            levels = self.levels
+        return np.array([[self.position[(time, level)] for level in levels] for time in times], dtype=np.int64)
+
+    def message_shape(self, message):
+        '''
+        Shape of the field of a message (position in the file). The shape of the index
+        is the shape of the first message, the files of EC-Earth mix grids.
+        '''
+        message = int(message)
+        if message not in self.shapes:
+            with open(self.path, 'rb') as grib_file:
+                grib_file.seek(self.offset[message])
+                self.shapes[message] = tuple(np.shape(decode(grib_file.read(self.length[message]))))
+
+        return self.shapes[message]
+
+    def read(self, times, levels=None, out=None, dtype=float, max_bytes=2**26):
+        '''
+        Decode a block of messages into an array (time, level, latitude, longitude).
+        See locate for times and levels, and read_messages for the other arguments.
+        '''
+        return self.read_messages(self.locate(times, levels), out, dtype, max_bytes)
+
+    def read_messages(self, messages, out=None, dtype=float, max_bytes=2**26):
+        '''
+        Decode messages, given by their position in the file (0 for the first), into
+        an array with the shape of messages followed by the shape of a field.
+        param out: preallocated array for the block, e.g. a slice of a larger array
+        param max_bytes: largest read from the file in one go
+        '''
+        messages = np.asarray(messages, dtype=np.int64)
+        flat = messages.ravel()
+        # read the messages in the order of the file, forward only
+        order = np.argsort(self.offset[flat], kind='mergesort')
+        with open(self.path, 'rb') as grib_file:
+            n = 0
+            while n < len(order):
+                # take a run of adjacent messages
+                first = self.offset[flat[order[n]]]
+                end = n + 1
+                while end < len(order) and \
+                      self.offset[flat[order[end]]] == self.offset[flat[order[end-1]]] + self.length[flat[order[end-1]]] and \
+                      self.offset[flat[order[end]]] + self.length[flat[order[end]]] - first <= max_bytes:
+                    end += 1
+                grib_file.seek(first)
+                block = grib_file.read(self.offset[flat[order[end-1]]] + self.length[flat[order[end-1]]] - first)
+                for m in order[n:end]:
+                    start = self.offset[flat[m]] - first
+                    values = decode(block[start:start + self.length[flat[m]]])
+                    if out is None:
+                        out = np.empty(messages.shape + values.shape, dtype=dtype)
+                    out[np.unravel_index(m, messages.shape)] = values
+                n = end
+
+        return out
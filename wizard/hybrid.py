@@ -0,0 +1,146 @@
+"""
+Copyright Netherlands eScience Center
+
+Function        : Pressure on hybrid model levels
+Date            : 2026.10.17
+Last Update     : 2026.10.17
+Description     : The pressure at the half levels of a hybrid sigma-pressure grid is
+                  p_half = A + B * sp. All quantities used by the AMET scripts are
+                  derived from the two half levels which bound each model level k
+
+                  p_half_minus                  upper half level (towards the TOA)
+                  p_half_plus                   lower half level (towards the surface)
+                  dp = p_half_plus - p_half_minus           layer thickness
+                  ln_p = ln(p_half_plus / p_half_minus)     log-pressure ratio
+                  alpha = 1 - p_half_minus / dp * ln_p      see ECMWF IFS 9220 eq 2.23
+
+                  At the TOA p_half_minus is zero, there ln_p = ln(p_half_plus / 10)
+                  and alpha = ln(2), as in the original scripts.
+
+                  One HybridLevels object is created per month (or day) from the
+                  surface pressure and passed to the mass correction, the geopotential
+                  and the energy transport. By default every quantity is evaluated
+                  for a single level when it is asked for, which only costs one 3D
+                  array. With dtype (e.g. np.float32) all levels are computed once and
+                  kept in (level, ...) arrays of that precision.
+
+                  sp can have any shape, e.g. (time, latitude, longitude) for the whole
+                  month or (latitude, longitude) for a single time step.
+Return Value    : numpy arrays with the shape of sp
+Dependencies    : numpy
+"""
+import numpy as np
+
+class HybridLevels(object):
+    '''
+    Half level pressure, layer thickness and log-pressure ratio on hybrid model levels.
+    param A: hybrid coefficient A on half levels [Pa] (number of levels + 1)
+    param B: hybrid coefficient B on half levels [1] (number of levels + 1)
+    param sp: surface pressure [Pa]
+    param surface_first: True if level 0 is the lowest model level (JRA55),
+                         False if level 0 is at the TOA (ERA-Interim, MERRA2)
+    param dtype: None to evaluate each level on request, or the precision in which
+                 dp, ln_p and alpha of all levels are computed once and stored
+    '''
+    def __init__(self, A, B, sp, surface_first=False, dtype=None):
+        self.A = np.asarray(A, dtype=float)
+        self.B = np.asarray(B, dtype=float)
+        self.sp = np.asarray(sp, dtype=float)
+        self.surface_first = surface_first
+        self.n_level = len(self.A) - 1
+        # index of the model levels, from the TOA to the surface
+        if surface_first:
+            self.index_top = self.n_level - 1
+            self.index_down = np.arange(self.n_level)[::-1]
+        else:
+            self.index_top = 0
+            self.index_down = np.arange(self.n_level)
+        # index of the model levels, from the surface to the TOA
+        self.index_up = self.index_down[::-1]
+        self._dp = None
+        self._ln_p = None
+        self._alpha = None
+        if dtype is not None:
+            shape = (self.n_level,) + self.sp.shape
+            self._dp = np.empty(shape, dtype=dtype)
+            self._ln_p = np.empty(shape, dtype=dtype)
+            self._alpha = np.empty(shape, dtype=dtype)
+            for k in np.arange(self.n_level):
+                self._dp[k] = self._calc_dp(k)
+                self._ln_p[k] = self._calc_ln_p(k)
+                self._alpha[k] = self._calc_alpha(k)
+
+    def p_half(self, k):
+        '''
+        Pressure [Pa] at half level k (0 <= k <= number of levels).
+        '''
+        return self.A[k] + self.B[k] * self.sp
+
+    def p_half_plus(self, k):
+        '''
+        Pressure [Pa] at the half level below model level k.
+        '''
+        if self.surface_first:
+            return self.p_half(k)
+        else:
+            return self.p_half(k+1)
+
+    def p_half_minus(self, k):
+        '''
+        Pressure [Pa] at the half level above model level k.
+        '''
+        if self.surface_first:
+            return self.p_half(k+1)
+        else:
+            return self.p_half(k)
+
+    def dp(self, k):
+        '''
+        Pressure thickness [Pa] of model level k.
+        '''
+        if self._dp is not None:
+            return self._dp[k]
+        return self._calc_dp(k)
+
+    def ln_p(self, k):
+        '''
+        ln(p_half_plus / p_half_minus) of model level k.
+        '''
+        if self._ln_p is not None:
+            return self._ln_p[k]
+        return self._calc_ln_p(k)
+
+    def alpha(self, k):
+        '''
+        alpha of model level k for the full level geopotential (IFS 9220 eq 2.23).
+        '''
+        if self._alpha is not None:
+            return self._alpha[k]
+        return self._calc_alpha(k)
+
+    def vertical_integral(self, field):
+        '''
+        Sum of field * dp over all model levels.
+        param field: array with the level axis at position -3, e.g. (time, level,
+                     latitude, longitude) or (level, latitude, longitude), matching sp
+        '''
+        field_int = np.zeros(self.sp.shape, dtype=float)
+        for k in np.arange(self.n_level):
+            field_int += field[...,k,:,:] * self.dp(k)
+
+        return field_int
+
+    def _calc_dp(self, k):
+        return self.p_half_plus(k) - self.p_half_minus(k)
+
+    def _calc_ln_p(self, k):
+        # an exception lies in the TOA
+        if k == self.index_top:
+            return np.log(self.p_half_plus(k) / 10)
+        return np.log(self.p_half_plus(k) / self.p_half_minus(k))
+
+    def _calc_alpha(self, k):
+        if k == self.index_top:
+            return np.full(self.sp.shape, np.log(2))
+        p_half_minus = self.p_half_minus(k)
+        return 1 - p_half_minus / (self.p_half_plus(k) - p_half_minus) * self._calc_ln_p(k)
@@ -0,0 +1,122 @@
+"""
+Copyright Netherlands eScience Center
+
+Function        : Read each input variable once per month (or day)
+Date            : 2026.10.17
+Last Update     : 2026.10.17
+Description     : The AMET scripts used to read T, q, u, v and the surface pressure
+                  from disk in every stage (mass correction, geopotential, energy
+                  transport). MonthFields keeps a list of the variables of the
+                  current month together with the netCDF4 dataset they live in. A
+                  variable is read from disk the first time it is asked for and the
+                  same array is handed to every later stage.
+
+                  With chunk_levels the 4D fields (time, level, latitude, longitude)
+                  are read in slabs of chunk_levels model levels, which keeps the
+                  requests to the file system small. With dtype (e.g. np.float32)
+                  the fields are kept in that precision after unpacking, which
+                  halves the memory of the 4D fields compared with float64. With
+                  steps (a slice of the time axis) only those time steps are read,
+                  e.g. one chunk of wizard.stream.
+
+                  For every variable the size in memory and the time spent on
+                  reading are recorded; report() prints them and sends them to the
+                  log.
+Return Value    : numpy arrays
+Dependencies    : time, logging, numpy, netCDF4 (datasets are opened by the caller)
+"""
+import numpy as np
+import time
+import logging
+
+def read_variable(variable, chunk_levels=None, dtype=None, steps=None):
+    '''
+    Read a netCDF4 variable, 4D variables optionally in slabs of model levels.
+    param variable: netCDF4 variable, e.g. dataset.variables['t']
+    param chunk_levels: number of model levels per read, None to read at once
+    param dtype: precision of the returned array, None to keep the unpacked dtype
+    param steps: slice of the time axis (first axis) to read, None for all time steps
+    '''
+    if steps is None:
+        steps = slice(None)
+    if chunk_levels is None or len(variable.shape) != 4:
+        field = variable[steps]
+        if dtype is not None:
+            field = field.astype(dtype)
+        return field
+    n_level = variable.shape[1]
+    # the first slab decides the dtype after unpacking (scale_factor, add_offset)
+    slab = variable[steps,0:chunk_levels,:,:]
+    if dtype is None:
+        dtype = slab.dtype
+    field = np.empty((slab.shape[0],) + tuple(variable.shape[1:]), dtype=dtype)
+    field[:,0:chunk_levels,:,:] = slab
+    for k in np.arange(chunk_levels, n_level, chunk_levels):
+        field[:,k:k+chunk_levels,:,:] = variable[steps,k:k+chunk_levels,:,:]
+
+    return field
+
+class MonthFields(object):
+    '''
+    Variables of one month which are read from disk only once.
+    param chunk_levels: number of model levels per read of 4D variables
+    param dtype: precision of the arrays in memory, None to keep the unpacked dtype
+    param steps: slice of the time axis to read, None for all time steps
+    '''
+    def __init__(self, chunk_levels=None, dtype=None, steps=None):
+        self.chunk_levels = chunk_levels
+        self.dtype = dtype
+        self.steps = steps
+        self.sources = {}
+        self.fields = {}
+        # bytes and seconds for each variable, in the order of reading
+        self.names_read = []
+        self.bytes_read = {}
+        self.time_read = {}
+
+    def add(self, name, dataset, var_name=None):
+        '''
+        Register a variable.
+        param name: the name used to ask for the variable
+        param dataset: netCDF4 Dataset which holds the variable
+        param var_name: name of the variable in the dataset, if it differs from name
+        '''
+        if var_name is None:
+            var_name = name
+        self.sources[name] = (dataset, var_name)
+
+    def __contains__(self, name):
+        return name in self.sources
+
+    def __getitem__(self, name):
+        if name not in self.fields:
+            dataset, var_name = self.sources[name]
+            start = time.time()
+            field = read_variable(dataset.variables[var_name], self.chunk_levels, self.dtype, self.steps)
+            self.time_read[name] = time.time() - start
+            self.bytes_read[name] = field.nbytes
+            self.names_read.append(name)
+            self.fields[name] = field
+        return self.fields[name]
+
+    def report(self):
+        '''
+        Print and log the size and the read time of each variable.
+        '''
+        total_bytes = 0
+        total_time = 0.0
+        for name in self.names_read:
+            message = 'Read %s: %.1f MB in %.2f s' % (name, self.bytes_read[name] / 1e+6, self.time_read[name])
+            print(message)
+            logging.info(message)
+            total_bytes += self.bytes_read[name]
+            total_time += self.time_read[name]
+        message = 'Read in total: %.1f MB in %.2f s' % (total_bytes / 1e+6, total_time)
+        print(message)
+        logging.info(message)
+
+    def release(self):
+        '''
+        Drop the arrays which have been read, e.g. at the end of the month.
+        '''
+        self.fields = {}
@@ -0,0 +1,441 @@
+"""
+Copyright Netherlands eScience Center
+
+Function        : Meshes of the ocean models (ORCA1, ORCA025 and MOM5) and partial cells
+Date            : 2026.10.17
+Last Update     : 2026.10.17
+Description     : The OMET and Statistics scripts of ORAS4 (ORCA1), GLORYS2V3 (ORCA025)
+                  and SODA3 (MOM5) each had their own var_coordinate, which read 15 to
+                  23 fields of the mesh at the start of the job, whether the script
+                  used them or not.
+
+                  ORCAMesh and MOMMesh read a field from the mesh file (or the file of
+                  the sub-basins) when it is used for the first time, e.g. mesh.e1v,
+                  and keep it for the next use. The fields which are derived from the
+                  mesh (partial cells, the Atlantic mask of MOM5, the V-grid mask of
+                  the Atlantic) are computed once for each mesh file and kept in a
+                  numpy file, which is memory mapped by the later runs. The time and
+                  memory at the start of a job depend on the fields it uses only.
+                  The 3D fields of the eddy resolving ORCA0083 are too large to be
+                  kept, read_rows reads the rows j of a tile when they are needed.
+
+                  The bottom cell of each water column in NEMO and MOM5 is a partial
+                  cell, which is thinner than the level it belongs to. The scripts
+                  correct the thickness of these cells with an adjustment field
+                  (level, j, i), which is zero apart from the bottom cell of each
+                  column. The field used to be built with a loop over every grid point
+                  (and every level), e.g. 75 x 1021 x 1442 iterations for ORCA025, at
+                  the start of every job. partial_cell_adjust builds it with array
+                  indexing: the level of the bottom cell is taken from mbathy (number
+                  of wet levels), the full thickness of that level is taken from the
+                  1D thickness and the adjustment is put along the level axis in one go.
+
+                  cached keeps a derived field in a numpy file next to the mesh file,
+                  or in cache_directory, named after the sha1 of the mesh file. A
+                  later run with the same mesh only hashes the mesh and loads it.
+
+                  basin_mask gives the land-sea mask (T grid) of a basin, for the
+                  zonal integrals and the stream functions of several basins in one
+                  pass of the OMET scripts:
+                  'atl' Atlantic, tmaskatl of the sub-basin file of NEMO, or the
+                        index boxes of MOM5
+                  'inp' Indo-Pacific, tmaskpac and tmaskind of the sub-basin file of
+                        NEMO; for MOM5 the ocean north of the southern boundary of
+                        the Atlantic which is neither Atlantic nor Arctic, without
+                        the Mediterranean
+                  'arc' Arctic, the ocean north of the Arctic circle (66.5N)
+                  (name, [(lon, lat), ...]) the ocean within a polygon [degrees]
+                  The basins may overlap, e.g. the Atlantic and the Arctic north of
+                  66.5N.
+Return Value    : numpy arrays
+Dependencies    : os, logging, numpy, wizard.checkpoint, netCDF4 (imported when a
+                  field is read)
+"""
+import numpy as np
+import os
+import logging
+
+from wizard import checkpoint
+
+def partial_cell_adjust(mbathy, partial, level, thickness=None, first=1, last=None):
+    '''
+    Adjustment of the thickness of the bottom cells.
+    adjust[mbathy-1,j,i] = thickness[mbathy-1] - partial[j,i] for first <= mbathy <= last,
+    and zero elsewhere (land and the levels above the bottom).
+    param mbathy: number of wet levels of each column (j, i)
+    param partial: thickness (NEMO e3t_ps) or depth (MOM5) of the bottom cell (j, i)
+    param level: number of levels
+    param thickness: full thickness (NEMO e3t_0) or depth of the bottom (MOM5 zb) of
+                     each level; None to take partial itself as the adjustment
+    param first, last: range of mbathy with a partial cell, last is level by default
+    return: adjustment (level, j, i)
+    '''
+    if last is None:
+        last = level
+    mbathy = np.rint(np.ma.filled(mbathy, 0)).astype(np.int64)
+    partial = np.ma.filled(partial, 0.0)
+    bottom = (mbathy >= first) & (mbathy <= last)
+    # level of the bottom cell (python starts with 0), land points are put on level 0 with 0
+    index = np.where(bottom, mbathy - 1, 0)
+    if thickness is None:
+        values = np.where(bottom, partial, 0.0)
+    else:
+        values = np.where(bottom, np.take(np.ma.filled(thickness, 0.0), index) - partial, 0.0)
+    adjust = np.zeros((level,) + mbathy.shape, dtype=float)
+    np.put_along_axis(adjust, index[np.newaxis], values[np.newaxis], axis=0)
+
+    return adjust
+
+def cached(mesh_path, name, compute, cache_directory=None, mmap_mode=None, key=None):
+    '''
+    Field derived from a mesh file, computed once for each version of the mesh.
+    param mesh_path: mesh file, its sha1 is the key of the cache
+    param name: name of the field, e.g. e3t_adjust
+    param compute: function without arguments which computes the field
+    param cache_directory: directory of the cache, by default the directory of the mesh
+    param mmap_mode: memory map the cache, e.g. 'c' (copy on write), see numpy.load
+    param key: sha1 of the mesh file, if it is known already
+    '''
+    if cache_directory is None:
+        cache_directory = os.path.dirname(os.path.abspath(mesh_path))
+    if key is None:
+        key = checkpoint.file_hash(mesh_path)
+    cache_path = os.path.join(cache_directory, '%s.%s.%s.npy' % (os.path.basename(mesh_path), name, key[:16]))
+    if os.path.exists(cache_path):
+        logging.info('Load %s of %s from %s' % (name, mesh_path, cache_path))
+        return np.load(cache_path, mmap_mode=mmap_mode)
+    field = compute()
+    # write to a temporary file first, a killed job must not leave a broken cache
+    cache_tmp = cache_path[:-len('.npy')] + '_tmp.npy'
+    try:
+        if not os.path.isdir(cache_directory):
+            os.makedirs(cache_directory)
+        np.save(cache_tmp, field)
+        os.rename(cache_tmp, cache_path)
+        logging.info('Save %s of %s to %s' % (name, mesh_path, cache_path))
+    except (IOError, OSError):
+        logging.warning('%s of %s can not be saved to %s' % (name, mesh_path, cache_path))
+
+    return field
+
+def polygon_mask(longitude, latitude, polygon):
+    '''
+    Points within a polygon (ray casting).
+    param longitude, latitude: coordinates of the points [degrees]
+    param polygon: vertices [(lon, lat), ...] [degrees], the polygon may cross the date
+                   line if its longitudes are continuous, e.g. from 150 to 240
+    return: boolean array of the shape of longitude
+    '''
+    vertices = np.asarray(polygon, dtype=float)
+    latitude = np.ma.filled(latitude, np.nan)
+    # longitude of the points within 360 degrees east of the westmost vertex
+    west = vertices[:,0].min()
+    longitude = (np.ma.filled(longitude, np.nan) - west) % 360 + west
+    inside = np.zeros(np.shape(longitude), dtype=bool)
+    for (x0, y0), (x1, y1) in zip(vertices, np.roll(vertices, -1, axis=0)):
+        # edges crossed by the ray from each point to the east
+        if y0 == y1:
+            continue
+        crossing = (y0 > latitude) != (y1 > latitude)
+        with np.errstate(invalid='ignore'):
+            x_edge = x0 + (latitude - y0) * (x1 - x0) / (y1 - y0)
+        inside ^= crossing & (longitude < x_edge)
+
+    return inside
+
+# fields of the NEMO mesh: file ('mesh' or 'basin'), name in the file and index of the
+# time axis, which the mesh files of NEMO carry
+orca_fields = {'nav_lat' : ('mesh', 'nav_lat', Ellipsis),
+               'nav_lon' : ('mesh', 'nav_lon', Ellipsis),
+               'nav_lev' : ('mesh', 'nav_lev', Ellipsis),
+               'deptht' : ('mesh', 'deptht', Ellipsis),
+               'gphiu' : ('mesh', 'gphiu', 0),
+               'glamu' : ('mesh', 'glamu', 0),
+               'gphiv' : ('mesh', 'gphiv', 0),
+               'glamv' : ('mesh', 'glamv', 0),
+               'tmask' : ('mesh', 'tmask', 0),
+               'umask' : ('mesh', 'umask', 0),
+               'vmask' : ('mesh', 'vmask', 0),
+               'e1t' : ('mesh', 'e1t', 0),
+               'e2t' : ('mesh', 'e2t', 0),
+               'e1u' : ('mesh', 'e1u', 0),
+               'e2u' : ('mesh', 'e2u', 0),
+               'e1v' : ('mesh', 'e1v', 0),
+               'e2v' : ('mesh', 'e2v', 0),
+               'mbathy' : ('mesh', 'mbathy', 0),
+               'e3t_0' : ('mesh', 'e3t_0', 0),
+               'e3t_ps' : ('mesh', 'e3t_ps', 0),
+               'hdept' : ('mesh', 'hdept', 0),
+               'tmaskatl' : ('basin', 'tmaskatl', Ellipsis),
+               'tmaskpac' : ('basin', 'tmaskpac', Ellipsis),
+               'tmaskind' : ('basin', 'tmaskind', Ellipsis)}
+# fields of the MOM5 mesh (topog.nc)
+mom_fields = {'grid_x_T' : ('mesh', 'grid_x_T', Ellipsis),       # Nominal Longitude of T-cell center
+              'grid_y_T' : ('mesh', 'grid_y_T', Ellipsis),       # Nominal Latitude of T-cell center
+              'grid_x_C' : ('mesh', 'grid_x_C', Ellipsis),       # Nominal Longitude of C-cell center
+              'grid_y_C' : ('mesh', 'grid_y_C', Ellipsis),       # Nominal Latitude of C-cell center
+              'x_T' : ('mesh', 'x_T', Ellipsis),                 # Geographic Longitude of T-cell center
+              'y_T' : ('mesh', 'y_T', Ellipsis),                 # Geographic Latitude of T-cell center
+              'x_C' : ('mesh', 'x_C', Ellipsis),                 # Geographic Longitude of C-cell center
+              'y_C' : ('mesh', 'y_C', Ellipsis),                 # Geographic Latitude of C-cell center
+              'zt' : ('mesh', 'zt', Ellipsis),                   # Depth of T cell (z50)
+              'zb' : ('mesh', 'zb', Ellipsis),                   # Depth of T cell edges (z50)
+              'area_T' : ('mesh', 'area_T', Ellipsis),           # Area of T-cell
+              'e1t' : ('mesh', 'ds_01_21_T', Ellipsis),          # width of T-cell
+              'e2t' : ('mesh', 'ds_10_12_T', Ellipsis),          # height of T-cell
+              'e1c' : ('mesh', 'ds_01_21_C', Ellipsis),          # width of C-cell
+              'e2c' : ('mesh', 'ds_10_12_C', Ellipsis),          # height of C-cell
+              'tmask' : ('mesh', 'wet', Ellipsis),               # land/sea flag (0=land) for T-cell
+              'cmask' : ('mesh', 'wet_c', Ellipsis),             # land/sea flag (0=land) for C-cell
+              'mbathy_t' : ('mesh', 'num_levels', Ellipsis),     # number of vertical T-cells
+              'mbathy_c' : ('mesh', 'num_levels_c', Ellipsis),   # number of vertical C-cells
+              'topo_depth_t' : ('mesh', 'depth', Ellipsis),      # topographic depth of T-cell
+              'topo_depth_c' : ('mesh', 'depth_c', Ellipsis)}    # topographic depth of C-cell
+# basins of basin_mask: derived field of the mask and long name
+basin_fields = {'atl' : ('tmaskatl', 'Atlantic'),
+                'inp' : ('tmaskinp', 'Indo-Pacific'),
+                'arc' : ('tmaskarc', 'Arctic')}
+# southern boundary of the Arctic [degrees north]
+arctic_latitude = 66.5
+
+class OceanMesh(object):
+    '''
+    Mesh of an ocean model, whose fields are read when they are used for the first
+    time (mesh.e1v) and the derived fields (derive_<name>) are computed once for
+    each mesh file and cached on disk.
+    param datapath: directory of the mesh files
+    param cache_directory: directory of the cache of the derived fields, by default
+                           the directory of the mesh files
+    '''
+    grid = None
+    mesh_file = None
+    basin_file = None
+    field_table = {}
+    # coordinates of the T grid
+    longitude_t = None
+    latitude_t = None
+
+    def __init__(self, datapath, cache_directory=None):
+        self.datapath = datapath
+        self.cache_directory = cache_directory
+        self.key = None
+
+    def __getattr__(self, name):
+        # only called for the fields which are not loaded yet
+        if name.startswith('_') or name in ('datapath', 'cache_directory', 'key'):
+            raise AttributeError(name)
+        if name in self.field_table:
+            value = self.read(name)
+        elif hasattr(type(self), 'derive_' + name):
+            if self.key is None:
+                self.key = checkpoint.file_hash(self.path('mesh'))
+            value = cached(self.path('mesh'), name, getattr(self, 'derive_' + name),
+                           self.cache_directory, mmap_mode='c', key=self.key)
+        else:
+            raise AttributeError('%s is not a field of the %s mesh' % (name, self.grid))
+        self.__dict__[name] = value
+
+        return value
+
+    def path(self, source):
+        '''
+        Path of the mesh file (source 'mesh') or of the file of the sub-basins ('basin').
+        '''
+        return os.path.join(self.datapath, self.mesh_file if source == 'mesh' else self.basin_file)
+
+    def read(self, name):
+        '''
+        Read a field from the mesh files.
+        '''
+        from netCDF4 import Dataset
+        source, variable, index = self.field_table[name]
+        logging.info('Read %s of the %s mesh from %s' % (name, self.grid, self.path(source)))
+        dataset = Dataset(self.path(source))
+        value = dataset.variables[variable][index]
+        dataset.close()
+
+        return value
+
+    def shape(self, name):
+        '''
+        Shape of a field in the mesh files, without reading it (the time axis is dropped).
+        '''
+        from netCDF4 import Dataset
+        source, variable, index = self.field_table[name]
+        dataset = Dataset(self.path(source))
+        shape = dataset.variables[variable].shape
+        dataset.close()
+
+        return shape[1:] if isinstance(index, int) else shape
+
+    def read_rows(self, name, rows):
+        '''
+        Read the rows j of a field from the mesh files, e.g. one tile of the mesh of
+        ORCA0083 (wizard.omet.tiled_transport); the rows are not kept.
+        param rows: slice of the rows j
+        '''
+        from netCDF4 import Dataset
+        source, variable, index = self.field_table[name]
+        dataset = Dataset(self.path(source))
+        if index is Ellipsis:
+            value = dataset.variables[variable][..., rows, :]
+        elif isinstance(index, int):
+            value = dataset.variables[variable][index, ..., rows, :]
+        else:
+            value = dataset.variables[variable][index][..., rows, :]
+        dataset.close()
+
+        return value
+
+    def fields(self, *names):
+        '''
+        Several fields at once, e.g. e1v, vmask = mesh.fields('e1v', 'vmask').
+        '''
+        return tuple(getattr(self, name) for name in names)
+
+    def surface_mask(self):
+        '''
+        Land-sea mask of the sea surface on the T grid (j, i).
+        '''
+        tmask = np.ma.filled(self.tmask, 0)
+        if tmask.ndim == 3:
+            tmask = tmask[0]
+
+        return tmask
+
+    def basin_mask(self, basin):
+        '''
+        Land-sea mask of a basin on the T grid (j, i).
+        param basin: 'atl', 'inp', 'arc' or a polygon (name, [(lon, lat), ...])
+        return: name, long name and mask of the basin
+        '''
+        if isinstance(basin, (tuple, list)):
+            name, polygon = basin
+            inside = polygon_mask(getattr(self, self.longitude_t), getattr(self, self.latitude_t), polygon)
+            return name, name, self.surface_mask() * inside
+        if basin not in basin_fields:
+            raise ValueError('unknown basin %s, use %s or (name, polygon)' % (basin, ', '.join(sorted(basin_fields))))
+        field, long_name = basin_fields[basin]
+
+        return basin, long_name, np.ma.filled(getattr(self, field), 0)
+
+    def basin_masks(self, basins):
+        '''
+        Names, long names and masks of several basins, see basin_mask.
+        '''
+        names, long_names, masks = [], [], []
+        for basin in basins:
+            name, long_name, mask = self.basin_mask(basin)
+            names.append(name)
+            long_names.append(long_name)
+            masks.append(mask)
+
+        return names, long_names, masks
+
+    def derive_tmaskarc(self):
+        # land sea mask of the Arctic, the ocean north of the Arctic circle
+        latitude = np.ma.filled(getattr(self, self.latitude_t), 0)
+        return self.surface_mask() * (latitude >= arctic_latitude)
+
+class ORCAMesh(OceanMesh):
+    '''
+    Mesh of NEMO on the ORCA1 (ORAS4), ORCA025 (GLORYS2V3) or ORCA0083 grid.
+    param grid: 'ORCA1', 'ORCA025' or 'ORCA0083'
+    '''
+    field_table = orca_fields
+    longitude_t = 'nav_lon'
+    latitude_t = 'nav_lat'
+
+    def __init__(self, grid, datapath, cache_directory=None):
+        OceanMesh.__init__(self, datapath, cache_directory)
+        if grid == 'ORCA1':
+            self.mesh_file = 'mesh_mask.nc'
+            # sub-basin from DRAKKER project
+            self.basin_file = 'basinmask_050308_UKMO.nc'
+        elif grid == 'ORCA025':
+            self.mesh_file = 'G2V3_mesh_mask_myocean.nc'
+            # sub-basin from Andreas, attention that the size is different!
+            self.basin_file = 'new_maskglo.nc'
+            self.field_table = dict(orca_fields)
+            for name in ('tmaskatl', 'tmaskpac', 'tmaskind'):
+                self.field_table[name] = ('basin', name, (slice(None), slice(1,-1)))
+        elif grid == 'ORCA0083':
+            # eddy resolving grid of the NEMO hindcast, read in tiles of rows (read_rows)
+            self.mesh_file = 'mesh_mask.nc'
+            self.basin_file = 'subbasins.nc'
+        else:
+            raise ValueError('unknown grid %s of NEMO, use ORCA1, ORCA025 or ORCA0083' % (grid))
+        self.grid = grid
+
+    def derive_e3t_adjust(self):
+        # difference between the full and the partial bottom cell, for mbathy 1 to level-1
+        level = len(self.e3t_0)
+        return partial_cell_adjust(self.mbathy, self.e3t_ps, level, thickness=self.e3t_0, last=level-1)
+
+    def derive_e3t_partial(self):
+        # thickness of the partial bottom cell itself, for mbathy 1 to level-1
+        level = len(self.e3t_0)
+        return partial_cell_adjust(self.mbathy, self.e3t_ps, level, last=level-1)
+
+    def derive_vmaskatl(self):
+        # land-sea mask of the Atlantic on the V grid
+        return np.ma.filled(self.vmask, 0) * np.ma.filled(self.tmaskatl, 0)[np.newaxis,:,:]
+
+    def derive_tmaskinp(self):
+        # land-sea mask of the Indo-Pacific, from the Pacific and the Indian ocean
+        return np.maximum(np.ma.filled(self.tmaskpac, 0), np.ma.filled(self.tmaskind, 0))
+
+class MOMMesh(OceanMesh):
+    '''
+    Mesh of MOM5 (SODA3), Arakawa-B grid with T and C cells.
+    '''
+    grid = 'MOM5'
+    mesh_file = 'topog.nc'
+    field_table = mom_fields
+    longitude_t = 'x_T'
+    latitude_t = 'y_T'
+
+    def derive_dz(self):
+        # thickness of each layer
+        zb = np.ma.filled(self.zb, 0.0)
+        dz = np.zeros(zb.shape)
+        dz[0] = zb[0]
+        dz[1:] = zb[1:] - zb[:-1]
+        return dz
+
+    def derive_dz_adjust_t(self):
+        return partial_cell_adjust(self.mbathy_t, self.topo_depth_t, len(self.zb), thickness=self.zb)
+
+    def derive_dz_adjust_c(self):
+        return partial_cell_adjust(self.mbathy_c, self.topo_depth_c, len(self.zb), thickness=self.zb)
+
+    def derive_tmaskatl(self):
+        # land sea mask of the Atlantic, from the land sea mask (copy) and index boxes
+        tmaskatl = np.array(np.ma.filled(self.tmask, 0))
+        tmaskatl[0:225,:] = 0 # boundary south
+        tmaskatl[:,0:727] = 0 # boundary west
+        tmaskatl[:,1200:] = 0 # boundary east
+        tmaskatl[np.ma.filled(self.y_T, 0) > 70] = 0 # boundary north
+        # correction Mediterranean
+        tmaskatl[614:680,1100:1240] = 0
+        tmaskatl[660:720,1140:1280] = 0
+        # correction Pacific
+        tmaskatl[225:522,759:839] = 0
+        tmaskatl[225:545,670:780] = 0
+        tmaskatl[225:560,670:759] = 0
+        return tmaskatl
+
+    def derive_tmaskinp(self):
+        # land sea mask of the Indo-Pacific, the ocean north of the southern boundary of the
+        # Atlantic which is neither Atlantic nor Arctic
+        longitude = (np.ma.filled(self.x_T, 0) + 180) % 360 - 180
+        latitude = np.ma.filled(self.y_T, 0)
+        tmaskinp = np.array(np.ma.filled(self.tmask, 0))
+        tmaskinp[0:225,:] = 0 # boundary south
+        tmaskinp[np.ma.filled(self.tmaskatl, 0) > 0] = 0
+        tmaskinp[np.ma.filled(self.tmaskarc, 0) > 0] = 0
+        # Mediterranean, Black Sea, Hudson Bay and the Atlantic north of 70N
+        tmaskinp[(longitude >= -100) & (longitude < 45) & (latitude > 30)] = 0
+        # Atlantic outside the index boxes of tmaskatl
+        tmaskinp[(longitude >= -70) & (longitude < 20)] = 0
+        return tmaskinp
@@ -0,0 +1,156 @@
+"""
+Copyright Netherlands eScience Center
+
+Function        : Ocean heat content in depth bands on z-level grids (NEMO, MOM5)
+Date            : 2026.10.17
+Last Update     : 2026.10.17
+Description     : ocean_heat_content() of the Statistics scripts of ORAS4, GLORYS2V3
+                  and SODA3 computed the heat content of every cell of the globe and
+                  of the Atlantic level by level into two arrays of the size of the
+                  temperature (12 x 42 x 292 x 362 for a year of ORAS4), with the grid
+                  spacing, the masks and the partial cells expanded by np.repeat, and
+                  summed them afterwards over fixed ranges of levels, e.g. the levels
+                  0 - 21 for "0 - 500 m" of ORAS4. The depth of the levels differs
+                  between the grids, so the layers did not match the nominal depths.
+
+                  DepthBands takes any list of depth bands (upper, lower) [m], with
+                  None for the sea bottom, e.g. 0 - 500 m, 500 - 1000 m, 1000 - 2000 m
+                  and the full depth. The depth of the top of each level follows
+                  from one cumulative sum of the thickness of the levels; the weight of
+                  a cell in a band is the part of its thickness within the band, so a
+                  cell which is cut by the boundary of a band is split between the
+                  two bands. The partial cells at the bottom keep the top of their
+                  level and are thinner, their weights are corrected at those cells
+                  only, so the weights take (band, level) and (band, columns) and no
+                  3D field per band.
+
+                  heat_content contracts the temperature, the volume of the cells
+                  (cell_volume) and the weights of the bands in one np.einsum, which
+                  gives (..., band, j, i) with any leading axes (month, ...) and no
+                  array of the size of the temperature. The zonal integrals of the
+                  bands and of the basins follow from wizard.overturning.zonal_integrals,
+                  zonal_profiles gives the zonal integral at each level (..., level, j).
+Return Value    : numpy arrays
+Dependencies    : numpy
+"""
+import numpy as np
+
+def cell_volume(e1t, e2t, thickness, mask):
+    '''
+    Volume of the T cells, with the partial cells and the land-sea mask.
+    param e1t, e2t: grid spacing at the T points (j, i) [m]
+    param thickness: thickness of the cells (level, j, i) or (level, 1, 1) [m], see
+                     wizard.overturning.cell_thickness
+    param mask: land-sea mask of the T points (level, j, i) or (j, i)
+    return: volume (level, j, i) [m3]
+    '''
+    area = np.ma.filled(e1t, 0.0) * np.ma.filled(e2t, 0.0)
+
+    return area[np.newaxis,:,:] * thickness * np.ma.filled(mask, 0)
+
+def overlap(top, bottom, upper, lower):
+    '''
+    Thickness of the part of the cells (top, bottom) within the band (upper, lower) [m].
+    '''
+    return np.clip(np.minimum(bottom, lower) - np.maximum(top, upper), 0.0, None)
+
+def band_name(band):
+    '''
+    Name of a band, e.g. 0_500 or 2000_inf.
+    '''
+    upper, lower = band
+    return '%d_%s' % (upper, 'inf' if lower is None else '%d' % (lower))
+
+def band_suffix(band):
+    '''
+    Suffix of the output variables of a band, e.g. OHC_glo_vert_0_500; the full depth
+    (0, None) has none (OHC_glo_vert).
+    '''
+    if tuple(band) == (0, None):
+        return ''
+    return '_' + band_name(band)
+
+def band_description(band):
+    '''
+    Description of a band for the long names, e.g. " from surface to 500 m".
+    '''
+    upper, lower = band
+    if tuple(band) == (0, None):
+        return ''
+    return ' from %s to %s' % ('surface' if upper == 0 else '%d m' % (upper),
+                               'bottom' if lower is None else '%d m' % (lower))
+
+class DepthBands(object):
+    '''
+    Weights of the cells of a z-level grid in depth bands.
+    param thickness: thickness of the levels (NEMO e3t_0, MOM5 dz) (level) [m]
+    param bands: list of (upper, lower) depth [m], lower None for the sea bottom
+    param adjust: adjustment of the partial cells (level, j, i), see wizard.mesh, None
+                  without partial cells
+    '''
+    def __init__(self, thickness, bands, adjust=None):
+        thickness = np.asarray(np.ma.filled(thickness, 0.0), dtype=float)
+        self.bands = [tuple(band) for band in bands]
+        # depth of the top and the bottom of each level, one cumulative sum
+        top = np.cumsum(thickness) - thickness
+        bottom = top + thickness
+        upper = np.array([band[0] for band in self.bands], dtype=float)[:,np.newaxis]
+        lower = np.array([np.inf if band[1] is None else band[1] for band in self.bands], dtype=float)[:,np.newaxis]
+        # part of each full level within each band (band, level)
+        self.weight = overlap(top, bottom, upper, lower) / np.where(thickness > 0, thickness, 1.0)
+        self.partial = None
+        if adjust is not None:
+            adjust = np.ma.filled(adjust, 0.0)
+            # the partial cells, one at the bottom of each column
+            level, j, i = np.nonzero(adjust)
+            partial = thickness[level] - adjust[level, j, i]
+            weight = overlap(top[level], top[level] + partial, upper, lower) / np.where(partial > 0, partial, 1.0)
+            # correction of the weight of the full level (band, cells)
+            self.partial = (level, j, i, weight - self.weight[:,level])
+
+    def integrals(self, field, volume):
+        '''
+        Integrals of a field over the cells of each band.
+        param field: (..., level, j, i), the masked values are 0
+        param volume: volume of the cells (level, j, i) [m3], see cell_volume
+        return: (..., band, j, i)
+        '''
+        field = np.ma.filled(field, 0.0)
+        integral = np.einsum('...kji,kji,bk->...bji', field, volume, self.weight)
+        if self.partial is not None:
+            level, j, i, correction = self.partial
+            cells = field[...,level,j,i] * volume[level,j,i]
+            np.add.at(integral, (Ellipsis, slice(None), j, i), cells[...,np.newaxis,:] * correction)
+
+        return integral
+
+def heat_content(theta, volume, depth_bands, constant):
+    '''
+    Ocean heat content of each depth band at each point.
+    OHC = rho * cp * sum over the cells of the band of theta * volume * weight
+    param theta: potential temperature (..., level, j, i) [Celsius], the masked values are 0
+    param volume: volume of the cells (level, j, i) [m3], see cell_volume
+    param depth_bands: DepthBands
+    param constant: dictionary with rho [kg/m3] and cp [J/(kg*C)]
+    return: heat content (..., band, j, i) [TJ]
+    '''
+    return constant['rho'] * constant['cp'] * depth_bands.integrals(theta, volume) / 1e+12
+
+def zonal_profiles(theta, volume, constant, basins=(None,)):
+    '''
+    Zonal integral of the ocean heat content at each level within each basin.
+    param theta: potential temperature (..., level, j, i) [Celsius], the masked values are 0
+    param volume: volume of the cells (level, j, i) [m3], see cell_volume
+    param basins: list of the masks of the basins (j, i), None for the whole domain
+    return: list of the zonal integrals of the basins (..., level, j) [TJ]
+    '''
+    theta = np.ma.filled(theta, 0.0)
+    profiles = []
+    for basin in basins:
+        if basin is None:
+            profile = np.einsum('...kji,kji->...kj', theta, volume)
+        else:
+            profile = np.einsum('...kji,kji,ji->...kj', theta, volume, np.ma.filled(basin, 0).astype(float))
+        profiles.append(constant['rho'] * constant['cp'] * profile / 1e+12)
+
+    return profiles
@@ -0,0 +1,144 @@
+"""
+Copyright Netherlands eScience Center
+
+Function        : Oceanic meridional energy transport on the V grid of NEMO (any basin)
+Date            : 2026.10.17
+Last Update     : 2026.10.17
+Description     : meridional_energy_transport of the OMET scripts of ORAS4 and
+                  GLORYS2V3 moved the temperature to the V grid with a loop over the
+                  rows j and filled the energy flux of each cell (month, level, j, i)
+                  in a loop over the months and the levels, with the partial cells
+                  as a second term rho * cp * v * T * e1v * e3t_adjust * vmask. The
+                  flux of a year of ORAS4 (12 x 42 x 292 x 362) was kept in full, only
+                  to be summed over the levels.
+
+                  t_on_v averages the rows j and j+1 of the temperature with slices.
+                  face_area gives the area of the V face of each cell with the partial
+                  cells and the land-sea mask, e1v * (e3t_0 - e3t_adjust) * vmask, which
+                  depends on the mesh only and is computed once per job.
+                  energy_transport contracts v, T and the face area over the levels in
+                  a single np.einsum, with any leading axes (month, ...), so no array of
+                  the size of the flux is built.
+
+                  For the eddy resolving grids (ORCA0083, 75 x 3059 x 4322) a single
+                  3D field of float64 takes 8 GB. tiled_transport goes through the
+                  domain in tiles of rows j (row_tiles, rows_per_tile for a memory
+                  budget) and reads the temperature of each tile with one halo row
+                  to the north for t_on_v. Since the energy transport, the zonal
+                  integrals and the stream function of a row only need the fields
+                  of that row, the zonal integrals and the stream functions of the
+                  basins are filled in tile by tile and the memory is bounded by the
+                  size of a tile. The OMET at each point is handed to a callback
+                  (e.g. writing the rows to the output file) and is not kept.
+Return Value    : numpy arrays
+Dependencies    : numpy, wizard.overturning
+"""
+import numpy as np
+
+from wizard import overturning
+
+def t_on_v(theta):
+    '''
+    Temperature on the V grid, the mean of the T points j and j+1; the last row keeps
+    the T point.
+    param theta: temperature (..., j, i), the masked values are 0
+    return: temperature on the V points (..., j, i)
+    '''
+    theta = np.ma.filled(theta, 0.0)
+    theta_v = np.empty(theta.shape, dtype=float)
+    np.add(theta[...,:-1,:], theta[...,1:,:], out=theta_v[...,:-1,:])
+    theta_v[...,:-1,:] /= 2
+    theta_v[...,-1,:] = theta[...,-1,:]
+
+    return theta_v
+
+def face_area(width, thickness, mask):
+    '''
+    Area of the V faces of the cells, with the partial cells and the land-sea mask.
+    param width: zonal grid spacing at the V points (NEMO e1v) (j, i) [m]
+    param thickness: thickness of the cells (level, j, i) or (level, 1, 1) [m], see
+                     wizard.overturning.cell_thickness
+    param mask: land-sea mask of the V points (level, j, i)
+    return: area (level, j, i) [m2]
+    '''
+    return np.ma.filled(width, 0.0)[np.newaxis,:,:] * thickness * np.ma.filled(mask, 0)
+
+def energy_transport(v, theta_v, area, constant):
+    '''
+    Vertical integral of the meridional energy transport at each V point.
+    E = rho * cp * sum over the levels of v * T * area
+    param v: meridional velocity (..., level, j, i) [m/s], the masked values are 0
+    param theta_v: temperature on the V points (..., level, j, i) [Celsius], see t_on_v
+    param area: area of the V faces (level, j, i) [m2], see face_area
+    param constant: dictionary with rho [kg/m3] and cp [J/(kg*C)]
+    return: energy transport (..., j, i) [TW]
+    '''
+    transport = np.einsum('...kji,...kji,kji->...ji', np.ma.filled(v, 0.0), theta_v, area)
+
+    return constant['rho'] * constant['cp'] * transport / 1e+12
+
+def rows_per_tile(memory_budget, n_level, n_i, n_steps=1, itemsize=8, n_fields=8):
+    '''
+    Number of rows j per tile which fits in the memory budget.
+    param memory_budget: bytes available for one tile
+    param n_steps: number of time steps (months) in the leading axis of the fields
+    param itemsize: bytes per value of the 3D fields
+    param n_fields: number of 3D fields of a tile (theta and v with their masks, theta
+                    on the V points, the face area and the transport)
+    '''
+    row_bytes = n_fields * n_steps * n_level * n_i * itemsize
+
+    return max(1, int(memory_budget // row_bytes))
+
+def row_tiles(n_row, rows):
+    '''
+    Tiles of rows j which cover the domain.
+    return: list of slices of the rows
+    '''
+    return [slice(first, min(first + rows, n_row)) for first in range(0, n_row, rows)]
+
+def tiled_transport(read_theta, read_v, read_area, n_row, rows, constant, basins=(None,), point=None):
+    '''
+    Energy transport, its zonal integrals and the stream functions of the basins,
+    computed in tiles of rows j.
+    param read_theta: function of a slice of rows which returns the temperature
+                      (..., level, rows, i) [Celsius]; it is called with one halo
+                      row to the north of the tile, except for the last tile
+    param read_v: function of a slice of rows which returns v (..., level, rows, i) [m/s]
+    param read_area: function of a slice of rows which returns the area of the V faces
+                     (level, rows, i) [m2], see face_area
+    param n_row: number of rows j of the domain
+    param rows: number of rows per tile, see rows_per_tile
+    param constant: dictionary with rho [kg/m3] and cp [J/(kg*C)]
+    param basins: list of the masks of the basins (j, i), None for the whole domain
+    param point: function point(tile, E) called with the slice of rows and the energy
+                 transport at each point of the tile (..., rows, i) [TW], None to drop it
+    return: list of the zonal integrals of the energy transport (..., j) [TW] and list
+            of the stream functions (..., level, j) [Sv] of the basins
+    '''
+    E_zonal = None
+    for tile in row_tiles(n_row, rows):
+        n_tile = tile.stop - tile.start
+        halo = slice(tile.start, min(tile.stop + 1, n_row))
+        theta_v = t_on_v(read_theta(halo))[...,:n_tile,:]
+        v = read_v(tile)
+        area = read_area(tile)
+        basins_tile = [None if basin is None else basin[tile] for basin in basins]
+        E_point = energy_transport(v, theta_v, area, constant)
+        del theta_v
+        if point is not None:
+            point(tile, E_point)
+        E_tile = overturning.zonal_integrals(E_point, basins_tile)
+        # the area holds the grid spacing, the thickness and the mask
+        psi_tile = overturning.stream_function(v, 1.0, area, basins=basins_tile)
+        del v, area, E_point
+        if E_zonal is None:
+            leading = E_tile[0].shape[:-1]
+            level = psi_tile[0].shape[-2]
+            E_zonal = [np.zeros(leading + (n_row,)) for basin in basins]
+            psi = [np.zeros(leading + (level, n_row)) for basin in basins]
+        for n in range(len(basins)):
+            E_zonal[n][...,tile] = E_tile[n]
+            psi[n][...,tile] = psi_tile[n]
+
+    return E_zonal, psi
@@ -0,0 +1,214 @@
+"""
+Copyright Netherlands eScience Center
+
+Function        : Shared writer of the output files (NetCDF4, compressed and chunked)
+Date            : 2026.10.17
+Last Update     : 2026.10.17
+Description     : The AMET, OMET and Statistics scripts wrote their output as
+                  NETCDF3_64BIT with float64 variables, without compression. The
+                  files of the fields at each grid point (e.g. 1979-2016 for the 5
+                  components of AMET and uc/vc) are very large and slow to copy.
+
+                  create_dataset opens a NETCDF4 file with the CF global attributes
+                  and create_variable replaces Dataset.createVariable. The variables
+                  are compressed with zlib (shuffle) and chunked along the time axes
+                  (year, month, time, ...), one time step per chunk with the full
+                  spatial field, which is the way the files are written and read.
+                  A variable which is written in parts, e.g. tiles of rows, is given
+                  chunks of those parts (chunks).
+                  The coordinates (latitude, longitude, level, ...) get their CF
+                  attributes, which the scripts may overwrite afterwards.
+
+                  The data variables can be packed:
+                  None      keep the data type of the script (float64)
+                  'float32' single precision (about 7 significant digits)
+                  'int16'   16 bit integers with scale_factor and add_offset (CF
+                            packing), about 4.5 significant digits of the range of
+                            the variable. The range is taken from the first write,
+                            or from value_range, and later writes are clipped to it.
+                            Missing values (nan) are stored as _FillValue.
+                  netCDF4 unpacks the data when they are read, so the readers do not
+                  change.
+
+                  Appender keeps an output file open with an unlimited time dimension
+                  (e.g. year) and appends the result of each year or month as soon as
+                  it is computed, with a flush to disk every flush_interval appends.
+                  The pools of all the years (e.g. OMET of ORAS4 at each grid point,
+                  1958-2014) are never held in memory, and a run which stops halfway
+                  leaves the years which are finished in the file. With the int16
+                  packing the range of the variables must be given (value_range),
+                  since the first append only covers one year or month and the
+                  later ones would be clipped to it.
+Return Value    : NetCDF4 data files
+Dependencies    : time, logging, numpy, netCDF4 (imported when a file is created)
+"""
+import numpy as np
+import time
+import logging
+
+# dimensions of the time axes, which are chunked by one
+time_dimensions = ('time', 'year', 'month', 'day', 'hour', 'record')
+# CF attributes of the coordinates, the units of the scripts take precedence
+coordinate_attributes = {'latitude' : {'standard_name' : 'latitude', 'units' : 'degrees_north', 'axis' : 'Y'},
+                         'longitude' : {'standard_name' : 'longitude', 'units' : 'degrees_east', 'axis' : 'X'},
+                         'level' : {'long_name' : 'model level', 'axis' : 'Z', 'positive' : 'down'},
+                         'lev' : {'long_name' : 'depth', 'axis' : 'Z', 'positive' : 'down'},
+                         'time' : {'standard_name' : 'time', 'axis' : 'T'},
+                         'year' : {'long_name' : 'year'},
+                         'month' : {'long_name' : 'month of the year'}}
+# largest packed value, -32768 is the fill value
+int16_max = 32767
+
+def create_dataset(path, title=None):
+    '''
+    Open a new NETCDF4 output file.
+    param path: path of the file
+    param title: CF global attribute title, the scripts add their own description
+    '''
+    from netCDF4 import Dataset
+    dataset = Dataset(path, 'w', format='NETCDF4')
+    dataset.Conventions = 'CF-1.6'
+    if title is not None:
+        dataset.title = title
+    dataset.history = 'Created %s by Energy-Wizard' % (time.strftime('%Y-%m-%d %H:%M:%S'))
+    dataset.institution = 'Netherlands eScience Center'
+
+    return dataset
+
+def chunk_sizes(dataset, dimensions):
+    '''
+    One time step per chunk with the full spatial field.
+    '''
+    return [1 if name in time_dimensions or len(dataset.dimensions[name]) == 0
+            else len(dataset.dimensions[name]) for name in dimensions]
+
+def create_variable(dataset, name, datatype, dimensions, packing=None, complevel=4, value_range=None, chunks=None):
+    '''
+    Create a compressed and chunked variable, see Dataset.createVariable.
+    param packing: None, 'float32' or 'int16' for the data variables of floating point,
+                   the coordinates are never packed
+    param complevel: zlib compression level (1 - 9)
+    param value_range: (minimum, maximum) of the data for the int16 packing, by default
+                       the range of the first write
+    param chunks: chunk sizes along the dimensions, by default chunk_sizes; a variable
+                  which is written in parts (e.g. tiles of rows) should be chunked by
+                  those parts, so a chunk is compressed once
+    return: netCDF4 variable, or PackedVariable for the int16 packing
+    '''
+    dimensions = tuple(dimensions)
+    # coordinate variables have the name of their dimension
+    coordinate = dimensions == (name,) or name in coordinate_attributes
+    floating = np.dtype(datatype).kind == 'f'
+    if packing not in (None, 'float32', 'int16'):
+        raise ValueError('unknown packing %s of %s, use None, float32 or int16' % (packing, name))
+    if coordinate or not floating:
+        packing = None
+    if chunks is None and dimensions:
+        chunks = chunk_sizes(dataset, dimensions)
+    if packing == 'int16':
+        variable = dataset.createVariable(name, np.int16, dimensions, zlib=True, shuffle=True, complevel=complevel,
+                                          chunksizes=chunks, fill_value=-int16_max-1)
+        variable = PackedVariable(variable, value_range)
+    else:
+        if packing == 'float32':
+            datatype = np.float32
+        variable = dataset.createVariable(name, datatype, dimensions, zlib=True, shuffle=True, complevel=complevel,
+                                          chunksizes=chunks)
+    if coordinate and name in coordinate_attributes:
+        for attribute, value in coordinate_attributes[name].items():
+            # the axis only belongs to a coordinate variable, not e.g. to the 2D latitude of ORCA
+            if attribute != 'axis' or dimensions == (name,):
+                setattr(variable, attribute, value)
+
+    return variable
+
+class PackedVariable(object):
+    '''
+    Variable packed into int16 with scale_factor and add_offset. It takes the place of
+    the netCDF4 variable: the attributes are set on the netCDF4 variable and the data
+    are packed when they are written (variable[...] = data).
+    '''
+    def __init__(self, variable, value_range=None):
+        object.__setattr__(self, 'variable', variable)
+        if value_range is not None:
+            self.pack(*value_range)
+
+    def __getattr__(self, name):
+        return getattr(self.variable, name)
+
+    def __setattr__(self, name, value):
+        setattr(self.variable, name, value)
+
+    def __getitem__(self, key):
+        return self.variable[key]
+
+    def __setitem__(self, key, data):
+        data = np.ma.masked_invalid(np.asarray(data, dtype=float))
+        if 'scale_factor' not in self.variable.ncattrs():
+            if data.count() == 0:
+                self.pack(0.0, 0.0)
+            else:
+                self.pack(data.min(), data.max())
+        minimum = self.variable.add_offset - int16_max * self.variable.scale_factor
+        maximum = self.variable.add_offset + int16_max * self.variable.scale_factor
+        if data.count() and (data.min() < minimum or data.max() > maximum):
+            logging.warning('%s is clipped to the packing range %.4e - %.4e' % (self.variable.name, minimum, maximum))
+            data = np.ma.clip(data, minimum, maximum)
+        # the missing values are written as _FillValue, nan must not reach the packing
+        self.variable[key] = np.ma.masked_array(data.filled(self.variable.add_offset), mask=np.ma.getmaskarray(data))
+
+    def pack(self, minimum, maximum):
+        '''
+        Set scale_factor and add_offset for the range of the data.
+        '''
+        # one step of margin on each side for the rounding
+        scale = (float(maximum) - float(minimum)) / (2 * (int16_max - 1))
+        if scale == 0.0:
+            scale = 1.0
+        self.variable.scale_factor = scale
+        self.variable.add_offset = (float(maximum) + float(minimum)) / 2
+
+class Appender(object):
+    '''
+    Output file which grows along its unlimited dimension, the fields are appended
+    when they are computed.
+    param dataset: file from create_dataset, with the unlimited dimension created
+                   with size None, e.g. dataset.createDimension('year', None)
+    param flush_interval: number of appends between two flushes to disk
+    '''
+    def __init__(self, dataset, flush_interval=12):
+        self.dataset = dataset
+        self.flush_interval = flush_interval
+        self.variables = {}
+        self.count = 0
+
+    def create_variable(self, name, datatype, dimensions, packing=None, complevel=4, value_range=None, chunks=None):
+        '''
+        Create a variable of the file, see create_variable. The int16 packing needs
+        value_range, the range of the first append does not hold for the others.
+        '''
+        if packing == 'int16' and value_range is None:
+            raise ValueError('the int16 packing of %s needs value_range, the fields are appended one by one' % (name))
+        self.variables[name] = create_variable(self.dataset, name, datatype, dimensions, packing,
+                                               complevel, value_range, chunks)
+
+        return self.variables[name]
+
+    def append(self, index, fields):
+        '''
+        Write the fields of one step, e.g. a year or a month of a year.
+        param index: index of the step on the leading dimensions, e.g. n for the n-th
+                     year or (n, month); a variable with fewer dimensions (e.g. the
+                     coordinate year) takes the leading part of the index
+        param fields: dictionary of the values of each variable
+        '''
+        if not isinstance(index, tuple):
+            index = (index,)
+        for name, values in fields.items():
+            self.variables[name][index[:self.variables[name].ndim]] = values
+        self.count += 1
+        if self.count % self.flush_interval == 0:
+            self.dataset.sync()
+
+    def close(self):
+        self.dataset.close()
@@ -0,0 +1,89 @@
+"""
+Copyright Netherlands eScience Center
+
+Function        : Meridional overturning stream function of the ocean (any basin)
+Date            : 2026.10.17
+Last Update     : 2026.10.17
+Description     : The OMET scripts of ORAS4, GLORYS2V3 and SODA3 computed the stream
+                  function level by level from the sea bottom to the surface, with the
+                  grid spacing, the land-sea masks and the partial cells expanded to
+                  the full size of the velocity by np.repeat, e.g. 4 arrays of 12 x
+                  42 x 292 x 362 for a year of ORAS4. The transport e1v * v * dz was
+                  computed again for the Atlantic.
+
+                  stream_function takes the meridional velocity with any leading axes
+                  (month, ...) in front of (level, j, i). The grid spacing and the
+                  thickness of the cells are broadcast (no copies), the transport
+                  through each cell is computed once and each basin mask is applied
+                  to it while it is integrated zonally. Since the zonal integral and
+                  the vertical integral are both sums, the vertical integral from the
+                  sea bottom is taken afterwards on the zonal integrals (level, j),
+                  which are small. Any number of basins is done in one pass, with
+                  the basin masks of wizard.mesh (Atlantic, Indo-Pacific, Arctic,
+                  polygons) applied on the fly to the masked transport.
+
+                  zonal_integrals does the same for a field which is integrated in
+                  the vertical already, e.g. OMET at each grid point, so that the
+                  OMET of each basin comes out of the same pass over the 3D fields
+                  and the point outputs need not be read and masked again.
+Return Value    : numpy arrays
+Dependencies    : numpy
+"""
+import numpy as np
+
+def cell_thickness(thickness, adjust=None):
+    '''
+    Thickness of the cells, with the partial cells at the bottom.
+    param thickness: thickness of each level (NEMO e3t_0, MOM5 dz) (level)
+    param adjust: adjustment of the partial cells (level, j, i), see wizard.mesh
+    return: thickness (level, 1, 1) or (level, j, i)
+    '''
+    thickness = np.asarray(np.ma.filled(thickness, 0.0), dtype=float)[:,np.newaxis,np.newaxis]
+    if adjust is None:
+        return thickness
+
+    return thickness - adjust
+
+def stream_function(v, width, thickness, mask=None, basins=(None,)):
+    '''
+    Meridional overturning stream function, integrated from the sea bottom to the
+    surface and zonally.
+    psi(level k, j) = sum over i and over the levels k to the bottom of
+                      width * v * thickness * mask * basin
+    param v: meridional velocity (..., level, j, i) [m/s], the masked values are 0
+    param width: zonal grid spacing at the V points (NEMO e1v, MOM5 e1c) (j, i) [m]
+    param thickness: thickness of the cells (level, j, i) or (level, 1, 1) [m], see
+                     cell_thickness
+    param mask: land-sea mask of the velocity (level, j, i), e.g. NEMO vmask
+    param basins: list of the masks of the basins (j, i), see wizard.mesh.basin_mask,
+                  None for the whole domain (globe)
+    return: list of the stream functions of the basins (..., level, j) [Sv]
+    '''
+    # transport through each cell, the only array of the size of v
+    transport = np.ma.filled(v, 0.0) * np.ma.filled(width, 0.0)
+    transport *= thickness
+    if mask is not None:
+        transport *= np.ma.filled(mask, 0)
+    psi = []
+    for zonal in zonal_integrals(transport, basins):
+        # integral from the sea bottom to the surface
+        psi.append(np.cumsum(zonal[...,::-1,:], axis=-2)[...,::-1,:] / 1e+6) # the unit is changed to Sv
+
+    return psi
+
+def zonal_integrals(field, basins=(None,)):
+    '''
+    Zonal integral of a field within each basin, e.g. OMET at each grid point.
+    param field: (..., j, i), the masked values are 0
+    param basins: list of the masks of the basins (j, i), None for the whole domain
+    return: list of the zonal integrals of the basins (..., j)
+    '''
+    field = np.ma.filled(field, 0.0)
+    integrals = []
+    for basin in basins:
+        if basin is None:
+            integrals.append(np.sum(field, -1))
+        else:
+            integrals.append(np.einsum('...ji,ji->...j', field, np.ma.filled(basin, 0).astype(field.dtype)))
+
+    return integrals
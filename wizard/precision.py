@@ -0,0 +1,51 @@
+"""
+Copyright Netherlands eScience Center
+
+Function        : Validation of the float32 mode of the AMET scripts
+Date            : 2026.10.17
+Last Update     : 2026.10.17
+Description     : In the float32 mode the 4D fields (time, level, latitude, longitude)
+                  are kept in single precision, while the column integrals, the
+                  time means and the zonal integrals are accumulated in float64.
+                  validation_report compares the zonal integral of the meridional
+                  energy transport of one month computed in float32 with the same
+                  month computed in float64. The difference is given in PW for the
+                  total and for each component, and it is checked against the
+                  tolerance (0.001 PW by default).
+Return Value    : maximum absolute difference [PW]
+Dependencies    : logging, numpy
+"""
+import numpy as np
+import logging
+
+def validation_report(reference, candidate, names, tolerance=0.001):
+    '''
+    Compare the zonal integrals of the float32 computation with float64.
+    param reference: zonal integrals [TW] (1E+12) computed in float64, one per name
+    param candidate: zonal integrals [TW] computed in float32, one per name
+    param names: name of each zonal integral, e.g. total, internal, latent ...
+    param tolerance: the largest acceptable difference [PW]
+    return: maximum absolute difference over all names and latitudes [PW]
+    '''
+    print('*******************************************************************')
+    print('****  Validation of float32 against float64 (unit: PW, 1E+15)  ****')
+    print('*******************************************************************')
+    difference_max = 0.0
+    for name, field_64, field_32 in zip(names, reference, candidate):
+        # unit change from tera to peta
+        difference = np.abs(np.asarray(field_32, dtype=float) - np.asarray(field_64, dtype=float)) / 1000
+        message = '%-14s max |diff| %.2e PW, mean |diff| %.2e PW, max |AMET| %.3f PW' % \
+                  (name, np.max(difference), np.mean(difference), np.max(np.abs(field_64)) / 1000)
+        print(message)
+        logging.info(message)
+        difference_max = max(difference_max, np.max(difference))
+    if difference_max > tolerance:
+        message = 'float32 differs from float64 by %.2e PW, more than %.0e PW' % (difference_max, tolerance)
+        print(message)
+        logging.warning(message)
+    else:
+        message = 'float32 agrees with float64 within %.0e PW' % (tolerance)
+        print(message)
+        logging.info(message)
+
+    return difference_max
@@ -0,0 +1,182 @@
+"""
+Copyright Netherlands eScience Center
+
+Function        : Conversion cache of the GRIB input of a reanalysis to NetCDF4
+Date            : 2026.10.17
+Last Update     : 2026.10.17
+Description     : The model level fields of JRA55 and EC-Earth are stored in GRIB1
+                  and they are decoded again every time AMET is computed. MonthStore
+                  converts a month (or an EC-Earth output file) once into a NetCDF4
+                  file, compressed with zlib (shuffle) and chunked with one time step
+                  and all levels per chunk, i.e. (1, level, latitude, longitude).
+                  This is the way AMET reads its input, a chunk of time steps with
+                  all the levels, so a read only touches the chunks it needs.
+
+                  A manifest (manifest.json) in the store directory records the
+                  provenance of each converted unit: the source files (size,
+                  modification time and sha1), the variables with their units and
+                  chunks, the compression and the time of the conversion. A unit is
+                  available when it is in the manifest, its file exists and the
+                  source files which still exist have the same size and modification
+                  time as at the conversion. The scripts take their input from the
+                  store when the unit is available and fall back to GRIB otherwise.
+
+                  The unit is written to a temporary file first and the manifest is
+                  updated under a file lock, so a killed conversion never leaves a
+                  broken unit behind.
+Return Value    : numpy arrays
+Dependencies    : os, json, time, fcntl, logging, numpy, netCDF4, wizard.checkpoint,
+                  wizard.loader
+"""
+import numpy as np
+import os
+import json
+import time
+import fcntl
+import logging
+
+from wizard import checkpoint
+from wizard import loader
+
+class MonthStore(object):
+    '''
+    Converted units (months) of a reanalysis product in a store directory.
+    param directory: store directory, created if it does not exist
+    param name: name of the product, e.g. JRA55 or EC-Earth
+    '''
+    def __init__(self, directory, name):
+        self.directory = directory
+        self.name = name
+        self.manifest_path = os.path.join(directory, 'manifest.json')
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def path(self, label):
+        '''
+        NetCDF4 file of a unit, e.g. label 2000_01 for January 2000.
+        '''
+        return os.path.join(self.directory, '%s_%s.nc' % (self.name, label))
+
+    def available(self, label):
+        '''
+        True if the unit is converted and its sources have not changed since.
+        '''
+        entry = self.read_manifest().get('%s_%s' % (self.name, label))
+        if entry is None or not os.path.exists(self.path(label)):
+            return False
+        for path, description in entry['sources'].items():
+            # the GRIB files may be removed after the conversion
+            if not os.path.exists(path):
+                continue
+            status = os.stat(path)
+            if status.st_size != description['size'] or int(status.st_mtime) != description['mtime']:
+                logging.info('The source %s of %s %s has changed' % (path, self.name, label))
+                return False
+
+        return True
+
+    def read(self, label, names, steps=None, dtype=None):
+        '''
+        Read variables of a unit.
+        param names: names of the variables
+        param steps: slice of the time axis, None for all time steps
+        param dtype: precision of the returned arrays, None to keep the stored dtype
+        return: list of arrays, one for each name
+        '''
+        from netCDF4 import Dataset
+        dataset = Dataset(self.path(label))
+        fields = [loader.read_variable(dataset.variables[name], dtype=dtype, steps=steps) for name in names]
+        dataset.close()
+
+        return fields
+
+    def convert(self, label, n_steps, read_block, variables, latitude, longitude, sources,
+                level=None, steps_per_block=1, complevel=4, dtype=float):
+        '''
+        Convert a unit into the store.
+        param n_steps: number of time steps of the unit
+        param read_block: function of (start, stop) which returns a dictionary with the
+                          fields of each variable for the time steps from start to stop
+        param variables: list of (name, units, long_name, 3D), where 3D is True for
+                         fields with levels (time, level, latitude, longitude)
+        param latitude, longitude: coordinates of the fields
+        param sources: list of the source files of the unit
+        param level: levels of the 3D fields (model level numbers), None without 3D fields
+        param steps_per_block: number of time steps per call of read_block
+        param complevel: zlib compression level (1 - 9)
+        param dtype: precision of the stored fields
+        '''
+        from netCDF4 import Dataset
+        print('Convert %s %s to %s' % (self.name, label, self.path(label)))
+        logging.info('Convert %s %s to %s' % (self.name, label, self.path(label)))
+        start_time = time.time()
+        path_tmp = self.path(label)[:-len('.nc')] + '_tmp.nc'
+        dataset = Dataset(path_tmp, 'w', format='NETCDF4')
+        dataset.createDimension('time', n_steps)
+        dataset.createDimension('latitude', len(latitude))
+        dataset.createDimension('longitude', len(longitude))
+        dataset.createVariable('latitude', np.float32, ('latitude',))[:] = latitude
+        dataset.createVariable('longitude', np.float32, ('longitude',))[:] = longitude
+        chunks = {}
+        for name, units, long_name, field_3D in variables:
+            if field_3D and 'level' not in dataset.dimensions:
+                dataset.createDimension('level', len(level))
+                dataset.createVariable('level', np.int32, ('level',))[:] = level
+            if field_3D:
+                dimensions = ('time', 'level', 'latitude', 'longitude')
+                chunks[name] = [1, len(dataset.dimensions['level']), len(latitude), len(longitude)]
+            else:
+                dimensions = ('time', 'latitude', 'longitude')
+                chunks[name] = [1, len(latitude), len(longitude)]
+            variable = dataset.createVariable(name, dtype, dimensions, zlib=True, shuffle=True,
+                                              complevel=complevel, chunksizes=chunks[name])
+            variable.units = units
+            variable.long_name = long_name
+        dataset.description = 'Conversion of the GRIB input of %s %s (wizard.store)' % (self.name, label)
+        # write the fields block by block, only one block is kept in memory
+        for start in np.arange(0, n_steps, steps_per_block):
+            stop = min(start + steps_per_block, n_steps)
+            fields = read_block(start, stop)
+            for name, units, long_name, field_3D in variables:
+                dataset.variables[name][start:stop] = fields[name]
+            del fields
+        dataset.close()
+        os.rename(path_tmp, self.path(label))
+        entry = {'file' : os.path.basename(self.path(label)),
+                 'steps' : int(n_steps),
+                 'variables' : dict((name, {'units' : units, 'long_name' : long_name, 'chunks' : chunks[name]})
+                                    for name, units, long_name, field_3D in variables),
+                 'complevel' : complevel,
+                 'dtype' : np.dtype(dtype).name,
+                 'created' : time.strftime('%Y-%m-%d %H:%M:%S'),
+                 'seconds' : round(time.time() - start_time, 1),
+                 'sources' : self.describe_sources(sources)}
+        with open(self.manifest_path + '.lock', 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            manifest = self.read_manifest()
+            manifest['%s_%s' % (self.name, label)] = entry
+            with open(self.manifest_path + '.tmp', 'w') as manifest_file:
+                json.dump(manifest, manifest_file, indent=1, sort_keys=True)
+            os.rename(self.manifest_path + '.tmp', self.manifest_path)
+            fcntl.flock(lock, fcntl.LOCK_UN)
+        print('%s %s is converted in %.1f minutes' % (self.name, label, (time.time() - start_time) / 60))
+        logging.info('%s %s is converted in %.1f minutes' % (self.name, label, (time.time() - start_time) / 60))
+
+    def read_manifest(self):
+        if not os.path.exists(self.manifest_path):
+            return {}
+        with open(self.manifest_path) as manifest_file:
+            return json.load(manifest_file)
+
+    def describe_sources(self, sources):
+        '''
+        Size, modification time and sha1 of each source file.
+        '''
+        description = {}
+        for path in sources:
+            status = os.stat(path)
+            description[path] = {'size' : status.st_size,
+                                 'mtime' : int(status.st_mtime),
+                                 'sha1' : checkpoint.file_hash(path)}
+
+        return description
@@ -0,0 +1,223 @@
+"""
+Copyright Netherlands eScience Center
+
+Function        : Streaming computation of AMET in chunks of time steps
+Date            : 2026.10.17
+Last Update     : 2026.10.17
+Description     : The mass budget correction and the energy transport only need the
+                  monthly mean of 2D column integrals, together with the state of the
+                  column at the first and the last time step (for the tendencies).
+                  MonthStream takes the 4D fields of a month in chunks of time steps
+                  and keeps only running means of 2D fields, so the 4D fields of a
+                  chunk can be dropped before the next chunk is read. This generalises
+                  the 3 rounds (days 1 - 10, 11 - 20, 21 - end) of the JRA55
+                  "memoryWise" script and the day loop of the MERRA2 script.
+
+                  For each chunk the following column integrals are added to a running
+                  mean over time (wizard.accumulate):
+                  moisture flux (u q dp / g, v q dp / g), mass flux (u dp / g, v dp / g),
+                  precipitable water (q dp / g), surface pressure and the eight energy
+                  flux integrals of wizard.column. As the divergence is linear, the
+                  divergence of the monthly mean flux equals the monthly mean of the
+                  divergence of each time step.
+
+                  The number of time steps per chunk follows from a memory budget
+                  (steps_per_chunk). The reader of each reanalysis (ERA-Interim,
+                  MERRA2, JRA55, EC-Earth) only has to deliver T, q, u, v, sp and
+                  either gz or the surface geopotential z of a chunk; the level
+                  ordering is given by surface_first and the latitude ordering by
+                  north_to_south.
+
+                  The tendency terms are taken from the first and the last time step
+                  of the stream. Scripts which use the time steps of the neighbouring
+                  months (centred tendency) pass their own start and end state, see
+                  MonthStream.state and mean_state.
+Return Value    : numpy arrays
+Dependencies    : numpy, wizard.accumulate, wizard.hybrid, wizard.column, wizard.divergence
+"""
+import numpy as np
+
+from wizard import accumulate
+from wizard import column
+from wizard import divergence
+from wizard import hybrid
+
+# 2D column integrals which are averaged over time
+names_mass = ['moisture_flux_u_int', 'moisture_flux_v_int', 'mass_flux_u_int', 'mass_flux_v_int',
+              'precipitable_water_int', 'sp']
+names_energy = ['internal_flux_int', 'latent_flux_int', 'geopotential_flux_int', 'kinetic_flux_int',
+                'heat_flux_int', 'vapor_flux_int', 'geo_flux_int', 'velocity_flux_int']
+
+def steps_per_chunk(memory_budget, n_level, n_latitude, n_longitude, itemsize=8, n_fields=5, n_steps=None):
+    '''
+    Number of time steps per chunk which fits in the memory budget.
+    param memory_budget: bytes available for one chunk
+    param itemsize: bytes per value of the 4D fields (8 for float64, 4 for float32)
+    param n_fields: number of 4D fields of a chunk (T, q, u, v and gz)
+    param n_steps: number of time steps of the month, the chunk is never longer
+    '''
+    # the 4D fields, and about 32 2D arrays in float64 for the level loops
+    step_bytes = n_fields * n_level * n_latitude * n_longitude * itemsize + 32 * n_latitude * n_longitude * 8
+    steps = max(1, int(memory_budget // step_bytes))
+    if n_steps is not None:
+        steps = min(steps, n_steps)
+
+    return steps
+
+def time_chunks(n_steps, steps):
+    '''
+    (start, stop) of each chunk of steps time steps, the last chunk may be shorter.
+    '''
+    return [(start, min(start + steps, n_steps)) for start in np.arange(0, n_steps, steps)]
+
+def mean_state(state_a, state_b):
+    '''
+    Mean of two column states, e.g. the last time step of the last month and the
+    first time step of the current month for a centred tendency.
+    '''
+    return dict((name, (state_a[name] + state_b[name]) / 2) for name in state_a)
+
+class MonthStream(object):
+    '''
+    Monthly means of the 2D column integrals for AMET, filled chunk by chunk.
+    param A: hybrid coefficient A on half levels [Pa]
+    param B: hybrid coefficient B on half levels [1]
+    param constant: dictionary of constants with at least g, cp, Lv, R_dry and R_vap
+    param surface_first: True if level 0 is the lowest model level (JRA55)
+    param variance: True to keep the variance over time of each column integral
+    '''
+    def __init__(self, A, B, constant, surface_first=False, variance=False):
+        self.A = A
+        self.B = B
+        self.constant = constant
+        self.surface_first = surface_first
+        self.n_steps = 0
+        self.means = dict((name, accumulate.RunningMean(variance)) for name in names_mass + names_energy)
+        # column state at the first and the last time step
+        self.first = None
+        self.last = None
+
+    def add(self, T, q, u, v, sp, gz=None, z=None):
+        '''
+        Add a chunk of time steps.
+        param T, q, u, v: 4D fields (time, level, latitude, longitude)
+        param sp: surface pressure [Pa] (time, latitude, longitude)
+        param gz: geopotential [m2/s2] on model levels, or None to compute it from z
+        param z: surface geopotential [m2/s2], used if gz is None
+        '''
+        levels = hybrid.HybridLevels(self.A, self.B, sp, self.surface_first)
+        integrals = dict(zip(names_mass, self.mass_integrals(q, u, v, levels) + (levels.sp,)))
+        integrals.update(zip(names_energy,
+                             column.energy_column_integrals(T, q, u, v, gz, levels, self.constant, z=z)))
+        for name in names_mass + names_energy:
+            self.means[name].add_chunk(integrals[name])
+        if self.n_steps == 0:
+            self.first = {'sp' : np.array(levels.sp[0], dtype=float),
+                          'precipitable_water_int' : integrals['precipitable_water_int'][0]}
+        self.last = {'sp' : np.array(levels.sp[-1], dtype=float),
+                     'precipitable_water_int' : integrals['precipitable_water_int'][-1]}
+        self.n_steps += len(levels.sp)
+
+    def mass_integrals(self, q, u, v, levels):
+        '''
+        Column integrals of the moisture flux, the mass flux and precipitable water
+        in one pass over the model levels.
+        '''
+        moisture_flux_u_int = np.zeros(levels.sp.shape, dtype=float)
+        moisture_flux_v_int = np.zeros(levels.sp.shape, dtype=float)
+        mass_flux_u_int = np.zeros(levels.sp.shape, dtype=float)
+        mass_flux_v_int = np.zeros(levels.sp.shape, dtype=float)
+        precipitable_water_int = np.zeros(levels.sp.shape, dtype=float)
+        for k in np.arange(levels.n_level):
+            # mass of the layer per unit area dp / g [kg/m2]
+            mass = levels.dp(k) / self.constant['g']
+            q_level = np.asarray(q[:,k,:,:], dtype=float)
+            mass_u = np.asarray(u[:,k,:,:], dtype=float) * mass
+            mass_v = np.asarray(v[:,k,:,:], dtype=float) * mass
+            mass_flux_u_int += mass_u
+            mass_flux_v_int += mass_v
+            moisture_flux_u_int += mass_u * q_level
+            moisture_flux_v_int += mass_v * q_level
+            precipitable_water_int += mass * q_level
+
+        return moisture_flux_u_int, moisture_flux_v_int, mass_flux_u_int, mass_flux_v_int, precipitable_water_int
+
+    def state(self, q, sp):
+        '''
+        Column state (surface pressure and precipitable water) of a single time step,
+        e.g. of the neighbouring months.
+        param q: specific humidity (level, latitude, longitude)
+        param sp: surface pressure [Pa] (latitude, longitude)
+        '''
+        levels = hybrid.HybridLevels(self.A, self.B, sp, self.surface_first)
+        return {'sp' : np.array(levels.sp, dtype=float),
+                'precipitable_water_int' : levels.vertical_integral(q) / self.constant['g']}
+
+    def mean(self, name):
+        '''
+        Time mean of a column integral over all time steps added so far.
+        '''
+        return self.means[name].mean()
+
+    def variance(self, name):
+        '''
+        Variance over time of a column integral, if the stream keeps the variance.
+        '''
+        return self.means[name].variance()
+
+    def correction(self, dx, dy, seconds, north_to_south=False, polar_rows=(), start=None, end=None):
+        '''
+        Barotropic correction wind from the mass budget (Trenberth, 1991).
+        param dx: zonal grid length for each latitude [m]
+        param dy: meridional grid length [m]
+        param seconds: length of the period between the start and the end state [s]
+        param north_to_south: True if latitude is ordered from north to south
+        param polar_rows: rows of latitude where vc is set to zero (polar points)
+        param start: column state at the start, by default the first time step
+        param end: column state at the end, by default the last time step
+        return: uc, vc [m/s]
+        '''
+        if start is None:
+            start = self.first
+        if end is None:
+            end = self.last
+        g = self.constant['g']
+        dx = np.asarray(dx, dtype=float)[:,np.newaxis]
+        # tendency terms
+        moisture_tendency = (end['precipitable_water_int'] - start['precipitable_water_int']) / seconds
+        sp_tendency = (end['sp'] - start['sp']) / seconds
+        # divergence terms
+        div_moisture_flux_u, div_moisture_flux_v = divergence.divergence(self.mean('moisture_flux_u_int'),
+                                                                         self.mean('moisture_flux_v_int'),
+                                                                         dx[:,0], dy, north_to_south)
+        div_mass_flux_u, div_mass_flux_v = divergence.divergence(self.mean('mass_flux_u_int'),
+                                                                 self.mean('mass_flux_v_int'),
+                                                                 dx[:,0], dy, north_to_south)
+        # evaporation minus precipitation
+        E_P = moisture_tendency + div_moisture_flux_u + div_moisture_flux_v
+        mass_residual = sp_tendency + g * (div_mass_flux_u + div_mass_flux_v) - g * E_P
+        # mass of the column without water vapour
+        column_mass = self.mean('sp') - g * self.mean('precipitable_water_int')
+        vc = mass_residual * dy / column_mass
+        # modification at polar points
+        vc[list(polar_rows),:] = 0
+        uc = mass_residual * dx / column_mass
+
+        return uc, vc
+
+    def energy_transport(self, vc, dx):
+        '''
+        Corrected meridional energy transport [TW] (1E+12).
+        param vc: meridional barotropic correction wind [m/s]
+        param dx: zonal grid length for each latitude [m]
+        return: zonal integrals of the total, internal, latent, geopotential and kinetic
+                energy transport, followed by the same five on each grid point
+        '''
+        dx = np.asarray(dx, dtype=float)[:,np.newaxis]
+        point = []
+        for flux, correction in zip(names_energy[:4], names_energy[4:]):
+            point.append((self.mean(flux) - vc * self.mean(correction)) * dx / 1e+12)
+        point.insert(0, point[0] + point[1] + point[2] + point[3])
+        zonal = [np.sum(field, 1) for field in point]
+
+        return tuple(zonal + point)
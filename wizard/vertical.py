@@ -0,0 +1,98 @@
+"""
+Copyright Netherlands eScience Center
+
+Function        : Interpolation of fields from model levels to pressure levels
+Date            : 2026.10.17
+Last Update     : 2026.10.17
+Description     : The Statistics scripts of ERA-Interim and MERRA2 interpolated T, u,
+                  v, q and gz from the hybrid model levels to the target pressure
+                  levels with a scipy.interpolate.interp1d object for every variable
+                  and every column (time, latitude, longitude), e.g. 5 x 124 x 94 x
+                  480 interpolators for a month of ERA-Interim north of 20N.
+
+                  PressureInterpolator finds the model levels which bracket each
+                  target level in all the columns at once: the columns are put one
+                  after the other on a single increasing axis (each column shifted by
+                  the range of the pressure) and searched with one np.searchsorted.
+                  The bracketing levels and the weights are kept and applied to any
+                  number of fields on the same levels, so the search is done once per
+                  month (or day) instead of once per variable and column.
+
+                  The interpolation is linear in pressure, as interp1d(kind='slinear')
+                  of the scripts, or linear in log-pressure (log_pressure=True). The
+                  target levels outside the column (above the top or below the lowest
+                  model level) get fill_value, 0 as in the scripts.
+Return Value    : numpy arrays with the target levels on the level axis
+Dependencies    : numpy
+"""
+import numpy as np
+
+class PressureInterpolator(object):
+    '''
+    Linear interpolation of fields from the model levels to pressure levels.
+    param p_level: pressure of the model levels (e.g. time, level, latitude, longitude)
+                   [Pa], monotone along the level axis (the same direction in all columns)
+    param p_target: target pressure levels [Pa]
+    param axis: level axis of p_level and of the fields
+    param log_pressure: True to interpolate linearly in ln(p)
+    param fill_value: value of the target levels outside the column
+    '''
+    def __init__(self, p_level, p_target, axis=1, log_pressure=False, fill_value=0.0):
+        p_level = np.moveaxis(np.asarray(p_level, dtype=float), axis, -1)
+        p_target = np.asarray(p_target, dtype=float)
+        self.axis = axis
+        self.fill_value = fill_value
+        self.shape = p_level.shape[:-1]
+        n_level = p_level.shape[-1]
+        # the levels in increasing pressure (TOA to surface)
+        self.reverse = bool(p_level.reshape(-1, n_level)[0,0] > p_level.reshape(-1, n_level)[0,-1])
+        p_column = p_level.reshape(-1, n_level)
+        if self.reverse:
+            p_column = p_column[:,::-1]
+        n_column = p_column.shape[0]
+        # every column on its own stretch of one increasing axis
+        minimum = min(p_column.min(), p_target.min())
+        span = max(p_column.max(), p_target.max()) - minimum + 1.0
+        offset = (np.arange(n_column, dtype=float) * span)[:,np.newaxis]
+        keys = (p_column - minimum + offset).ravel()
+        targets = (p_target[np.newaxis,:] - minimum + offset).ravel()
+        # number of levels with p < target in each column
+        count = np.searchsorted(keys, targets).reshape(n_column, len(p_target)) -\
+                (np.arange(n_column) * n_level)[:,np.newaxis]
+        del keys, targets
+        # upper one of the bracketing levels, a target at the lowest level takes the last
+        # interval (int16 to save memory, there are less than 32767 levels)
+        self.upper = np.clip(count, 1, n_level - 1).astype(np.int16)
+        del count
+        if log_pressure:
+            x_column = np.log(p_column)
+            x_target = np.log(p_target)
+        else:
+            x_column = p_column
+            x_target = p_target
+        x_lower = np.take_along_axis(x_column, self.upper - 1, -1)
+        x_upper = np.take_along_axis(x_column, self.upper, -1)
+        self.weight = (x_target[np.newaxis,:] - x_lower) / (x_upper - x_lower)
+        self.inside = (p_target[np.newaxis,:] >= p_column[:,:1]) & (p_target[np.newaxis,:] <= p_column[:,-1:])
+        self.n_target = len(p_target)
+
+    def interpolate(self, field):
+        '''
+        Interpolate one field on the model levels to the target levels.
+        '''
+        field = np.moveaxis(np.ma.filled(field, np.nan), self.axis, -1)
+        column = field.reshape(-1, field.shape[-1])
+        if self.reverse:
+            column = column[:,::-1]
+        value_lower = np.take_along_axis(column, self.upper - 1, -1)
+        value_upper = np.take_along_axis(column, self.upper, -1)
+        values = np.where(self.inside, value_lower + self.weight * (value_upper - value_lower), self.fill_value)
+
+        return np.moveaxis(values.reshape(self.shape + (self.n_target,)), -1, self.axis)
+
+    def __call__(self, *fields):
+        '''
+        Interpolate several fields on the same model levels, e.g. T, u, v, q, gz.
+        return: list of the fields on the target levels
+        '''
+        return [self.interpolate(field) for field in fields]